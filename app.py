@@ -3,8 +3,14 @@ Carnivore GPS Tracking Analysis Dashboard
 Main application file
 """
 
+import time
+import uuid
+
+# Cold start phases (name, perf_counter at its end), reported once the app is ready
+_startup_marks = [("start", time.perf_counter())]
+
 import dash
-from dash import dcc, html, Input, Output, State, callback, dash_table
+from dash import dcc, html, Input, Output, State, Patch, callback, dash_table
 import dash_bootstrap_components as dbc
 import pandas as pd
 import numpy as np
@@ -16,6 +22,10 @@ import requests
 import os
 import base64
 import io
+import flask
+from importlib import import_module
+
+_startup_marks.append(("dash, pandas and plotly", time.perf_counter()))
 
 # Create the Dash app
 app = dash.Dash(
@@ -27,12 +37,60 @@ app = dash.Dash(
 server = app.server
 app.title = "Carnivore GPS Tracking Dashboard"
 
+# Instrument the analysis and Movebank functions before their names are imported below,
+# and every callback registered from here on (metrics at /metrics)
+import components.analysis
+import components.movebank_api
+from components.instrumentation import instrument_callbacks, instrument_module, register_metrics_routes
+instrument_module(components.analysis)
+instrument_module(components.movebank_api)
+callback = instrument_callbacks(callback)
+app.callback = instrument_callbacks(app.callback)
+register_metrics_routes(server)
+
 # Import components and pages after app initialization
 from components.analysis import (
     calculate_daily_distance, calculate_nsd, calculate_home_range,
     calculate_activity_patterns, calculate_speed_metrics, calculate_fix_success,
     calculate_core_peripheral_zones
 )
+from components.data_store import register_dataset, dataset_version, get_dataset, get_result, store_result
+from components.append import register_append_routes
+from components.live import live_dataset, live_kpis, poll_live, start_live, stop_live
+from components.export import register_export_routes, tile_url_template
+from components.figure_cache import cached_figure, skip_cache
+from components.steps import get_step_table, displacement_from_start, usable_steps
+from components.activity import activity_tensor, activity_frame
+from components.timeline import build_timeline
+from components.hmm import get_hmm_states, active_from_states
+from components.segmentation import get_segments
+from components.nsd import get_nsd_models, model_curve
+from components.quality import (
+    get_quality_report, completeness_from_rollup, merge_intervals, quality_scores, rollup_by
+)
+from components.outliers import (FLAG_NAMES, apply_outlier_filter, normalize_outlier_settings, outlier_suffix,
+                                 outlier_summary)
+from components.ingest import DEFAULT_POLICY, DEFAULT_TOLERANCE_S, describe_resolution, resolve_duplicates
+from components.raster import LAYER_DIR, get_layer_values, habitat_usage
+from components.proximity import (
+    FEATURE_LAYERS, HUMAN_LAYERS, get_feature_distances, human_influence_index, proximity_summary
+)
+from components.elevation import DEM_DIR, elevation_summary, get_elevation, profile_points
+from components.jobs import ACTIVE_STATUSES, job_status, submit_job
+from components.schema import to_canonical
+from components.movebank_api import MoveBank
+from components.tracks import get_tracks, split_individuals
+
+_startup_marks.append(("components", time.perf_counter()))
+
+# GeoJSON / vector tile export endpoints for GIS clients and the map page
+register_export_routes(server)
+
+# Append endpoint for live collar feeds (merges new fixes into a registered dataset)
+register_append_routes(server)
+
+# Above this many fixes the map page draws tracks from vector tiles instead of per-point traces
+LARGE_STUDY_FIXES = 50000
 
 # Create a navigation sidebar with the expanded sections
 sidebar = html.Div(
@@ -86,6 +144,12 @@ app.layout = html.Div(
         dcc.Store(id="store-speed"),
         dcc.Store(id="store-quality"),
         dcc.Store(id="store-filters"),
+        dcc.Store(id="store-outlier-settings"),  # Outlier settings of this browser (default mask if empty)
+        dcc.Store(id="store-jobs", data={}),  # Background job ids by analysis
+        dcc.Store(id="store-session-id", storage_type="session"),  # Scopes this tab's background jobs
+        dcc.Store(id="store-job-status"),  # Progress of the background jobs
+        dcc.Store(id="store-live"),  # Live-tracking state and the latest delta of new fixes
+        dcc.Store(id="store-figure-etags", data={}),  # Tags of the cached figures this browser shows
         dcc.Store(id="study-id-store"),  # Store for the current study ID
         
         # Date filter component that's used by several callbacks
@@ -94,6 +158,8 @@ app.layout = html.Div(
         # Hidden behavioral analysis components needed by callbacks
         dbc.Input(id="behavioral-activity-threshold", type="number", value=0.05, style={"display": "none"}),
         dbc.Input(id="behavioral-time-window", type="number", value=60, style={"display": "none"}),
+        dcc.RadioItems(id="behavioral-classifier", value="threshold", style={"display": "none"}),
+        dbc.Input(id="behavioral-hmm-states", type="number", value=3, style={"display": "none"}),
         dcc.Dropdown(id="behavioral-individuals", multi=True, style={"display": "none"}),
         dcc.Dropdown(id="behavioral-timeline-individual", style={"display": "none"}),
         
@@ -163,7 +229,7 @@ app.layout = html.Div(
             children=html.Div(id="loading-output")
         ),
         
-        # Interval component for periodic updates (can be enabled if needed)
+        # Interval component for periodic updates: background job polling and live tracking
         dcc.Interval(
             id="interval-component",
             interval=300000,  # 5 minutes in milliseconds
@@ -173,16 +239,30 @@ app.layout = html.Div(
     ]
 )
 
-# Import pages after app layout initialization
-from pages.dashboard import layout as dashboard_layout
-from pages.data_import import layout as data_import_layout
-from pages.map_visualization import layout as map_layout
-from pages.movement_analysis import layout as movement_layout
-from pages.home_range_analysis import layout as home_range_layout
-from pages.behavioral_patterns import layout as behavior_layout
-from pages.environmental_context import layout as environment_layout
-from pages.data_quality import layout as quality_layout
-from pages.help import layout as help_layout
+_startup_marks.append(("layout", time.perf_counter()))
+
+# Page layout modules by URL path. Pages are imported and their layouts built on first
+# navigation, unless PRELOAD_PAGES is set (e.g. for long-lived workers)
+PAGE_MODULES = {
+    "/": "pages.dashboard",
+    "/data-import": "pages.data_import",
+    "/map": "pages.map_visualization",
+    "/movement": "pages.movement_analysis",
+    "/home-range": "pages.home_range_analysis",
+    "/behavior": "pages.behavioral_patterns",
+    "/environment": "pages.environmental_context",
+    "/quality": "pages.data_quality",
+    "/help": "pages.help",
+}
+
+def get_page_layout(pathname):
+    # Module imports are cached by Python, so each layout is built once per process
+    return import_module(PAGE_MODULES[pathname]).layout
+
+if os.environ.get("PRELOAD_PAGES"):
+    for page_path in PAGE_MODULES:
+        get_page_layout(page_path)
+    _startup_marks.append(("pages", time.perf_counter()))
 
 # Callback to update page content based on URL
 @app.callback(
@@ -190,24 +270,8 @@ from pages.help import layout as help_layout
     Input("url", "pathname")
 )
 def render_page_content(pathname):
-    if pathname == "/":
-        return dashboard_layout
-    elif pathname == "/data-import":
-        return data_import_layout
-    elif pathname == "/map":
-        return map_layout
-    elif pathname == "/movement":
-        return movement_layout
-    elif pathname == "/home-range":
-        return home_range_layout
-    elif pathname == "/behavior":
-        return behavior_layout
-    elif pathname == "/environment":
-        return environment_layout
-    elif pathname == "/quality":
-        return quality_layout
-    elif pathname == "/help":
-        return help_layout
+    if pathname in PAGE_MODULES:
+        return get_page_layout(pathname)
     else:
         # If the user tries to reach a different page, return a 404 message
         return html.Div(
@@ -493,10 +557,15 @@ def apply_filters_to_preview(n_clicks, movement_data_json, selected_individuals,
         Output("data-preview-table", "data"),
     ],
     Input("upload-movebank-csv", "contents"),
-    [State("upload-movebank-csv", "filename"), State("upload-movebank-csv", "last_modified")],
+    [
+        State("upload-movebank-csv", "filename"),
+        State("upload-movebank-csv", "last_modified"),
+        State("duplicate-policy", "value"),
+        State("duplicate-tolerance", "value"),
+    ],
     prevent_initial_call=True
 )
-def process_csv_upload(contents, filename, last_modified):
+def process_csv_upload(contents, filename, last_modified, duplicate_policy, duplicate_tolerance):
     print("DEBUG: process_csv_upload called", contents is not None, filename, last_modified, flush=True)
     if contents is None:
         return None, dash.no_update, {"display": "none"}, [], []
@@ -516,31 +585,8 @@ def process_csv_upload(contents, filename, last_modified):
         # Try to parse the CSV file
         df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
         
-        # Check required columns - try alternative column names
-        required_cols_mapping = {
-            'individual_id': ['individual_id', 'individual-id', 'id', 'animal_id', 'animal-id', 'tag_id', 'tag-id'],
-            'timestamp': ['timestamp', 'time', 'date', 'datetime', 'date_time', 'date-time'],
-            'location_lat': ['location_lat', 'location-lat', 'latitude', 'lat', 'y'],
-            'location_long': ['location_long', 'location-long', 'longitude', 'long', 'lon', 'x']
-        }
-        
-        # Map actual column names to required column names
-        col_mapping = {}
-        missing_cols = []
-        
-        for req_col, alternatives in required_cols_mapping.items():
-            found = False
-            for alt in alternatives:
-                if alt in df.columns:
-                    col_mapping[alt] = req_col
-                    found = True
-                    break
-            if not found:
-                missing_cols.append(req_col)
-        
-        # Rename columns if needed
-        if col_mapping and not missing_cols:
-            df = df.rename(columns=col_mapping)
+        # Resolve column aliases to the canonical schema once, in place
+        missing_cols = to_canonical(df)
         
         # Check if any required columns are still missing
         if missing_cols:
@@ -564,8 +610,12 @@ def process_csv_upload(contents, filename, last_modified):
             ], className="text-danger")
             return None, error_message, {"display": "none"}, [], []
         
-        # Sort data by individual_id and timestamp
-        df = df.sort_values(['individual_id', 'timestamp'])
+        # Sort by individual and time and resolve duplicate fixes
+        df, resolution = resolve_duplicates(
+            df,
+            policy=duplicate_policy or DEFAULT_POLICY,
+            tolerance_s=duplicate_tolerance if duplicate_tolerance is not None else DEFAULT_TOLERANCE_S
+        )
         
         # Create a preview of the data
         preview_df = df.head(10).copy()  # Create a copy to avoid SettingWithCopyWarning
@@ -587,13 +637,19 @@ def process_csv_upload(contents, filename, last_modified):
             html.Div([
                 html.Strong(f"Successfully loaded {len(df):,} records from {filename}"),
                 html.Br(),
-                html.Span(f"Found {num_individuals} individuals with data ranging from {date_range}")
+                html.Span(f"Found {num_individuals} individuals with data ranging from {date_range}"),
+                html.Br(),
+                html.Small(describe_resolution(resolution), className="text-muted")
             ])
         ], className="text-success p-2 bg-light border rounded")
         
         # Store the movement data as JSON
         movement_data_json = df.to_json(date_format='iso', orient='split')
         
+        # Keep a server-side copy for the export endpoints, with its ingest report
+        version = register_dataset(df, movement_data_json)
+        store_result(version, 'ingest', resolution)
+        
         return movement_data_json, success_message, {"display": "block"}, preview_columns, preview_data
         
     except Exception as e:
@@ -706,21 +762,26 @@ def update_filters_store(study_id, selected_individuals, start_date, end_date):
 @callback(
     Output("store-daily-distance", "data"),
     Input("store-movement-data", "data"),
+    Input("store-outlier-settings", "data"),
     prevent_initial_call=True,
 )
-def process_daily_distance(movement_data_json):
+def process_daily_distance(movement_data_json, outlier_settings):
     if not movement_data_json:
         return None
     
     try:
-        # Convert JSON to DataFrame
-        movement_data = pd.read_json(movement_data_json, orient='split')
-        
-        # Calculate daily distance for each individual
-        daily_distance = calculate_daily_distance(movement_data)
+        # Appended datasets keep their daily distance (default outlier mask) up to date incrementally
+        kind = f"daily_distance{outlier_suffix(outlier_settings)}"
+        daily_distance = get_result(dataset_version(movement_data_json), kind)
+        if daily_distance is None:
+            steps = get_step_table(movement_data_json, outlier_settings=outlier_settings)
+            daily_distance = calculate_daily_distance(steps)
+        else:
+            daily_distance = daily_distance.copy()
         
-        # Store the results
+        # Store the results, with the distance in km for the dashboard
         if daily_distance is not None and not daily_distance.empty:
+            daily_distance['distance'] = daily_distance['daily_distance'] / 1000
             return daily_distance.to_json(date_format='iso', orient='split')
         else:
             return None
@@ -756,18 +817,19 @@ def process_home_range(movement_data_json):
 @callback(
     Output("store-activity", "data", allow_duplicate=True),
     Input("store-movement-data", "data"),
+    Input("store-outlier-settings", "data"),
     prevent_initial_call=True,
 )
-def process_activity_patterns(movement_data_json):
+def process_activity_patterns(movement_data_json, outlier_settings):
     if not movement_data_json:
         return None
     
     try:
-        # Convert JSON to DataFrame
-        movement_data = pd.read_json(movement_data_json, orient='split')
-        
-        # Calculate activity patterns for each individual
-        activity_data = calculate_activity_patterns(movement_data)
+        # Count active/resting steps per individual and hour with default settings
+        steps = get_step_table(movement_data_json, outlier_settings=outlier_settings)
+        tensor = get_result(dataset_version(movement_data_json), f"activity{outlier_suffix(outlier_settings)}")
+        counts, speed_sum = tensor if tensor is not None else activity_tensor(steps)
+        activity_data = activity_frame(counts, speed_sum, steps.attrs['individuals'])
         
         # Store the results
         if activity_data is not None and not activity_data.empty:
@@ -781,18 +843,17 @@ def process_activity_patterns(movement_data_json):
 @callback(
     Output("store-speed", "data"),
     Input("store-movement-data", "data"),
+    Input("store-outlier-settings", "data"),
     prevent_initial_call=True,
 )
-def process_speed_metrics(movement_data_json):
+def process_speed_metrics(movement_data_json, outlier_settings):
     if not movement_data_json:
         return None
     
     try:
-        # Convert JSON to DataFrame
-        movement_data = pd.read_json(movement_data_json, orient='split')
-        
-        # Calculate speed metrics for each individual
-        speed_data = calculate_speed_metrics(movement_data)
+        # Speed summary per individual over steps between fixes not flagged as outliers
+        steps = get_step_table(movement_data_json, outlier_settings=outlier_settings)
+        speed_data = speed_summary(steps)
         
         # Store the results
         if speed_data is not None and not speed_data.empty:
@@ -802,29 +863,37 @@ def process_speed_metrics(movement_data_json):
     except Exception:
         return None
 
+# Per-individual speed statistics from the usable steps of the step table
+def speed_summary(steps):
+    usable = usable_steps(steps) & (steps['dt_s'].to_numpy() > 0)
+    speeds = steps.loc[usable, ['individual_id', 'speed_kmh']]
+    summary = speeds.groupby('individual_id')['speed_kmh'].agg(['mean', 'median', 'max', 'std', 'count'])
+    summary = summary.rename(columns={'mean': 'speed_kmh', 'median': 'median_speed_kmh',
+                                      'max': 'max_speed_kmh', 'std': 'speed_std_kmh', 'count': 'steps'})
+    return summary.reset_index()
+
 # Callback to calculate data quality metrics and update store
 @callback(
     Output("store-quality", "data"),
     Input("store-movement-data", "data"),
+    Input("store-outlier-settings", "data"),
     prevent_initial_call=True,
 )
-def process_data_quality(movement_data_json):
+def process_data_quality(movement_data_json, outlier_settings):
     if not movement_data_json:
         return None
     
     try:
-        # Convert JSON to DataFrame
-        movement_data = pd.read_json(movement_data_json, orient='split')
-        
-        # Calculate fix success rate and data gaps for each individual
-        quality_data = calculate_fix_success(movement_data)
+        # Fix success rate and data gaps for all individuals from the shared step table
+        quality_data = get_quality_report(movement_data_json, outlier_settings=outlier_settings)['individuals']
         
         # Store the results
-        if quality_data is not None and not quality_data.empty:
+        if not quality_data.empty:
             return quality_data.to_json(date_format='iso', orient='split')
         else:
             return None
-    except Exception:
+    except Exception as e:
+        print(f"Error processing data quality: {e}")
         return None
 
 # Dashboard KPI Cards Callbacks
@@ -845,9 +914,11 @@ def process_data_quality(movement_data_json):
         Input("store-quality", "data"),
         Input("store-home-range", "data"),
     ],
+    State("store-live", "data"),
     prevent_initial_call=True,
 )
-def update_dashboard_kpis(movement_data_json, daily_distance_json, speed_json, activity_json, quality_json, home_range_json):
+def update_dashboard_kpis(movement_data_json, daily_distance_json, speed_json, activity_json, quality_json, home_range_json,
+                          live):
     # Default values
     total_distance = "--"
     avg_daily = "--"
@@ -898,17 +969,30 @@ def update_dashboard_kpis(movement_data_json, daily_distance_json, speed_json, a
         except Exception:
             pass
     
+    # With live fixes appended, the KPIs describe the appended dataset
+    if movement_data_json and live_dataset(live, dataset_version(movement_data_json)):
+        live_texts = live_kpi_texts(live["version"])
+        total_distance, avg_daily, avg_speed, time_active, fix_rate = [
+            text if text is not dash.no_update else default
+            for text, default in zip(live_texts, [total_distance, avg_daily, avg_speed, time_active, fix_rate])
+        ]
+    
     return total_distance, avg_daily, avg_speed, time_active, fix_rate, home_range
 
 # Dashboard Main Chart Callback
 @callback(
-    Output("dashboard-main-chart", "figure"),
+    [
+        Output("dashboard-main-chart", "figure"),
+        Output("store-figure-etags", "data", allow_duplicate=True),
+    ],
     [
         Input("store-daily-distance", "data"),
         Input("dashboard-chart-type", "value"),
     ],
-    prevent_initial_call=True,
+    State("store-figure-etags", "data"),
+    prevent_initial_call="initial_duplicate",
 )
+@cached_figure()
 def update_dashboard_main_chart(daily_distance_json, chart_type):
     # Default empty figure
     fig = go.Figure()
@@ -1004,15 +1088,17 @@ def update_dashboard_main_chart(daily_distance_json, chart_type):
     except Exception as e:
         # Return default figure with error information
         fig.update_layout(title=f"Error loading data: {str(e)}")
+        skip_cache()
         return fig
 
 # Dashboard Map Preview Callback
 @callback(
     Output("dashboard-map-preview", "figure"),
     Input("store-movement-data", "data"),
+    State("store-live", "data"),
     prevent_initial_call=True,
 )
-def update_dashboard_map(movement_data_json):
+def update_dashboard_map(movement_data_json, live):
     # Default empty figure
     fig = go.Figure()
     fig.update_layout(
@@ -1025,8 +1111,9 @@ def update_dashboard_map(movement_data_json):
         return fig
     
     try:
-        # Convert JSON to DataFrame
-        df = pd.read_json(movement_data_json, orient='split')
+        # Convert JSON to DataFrame (the appended dataset while live mode has new fixes)
+        appended = live_dataset(live, dataset_version(movement_data_json))
+        df = appended[1] if appended else pd.read_json(movement_data_json, orient='split')
         
         # Check if required columns exist
         if 'location_lat' not in df.columns or 'location_long' not in df.columns:
@@ -1144,6 +1231,392 @@ def update_dashboard_activity(activity_json):
         fig.update_layout(title=f"Error loading activity data: {str(e)}")
         return fig
 
+# Dashboard NSD Chart Callback
+@callback(
+    Output("nsd-chart", "figure"),
+    Input("store-movement-data", "data"),
+    Input("store-outlier-settings", "data"),
+    prevent_initial_call=True,
+)
+def update_nsd_chart(movement_data_json, outlier_settings):
+    # Default empty figure
+    fig = go.Figure()
+    fig.update_layout(
+        title="No data available",
+        xaxis_title="Date",
+        yaxis_title="NSD (km²)",
+        template="plotly_white",
+        height=320,
+    )
+    
+    if not movement_data_json:
+        return fig
+    
+    try:
+        # Daily NSD and model fits for all individuals, cached per dataset
+        daily, fits = get_nsd_models(movement_data_json, outlier_settings=outlier_settings)
+        
+        if daily.empty:
+            return fig
+        
+        colors = px.colors.qualitative.Safe
+        best = fits[fits['is_best']].set_index('individual_id') if not fits.empty else pd.DataFrame()
+        
+        for i, (individual, group) in enumerate(daily.groupby('individual_id', sort=False)):
+            color = colors[i % len(colors)]
+            label = str(individual)
+            if individual in best.index:
+                label = f"{individual} ({best.loc[individual, 'model']})"
+            
+            fig.add_trace(go.Scattergl(
+                x=group['date'],
+                y=group['nsd_km2'],
+                mode='markers',
+                marker=dict(color=color, size=4),
+                name=label,
+                legendgroup=label
+            ))
+            
+            # Best-fitting movement model
+            if individual in best.index:
+                fig.add_trace(go.Scattergl(
+                    x=group['date'],
+                    y=model_curve(best.loc[individual], group['day'].to_numpy()),
+                    mode='lines',
+                    line=dict(color=color, width=2),
+                    name=f"{individual} fit",
+                    legendgroup=label,
+                    showlegend=False
+                ))
+        
+        fig.update_layout(
+            title="Net Squared Displacement",
+            margin={"l": 40, "r": 40, "t": 40, "b": 40},
+            legend={'title': 'Individual (best model)'}
+        )
+        
+        return fig
+        
+    except Exception as e:
+        print(f"Error creating NSD chart: {e}")
+        return fig
+
+# Habitat layer values at every fix for the environmental page settings
+def habitat_samples(movement_data_json, layer, resolution):
+    values, legend, path = get_layer_values(movement_data_json, layer or "landcover", resolution)
+    return get_step_table(movement_data_json), values, legend, path
+
+# Message shown when a habitat layer cannot be sampled
+def habitat_unavailable_title(layer, error=None):
+    if isinstance(error, ImportError):
+        return "Raster layers need the rasterio package"
+    if error is not None:
+        return f"Error sampling habitat layer: {str(error)}"
+    return f"No '{layer}' layer found in {LAYER_DIR}"
+
+# Callback for fixes colored by habitat class
+@callback(
+    Output("habitat-map", "figure"),
+    [
+        Input("store-movement-data", "data"),
+        Input("update-environmental-btn", "n_clicks"),
+        Input("habitat-layer-dropdown", "value"),
+    ],
+    State("habitat-resolution", "value"),
+    prevent_initial_call=True,
+)
+def update_habitat_map(movement_data_json, n_clicks, layer, resolution):
+    # Default empty figure
+    fig = go.Figure()
+    fig.update_layout(
+        title="No data available",
+        template="plotly_white",
+        height=400,
+    )
+    
+    if not movement_data_json:
+        return fig
+    
+    try:
+        steps, values, legend, path = habitat_samples(movement_data_json, layer, resolution)
+        if values is None:
+            fig.update_layout(title=habitat_unavailable_title(layer))
+            return fig
+        
+        # Thin the fixes evenly for display; every class keeps its own trace
+        shown = np.arange(0, len(steps), max(1, len(steps) // MAX_MAP_FIXES))
+        shown_values = values[shown]
+        
+        fig = go.Figure()
+        for value in np.unique(shown_values[~np.isnan(shown_values)]):
+            rows = shown[shown_values == value]
+            fig.add_trace(go.Scattermapbox(
+                lat=steps['location_lat'].to_numpy()[rows],
+                lon=steps['location_long'].to_numpy()[rows],
+                mode='markers',
+                marker=dict(size=5),
+                name=legend.get(int(value), f"Class {value:g}")
+            ))
+        outside = shown[np.isnan(shown_values)]
+        if len(outside):
+            fig.add_trace(go.Scattermapbox(
+                lat=steps['location_lat'].to_numpy()[outside],
+                lon=steps['location_long'].to_numpy()[outside],
+                mode='markers',
+                marker=dict(size=4, color='lightgray'),
+                name="Not covered"
+            ))
+        
+        fig.update_layout(
+            title=f"Fixes by {layer} class",
+            height=400,
+            margin={"l": 0, "r": 0, "t": 40, "b": 0},
+            mapbox=dict(
+                style="carto-positron",
+                center=dict(lat=float(steps['location_lat'].mean()), lon=float(steps['location_long'].mean())),
+                zoom=7
+            ),
+            legend=dict(orientation="h", y=-0.05)
+        )
+        
+        return fig
+        
+    except Exception as e:
+        fig.update_layout(title=habitat_unavailable_title(layer, e))
+        return fig
+
+# Individuals shown separately in the habitat usage chart (more are pooled)
+MAX_USAGE_INDIVIDUALS = 20
+
+# Callback for habitat usage per individual and the dominant habitat
+@callback(
+    [
+        Output("habitat-usage-chart", "figure"),
+        Output("dominant-habitat-stat", "children"),
+    ],
+    [
+        Input("store-movement-data", "data"),
+        Input("update-environmental-btn", "n_clicks"),
+        Input("habitat-layer-dropdown", "value"),
+    ],
+    State("habitat-resolution", "value"),
+    prevent_initial_call=True,
+)
+def update_habitat_usage(movement_data_json, n_clicks, layer, resolution):
+    # Default empty figure
+    fig = go.Figure()
+    fig.update_layout(
+        title="No data available",
+        template="plotly_white",
+        height=300,
+    )
+    
+    if not movement_data_json:
+        return fig, "--"
+    
+    try:
+        steps, values, legend, path = habitat_samples(movement_data_json, layer, resolution)
+        if values is None:
+            fig.update_layout(title=habitat_unavailable_title(layer))
+            return fig, "--"
+        
+        usage = habitat_usage(steps, values, legend)
+        if usage.empty:
+            fig.update_layout(title=f"No fixes inside the '{layer}' layer")
+            return fig, "--"
+        
+        # Dominant habitat over all covered fixes
+        overall = usage.groupby('habitat')['fixes'].sum().sort_values(ascending=False)
+        dominant = f"{overall.index[0]} ({overall.iloc[0] / overall.sum() * 100:.0f}%)"
+        
+        if usage['individual_id'].nunique() > MAX_USAGE_INDIVIDUALS:
+            usage = (overall / overall.sum() * 100).rename('percent').reset_index().assign(individual_id="All")
+        
+        fig = px.bar(
+            usage,
+            x='individual_id',
+            y='percent',
+            color='habitat',
+            labels={'individual_id': 'Individual', 'percent': '% of fixes', 'habitat': 'Habitat'},
+            template="plotly_white"
+        )
+        fig.update_layout(
+            title="Habitat Use by Individual",
+            barmode="stack",
+            height=300,
+            margin={"l": 40, "r": 20, "t": 40, "b": 40}
+        )
+        
+        return fig, dominant
+        
+    except Exception as e:
+        fig.update_layout(title=habitat_unavailable_title(layer, e))
+        return fig, "--"
+
+# Callback for the share of fixes near each selected feature layer
+@callback(
+    Output("proximity-chart", "figure"),
+    [
+        Input("store-movement-data", "data"),
+        Input("update-environmental-btn", "n_clicks"),
+        Input("proximity-features-checklist", "value"),
+        Input("proximity-threshold", "value"),
+    ],
+    prevent_initial_call=True,
+)
+def update_proximity_chart(movement_data_json, n_clicks, features, threshold_km):
+    # Default empty figure
+    fig = go.Figure()
+    fig.update_layout(
+        title="No data available",
+        template="plotly_white",
+        height=300,
+    )
+
+    if not movement_data_json or not features:
+        return fig
+
+    try:
+        distances = get_feature_distances(movement_data_json, features)
+        missing = [feature for feature in features if feature not in distances]
+        if not distances:
+            fig.update_layout(title=f"No feature layers ({', '.join(missing)}) found in {LAYER_DIR}")
+            return fig
+
+        threshold_m = (threshold_km or 1.0) * 1000
+        summary = proximity_summary(get_step_table(movement_data_json), distances, threshold_m)
+        summary['feature'] = summary['feature'].map(FEATURE_LAYERS)
+
+        if summary['individual_id'].nunique() > MAX_USAGE_INDIVIDUALS:
+            summary = summary.groupby('feature', as_index=False)[['within', 'fixes']].sum()
+            summary['percent_within'] = summary['within'] / summary['fixes'] * 100
+            summary['individual_id'] = "All"
+
+        fig = px.bar(
+            summary,
+            x='individual_id',
+            y='percent_within',
+            color='feature',
+            barmode='group',
+            labels={'individual_id': 'Individual', 'percent_within': '% of fixes', 'feature': 'Feature'},
+            template="plotly_white"
+        )
+        title = f"Fixes within {threshold_m / 1000:g} km of Features"
+        if missing:
+            title += f" (no layer: {', '.join(missing)})"
+        fig.update_layout(
+            title=title,
+            yaxis_range=[0, 100],
+            height=300,
+            margin={"l": 40, "r": 20, "t": 40, "b": 40}
+        )
+
+        return fig
+
+    except Exception as e:
+        print(f"Error creating proximity chart: {e}")
+        fig.update_layout(title=f"Error computing feature proximity: {str(e)}")
+        return fig
+
+# Callback for the water proximity and human influence statistics
+@callback(
+    [
+        Output("water-proximity-stat", "children"),
+        Output("human-influence-stat", "children"),
+    ],
+    [
+        Input("store-movement-data", "data"),
+        Input("update-environmental-btn", "n_clicks"),
+        Input("proximity-threshold", "value"),
+    ],
+    prevent_initial_call=True,
+)
+def update_proximity_stats(movement_data_json, n_clicks, threshold_km):
+    if not movement_data_json:
+        return "--", "--"
+
+    try:
+        distances = get_feature_distances(movement_data_json, ('water',) + HUMAN_LAYERS)
+
+        water = "--"
+        if 'water' in distances and not np.isnan(distances['water']).all():
+            water = f"{np.nanmean(distances['water']) / 1000:.2f}"
+
+        index = human_influence_index(distances, (threshold_km or 1.0) * 1000)
+        human = f"{index:.0f}" if index is not None else "--"
+
+        return water, human
+
+    except Exception as e:
+        print(f"Error computing proximity statistics: {e}")
+        return "--", "--"
+
+# Callback for the elevation profile, elevation range and per-individual ascent/descent
+@callback(
+    [
+        Output("elevation-profile", "figure"),
+        Output("elevation-range-stat", "children"),
+        Output("elevation-data-store", "data"),
+    ],
+    [
+        Input("store-movement-data", "data"),
+        Input("update-environmental-btn", "n_clicks"),
+        Input("store-outlier-settings", "data"),
+    ],
+    prevent_initial_call=True,
+)
+def update_elevation_profile(movement_data_json, n_clicks, outlier_settings):
+    # Default empty figure
+    fig = go.Figure()
+    fig.update_layout(
+        title="No data available",
+        template="plotly_white",
+        height=300,
+    )
+
+    if not movement_data_json:
+        return fig, "--", None
+
+    try:
+        elevation = get_elevation(movement_data_json)
+        if elevation is None:
+            fig.update_layout(title=f"No DEM tiles found in {DEM_DIR}")
+            return fig, "--", None
+
+        steps = get_step_table(movement_data_json, outlier_settings=outlier_settings)
+        summary = elevation_summary(steps, elevation)
+        if summary.empty:
+            fig.update_layout(title="No fixes inside the DEM tiles")
+            return fig, "--", None
+
+        profile = profile_points(steps, elevation)
+        fig = go.Figure()
+        for individual, points in profile.groupby('individual_id', sort=False):
+            fig.add_trace(go.Scattergl(
+                x=points['timestamp'],
+                y=points['elevation'],
+                mode='lines',
+                name=str(individual)
+            ))
+
+        fig.update_layout(
+            title="Elevation Profile",
+            xaxis_title="Date",
+            yaxis_title="Elevation (m)",
+            template="plotly_white",
+            height=300,
+            margin={"l": 40, "r": 20, "t": 40, "b": 40},
+            showlegend=len(summary) <= MAX_USAGE_INDIVIDUALS
+        )
+
+        elevation_range = f"{summary['min_m'].min():.0f}-{summary['max_m'].max():.0f}"
+        return fig, elevation_range, summary.to_json(orient='split')
+
+    except Exception as e:
+        print(f"Error creating elevation profile: {e}")
+        fig.update_layout(title=f"Error sampling elevation: {str(e)}")
+        return fig, "--", None
+
 # Help page navigation callbacks
 @callback(
     [Output("getting-started-section", "style"),
@@ -1220,10 +1693,11 @@ def display_help_section(n1, n2, n3, n4, n5, n6, n7, n8, n9, n10):
         Input("map-filter-individuals", "value"),
         Input("map-show-trajectory", "value"),
     ],
+    State("store-live", "data"),
     prevent_initial_call=True,
 )
 def update_map_visualization(
-    movement_data_json, map_type, map_style, time_range, selected_individuals, show_trajectory
+    movement_data_json, map_type, map_style, time_range, selected_individuals, show_trajectory, live
 ):
     # Default empty figure
     fig = go.Figure()
@@ -1237,8 +1711,13 @@ def update_map_visualization(
         return fig
     
     try:
-        # Convert JSON to DataFrame
-        df = pd.read_json(movement_data_json, orient='split')
+        # Convert JSON to DataFrame (the appended dataset while live mode has new fixes)
+        version = dataset_version(movement_data_json)
+        appended = live_dataset(live, version)
+        if appended:
+            version, df = appended
+        else:
+            df = pd.read_json(movement_data_json, orient='split')
         
         # Check if required columns exist
         if 'location_lat' not in df.columns or 'location_long' not in df.columns:
@@ -1248,6 +1727,7 @@ def update_map_visualization(
         # Ensure timestamp is datetime
         if 'timestamp' in df.columns:
             df['timestamp'] = pd.to_datetime(df['timestamp'])
+        full_df = df
         
         # Apply time range filter if provided
         if time_range and len(time_range) == 2 and 'timestamp' in df.columns:
@@ -1273,8 +1753,49 @@ def update_map_visualization(
         elif map_style == "dark":
             mapbox_style = "carto-darkmatter"
         
+        # Large studies are drawn from vector tiles served by the export endpoint
+        tiled = map_type == "points" and len(df) > LARGE_STUDY_FIXES
+        
         # Create appropriate map based on the map_type
-        if map_type == "points":
+        if tiled:
+            if get_dataset(version) is None:
+                register_dataset(full_df, version=version)
+            tiles_url = tile_url_template(version, flask.request.host_url)
+            
+            # Invisible anchor trace so the mapbox subplot is created
+            fig = go.Figure(go.Scattermapbox(
+                lat=[df['location_lat'].mean()],
+                lon=[df['location_long'].mean()],
+                mode='markers',
+                marker=dict(size=0),
+                hoverinfo='skip',
+                showlegend=False
+            ))
+            fig.update_layout(
+                height=700,
+                mapbox_layers=[
+                    {
+                        'sourcetype': 'vector',
+                        'source': [tiles_url + '?layers=tracks'],
+                        'sourcelayer': 'tracks',
+                        'type': 'line',
+                        'color': '#e74c3c',
+                        'line': {'width': 1.5},
+                        'opacity': 0.6
+                    },
+                    {
+                        'sourcetype': 'vector',
+                        'source': [tiles_url + '?layers=points'],
+                        'sourcelayer': 'points',
+                        'type': 'circle',
+                        'color': '#2c3e50',
+                        'circle': {'radius': 2},
+                        'opacity': 0.7
+                    }
+                ]
+            )
+            
+        elif map_type == "points":
             # Create scatter mapbox with individual points
             if 'individual_id' in df.columns:
                 fig = px.scatter_mapbox(
@@ -1319,13 +1840,12 @@ def update_map_visualization(
                 coloraxis_showscale=False  # Hide the color scale
             )
         
-        # Add trajectory lines if requested
-        if show_trajectory and len(show_trajectory) > 0 and 'individual_id' in df.columns:
+        # Add trajectory lines if requested (tiled maps already include the tracks layer)
+        if not tiled and show_trajectory and len(show_trajectory) > 0 and 'individual_id' in df.columns:
             if 'trajectory' in show_trajectory:
                 # Sort by timestamp to ensure correct line connection
                 if 'individual_id' in df.columns:
-                    for individual in df['individual_id'].unique():
-                        individual_df = df[df['individual_id'] == individual].sort_values('timestamp')
+                    for individual, individual_df in split_individuals(df, by_time=True):
                         fig.add_trace(
                             go.Scattermapbox(
                                 lat=individual_df['location_lat'],
@@ -1520,8 +2040,14 @@ def update_map_filter_options(movement_data_json):
         return [], []
 
 # Home Range Analysis Callbacks
+# Estimators run as background jobs; the job id is kept in store-jobs and polled
 @callback(
-    Output("store-home-range", "data"),
+    [
+        Output("store-jobs", "data", allow_duplicate=True),
+        Output("interval-component", "disabled", allow_duplicate=True),
+        Output("interval-component", "interval", allow_duplicate=True),
+        Output("store-session-id", "data"),
+    ],
     [
         Input("store-movement-data", "data"),
         Input("home-range-method", "value"),
@@ -1530,11 +2056,13 @@ def update_map_filter_options(movement_data_json):
         Input("home-range-smoothing", "value"),
         Input("home-range-individuals", "value"),
     ],
+    State("store-session-id", "data"),
     prevent_initial_call=True,
 )
-def calculate_home_range(movement_data_json, method, percent_levels, grid_size, smoothing_factor, selected_individuals):
+def calculate_home_range(movement_data_json, method, percent_levels, grid_size, smoothing_factor, selected_individuals,
+                         session_id):
     if not movement_data_json:
-        return json.dumps({})
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
     
     # Default values if not provided
     if not method:
@@ -1547,478 +2075,251 @@ def calculate_home_range(movement_data_json, method, percent_levels, grid_size,
         smoothing_factor = 1.0  # Default smoothing
         
     try:
-        # Convert JSON to DataFrame
-        df = pd.read_json(movement_data_json, orient='split')
-        
-        # Check if required columns exist
-        if 'location_lat' not in df.columns or 'location_long' not in df.columns:
-            return json.dumps({})
-        
-        # Apply individual filter if provided
-        if selected_individuals and 'individual_id' in df.columns:
-            df = df[df['individual_id'].isin(selected_individuals)]
-        
-        # Initialize result dictionary
-        result = {}
-        
-        # Calculate home range based on method
-        if method == "mcp":
-            result["mcp"] = calculate_mcp_home_range(df, percent_levels)
-        elif method == "kde":
-            result["kde"] = calculate_kde_home_range(df, percent_levels, grid_size, smoothing_factor)
-        elif method == "bbmm":
-            result["bbmm"] = calculate_bbmm_home_range(df, percent_levels, grid_size)
-        elif method == "locoht":
-            result["locoht"] = calculate_locoht_home_range(df, percent_levels)
-        
-        return json.dumps(result)
+        # Identical requests share a job; a new parameter set cancels the previous job
+        params = {
+            "method": method,
+            "percent_levels": sorted(percent_levels),
+            "grid_size": grid_size,
+            "smoothing_factor": smoothing_factor,
+            "individuals": sorted(map(str, selected_individuals)) if selected_individuals else None,
+        }
+        # Jobs are grouped per browser session, so other sessions' jobs are not cancelled
+        new_session_id = None if session_id else uuid.uuid4().hex
+        group = f"home_range:{dataset_version(movement_data_json)}:{session_id or new_session_id}"
+        job_id = submit_job("home_range", movement_data_json, params, group=group)
+        
+        jobs = Patch()
+        jobs["home_range"] = job_id
+        return jobs, False, JOB_POLL_MS, new_session_id or dash.no_update
     except Exception as e:
-        print(f"Error calculating home range: {str(e)}")
-        return json.dumps({"error": str(e)})
-
-# MCP Home Range Calculation
-def calculate_mcp_home_range(df, percent_levels):
-    result = {}
-    
-    # Check if we have multiple individuals
-    if 'individual_id' in df.columns:
-        # Calculate for each individual
-        for individual in df['individual_id'].unique():
-            ind_df = df[df['individual_id'] == individual]
-            ind_result = calculate_single_mcp(ind_df, percent_levels)
-            result[individual] = ind_result
-    else:
-        # Calculate for the single dataset
-        result = calculate_single_mcp(df, percent_levels)
-    
-    return result
+        print(f"Error starting home range job: {str(e)}")
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
-def calculate_single_mcp(df, percent_levels):
-    result = {}
-    
-    # Create a list of points for shapely
-    points = [Point(lon, lat) for lon, lat in zip(df['location_long'], df['location_lat'])]
-    
-    # Calculate MultiPoint and convex hull
-    multi_point = MultiPoint(points)
-    
-    # Calculate full MCP (100%)
-    hull = multi_point.convex_hull
-    
-    # Calculate area in square kilometers (approximate)
-    # This is an approximation assuming a flat surface
-    area_100 = calculate_area_km2(hull, df['location_lat'].mean())
-    result["area_100"] = area_100
-    result["hull_100"] = hull_to_geojson(hull)
-    
-    # Calculate MCPs for specified percent levels
-    for percent in percent_levels:
-        if percent == 100:
-            continue  # Already calculated
-            
-        # Randomly sample points
-        n_points = len(points)
-        sample_size = int(n_points * (percent / 100))
-        
-        if sample_size >= 3:  # Need at least 3 points for a polygon
-            # Sample points
-            random_indices = np.random.choice(range(n_points), sample_size, replace=False)
-            sampled_points = [points[i] for i in random_indices]
-            sampled_multi_point = MultiPoint(sampled_points)
-            sampled_hull = sampled_multi_point.convex_hull
-            
-            # Calculate area
-            area = calculate_area_km2(sampled_hull, df['location_lat'].mean())
-            result[f"area_{percent}"] = area
-            result[f"hull_{percent}"] = hull_to_geojson(sampled_hull)
-    
-    return result
-
-# KDE Home Range Calculation
-def calculate_kde_home_range(df, percent_levels, grid_size, smoothing_factor):
-    result = {}
-    
-    # Check if we have multiple individuals
-    if 'individual_id' in df.columns:
-        # Calculate for each individual
-        for individual in df['individual_id'].unique():
-            ind_df = df[df['individual_id'] == individual]
-            ind_result = calculate_single_kde(ind_df, percent_levels, grid_size, smoothing_factor)
-            result[individual] = ind_result
-    else:
-        # Calculate for the single dataset
-        result = calculate_single_kde(df, percent_levels, grid_size, smoothing_factor)
-    
-    return result
+# Poll interval (ms) while background jobs are active
+JOB_POLL_MS = 1000
 
-def calculate_single_kde(df, percent_levels, grid_size, smoothing_factor):
-    result = {}
+# Callback to poll background jobs and publish their progress and results
+@callback(
+    [
+        Output("store-home-range", "data"),
+        Output("store-job-status", "data"),
+        Output("interval-component", "disabled", allow_duplicate=True),
+        Output("interval-component", "interval", allow_duplicate=True),
+    ],
+    Input("interval-component", "n_intervals"),
+    [
+        State("store-jobs", "data"),
+        State("store-job-status", "data"),
+        State("store-live", "data"),
+    ],
+    prevent_initial_call=True,
+)
+def poll_jobs(n_intervals, jobs, previous_status, live):
+    # The interval keeps running at the live poll pace once no job is active
+    live_on = bool(live and live.get("enabled"))
+    live_interval = int(live["poll_s"] * 1000) if live_on else dash.no_update
+    if not jobs:
+        return dash.no_update, dash.no_update, not live_on, live_interval
+    
+    previous_status = previous_status or {}
+    summary = {}
+    home_range = dash.no_update
+    
+    for name, job_id in jobs.items():
+        status = job_status(job_id)
+        if status is None:
+            continue
+        summary[name] = {key: status[key] for key in ("id", "status", "progress", "message", "error")}
+        
+        # Publish partial and final results only when they changed
+        if name == "home_range" and summary[name] != previous_status.get(name):
+            if status["status"] == "done":
+                home_range = json.dumps(status["result"])
+                # Make the polygons available to the export endpoints
+                store_result(status["version"], 'home_range', status["result"])
+            elif status["status"] == "failed":
+                home_range = json.dumps({"error": status["error"]})
+            elif status["partial"]:
+                home_range = json.dumps(status["partial"])
+    
+    active = any(item["status"] in ACTIVE_STATUSES for item in summary.values())
+    interval = dash.no_update if active else live_interval
+    if summary == previous_status:
+        return home_range, dash.no_update, not active and not live_on, interval
+    return home_range, summary, not active and not live_on, interval
+
+# Live tracking: the interval polls the live source for fixes newer than each
+# individual's last fix; new fixes are appended incrementally on the server and
+# only their delta is pushed to the maps and KPIs
+@callback(
+    [
+        Output("store-live", "data"),
+        Output("interval-component", "disabled", allow_duplicate=True),
+        Output("interval-component", "interval", allow_duplicate=True),
+    ],
+    [
+        Input("live-mode-switch", "value"),
+        Input("store-movement-data", "data"),
+    ],
+    [
+        State("live-source", "value"),
+        State("live-study-id", "value"),
+        State("live-poll-minutes", "value"),
+        State("study-id-store", "data"),
+        State("store-job-status", "data"),
+        State("store-live", "data"),
+    ],
+    prevent_initial_call=True,
+)
+def toggle_live_mode(switch, movement_data_json, source, study_id, poll_minutes, current_study_id, job_status_data,
+                     previous_live):
+    # A new dataset restarts live mode on it (or leaves it off); the appended
+    # dataset of the previous run is dropped
+    if dash.ctx.triggered_id == "store-movement-data" and not (previous_live or {}).get("enabled"):
+        return dash.no_update, dash.no_update, dash.no_update
+    stop_live(previous_live)
+    
+    jobs_active = any(item.get("status") in ACTIVE_STATUSES for item in (job_status_data or {}).values())
+    if not switch or not movement_data_json:
+        return {"enabled": False}, not jobs_active, dash.no_update
     
     try:
-        # Extract coordinates
-        x = df['location_long'].to_numpy()
-        y = df['location_lat'].to_numpy()
-        
-        # Create grid for KDE calculation
-        x_min, x_max = x.min(), x.max()
-        y_min, y_max = y.min(), y.max()
-        
-        # Add buffer around min/max
-        buffer_x = (x_max - x_min) * 0.1
-        buffer_y = (y_max - y_min) * 0.1
-        
-        x_min -= buffer_x
-        x_max += buffer_x
-        y_min -= buffer_y
-        y_max += buffer_y
-        
-        # Create grid
-        x_grid = np.linspace(x_min, x_max, grid_size)
-        y_grid = np.linspace(y_min, y_max, grid_size)
-        xx, yy = np.meshgrid(x_grid, y_grid)
-        
-        # Stack coordinates for KDE input
-        positions = np.vstack([xx.ravel(), yy.ravel()])
-        values = np.vstack([x, y])
-        
-        # Calculate KDE
-        kernel = stats.gaussian_kde(values, bw_method=smoothing_factor)
-        kde = np.reshape(kernel(positions).T, xx.shape)
-        
-        # Find contour levels
-        kde_sorted = np.sort(kde.flatten())[::-1]  # Sort in descending order
-        cumsum = np.cumsum(kde_sorted)
-        cumsum = cumsum / cumsum[-1]  # Normalize
-        
-        # Store raw KDE data
-        result["kde_grid"] = kde.tolist()
-        result["x_grid"] = x_grid.tolist()
-        result["y_grid"] = y_grid.tolist()
-        
-        # Calculate contours for each percent level
-        for percent in percent_levels:
-            # Find the kde value that gives the specified percent level
-            idx = np.argmin(np.abs(cumsum - (percent / 100)))
-            contour_level = kde_sorted[idx]
-            
-            # Generate contour
-            contours = measure.find_contours(kde, contour_level)
-            
-            # Convert contours to geographic coordinates
-            geo_contours = []
-            for contour in contours:
-                # Map from grid indices to geographic coordinates
-                contour_y = np.interp(contour[:, 0], np.arange(grid_size), y_grid)
-                contour_x = np.interp(contour[:, 1], np.arange(grid_size), x_grid)
-                geo_contours.append(list(zip(contour_x, contour_y)))
-            
-            # Convert to polygons and calculate area
-            polygons = [Polygon(contour) for contour in geo_contours if len(contour) >= 3]
-            if polygons:
-                multi_polygon = MultiPolygon(polygons)
-                area = calculate_area_km2(multi_polygon, df['location_lat'].mean())
-                result[f"area_{percent}"] = area
-                result[f"contour_{percent}"] = contour_to_geojson(multi_polygon)
-                
+        steps = get_step_table(movement_data_json)
+        live = start_live(dataset_version(movement_data_json), steps, source,
+                          study_id or current_study_id, poll_minutes)
     except Exception as e:
-        result["error"] = str(e)
-    
-    return result
-
-# Brownian Bridge Movement Model (BBMM) - Simplified implementation
-def calculate_bbmm_home_range(df, percent_levels, grid_size):
-    # In a real implementation, this would use a proper BBMM package
-    # For this demo, we'll use a simplified approach similar to KDE but with time weighting
-    result = {}
-    
-    # Check if we have multiple individuals
-    if 'individual_id' in df.columns:
-        # Calculate for each individual
-        for individual in df['individual_id'].unique():
-            ind_df = df[df['individual_id'] == individual]
-            if 'timestamp' in ind_df.columns:
-                ind_result = calculate_single_bbmm(ind_df, percent_levels, grid_size)
-                result[individual] = ind_result
-    else:
-        # Calculate for the single dataset
-        if 'timestamp' in df.columns:
-            result = calculate_single_bbmm(df, percent_levels, grid_size)
+        print(f"Error starting live mode: {str(e)}")
+        return {"enabled": False, "error": str(e)}, not jobs_active, dash.no_update
     
-    return result
+    # Job polling keeps its fast pace until the jobs finish
+    return live, False, JOB_POLL_MS if jobs_active else int(live["poll_s"] * 1000)
 
-def calculate_single_bbmm(df, percent_levels, grid_size):
-    # This is a simplified implementation
-    result = {}
-    
-    try:
-        # Sort by timestamp
-        if 'timestamp' in df.columns:
-            df = df.sort_values('timestamp')
-            
-            # Calculate time differences
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df['time_diff'] = df['timestamp'].diff().dt.total_seconds() / 3600  # In hours
-            
-            # Replace NaN in first row and cap large gaps
-            df['time_diff'].iloc[0] = 0
-            df['time_diff'] = df['time_diff'].clip(upper=24)  # Cap at 24 hours
-            
-            # Use time differences as weights
-            weights = 1.0 / (df['time_diff'] + 0.1)  # Add small constant to avoid division by zero
-            weights = weights / weights.sum()  # Normalize
-            
-            # Extract coordinates
-            x = df['location_long'].to_numpy()
-            y = df['location_lat'].to_numpy()
-            
-            # Create grid
-            x_min, x_max = x.min(), x.max()
-            y_min, y_max = y.min(), y.max()
-            
-            # Add buffer
-            buffer_x = (x_max - x_min) * 0.1
-            buffer_y = (y_max - y_min) * 0.1
-            
-            x_min -= buffer_x
-            x_max += buffer_x
-            y_min -= buffer_y
-            y_max += buffer_y
-            
-            x_grid = np.linspace(x_min, x_max, grid_size)
-            y_grid = np.linspace(y_min, y_max, grid_size)
-            xx, yy = np.meshgrid(x_grid, y_grid)
-            
-            # Calculate weighted KDE as a simplified BBMM
-            grid_values = np.zeros_like(xx)
-            
-            for i in range(len(x) - 1):
-                # Calculate segment contribution based on time
-                weight = weights[i+1]
-                
-                # Create a density between consecutive points
-                segment_density = np.zeros_like(xx)
-                
-                for j in range(grid_size):
-                    for k in range(grid_size):
-                        # Distance from grid point to line segment
-                        dist = point_to_segment_distance(
-                            xx[j, k], yy[j, k],
-                            x[i], y[i],
-                            x[i+1], y[i+1]
-                        )
-                        # Apply Gaussian kernel
-                        segment_density[j, k] = np.exp(-dist * dist / 0.001) * weight
-                
-                grid_values += segment_density
-            
-            # Normalize grid values
-            grid_values = grid_values / grid_values.sum()
-            
-            # Store grid data
-            result["bbmm_grid"] = grid_values.tolist()
-            result["x_grid"] = x_grid.tolist()
-            result["y_grid"] = y_grid.tolist()
-            
-            # Calculate contours for each percent level
-            grid_sorted = np.sort(grid_values.flatten())[::-1]
-            cumsum = np.cumsum(grid_sorted)
-            cumsum = cumsum / cumsum[-1]  # Normalize
-            
-            for percent in percent_levels:
-                # Find contour level
-                idx = np.argmin(np.abs(cumsum - (percent / 100)))
-                contour_level = grid_sorted[idx]
-                
-                # Generate contour
-                contours = measure.find_contours(grid_values, contour_level)
-                
-                # Convert to geographic coordinates
-                geo_contours = []
-                for contour in contours:
-                    contour_y = np.interp(contour[:, 0], np.arange(grid_size), y_grid)
-                    contour_x = np.interp(contour[:, 1], np.arange(grid_size), x_grid)
-                    geo_contours.append(list(zip(contour_x, contour_y)))
-                
-                # Convert to polygons and calculate area
-                polygons = [Polygon(contour) for contour in geo_contours if len(contour) >= 3]
-                if polygons:
-                    multi_polygon = MultiPolygon(polygons)
-                    area = calculate_area_km2(multi_polygon, df['location_lat'].mean())
-                    result[f"area_{percent}"] = area
-                    result[f"contour_{percent}"] = contour_to_geojson(multi_polygon)
-            
-    except Exception as e:
-        result["error"] = str(e)
-    
-    return result
+@callback(
+    Output("store-live", "data", allow_duplicate=True),
+    Input("interval-component", "n_intervals"),
+    [
+        State("store-live", "data"),
+        State("store-movement-data", "data"),
+    ],
+    prevent_initial_call=True,
+)
+def poll_live_source(n_intervals, live, movement_data_json):
+    # The interval ticks faster while background jobs run; the source is polled at its own pace
+    if not live or not live.get("enabled") or time.time() - live.get("polled", 0) < live["poll_s"]:
+        return dash.no_update
+    # Live mode is being restarted on a new dataset
+    if live["base"] != dataset_version(movement_data_json):
+        return dash.no_update
+    
+    changes, delta = poll_live(live)
+    update = Patch()
+    for key, value in changes.items():
+        update[key] = value
+    update["delta"] = delta
+    return update
+
+# KPIs of an appended dataset come from its incrementally updated rollups
+LIVE_KPI_FORMATS = [
+    ("total_distance", "{:.1f} km"),
+    ("avg_daily", "{:.1f} km/day"),
+    ("avg_speed", "{:.1f} km/h"),
+    ("time_active", "{:.1f}%"),
+    ("fix_rate", "{:.1f}%"),
+]
+
+def live_kpi_texts(version):
+    kpis = live_kpis(version)
+    return [dash.no_update if kpis[key] is None else text.format(kpis[key]) for key, text in LIVE_KPI_FORMATS]
+
+def live_trace(delta, seq):
+    return go.Scattermapbox(
+        lat=delta["lat"],
+        lon=delta["lon"],
+        mode="lines+markers",
+        line=dict(width=2, color="#e74c3c"),
+        marker=dict(size=7, color="#e74c3c"),
+        text=[f"{individual}<br>{time_}" if individual else None
+              for individual, time_ in zip(delta["individual_id"], delta["time"])],
+        hoverinfo="text",
+        name=f"Live fixes ({seq})",
+        legendgroup="live",
+        showlegend=False,
+    ).to_plotly_json()
 
-# Calculate T-LoCoH Home Range (simplified implementation)
-def calculate_locoht_home_range(df, percent_levels):
-    result = {}
-    
-    # Check if we have multiple individuals
-    if 'individual_id' in df.columns:
-        # Calculate for each individual
-        for individual in df['individual_id'].unique():
-            ind_df = df[df['individual_id'] == individual]
-            ind_result = calculate_single_locoht(ind_df, percent_levels)
-            result[individual] = ind_result
-    else:
-        # Calculate for the single dataset
-        result = calculate_single_locoht(df, percent_levels)
-    
-    return result
+@callback(
+    Output("map-visualization", "figure", allow_duplicate=True),
+    Input("store-live", "data"),
+    prevent_initial_call=True,
+)
+def push_live_map(live):
+    if not live or not live.get("delta"):
+        return dash.no_update
+    fig = Patch()
+    fig["data"].append(live_trace(live["delta"], live["seq"]))
+    return fig
 
-def calculate_single_locoht(df, percent_levels):
-    # This is a simplified implementation of T-LoCoH
-    result = {}
-    
-    try:
-        # Extract coordinates
-        coords = np.column_stack((df['location_long'].values, df['location_lat'].values))
-        n_points = len(coords)
-        
-        if n_points < 5:
-            result["error"] = "Not enough points for T-LoCoH analysis"
-            return result
-        
-        # Calculate pairwise distances
-        dist_matrix = spatial.distance.cdist(coords, coords, 'euclidean')
-        
-        # Incorporate time if available
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            times = df['timestamp'].values.astype(np.int64) // 10**9  # Convert to Unix time
-            time_matrix = spatial.distance.cdist(times.reshape(-1, 1), times.reshape(-1, 1), 'euclidean')
-            # Normalize time matrix
-            time_matrix = time_matrix / time_matrix.max() if time_matrix.max() > 0 else time_matrix
-            
-            # Combine space and time with s parameter = 0.5 (equal weight)
-            combined_matrix = dist_matrix + 0.5 * time_matrix
-        else:
-            combined_matrix = dist_matrix
-        
-        # Set diagonal to infinity to avoid self-neighbors
-        np.fill_diagonal(combined_matrix, np.inf)
-        
-        # Create local hulls
-        k = min(15, n_points - 1)  # Number of nearest neighbors
-        hulls = []
-        hull_areas = []
-        
-        for i in range(n_points):
-            # Find k nearest neighbors
-            neighbors_idx = np.argsort(combined_matrix[i])[:k+1]  # +1 to include self
-            neighbor_coords = coords[neighbors_idx]
-            
-            # Create convex hull
-            if len(neighbor_coords) >= 3:
-                hull = ConvexHull(neighbor_coords)
-                hull_points = neighbor_coords[hull.vertices]
-                
-                # Calculate hull area (simplified, should be geodesic in full implementation)
-                hull_poly = Polygon(hull_points)
-                area = calculate_area_km2(hull_poly, df['location_lat'].mean())
-                
-                hulls.append(hull_poly)
-                hull_areas.append(area)
-        
-        # Sort hulls by area
-        sorted_indices = np.argsort(hull_areas)
-        sorted_hulls = [hulls[i] for i in sorted_indices]
-        
-        # Calculate isopleth hulls for different percent levels
-        total_area = sum(hull_areas)
-        
-        for percent in percent_levels:
-            # Calculate how many hulls to include
-            target_area = total_area * (percent / 100)
-            current_area = 0
-            included_hulls = []
-            
-            for i, hull in enumerate(sorted_hulls):
-                current_area += hull_areas[sorted_indices[i]]
-                included_hulls.append(hull)
-                
-                if current_area >= target_area:
-                    break
-            
-            # Union of included hulls
-            if included_hulls:
-                union_poly = unary_union(included_hulls)
-                area = calculate_area_km2(union_poly, df['location_lat'].mean())
-                result[f"area_{percent}"] = area
-                result[f"contour_{percent}"] = contour_to_geojson(union_poly)
+@callback(
+    Output("dashboard-map-preview", "figure", allow_duplicate=True),
+    Input("store-live", "data"),
+    prevent_initial_call=True,
+)
+def push_live_map_preview(live):
+    if not live or not live.get("delta"):
+        return dash.no_update
+    fig = Patch()
+    fig["data"].append(live_trace(live["delta"], live["seq"]))
+    return fig
+
+@callback(
+    [
+        Output("total-distance-kpi", "children", allow_duplicate=True),
+        Output("avg-daily-distance-kpi", "children", allow_duplicate=True),
+        Output("avg-speed-kpi", "children", allow_duplicate=True),
+        Output("time-active-kpi", "children", allow_duplicate=True),
+        Output("gps-fix-rate-kpi", "children", allow_duplicate=True),
+    ],
+    Input("store-live", "data"),
+    prevent_initial_call=True,
+)
+def push_live_kpis(live):
+    if not live or not live.get("delta"):
+        return [dash.no_update] * 5
+    return live_kpi_texts(live["version"])
+
+@callback(
+    Output("live-status", "children"),
+    Input("store-live", "data"),
+    prevent_initial_call=True,
+)
+def update_live_status(live):
+    if not live or not live.get("enabled"):
+        return f"Live mode is off. {live['error']}" if live and live.get("error") else "Live mode is off."
     
-    except Exception as e:
-        result["error"] = str(e)
-    
-    return result
-
-# Helper function to calculate area in km²
-def calculate_area_km2(polygon, mean_latitude):
-    # Convert area in degrees to km² (approximate)
-    # At the equator, 1° longitude = 111.32 km
-    # At latitude L, 1° longitude = 111.32 * cos(L) km
-    lat_correction = np.cos(np.radians(mean_latitude))
-    area_degrees = polygon.area
-    area_km2 = area_degrees * (111.32**2) * lat_correction
-    return area_km2
-
-# Helper function to convert shapely polygon to GeoJSON format
-def hull_to_geojson(hull):
-    if hull.geom_type == 'Polygon':
-        exterior_coords = list(hull.exterior.coords)
-        return {
-            "type": "Polygon",
-            "coordinates": [exterior_coords]
-        }
-    return None
-
-# Helper function to convert contour to GeoJSON
-def contour_to_geojson(contour):
-    if contour.geom_type == 'Polygon':
-        exterior_coords = list(contour.exterior.coords)
-        interior_coords = [list(interior.coords) for interior in contour.interiors]
-        return {
-            "type": "Polygon",
-            "coordinates": [exterior_coords] + interior_coords
-        }
-    elif contour.geom_type == 'MultiPolygon':
-        multi_coords = []
-        for polygon in contour.geoms:
-            exterior_coords = list(polygon.exterior.coords)
-            interior_coords = [list(interior.coords) for interior in polygon.interiors]
-            multi_coords.append([exterior_coords] + interior_coords)
-        return {
-            "type": "MultiPolygon",
-            "coordinates": multi_coords
-        }
-    return None
-
-# Helper function for BBMM calculation
-def point_to_segment_distance(px, py, x1, y1, x2, y2):
-    # Calculate the distance from point (px, py) to line segment (x1,y1)-(x2,y2)
-    line_length_sq = (x2 - x1)**2 + (y2 - y1)**2
-    
-    if line_length_sq == 0:
-        # Points are the same
-        return np.sqrt((px - x1)**2 + (py - y1)**2)
-    
-    # Calculate projection
-    t = ((px - x1) * (x2 - x1) + (py - y1) * (y2 - y1)) / line_length_sq
-    
-    if t < 0:
-        # Beyond point 1
-        return np.sqrt((px - x1)**2 + (py - y1)**2)
-    elif t > 1:
-        # Beyond point 2
-        return np.sqrt((px - x2)**2 + (py - y2)**2)
-    else:
-        # On the segment
-        proj_x = x1 + t * (x2 - x1)
-        proj_y = y1 + t * (y2 - y1)
-        return np.sqrt((px - proj_x)**2 + (py - proj_y)**2)
+    polled = datetime.fromtimestamp(live["polled"]).strftime("%H:%M:%S") if live.get("polled") else "not yet"
+    status = [html.Div(f"Live: {live['appended']:,} new fixes, last poll {polled}")]
+    if live.get("error"):
+        status.append(html.Div(f"Error: {live['error']}", className="text-danger"))
+    return status
+
+# Callback for the home range job progress on the home range page
+@callback(
+    Output("home-range-job-status", "children"),
+    Input("store-job-status", "data"),
+)
+def update_home_range_job_status(job_status_data):
+    status = (job_status_data or {}).get("home_range")
+    if not status:
+        return ""
+    
+    if status["status"] in ACTIVE_STATUSES:
+        label = "Queued" if status["status"] == "queued" else (status["message"] or "Running")
+        return dbc.Progress(value=round(status["progress"] * 100), label=label, striped=True, animated=True,
+                            className="mt-2")
+    if status["status"] == "failed":
+        return html.Small(f"Home range calculation failed: {status['error']}", className="text-danger")
+    if status["status"] == "cancelled":
+        return html.Small("Home range calculation cancelled", className="text-muted")
+    return ""
 
 # Behavioral Patterns Analysis Callbacks
 @callback(
@@ -2028,10 +2329,14 @@ def point_to_segment_distance(px, py, x1, y1, x2, y2):
         Input("behavioral-activity-threshold", "value"),
         Input("behavioral-time-window", "value"),
         Input("behavioral-individuals", "value"),
+        Input("behavioral-classifier", "value"),
+        Input("behavioral-hmm-states", "value"),
+        Input("store-outlier-settings", "data"),
     ],
     prevent_initial_call=True,
 )
-def calculate_activity_patterns(movement_data_json, activity_threshold, time_window, selected_individuals):
+def calculate_activity_patterns(movement_data_json, activity_threshold, time_window, selected_individuals,
+                                classifier, hmm_states, outlier_settings):
     if not movement_data_json:
         return json.dumps({})
     
@@ -2042,22 +2347,18 @@ def calculate_activity_patterns(movement_data_json, activity_threshold, time_win
         time_window = 60  # Default time window in minutes
     
     try:
-        # Convert JSON to DataFrame
-        df = pd.read_json(movement_data_json, orient='split')
+        # Steps are computed once per dataset; only the classification is redone here
+        steps = get_step_table(movement_data_json, outlier_settings=outlier_settings)
         
-        # Check if required columns exist
-        if 'location_lat' not in df.columns or 'location_long' not in df.columns or 'timestamp' not in df.columns:
-            return json.dumps({})
+        # Decoded HMM states replace the distance threshold when selected
+        active = decoded_activity(movement_data_json, classifier, hmm_states, outlier_settings)
         
-        # Ensure timestamp is datetime
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        # Calculate activity patterns
+        result_df = calculate_activity_metrics(steps, activity_threshold, time_window, active)
         
         # Apply individual filter if provided
-        if selected_individuals and 'individual_id' in df.columns:
-            df = df[df['individual_id'].isin(selected_individuals)]
-        
-        # Calculate activity patterns
-        result_df = calculate_activity_metrics(df, activity_threshold, time_window)
+        if selected_individuals:
+            result_df = result_df[result_df['individual_id'].isin(selected_individuals)]
         
         # Return as JSON
         return result_df.to_json(orient='split', date_format='iso')
@@ -2066,72 +2367,19 @@ def calculate_activity_patterns(movement_data_json, activity_threshold, time_win
         print(f"Error calculating activity patterns: {str(e)}")
         return json.dumps({})
 
-# Calculate activity metrics
-def calculate_activity_metrics(df, activity_threshold, time_window):
-    # Sort by individual (if present) and timestamp
-    if 'individual_id' in df.columns:
-        df = df.sort_values(['individual_id', 'timestamp'])
-    else:
-        df = df.sort_values('timestamp')
-    
-    # Initialize result DataFrame
-    result_df = pd.DataFrame()
-    
-    # Process each individual separately if individual_id exists
-    if 'individual_id' in df.columns:
-        for individual in df['individual_id'].unique():
-            ind_df = df[df['individual_id'] == individual]
-            ind_result = calculate_single_activity(ind_df, activity_threshold, time_window)
-            ind_result['individual_id'] = individual
-            result_df = pd.concat([result_df, ind_result])
-    else:
-        result_df = calculate_single_activity(df, activity_threshold, time_window)
-    
-    return result_df
-
-def calculate_single_activity(df, activity_threshold, time_window):
-    # Calculate step distances
-    df['next_lat'] = df['location_lat'].shift(-1)
-    df['next_long'] = df['location_long'].shift(-1)
-    df['time_diff'] = df['timestamp'].diff().dt.total_seconds() / 60  # in minutes
-    
-    # Calculate haversine distance
-    df['distance'] = np.nan
-    for i in range(len(df) - 1):
-        df.loc[df.index[i], 'distance'] = haversine_distance(
-            df.loc[df.index[i], 'location_lat'],
-            df.loc[df.index[i], 'location_long'],
-            df.loc[df.index[i+1], 'location_lat'],
-            df.loc[df.index[i+1], 'location_long']
-        )
-    
-    # Calculate speed in km/h
-    df['speed_kmh'] = df['distance'] / (df['time_diff'] / 60)
-    
-    # Set NaN or inf values to 0
-    df['speed_kmh'] = df['speed_kmh'].replace([np.nan, np.inf, -np.inf], 0)
-    
-    # Determine if active based on distance threshold and time window
-    df['is_active'] = (df['distance'] > activity_threshold) & (df['time_diff'] <= time_window)
-    
-    # Extract hour of day and add day/night flag
-    df['hour_of_day'] = df['timestamp'].dt.hour
-    df['is_daytime'] = ((df['hour_of_day'] >= 6) & (df['hour_of_day'] < 18))
-    
-    # Aggregate by hour of day
-    hourly_activity = df.groupby('hour_of_day').agg(
-        activity_count=('is_active', 'sum'),
-        total_count=('is_active', 'count'),
-        avg_speed=('speed_kmh', 'mean')
-    ).reset_index()
-    
-    hourly_activity['activity_ratio'] = hourly_activity['activity_count'] / hourly_activity['total_count']
-    hourly_activity['activity'] = hourly_activity['activity_ratio'] * 100  # as percentage
-    
-    # Add day/night flag
-    hourly_activity['is_daytime'] = ((hourly_activity['hour_of_day'] >= 6) & (hourly_activity['hour_of_day'] < 18))
-    
-    return hourly_activity
+# Calculate hourly activity metrics from the shared step table
+def calculate_activity_metrics(steps, activity_threshold, time_window, active=None):
+    # Activity threshold is given in km, the step table is in meters
+    counts, speed_sum = activity_tensor(steps, activity_threshold * 1000, time_window, active=active)
+    return activity_frame(counts, speed_sum, steps.attrs['individuals'])
+
+# Active steps from the HMM classifier (None keeps the distance threshold)
+def decoded_activity(movement_data_json, classifier, hmm_states, outlier_settings=None):
+    if classifier != "hmm":
+        return None
+    n_states = int(min(max(hmm_states or 3, 2), 4))
+    result = get_hmm_states(movement_data_json, n_states=n_states, outlier_settings=outlier_settings)
+    return active_from_states(result['states'])
 
 # Haversine distance calculation (in km)
 def haversine_distance(lat1, lon1, lat2, lon2):
@@ -2149,13 +2397,18 @@ def haversine_distance(lat1, lon1, lat2, lon2):
 
 # Callback for daily activity rhythm chart
 @callback(
-    Output("behavioral-daily-rhythm-chart", "figure"),
+    [
+        Output("behavioral-daily-rhythm-chart", "figure"),
+        Output("store-figure-etags", "data", allow_duplicate=True),
+    ],
     [
         Input("store-activity", "data"),
         Input("behavioral-rhythm-chart-type", "value"),
     ],
-    prevent_initial_call=True,
+    State("store-figure-etags", "data"),
+    prevent_initial_call="initial_duplicate",
 )
+@cached_figure()
 def update_daily_rhythm_chart(activity_json, chart_type):
     # Default empty figure
     fig = go.Figure()
@@ -2251,6 +2504,7 @@ def update_daily_rhythm_chart(activity_json, chart_type):
     except Exception as e:
         # Return default figure with error information
         fig.update_layout(title=f"Error loading activity data: {str(e)}")
+        skip_cache()
         return fig
 
 # Callback for active/resting time donut chart
@@ -2361,10 +2615,15 @@ def update_active_resting_chart(activity_json):
 
 # Callback for seasonal patterns chart
 @callback(
-    Output("behavioral-seasonal-chart", "figure"),
+    [
+        Output("behavioral-seasonal-chart", "figure"),
+        Output("store-figure-etags", "data", allow_duplicate=True),
+    ],
     Input("store-movement-data", "data"),
-    prevent_initial_call=True,
+    State("store-figure-etags", "data"),
+    prevent_initial_call="initial_duplicate",
 )
+@cached_figure()
 def update_seasonal_chart(movement_data_json):
     # Default empty figure
     fig = go.Figure()
@@ -2481,8 +2740,40 @@ def update_seasonal_chart(movement_data_json):
     except Exception as e:
         # Return default figure with error information
         fig.update_layout(title=f"Error in seasonal analysis: {str(e)}")
+        skip_cache()
         return fig
 
+# Callback to select the behavioral timeline window
+@callback(
+    [
+        Output("behavioral-timeline-window", "data"),
+        Output("timeline-1week-btn", "color"),
+        Output("timeline-1month-btn", "color"),
+        Output("timeline-3month-btn", "color"),
+        Output("timeline-all-btn", "color"),
+    ],
+    [
+        Input("timeline-1week-btn", "n_clicks"),
+        Input("timeline-1month-btn", "n_clicks"),
+        Input("timeline-3month-btn", "n_clicks"),
+        Input("timeline-all-btn", "n_clicks"),
+    ],
+    prevent_initial_call=True,
+)
+def select_timeline_window(n_week, n_month, n_3months, n_all):
+    button_windows = {
+        "timeline-1week-btn": "1week",
+        "timeline-1month-btn": "1month",
+        "timeline-3month-btn": "3months",
+        "timeline-all-btn": "all",
+    }
+    ctx = dash.callback_context
+    button_id = ctx.triggered[0]["prop_id"].split(".")[0] if ctx.triggered else "timeline-1month-btn"
+    window = button_windows.get(button_id, "1month")
+    
+    colors = ["primary" if w == window else "secondary" for w in button_windows.values()]
+    return (window, *colors)
+
 # Callback for behavioral timeline
 @callback(
     Output("behavioral-timeline-chart", "figure"),
@@ -2490,10 +2781,19 @@ def update_seasonal_chart(movement_data_json):
         Input("store-movement-data", "data"),
         Input("store-activity", "data"),
         Input("behavioral-timeline-individual", "value"),
+        Input("behavioral-timeline-window", "data"),
+    ],
+    [
+        State("behavioral-activity-threshold", "value"),
+        State("behavioral-time-window", "value"),
+        State("behavioral-classifier", "value"),
+        State("behavioral-hmm-states", "value"),
+        State("store-outlier-settings", "data"),
     ],
     prevent_initial_call=True,
 )
-def update_behavioral_timeline(movement_data_json, activity_json, selected_individual):
+def update_behavioral_timeline(movement_data_json, activity_json, selected_individual, timeline_window,
+                               activity_threshold, time_window, classifier, hmm_states, outlier_settings):
     # Default empty figure
     fig = go.Figure()
     fig.update_layout(
@@ -2502,98 +2802,146 @@ def update_behavioral_timeline(movement_data_json, activity_json, selected_indiv
         height=400,
     )
     
-    if not movement_data_json or not activity_json:
+    if not movement_data_json:
         return fig
     
     try:
-        # Convert JSONs to DataFrames
-        move_df = pd.read_json(movement_data_json, orient='split')
-        activity_df = pd.read_json(activity_json, orient='split')
-        
-        # Check if required columns exist
-        if 'timestamp' not in move_df.columns:
-            return fig
-            
-        # Ensure timestamp is datetime
-        move_df['timestamp'] = pd.to_datetime(move_df['timestamp'])
-        
-        # Filter by individual if specified and available
-        if selected_individual and 'individual_id' in move_df.columns:
-            move_df = move_df[move_df['individual_id'] == selected_individual]
+        # Occupancy and activity matrices come from the cached step table
+        steps = get_step_table(movement_data_json, outlier_settings=outlier_settings)
+        timeline = build_timeline(
+            steps,
+            window=timeline_window or "1month",
+            individual=selected_individual,
+            threshold_m=(activity_threshold or 0.05) * 1000,
+            window_min=time_window or 60,
+            active=decoded_activity(movement_data_json, classifier, hmm_states, outlier_settings),
+        )
         
-        if len(move_df) == 0:
+        if timeline is None:
             fig.update_layout(title="No data available for selected individual")
             return fig
         
-        # Calculate daily activity stats
-        move_df['date'] = move_df['timestamp'].dt.date
-        move_df['hour'] = move_df['timestamp'].dt.hour
+        # Create heatmap (cells without fixes stay blank)
+        fig = go.Figure(go.Heatmap(
+            z=timeline['activity'],
+            x=timeline['columns'],
+            y=timeline['rows'],
+            customdata=timeline['occupancy'],
+            colorscale='Viridis',
+            zmin=0,
+            zmax=100,
+            colorbar=dict(title="Activity (%)"),
+            hovertemplate="%{y} %{x}<br>Activity: %{z:.0f}%<br>Fixes: %{customdata}<extra></extra>"
+        ))
+        
+        show_individual = selected_individual and selected_individual != 'all'
         
-        # Create daily activity grid
-        # First get the activity pattern by hour
-        hourly_activity = {}
-        for _, row in activity_df.iterrows():
-            if 'individual_id' in activity_df.columns:
-                if selected_individual and row['individual_id'] != selected_individual:
-                    continue
-                hourly_activity[row['hour_of_day']] = row['activity']
-            else:
-                hourly_activity[row['hour_of_day']] = row['activity']
+        # Update layout
+        fig.update_layout(
+            title="Behavioral Timeline" + (f" for {selected_individual}" if show_individual else ""),
+            height=400,
+            template="plotly_white",
+            margin={"l": 40, "r": 40, "t": 40, "b": 40},
+            yaxis={'title': timeline['row_title'], 'autorange': 'reversed'}
+        )
         
-        # Then create a timeline
-        dates = sorted(move_df['date'].unique())
-        hours = list(range(24))
+        if timeline['resolution'] == 'hour':
+            fig.update_xaxes(
+                title="Hour of Day",
+                tickmode='array',
+                tickvals=list(range(0, 24, 3)),
+                ticktext=['12 AM', '3 AM', '6 AM', '9 AM', '12 PM', '3 PM', '6 PM', '9 PM']
+            )
+        elif timeline['resolution'] == '15min':
+            fig.update_xaxes(title="Time of Day", nticks=12)
+        else:
+            fig.update_xaxes(title="Day of Week")
         
-        timeline_data = []
+        return fig
         
-        for date in dates:
-            date_points = move_df[move_df['date'] == date]
-            for hour in hours:
-                hour_points = date_points[date_points['hour'] == hour]
-                activity_level = hourly_activity.get(hour, 0) if hourly_activity else 0
-                
-                # Determine if we have data for this hour
-                has_data = len(hour_points) > 0
-                
-                timeline_data.append({
-                    'date': date,
-                    'hour': hour,
-                    'activity': activity_level if has_data else 0,
-                    'has_data': has_data
-                })
+    except Exception as e:
+        # Return default figure with error information
+        fig.update_layout(title=f"Error creating behavioral timeline: {str(e)}")
+        return fig
+
+# Callback for behavioral segments (change points in step length, NSD and heading persistence)
+@callback(
+    Output("behavioral-segments-chart", "figure"),
+    [
+        Input("store-movement-data", "data"),
+        Input("behavioral-timeline-individual", "value"),
+        Input("segment-hazard-lambda", "value"),
+        Input("store-outlier-settings", "data"),
+    ],
+    prevent_initial_call=True,
+)
+def update_segments_chart(movement_data_json, selected_individual, hazard_lambda, outlier_settings):
+    # Default empty figure
+    fig = go.Figure()
+    fig.update_layout(
+        title="No data available for behavioral segmentation",
+        template="plotly_white",
+        height=300,
+    )
+    
+    if not movement_data_json:
+        return fig
+    
+    try:
+        # Segments are cached per dataset; detectors resume when new fixes arrive
+        steps = get_step_table(movement_data_json)
+        segments = get_segments(movement_data_json, hazard_lambda=int(hazard_lambda or 500),
+                                outlier_settings=outlier_settings)
         
-        timeline_df = pd.DataFrame(timeline_data)
+        if segments.empty:
+            return fig
         
-        # Convert to matrix format for heatmap
-        matrix_df = timeline_df.pivot(index='date', columns='hour', values='activity')
+        individual = selected_individual
+        if not individual or individual == 'all':
+            individual = steps.attrs['individuals'][0]
         
-        # Create heatmap
-        fig = px.imshow(
-            matrix_df,
-            labels=dict(x="Hour of Day", y="Date", color="Activity"),
-            x=hours,
-            y=[str(date) for date in matrix_df.index],
-            color_continuous_scale='Viridis',
-            title="Behavioral Timeline" + (f" for {selected_individual}" if selected_individual else "")
-        )
+        tracks = get_tracks(movement_data_json)
+        if individual not in tracks:
+            return fig
+        rows = tracks.rows(individual)
+        ind_segments = segments[segments['individual_id'] == individual]
+        displacement = displacement_from_start(steps)[rows] / 1000
+        timestamps = tracks[individual].timestamps
+        
+        # Displacement from the first fix, with shaded segments
+        fig = go.Figure(go.Scattergl(
+            x=timestamps,
+            y=displacement,
+            mode='lines',
+            line=dict(color='#2c3e50', width=1),
+            name="Displacement (km)"
+        ))
+        
+        colors = px.colors.qualitative.Pastel
+        for row in ind_segments.itertuples():
+            fig.add_vrect(
+                x0=row.start,
+                x1=row.end,
+                fillcolor=colors[row.segment % len(colors)],
+                opacity=0.35,
+                line_width=0,
+                layer="below"
+            )
         
-        # Update layout
         fig.update_layout(
-            height=400,
+            title=f"Behavioral Segments for {individual} ({len(ind_segments)} segments)",
+            height=300,
             template="plotly_white",
             margin={"l": 40, "r": 40, "t": 40, "b": 40},
-            xaxis={
-                'tickmode': 'array',
-                'tickvals': list(range(0, 24, 3)),
-                'ticktext': ['12 AM', '3 AM', '6 AM', '9 AM', '12 PM', '3 PM', '6 PM', '9 PM']
-            }
+            xaxis={'title': 'Date'},
+            yaxis={'title': 'Displacement from Start (km)'},
+            showlegend=False
         )
         
         return fig
         
     except Exception as e:
-        # Return default figure with error information
-        fig.update_layout(title=f"Error creating behavioral timeline: {str(e)}")
+        fig.update_layout(title=f"Error in behavioral segmentation: {str(e)}")
         return fig
 
 # Populate behavioral pattern dropdown with available individuals
@@ -2636,34 +2984,26 @@ def update_behavioral_filter_options(movement_data_json):
         Input("store-movement-data", "data"),
         Input("quality-sampling-rate", "value"),
         Input("quality-individual", "value"),
+        Input("store-outlier-settings", "data"),
     ],
     prevent_initial_call=True,
 )
-def calculate_data_quality(movement_data_json, expected_sampling_rate, selected_individual):
+def calculate_data_quality(movement_data_json, expected_sampling_rate, selected_individual, outlier_settings):
     if not movement_data_json:
         return json.dumps({})
     
-    # Default values if not provided
+    # Infer each collar's duty-cycle schedule if no sampling rate is given
     if not expected_sampling_rate or expected_sampling_rate <= 0:
-        expected_sampling_rate = 60  # Default: 1 fix per hour (60 minutes)
+        expected_sampling_rate = None
     
     try:
-        # Convert JSON to DataFrame
-        df = pd.read_json(movement_data_json, orient='split')
-        
-        # Check if required columns exist
-        if 'timestamp' not in df.columns:
-            return json.dumps({})
-        
-        # Ensure timestamp is datetime
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        # Intervals, gaps and completeness come from the cached quality engine
+        steps = get_step_table(movement_data_json, outlier_settings=outlier_settings)
+        report = get_quality_report(movement_data_json, expected_sampling_rate, OUTAGE_GAP_FACTOR,
+                                    outlier_settings=outlier_settings)
         
-        # Apply individual filter if provided
-        if selected_individual and 'individual_id' in df.columns:
-            df = df[df['individual_id'] == selected_individual]
-            
         # Calculate data quality metrics
-        quality_metrics = calculate_quality_metrics(df, expected_sampling_rate)
+        quality_metrics = calculate_quality_metrics(steps, report, expected_sampling_rate, selected_individual)
         
         # Return as JSON
         return json.dumps(quality_metrics)
@@ -2672,75 +3012,65 @@ def calculate_data_quality(movement_data_json, expected_sampling_rate, selected_
         print(f"Error calculating data quality metrics: {str(e)}")
         return json.dumps({})
 
-# Calculate data quality metrics
-def calculate_quality_metrics(df, expected_sampling_rate):
-    # Sort by timestamp
-    df = df.sort_values('timestamp')
+# Outages are gaps longer than this multiple of the expected sampling rate
+OUTAGE_GAP_FACTOR = 2
+
+# Calculate data quality metrics from the quality report
+def calculate_quality_metrics(steps, report, expected_sampling_rate, selected_individual=None):
+    individuals = report['individuals']
+    outages = report['gaps']
+    mask = np.ones(len(steps), dtype=bool)
+    
+    # Apply individual filter if provided
+    if selected_individual:
+        mask = (steps['individual_id'] == selected_individual).to_numpy()
+        individuals = individuals[individuals['individual_id'] == selected_individual]
+        outages = outages[outages['individual_id'] == selected_individual]
+    
+    timestamps = steps['timestamp'][mask]
+    if timestamps.empty:
+        return {}
     
     # Calculate date range
-    start_date = df['timestamp'].min()
-    end_date = df['timestamp'].max()
-    date_range = (end_date - start_date).total_seconds() / 60  # in minutes
+    start_date = timestamps.min()
+    end_date = timestamps.max()
     
     # Expected fixes based on sampling rate
-    expected_fixes = int(date_range / expected_sampling_rate)
-    actual_fixes = len(df)
+    expected_fixes = int(individuals['expected_fixes'].sum())
+    actual_fixes = int(mask.sum())
     
     # Fix success rate
     fix_success_rate = min(100, (actual_fixes / expected_fixes * 100)) if expected_fixes > 0 else 0
     
-    # Time gaps between consecutive fixes
-    df['next_timestamp'] = df['timestamp'].shift(-1)
-    df['time_gap'] = (df['next_timestamp'] - df['timestamp']).dt.total_seconds() / 60  # in minutes
-    
-    # Identify outages (gaps larger than 2x expected sampling rate)
-    outage_threshold = expected_sampling_rate * 2
-    df['is_outage'] = df['time_gap'] > outage_threshold
-    outages = df[df['is_outage']]
-    
-    # Calculate outage statistics
-    total_outages = len(outages)
-    total_outage_time = outages['time_gap'].sum() if not outages.empty else 0
-    avg_outage_duration = outages['time_gap'].mean() if not outages.empty else 0
-    max_outage_duration = outages['time_gap'].max() if not outages.empty else 0
-    
-    # Calculate daily completeness
-    df['date'] = df['timestamp'].dt.date
-    daily_counts = df.groupby('date').size()
-    daily_expected = 24 * 60 / expected_sampling_rate  # expected fixes per day
-    daily_completeness = daily_counts / daily_expected * 100
-    daily_completeness = daily_completeness.clip(upper=100)  # Cap at 100%
-    
-    # Prepare daily completeness for chart
-    daily_comp_data = [
-        {
-            'date': str(date),
-            'completeness': completeness
-        } for date, completeness in zip(daily_completeness.index, daily_completeness)
-    ]
+    # Outage statistics (durations in minutes)
+    durations = outages['duration_min'].to_numpy()
+    total_outages = len(durations)
     
-    # Prepare outage data for timeline
-    outage_data = []
-    if not outages.empty:
-        for _, row in outages.iterrows():
-            outage_data.append({
-                'start_time': row['timestamp'].isoformat(),
-                'end_time': row['next_timestamp'].isoformat(),
-                'duration': row['time_gap']
-            })
+    # Daily completeness for the selected individual, or all individuals reporting that day
+    if selected_individual:
+        daily = completeness_from_rollup(report['rollup'], individual_level=True)
+        daily = daily[daily['individual_id'] == selected_individual]
+    else:
+        daily = report['daily']
+    
+    # Gap intervals stay columnar
+    outage_data = {
+        'individual_id': outages['individual_id'].astype(str).tolist(),
+        'start_time': outages['start_time'].dt.strftime('%Y-%m-%dT%H:%M:%S').tolist(),
+        'end_time': outages['end_time'].dt.strftime('%Y-%m-%dT%H:%M:%S').tolist(),
+        'duration': durations.tolist()
+    }
     
     # Calculate weekly or monthly patterns if enough data
     temporal_patterns = {}
     if (end_date - start_date).days >= 7:  # At least a week of data
-        df['day_of_week'] = df['timestamp'].dt.day_name()
         day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        weekly_counts = df.groupby('day_of_week').size().reindex(day_order).fillna(0).to_dict()
-        temporal_patterns['weekly'] = weekly_counts
+        weekly_counts = np.bincount(timestamps.dt.dayofweek.to_numpy(), minlength=7)
+        temporal_patterns['weekly'] = dict(zip(day_order, weekly_counts.tolist()))
     
     if (end_date - start_date).days >= 30:  # At least a month of data
-        df['hour_of_day'] = df['timestamp'].dt.hour
-        hourly_counts = df.groupby('hour_of_day').size().to_dict()
-        temporal_patterns['hourly'] = hourly_counts
+        hourly_counts = np.bincount(steps['hour'].to_numpy()[mask], minlength=24)
+        temporal_patterns['hourly'] = {hour: int(count) for hour, count in enumerate(hourly_counts) if count}
     
     # Return all metrics
     return {
@@ -2751,15 +3081,394 @@ def calculate_quality_metrics(df, expected_sampling_rate):
             'expected_points': expected_fixes,
             'fix_success_rate': fix_success_rate,
             'total_outages': total_outages,
-            'total_outage_time': total_outage_time,  # in minutes
-            'avg_outage_duration': avg_outage_duration,  # in minutes
-            'max_outage_duration': max_outage_duration,  # in minutes
+            'total_outage_time': float(durations.sum()),  # in minutes
+            'avg_outage_duration': float(durations.mean()) if total_outages else 0,  # in minutes
+            'max_outage_duration': float(durations.max()) if total_outages else 0,  # in minutes
+        },
+        'daily_completeness': {
+            'date': daily['date'].astype(str).tolist(),
+            'completeness': daily['completeness'].tolist()
         },
-        'daily_completeness': daily_comp_data,
         'outages': outage_data,
         'temporal_patterns': temporal_patterns
     }
 
+# Quality report for the data quality page settings (inferred schedule unless switched off)
+def page_quality_report(movement_data_json, fix_interval, schedule_auto, outlier_settings=None):
+    expected_frequency = None if schedule_auto or not fix_interval else fix_interval
+    return get_quality_report(movement_data_json, expected_frequency, outlier_settings=outlier_settings)
+
+# Data quality page inputs: every view renders from the cached per-day rollup
+QUALITY_PAGE_INPUTS = [
+    Input("store-movement-data", "data"),
+    Input("update-quality-btn", "n_clicks"),
+    Input("outliers-data-store", "data"),
+]
+QUALITY_PAGE_STATES = [
+    State("fix-interval-input", "value"),
+    State("fix-schedule-auto", "value"),
+    State("store-outlier-settings", "data"),
+]
+
+# Callback for the data quality summary cards
+@callback(
+    [
+        Output("overall-fix-success", "children"),
+        Output("total-gaps", "children"),
+        Output("missing-data-time", "children"),
+        Output("quality-score", "children"),
+    ],
+    QUALITY_PAGE_INPUTS,
+    QUALITY_PAGE_STATES,
+    prevent_initial_call=True,
+)
+def update_quality_summary(movement_data_json, n_clicks, outliers_json, fix_interval, schedule_auto,
+                           outlier_settings):
+    if not movement_data_json:
+        return "--", "--", "--", "--"
+    
+    try:
+        rollup = page_quality_report(movement_data_json, fix_interval, schedule_auto, outlier_settings)['rollup']
+        if rollup.empty:
+            return "--", "--", "--", "--"
+        
+        totals = rollup_by(rollup.assign(all=0), 'all').iloc[0]
+        scores = quality_scores(rollup)
+        
+        # Missing time: expected but not received fixes at each day's scheduled interval
+        missing = (rollup['expected_fixes'] - rollup['fixes']).clip(lower=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            interval_h = np.where(rollup['expected_fixes'] > 0, 24 / rollup['expected_fixes'], 0)
+        missing_hours = float((missing * interval_h).sum())
+        
+        # Fleet score weights every individual by its expected fixes
+        weights = scores['expected_fixes'].clip(lower=1)
+        score = float(np.average(scores['score'], weights=weights))
+        
+        return (
+            f"{totals['completeness']:.1f}%",
+            f"{int(totals['gap_count']):,}",
+            f"{missing_hours:,.1f}",
+            f"{score:.0f}"
+        )
+    except Exception as e:
+        print(f"Error updating quality summary: {e}")
+        return "--", "--", "--", "--"
+
+# Callback to select the fix success period
+@callback(
+    [
+        Output("fix-success-period", "data"),
+        Output("fix-daily-btn", "color"),
+        Output("fix-weekly-btn", "color"),
+        Output("fix-monthly-btn", "color"),
+    ],
+    [
+        Input("fix-daily-btn", "n_clicks"),
+        Input("fix-weekly-btn", "n_clicks"),
+        Input("fix-monthly-btn", "n_clicks"),
+    ],
+    prevent_initial_call=True,
+)
+def select_fix_success_period(n_daily, n_weekly, n_monthly):
+    button_periods = {
+        "fix-daily-btn": "D",
+        "fix-weekly-btn": "W",
+        "fix-monthly-btn": "M",
+    }
+    ctx = dash.callback_context
+    button_id = ctx.triggered[0]["prop_id"].split(".")[0] if ctx.triggered else "fix-daily-btn"
+    period = button_periods.get(button_id, "D")
+    
+    colors = ["primary" if p == period else "secondary" for p in button_periods.values()]
+    return (period, *colors)
+
+# Callback for the fix success rate over time
+@callback(
+    Output("fix-success-chart", "figure"),
+    QUALITY_PAGE_INPUTS + [Input("fix-success-period", "data")],
+    QUALITY_PAGE_STATES,
+    prevent_initial_call=True,
+)
+def update_fix_success_chart(movement_data_json, n_clicks, outliers_json, period, fix_interval, schedule_auto,
+                             outlier_settings):
+    # Default empty figure
+    fig = go.Figure()
+    fig.update_layout(
+        title="No data available",
+        template="plotly_white",
+        height=380,
+    )
+    
+    if not movement_data_json:
+        return fig
+    
+    try:
+        rollup = page_quality_report(movement_data_json, fix_interval, schedule_auto, outlier_settings)['rollup']
+        if rollup.empty:
+            return fig
+        
+        period = period or "D"
+        periods = rollup['date'].dt.to_period(period).dt.start_time
+        by_period = rollup_by(rollup.assign(period=periods), 'period').reset_index()
+        individuals = rollup.assign(period=periods).groupby('period')['ind_code'].nunique()
+        
+        fig = go.Figure()
+        fig.add_trace(go.Bar(
+            x=by_period['period'],
+            y=by_period['completeness'],
+            marker_color="#2c7fb8",
+            customdata=np.column_stack([by_period['fixes'], by_period['expected_fixes'].round(),
+                                        individuals.reindex(by_period['period']).to_numpy()]),
+            hovertemplate=("%{x|%Y-%m-%d}: %{y:.1f}%<br>%{customdata[0]:,} of %{customdata[1]:,} fixes"
+                           "<br>%{customdata[2]} individuals<extra></extra>")
+        ))
+        
+        labels = {"D": "Daily", "W": "Weekly", "M": "Monthly"}
+        fig.update_layout(
+            title=f"{labels.get(period, 'Daily')} Fix Success Rate",
+            height=380,
+            template="plotly_white",
+            margin={"l": 40, "r": 40, "t": 40, "b": 40},
+            yaxis={'title': 'Fix success (%)', 'range': [0, 105]},
+            bargap=0.1
+        )
+        
+        return fig
+        
+    except Exception as e:
+        fig.update_layout(title=f"Error calculating fix success: {str(e)}")
+        return fig
+
+# Callback for completeness by individual against the (inferred) fix schedule
+@callback(
+    Output("individual-completeness-chart", "figure"),
+    QUALITY_PAGE_INPUTS,
+    QUALITY_PAGE_STATES,
+    prevent_initial_call=True,
+)
+def update_individual_completeness(movement_data_json, n_clicks, outliers_json, fix_interval, schedule_auto,
+                                   outlier_settings):
+    # Default empty figure
+    fig = go.Figure()
+    fig.update_layout(
+        title="No data available",
+        template="plotly_white",
+        height=300,
+    )
+    
+    if not movement_data_json:
+        return fig
+    
+    try:
+        report = page_quality_report(movement_data_json, fix_interval, schedule_auto, outlier_settings)
+        if report['rollup'].empty:
+            return fig
+        
+        scores = quality_scores(report['rollup'])
+        schedules = report['individuals'].set_index(report['individuals']['individual_id'].astype(str))['schedule']
+        scores = scores.sort_values('completeness')
+        individual_ids = scores['individual_id'].astype(str)
+        
+        fig = go.Figure(go.Bar(
+            x=scores['completeness'],
+            y=individual_ids,
+            orientation='h',
+            marker=dict(
+                color=scores['completeness'],
+                colorscale=[[0, 'red'], [0.5, 'yellow'], [0.8, 'green'], [1, 'green']],
+                cmin=0,
+                cmax=100
+            ),
+            customdata=np.column_stack([
+                schedules.reindex(individual_ids).fillna('').to_numpy(),
+                scores['fixes'],
+                scores['expected_fixes'].round(),
+                scores['score'].round(),
+                (scores['outlier_share'] * 100).round(1)
+            ]),
+            hovertemplate=("%{y}: %{x:.1f}%<br>Schedule: %{customdata[0]}<br>"
+                           "Fixes: %{customdata[1]} of %{customdata[2]} expected<br>"
+                           "Quality score: %{customdata[3]}, outliers: %{customdata[4]}%<extra></extra>")
+        ))
+        
+        fig.update_layout(
+            title="Fix Success by Individual" + (" (inferred schedules)" if schedule_auto or not fix_interval else ""),
+            height=300,
+            template="plotly_white",
+            margin={"l": 40, "r": 40, "t": 40, "b": 40},
+            xaxis={'title': 'Completeness (%)', 'range': [0, 100]}
+        )
+        
+        return fig
+        
+    except Exception as e:
+        fig.update_layout(title=f"Error calculating completeness: {str(e)}")
+        return fig
+
+# Callback for daily gap hours of every individual
+@callback(
+    Output("data-gap-timeline", "figure"),
+    QUALITY_PAGE_INPUTS,
+    QUALITY_PAGE_STATES,
+    prevent_initial_call=True,
+)
+def update_data_gap_timeline(movement_data_json, n_clicks, outliers_json, fix_interval, schedule_auto,
+                             outlier_settings):
+    # Default empty figure
+    fig = go.Figure()
+    fig.update_layout(
+        title="No data available",
+        template="plotly_white",
+        height=250,
+    )
+    
+    if not movement_data_json:
+        return fig
+    
+    try:
+        rollup = page_quality_report(movement_data_json, fix_interval, schedule_auto, outlier_settings)['rollup']
+        if rollup.empty:
+            return fig
+        
+        # Individual x day matrix of gap hours (gaps are counted on the day they start)
+        dates = pd.date_range(rollup['date'].min(), rollup['date'].max(), freq='D')
+        individuals = rollup['individual_id'].cat.categories
+        day_index = ((rollup['date'] - dates[0]) // pd.Timedelta(days=1)).to_numpy()
+        hours = np.full((len(individuals), len(dates)), np.nan)
+        hours[rollup['ind_code'].to_numpy(), day_index] = rollup['gap_hours'].to_numpy()
+        
+        fig = go.Figure(go.Heatmap(
+            z=hours,
+            x=dates,
+            y=list(individuals),
+            colorscale="Reds",
+            zmin=0,
+            colorbar=dict(title="Gap h"),
+            hovertemplate="%{y}<br>%{x|%Y-%m-%d}: %{z:.1f} h of gaps<extra></extra>"
+        ))
+        
+        fig.update_layout(
+            title="Data Gaps by Day",
+            height=250,
+            template="plotly_white",
+            margin={"l": 40, "r": 20, "t": 40, "b": 30},
+            yaxis={'showticklabels': len(individuals) <= 30}
+        )
+        
+        return fig
+        
+    except Exception as e:
+        fig.update_layout(title=f"Error loading gap data: {str(e)}")
+        return fig
+
+# Number of gaps listed in the major gaps table
+MAJOR_GAPS_SHOWN = 10
+
+# Callback for the longest gaps table
+@callback(
+    Output("major-gaps-table", "children"),
+    QUALITY_PAGE_INPUTS,
+    QUALITY_PAGE_STATES,
+    prevent_initial_call=True,
+)
+def update_major_gaps_table(movement_data_json, n_clicks, outliers_json, fix_interval, schedule_auto,
+                            outlier_settings):
+    if not movement_data_json:
+        return html.P("No data available", className="text-muted")
+    
+    try:
+        gaps = page_quality_report(movement_data_json, fix_interval, schedule_auto, outlier_settings)['gaps']
+        if gaps.empty:
+            return html.P("No data gaps detected", className="text-muted")
+        
+        longest = gaps.nlargest(MAJOR_GAPS_SHOWN, 'duration_min')
+        rows = [
+            html.Tr([
+                html.Td(str(row.individual_id)),
+                html.Td(f"{row.start_time:%Y-%m-%d %H:%M}"),
+                html.Td(f"{row.end_time:%Y-%m-%d %H:%M}"),
+                html.Td(f"{row.duration_min / 60:.1f} h")
+            ])
+            for row in longest.itertuples()
+        ]
+        
+        return dbc.Table([
+            html.Thead(html.Tr([html.Th("Individual"), html.Th("Start"), html.Th("End"), html.Th("Duration")])),
+            html.Tbody(rows)
+        ], bordered=False, hover=True, size="sm", striped=True)
+        
+    except Exception as e:
+        print(f"Error updating major gaps table: {e}")
+        return html.P("Error loading data gaps", className="text-danger")
+
+# Callback for daily outlier share and positional precision
+@callback(
+    Output("signal-quality-chart", "figure"),
+    QUALITY_PAGE_INPUTS,
+    QUALITY_PAGE_STATES,
+    prevent_initial_call=True,
+)
+def update_signal_quality_chart(movement_data_json, n_clicks, outliers_json, fix_interval, schedule_auto,
+                                outlier_settings):
+    # Default empty figure
+    fig = go.Figure()
+    fig.update_layout(
+        title="No data available",
+        template="plotly_white",
+        height=200,
+    )
+    
+    if not movement_data_json:
+        return fig
+    
+    try:
+        rollup = page_quality_report(movement_data_json, fix_interval, schedule_auto, outlier_settings)['rollup']
+        if rollup.empty:
+            return fig
+        
+        by_day = rollup_by(rollup, 'date').reset_index()
+        
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=by_day['date'],
+            y=by_day['outlier_share'] * 100,
+            mode="lines",
+            name="Outliers (%)",
+            line=dict(color="red")
+        ))
+        fig.add_trace(go.Scatter(
+            x=by_day['date'],
+            y=by_day['duplicate_share'] * 100,
+            mode="lines",
+            name="Duplicates (%)",
+            line=dict(color="orange")
+        ))
+        if by_day['hdop_mean'].notna().any():
+            fig.add_trace(go.Scatter(
+                x=by_day['date'],
+                y=by_day['hdop_mean'],
+                mode="lines",
+                name="Mean HDOP",
+                line=dict(color="#2c7fb8"),
+                yaxis="y2"
+            ))
+        
+        fig.update_layout(
+            height=200,
+            template="plotly_white",
+            margin={"l": 40, "r": 40, "t": 20, "b": 30},
+            legend=dict(orientation="h", y=1.15),
+            yaxis={'title': '% of fixes', 'rangemode': 'tozero'},
+            yaxis2={'title': 'HDOP', 'overlaying': 'y', 'side': 'right', 'rangemode': 'tozero'}
+        )
+        
+        return fig
+        
+    except Exception as e:
+        fig.update_layout(title=f"Error loading signal quality: {str(e)}")
+        return fig
+
 # Callback to update data quality KPI cards
 @callback(
     [
@@ -2805,10 +3514,15 @@ def update_quality_kpi_cards(quality_json):
 
 # Callback to update daily completeness chart
 @callback(
-    Output("quality-completeness-chart", "figure"),
+    [
+        Output("quality-completeness-chart", "figure"),
+        Output("store-figure-etags", "data", allow_duplicate=True),
+    ],
     Input("store-data-quality", "data"),
-    prevent_initial_call=True,
+    State("store-figure-etags", "data"),
+    prevent_initial_call="initial_duplicate",
 )
+@cached_figure()
 def update_completeness_chart(quality_json):
     # Default empty figure
     fig = go.Figure()
@@ -2824,13 +3538,12 @@ def update_completeness_chart(quality_json):
     try:
         # Parse JSON
         quality_data = json.loads(quality_json)
-        daily_completeness = quality_data.get('daily_completeness', [])
+        # Convert to DataFrame
+        df = pd.DataFrame(quality_data.get('daily_completeness', {}))
         
-        if not daily_completeness:
+        if df.empty:
             return fig
         
-        # Convert to DataFrame
-        df = pd.DataFrame(daily_completeness)
         df['date'] = pd.to_datetime(df['date'])
         df = df.sort_values('date')
         
@@ -2868,15 +3581,19 @@ def update_completeness_chart(quality_json):
     except Exception as e:
         # Return default figure with error information
         fig.update_layout(title=f"Error loading completeness data: {str(e)}")
+        skip_cache()
         return fig
 
 # Callback to update outage timeline
 @callback(
     Output("quality-outage-timeline", "figure"),
-    Input("store-data-quality", "data"),
+    [
+        Input("store-data-quality", "data"),
+        Input("quality-outage-timeline", "relayoutData"),
+    ],
     prevent_initial_call=True,
 )
-def update_outage_timeline(quality_json):
+def update_outage_timeline(quality_json, relayout_data):
     # Default empty figure
     fig = go.Figure()
     fig.update_layout(
@@ -2891,49 +3608,80 @@ def update_outage_timeline(quality_json):
     try:
         # Parse JSON
         quality_data = json.loads(quality_json)
-        outages = quality_data.get('outages', [])
         summary = quality_data.get('summary', {})
         
-        if not outages:
+        # Convert to DataFrame
+        df = pd.DataFrame(quality_data.get('outages', {}))
+        
+        if df.empty:
             fig.update_layout(title="No outages detected")
             return fig
         
-        # Convert to DataFrame
-        df = pd.DataFrame(outages)
-        df['start_time'] = pd.to_datetime(df['start_time'])
-        df['end_time'] = pd.to_datetime(df['end_time'])
-        df = df.sort_values('start_time')
+        start_times = pd.to_datetime(df['start_time']).to_numpy()
+        end_times = pd.to_datetime(df['end_time']).to_numpy()
+        individuals = df['individual_id'] if 'individual_id' in df else pd.Series('All', index=df.index)
         
-        # Get date range for x-axis
+        # Visible window: the current zoom, or the full date range
         start_date = pd.to_datetime(summary.get('start_date'))
         end_date = pd.to_datetime(summary.get('end_date'))
+        view_start, view_end = visible_time_range(relayout_data, start_date, end_date)
         
-        # Create outage timeline
-        fig = go.Figure()
+        # Merge outages closer than one pixel at this zoom, keeping only those in view
+        resolution = (view_end - view_start) / OUTAGE_TIMELINE_PIXELS
+        in_view = (end_times >= view_start.to_datetime64()) & (start_times <= view_end.to_datetime64())
+        merged = merge_intervals(start_times[in_view], end_times[in_view],
+                                 individuals.to_numpy()[in_view], min_gap=resolution.to_timedelta64())
         
-        # Add rectangle for each outage
-        for i, row in df.iterrows():
-            fig.add_trace(go.Scatter(
-                x=[row['start_time'], row['end_time'], row['end_time'], row['start_time'], row['start_time']],
-                y=[i, i, i+0.8, i+0.8, i],
-                fill="toself",
-                fillcolor="rgba(255, 0, 0, 0.5)",
-                line=dict(color="red"),
+        fig = go.Figure()
+        if not merged.empty:
+            lanes = pd.Categorical(merged['group'].astype(str))
+            lane_names = list(lanes.categories)
+            covered_min = merged['covered'] / np.timedelta64(1, 'm')
+            
+            # One segment trace: start and end vertex per outage, separated by gaps
+            n = len(merged)
+            x = np.empty(3 * n, dtype=object)
+            x[0::3] = merged['start'].dt.strftime('%Y-%m-%dT%H:%M:%S').to_numpy()
+            x[1::3] = merged['end'].dt.strftime('%Y-%m-%dT%H:%M:%S').to_numpy()
+            x[2::3] = None
+            y = np.full(3 * n, np.nan)
+            y[0::3] = lanes.codes
+            y[1::3] = lanes.codes
+            text = (lanes.astype(str) + ": " + merged['count'].astype(str) + " outage(s), " +
+                    covered_min.round(1).astype(str) + " min<br>" +
+                    merged['start'].dt.strftime('%Y-%m-%d %H:%M') + " to " +
+                    merged['end'].dt.strftime('%Y-%m-%d %H:%M')).to_numpy()
+            hover = np.empty(3 * n, dtype=object)
+            hover[0::3] = text
+            hover[1::3] = text
+            
+            fig.add_trace(go.Scattergl(
+                x=x,
+                y=y,
                 mode="lines",
-                name=f"Outage: {row['duration']:.1f} min",
+                line=dict(color="rgba(255, 0, 0, 0.6)", width=max(2, min(12, 200 // len(lane_names)))),
+                connectgaps=False,
                 hoverinfo="text",
-                text=f"Start: {row['start_time']}<br>End: {row['end_time']}<br>Duration: {row['duration']:.1f} min"
+                text=hover
             ))
+        else:
+            lane_names = []
         
         # Update layout
         fig.update_layout(
-            title="GPS Outage Timeline",
+            title=f"GPS Outage Timeline ({int(in_view.sum())} outages in view)",
             height=300,
             template="plotly_white",
             margin={"l": 40, "r": 40, "t": 40, "b": 40},
             showlegend=False,
-            xaxis=dict(title="Time", range=[start_date, end_date]),
-            yaxis=dict(title="Outages", showticklabels=False)
+            uirevision="outage-timeline",
+            xaxis=dict(title="Time", range=[view_start, view_end]),
+            yaxis=dict(
+                title="Individual",
+                tickvals=list(range(len(lane_names))),
+                ticktext=lane_names,
+                showticklabels=len(lane_names) <= 30
+            )
         )
         
         return fig
@@ -2943,6 +3691,171 @@ def update_outage_timeline(quality_json):
         fig.update_layout(title=f"Error loading outage data: {str(e)}")
         return fig
 
+# Outage timeline resolution (pixels across the plot) used to merge nearby outages
+OUTAGE_TIMELINE_PIXELS = 1000
+
+# Time range shown on a graph after zooming, or the default range
+def visible_time_range(relayout_data, default_start, default_end):
+    relayout_data = relayout_data or {}
+    if relayout_data.get('xaxis.autorange'):
+        return default_start, default_end
+    
+    bounds = relayout_data.get('xaxis.range')
+    if bounds is None and 'xaxis.range[0]' in relayout_data:
+        bounds = [relayout_data['xaxis.range[0]'], relayout_data.get('xaxis.range[1]')]
+    if not bounds:
+        return default_start, default_end
+    
+    try:
+        view_start, view_end = pd.to_datetime(bounds[0]), pd.to_datetime(bounds[1])
+    except (TypeError, ValueError):
+        return default_start, default_end
+    return (view_start, view_end) if view_end > view_start else (default_start, default_end)
+
+# Callback to flag outliers with the current settings
+@callback(
+    [
+        Output("outliers-data-store", "data"),
+        Output("store-outlier-settings", "data"),
+    ],
+    Input("filter-outliers-btn", "n_clicks"),
+    [
+        State("store-movement-data", "data"),
+        State("speed-threshold-input", "value"),
+    ],
+    prevent_initial_call=True,
+)
+def filter_outliers(n_clicks, movement_data_json, speed_threshold):
+    if not n_clicks or not movement_data_json:
+        return None, dash.no_update
+    
+    try:
+        # The mask of these settings gets its own step table; engines given the settings skip flagged fixes
+        settings = normalize_outlier_settings({'max_speed_kmh': speed_threshold})
+        steps = apply_outlier_filter(movement_data_json, **settings)
+        return outlier_summary(steps).to_json(orient='split'), settings
+    except Exception as e:
+        print(f"Error filtering outliers: {e}")
+        return None, dash.no_update
+
+# Callback for outlier counts per individual and rule
+@callback(
+    Output("speed-outliers-chart", "figure"),
+    Input("outliers-data-store", "data"),
+    prevent_initial_call=True,
+)
+def update_speed_outliers_chart(outliers_json):
+    # Default empty figure
+    fig = go.Figure()
+    fig.update_layout(
+        title="No outlier data available",
+        template="plotly_white",
+        height=200,
+    )
+    
+    if not outliers_json:
+        return fig
+    
+    try:
+        summary = pd.read_json(io.StringIO(outliers_json), orient='split')
+        if summary.empty:
+            return fig
+        
+        fig = go.Figure()
+        for name in FLAG_NAMES.values():
+            if summary[name].sum() > 0:
+                fig.add_trace(go.Bar(
+                    x=summary['individual_id'].astype(str),
+                    y=summary[name],
+                    name=name
+                ))
+        
+        fig.update_layout(
+            title=f"{int(summary['outliers'].sum()):,} of {int(summary['fixes'].sum()):,} fixes flagged",
+            barmode="stack",
+            height=200,
+            template="plotly_white",
+            margin={"l": 40, "r": 20, "t": 40, "b": 30},
+            yaxis={'title': 'Fixes'}
+        )
+        
+        return fig
+        
+    except Exception as e:
+        fig.update_layout(title=f"Error loading outlier data: {str(e)}")
+        return fig
+
+# Clean fixes shown in the spatial outlier map (flagged fixes are always shown)
+MAX_MAP_FIXES = 20000
+
+# Callback for the positions of flagged fixes
+@callback(
+    Output("spatial-outliers-chart", "figure"),
+    Input("outliers-data-store", "data"),
+    State("store-movement-data", "data"),
+    State("store-outlier-settings", "data"),
+    prevent_initial_call=True,
+)
+def update_spatial_outliers_chart(outliers_json, movement_data_json, outlier_settings):
+    # Default empty figure
+    fig = go.Figure()
+    fig.update_layout(
+        title="No outlier data available",
+        template="plotly_white",
+        height=200,
+    )
+    
+    if not outliers_json or not movement_data_json:
+        return fig
+    
+    try:
+        steps = get_step_table(movement_data_json, outlier_settings=outlier_settings)
+        if 'is_outlier' not in steps.columns:
+            return fig
+        
+        outlier = steps['is_outlier'].to_numpy()
+        clean = np.flatnonzero(~outlier)
+        clean = clean[::max(1, len(clean) // MAX_MAP_FIXES)]
+        flagged = np.flatnonzero(outlier)
+        flags = steps['outlier_flags'].to_numpy()[flagged]
+        reasons = [", ".join(name for flag, name in FLAG_NAMES.items() if value & flag) for value in flags]
+        
+        fig = go.Figure()
+        fig.add_trace(go.Scattergl(
+            x=steps['location_long'].to_numpy()[clean],
+            y=steps['location_lat'].to_numpy()[clean],
+            mode="markers",
+            marker=dict(size=3, color="lightgray"),
+            name="Fixes",
+            hoverinfo="skip"
+        ))
+        fig.add_trace(go.Scattergl(
+            x=steps['location_long'].to_numpy()[flagged],
+            y=steps['location_lat'].to_numpy()[flagged],
+            mode="markers",
+            marker=dict(size=6, color="red"),
+            name="Outliers",
+            text=[f"{ind}<br>{ts:%Y-%m-%d %H:%M}<br>{reason}" for ind, ts, reason in
+                  zip(steps['individual_id'].to_numpy()[flagged], steps['timestamp'].iloc[flagged], reasons)],
+            hoverinfo="text"
+        ))
+        
+        fig.update_layout(
+            title=f"{len(flagged):,} flagged fixes",
+            height=200,
+            template="plotly_white",
+            margin={"l": 40, "r": 20, "t": 40, "b": 30},
+            showlegend=False,
+            xaxis={'title': 'Longitude'},
+            yaxis={'title': 'Latitude', 'scaleanchor': 'x'}
+        )
+        
+        return fig
+        
+    except Exception as e:
+        fig.update_layout(title=f"Error loading outlier positions: {str(e)}")
+        return fig
+
 # Callback to update temporal pattern chart
 @callback(
     Output("quality-temporal-pattern", "figure"),
@@ -3049,5 +3962,29 @@ def update_quality_individual_filter(movement_data_json):
     except Exception:
         return [], None
 
+# Startup timing report: time of every import phase against the cold start budget (seconds)
+STARTUP_BUDGET_S = float(os.environ.get("STARTUP_BUDGET_S", 3.0))
+
+_startup_marks.append(("callbacks", time.perf_counter()))
+
+def startup_report():
+    phases = {
+        name: round(end - previous_end, 3)
+        for (_, previous_end), (name, end) in zip(_startup_marks, _startup_marks[1:])
+    }
+    total = round(_startup_marks[-1][1] - _startup_marks[0][1], 3)
+    return {"phases": phases, "total_s": total, "budget_s": STARTUP_BUDGET_S,
+            "within_budget": total <= STARTUP_BUDGET_S}
+
+@server.route("/startup-report")
+def serve_startup_report():
+    return flask.jsonify(startup_report())
+
+_report = startup_report()
+print(f"Startup took {_report['total_s']:.2f}s (budget {STARTUP_BUDGET_S:.2f}s): " +
+      ", ".join(f"{name} {seconds:.2f}s" for name, seconds in _report["phases"].items()))
+if not _report["within_budget"]:
+    print(f"Warning: startup exceeded the cold start budget of {STARTUP_BUDGET_S:.2f}s")
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,468 @@
+"""
+Batch Analysis
+Headless runner of the analysis pipeline over many studies, without the dashboard
+
+Runs daily distance, speed, home range (MCP/KDE/BBMM/T-LoCoH), activity and fix
+success estimators for every individual of every study in a process pool. Each
+individual's results are written to a JSON checkpoint as soon as they are done, so
+an interrupted run resumes where it stopped; checkpoints are reused while the
+individual's fixes and the parameters are unchanged. When all individuals of a
+study are done, its tables are written as Parquet (or CSV) and its home ranges as
+GeoPackage.
+
+Usage:
+    python batch.py tracks.csv more.parquet --output results
+    python batch.py --cached-studies --output results --methods mcp,kde,locoht
+    python batch.py --movebank-study 123456 --output results --workers 4
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from components.schema import INDIVIDUAL, REQUIRED_COLUMNS, TIMESTAMP, to_canonical
+
+# Home range methods run by default (BBMM is much slower than the others)
+DEFAULT_METHODS = ('mcp', 'kde')
+
+# Tasks queued per worker at most, so only a few individuals' fixes wait in memory
+TASKS_PER_WORKER = 4
+
+# Table formats of the study outputs
+TABLE_FORMATS = ('parquet', 'csv')
+
+# Bump when the checkpoint contents change, so old checkpoints are recomputed
+CHECKPOINT_VERSION = 1
+
+
+def slug(name):
+    """File-system safe version of a study or individual name."""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(name)).strip('_') or 'unnamed'
+
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def load_table(path):
+    """
+    Read a tracking data file and resolve its columns to the canonical schema.
+
+    Args:
+        path: CSV or Parquet file
+
+    Returns:
+        DataFrame
+    """
+    if path.lower().endswith('.parquet'):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    missing = to_canonical(df)
+    if missing:
+        raise ValueError(f"{path} is missing required columns: {', '.join(missing)}")
+    df[TIMESTAMP] = pd.to_datetime(df[TIMESTAMP])
+    return df
+
+
+def cached_studies(cache_dir='./data/cache'):
+    """
+    Studies imported from Movebank and cached by `MoveBank.import_movebank_csv`.
+
+    Args:
+        cache_dir: Movebank cache directory
+
+    Returns:
+        List of (study name, data file) of the cached studies with a data file
+    """
+    studies = []
+    for info_path in sorted(glob.glob(os.path.join(cache_dir, 'imported_study_*.json'))):
+        with open(info_path) as f:
+            info = json.load(f)
+        key = os.path.basename(info_path)[len('imported_study_'):-len('.json')]
+        data_path = os.path.join(cache_dir, f"imported_{key}.csv")
+        if os.path.exists(data_path):
+            studies.append((info.get('name') or key, data_path))
+    return studies
+
+
+def movebank_study(study_id):
+    """
+    Tracking data of a Movebank study (from the Movebank cache when it is fresh).
+
+    Credentials are read from the MOVEBANK_USERNAME and MOVEBANK_PASSWORD
+    environment variables when the data has to be downloaded.
+
+    Args:
+        study_id: Movebank study id
+
+    Returns:
+        DataFrame
+    """
+    from components.movebank_api import MoveBank
+
+    movebank = MoveBank()
+    if os.environ.get('MOVEBANK_USERNAME'):
+        movebank.authenticate(os.environ['MOVEBANK_USERNAME'], os.environ.get('MOVEBANK_PASSWORD'))
+    df = movebank.get_tracking_data(study_id)
+    if df.empty:
+        raise ValueError(f"No tracking data for Movebank study {study_id}")
+    df[TIMESTAMP] = pd.to_datetime(df[TIMESTAMP])
+    return df
+
+
+def fingerprint(df, params):
+    """
+    Key of an individual's fixes and the analysis parameters, to validate checkpoints.
+
+    Args:
+        df: Fixes of one individual
+        params: JSON-serializable parameters
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.md5(json.dumps([CHECKPOINT_VERSION, params], sort_keys=True).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df[list(REQUIRED_COLUMNS)], index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def checkpoint_path(output_dir, study, individual):
+    """Path of the checkpoint of one individual of a study."""
+    return os.path.join(output_dir, slug(study), 'checkpoints', f"{slug(individual)}.json")
+
+
+def read_checkpoint(path, key=None):
+    """
+    Read a checkpoint.
+
+    Args:
+        path: Checkpoint file
+        key: Expected fingerprint (any if None)
+
+    Returns:
+        Checkpoint dictionary, or None if it is missing, unreadable or stale
+    """
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if key is not None and checkpoint.get('fingerprint') != key:
+        return None
+    return checkpoint
+
+
+def analyze_individual(df, methods=DEFAULT_METHODS, percent_levels=(50, 95), grid_size=100):
+    """
+    Run the estimators on the fixes of one individual.
+
+    Args:
+        df: Fixes of one individual with the canonical columns
+        methods: Home range methods (keys of `components.home_range.HOME_RANGE_METHODS`)
+        percent_levels: Home range isopleth levels (%)
+        grid_size: Grid cells per axis of the density estimators
+
+    Returns:
+        Dictionary of results: daily_distance (records), speed, activity and
+        fix_success statistics, and home_ranges by method
+    """
+    from components.analysis import (
+        calculate_activity_patterns, calculate_daily_distance, calculate_fix_success, calculate_speed_metrics
+    )
+    from components.home_range import home_range_job
+
+    df = df.sort_values(TIMESTAMP).reset_index(drop=True)
+    individual = str(df[INDIVIDUAL].iloc[0])
+    results = {'fixes': len(df), 'errors': {}}
+
+    def run(name, estimate):
+        try:
+            return estimate()
+        except Exception as e:
+            print(f"Error calculating {name} for {individual}: {e}")
+            results['errors'][name] = str(e)
+            return None
+
+    daily = run('daily_distance', lambda: calculate_daily_distance(df))
+    results['daily_distance'] = [] if daily is None else daily.assign(date=daily['date'].astype(str)).to_dict('records')
+
+    speed = run('speed', lambda: calculate_speed_metrics(df))
+    results['speed'] = next(iter(speed[1].values()), {}) if speed else {}
+
+    activity = run('activity', lambda: calculate_activity_patterns(df))
+    results['activity'] = next(iter(activity[1].values()), {}) if activity else {}
+
+    fix_success = run('fix_success', lambda: calculate_fix_success(df)) or {}
+    fix_success = next(iter(fix_success.values()), {})
+    gaps = fix_success.pop('gaps', None)
+    if gaps is not None:
+        fix_success['gaps'] = pd.DataFrame(gaps).astype(str).to_dict('records')
+    results['fix_success'] = fix_success
+
+    results['home_ranges'] = {}
+    for method in methods:
+        estimate = run(f"home_range_{method}", lambda: home_range_job(
+            df, method=method, percent_levels=list(percent_levels), grid_size=grid_size))
+        if estimate:
+            results['home_ranges'][method] = next(iter(estimate.get(method, {}).values()), {})
+    return results
+
+
+def run_individual(task):
+    """
+    Analyze one individual and write its checkpoint (runs in a worker process).
+
+    Args:
+        task: Dictionary with study, individual, fixes (DataFrame), params,
+            fingerprint and path
+
+    Returns:
+        Tuple (study, individual, checkpoint path)
+    """
+    results = analyze_individual(task['fixes'], **task['params'])
+    checkpoint = {
+        'study': task['study'],
+        'individual': task['individual'],
+        'fingerprint': task['fingerprint'],
+        'params': task['params'],
+        'created': time.time(),
+        **results,
+    }
+    path = task['path']
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, 'w') as f:
+        json.dump(checkpoint, f, default=_json_default)
+    os.replace(partial, path)
+    return task['study'], task['individual'], path
+
+
+def _write_table(df, path_without_extension, table_format):
+    if table_format == 'parquet':
+        df.to_parquet(f"{path_without_extension}.parquet", index=False)
+    else:
+        df.to_csv(f"{path_without_extension}.csv", index=False)
+
+
+def write_study_outputs(study_dir, checkpoints, table_format='parquet'):
+    """
+    Write the combined tables and home ranges of a study from its checkpoints.
+
+    Outputs:
+        daily_distance    Daily distance (m) of every individual and day
+        summary           One row per individual: fixes, speed, activity and fix
+                          success statistics and home range areas (km²)
+        activity_by_hour  Percentage of active fixes by hour of day
+        home_ranges.gpkg  Home range polygons (individual, method, percent, area_km2)
+
+    Args:
+        study_dir: Output directory of the study
+        checkpoints: Checkpoint dictionaries of its individuals
+        table_format: One of TABLE_FORMATS
+    """
+    daily, summary, hourly, polygons = [], [], [], []
+    for checkpoint in sorted(checkpoints, key=lambda c: c['individual']):
+        individual = checkpoint['individual']
+        daily.extend(checkpoint['daily_distance'])
+
+        row = {'individual_id': individual, 'fixes': checkpoint['fixes']}
+        row.update({f"speed_{k}": v for k, v in checkpoint['speed'].items()})
+        row.update({f"activity_{k}": v for k, v in checkpoint['activity'].items() if k != 'activity_by_hour'})
+        row.update({f"fix_{k}": v for k, v in checkpoint['fix_success'].items() if k != 'gaps'})
+        for method, result in checkpoint['home_ranges'].items():
+            for key, value in result.items():
+                if key.startswith('area_'):
+                    row[f"{method}_{key}_km2"] = value
+                elif key.startswith(('hull_', 'contour_')) and value:
+                    polygons.append({'individual_id': individual, 'method': method,
+                                     'percent': int(key.split('_')[1]), 'area_km2': result.get(f"area_{key.split('_')[1]}"),
+                                     'geometry': value})
+        row['errors'] = json.dumps(checkpoint['errors']) if checkpoint['errors'] else None
+        summary.append(row)
+
+        hourly.extend({'individual_id': individual, 'hour': h['hour'], 'active_percent': h['activity_status']}
+                      for h in checkpoint['activity'].get('activity_by_hour', []))
+
+    _write_table(pd.DataFrame(daily), os.path.join(study_dir, 'daily_distance'), table_format)
+    _write_table(pd.DataFrame(summary), os.path.join(study_dir, 'summary'), table_format)
+    _write_table(pd.DataFrame(hourly), os.path.join(study_dir, 'activity_by_hour'), table_format)
+
+    if polygons:
+        import geopandas as gpd
+        from shapely.geometry import shape
+
+        frame = gpd.GeoDataFrame(
+            [{k: v for k, v in p.items() if k != 'geometry'} for p in polygons],
+            geometry=[shape(p['geometry']) for p in polygons],
+            crs='EPSG:4326'
+        )
+        path = os.path.join(study_dir, 'home_ranges.gpkg')
+        if os.path.exists(path):
+            os.remove(path)
+        frame.to_file(path, layer='home_ranges', driver='GPKG')
+
+
+def run_batch(studies, output_dir, methods=DEFAULT_METHODS, percent_levels=(50, 95), grid_size=100,
+              workers=None, table_format='parquet', force=False):
+    """
+    Analyze every individual of every study in a process pool.
+
+    Args:
+        studies: Iterable of (study name, loader) where loader() returns the DataFrame
+        output_dir: Output directory (one subdirectory per study)
+        methods: Home range methods
+        percent_levels: Home range isopleth levels (%)
+        grid_size: Grid cells per axis of the density estimators
+        workers: Worker processes (CPU count if None)
+        table_format: One of TABLE_FORMATS
+        force: Recompute individuals even if their checkpoint is current
+
+    Returns:
+        Dictionary {study: {'individuals': n, 'computed': n, 'reused': n, 'failed': n}}
+    """
+    from components.tracks import split_individuals
+
+    params = {'methods': list(methods), 'percent_levels': list(percent_levels), 'grid_size': grid_size}
+    workers = workers or os.cpu_count() or 1
+    report = {}
+    remaining = {}
+    finished = {}
+
+    def finish(study):
+        study_dir = os.path.join(output_dir, slug(study))
+        write_study_outputs(study_dir, finished.pop(study), table_format)
+        print(f"{study}: {report[study]} -> {study_dir}", flush=True)
+
+    def collect(done):
+        for future in done:
+            task = pending.pop(future)
+            study = task['study']
+            try:
+                future.result()
+                checkpoint = read_checkpoint(task['path'])
+                finished[study].append(checkpoint)
+                report[study]['computed'] += 1
+            except Exception as e:
+                print(f"Error analyzing {study} / {task['individual']}: {e}")
+                report[study]['failed'] += 1
+            remaining[study] -= 1
+            if remaining[study] == 0:
+                finish(study)
+
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    pending = {}
+    try:
+        for study, loader in studies:
+            try:
+                df = loader()
+            except Exception as e:
+                print(f"Error loading study {study}: {e}")
+                continue
+
+            report[study] = {'individuals': 0, 'computed': 0, 'reused': 0, 'failed': 0}
+            remaining[study] = 0
+            finished[study] = []
+            for individual, fixes in split_individuals(df):
+                report[study]['individuals'] += 1
+                key = fingerprint(fixes, params)
+                path = checkpoint_path(output_dir, study, individual)
+                checkpoint = None if force else read_checkpoint(path, key)
+                if checkpoint is not None:
+                    finished[study].append(checkpoint)
+                    report[study]['reused'] += 1
+                    continue
+
+                # Keep the queue short so only a few individuals' fixes are held in memory
+                while len(pending) >= workers * TASKS_PER_WORKER:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+                task = {'study': study, 'individual': str(individual), 'fixes': fixes, 'params': params,
+                        'fingerprint': key, 'path': path}
+                pending[executor.submit(run_individual, task)] = {k: task[k] for k in ('study', 'individual', 'path')}
+                remaining[study] += 1
+
+            if remaining[study] == 0:
+                finish(study)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return report
+
+
+def _parquet_available():
+    for module in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            continue
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the tracking analysis pipeline over many studies")
+    parser.add_argument('inputs', nargs='*', help="CSV or Parquet tracking data files (one study each)")
+    parser.add_argument('--cached-studies', action='store_true', help="Include studies in the Movebank cache")
+    parser.add_argument('--cache-dir', default='./data/cache', help="Movebank cache directory")
+    parser.add_argument('--movebank-study', action='append', default=[], help="Movebank study id (repeatable)")
+    parser.add_argument('--output', default='./data/batch', help="Output directory")
+    parser.add_argument('--methods', default=','.join(DEFAULT_METHODS),
+                        help="Comma-separated home range methods (mcp, kde, bbmm, locoht)")
+    parser.add_argument('--percent-levels', default='50,95', help="Comma-separated isopleth levels")
+    parser.add_argument('--grid-size', type=int, default=100)
+    parser.add_argument('--workers', type=int, help="Worker processes (CPU count by default)")
+    parser.add_argument('--table-format', choices=TABLE_FORMATS, default='parquet')
+    parser.add_argument('--force', action='store_true', help="Ignore existing checkpoints")
+    args = parser.parse_args(argv)
+
+    from components.home_range import HOME_RANGE_METHODS
+
+    methods = [m for m in args.methods.split(',') if m]
+    unknown = [m for m in methods if m not in HOME_RANGE_METHODS]
+    if unknown:
+        parser.error(f"Unknown home range methods: {', '.join(unknown)}")
+    if args.table_format == 'parquet' and not _parquet_available():
+        parser.error("Parquet output needs pyarrow (or fastparquet); install it or use --table-format csv")
+
+    studies = [(os.path.splitext(os.path.basename(path))[0], lambda path=path: load_table(path))
+               for path in args.inputs]
+    if args.cached_studies:
+        studies += [(name, lambda path=path: load_table(path)) for name, path in cached_studies(args.cache_dir)]
+    studies += [(f"movebank_{study_id}", lambda study_id=study_id: movebank_study(study_id))
+                for study_id in args.movebank_study]
+    if not studies:
+        parser.error("No studies given")
+
+    started = time.time()
+    report = run_batch(studies, args.output, methods, [int(p) for p in args.percent_levels.split(',') if p],
+                       args.grid_size, args.workers, args.table_format, args.force)
+    failed = sum(r['failed'] for r in report.values())
+    print(f"{len(report)} studies, {sum(r['individuals'] for r in report.values())} individuals "
+          f"({sum(r['reused'] for r in report.values())} from checkpoints, {failed} failed) "
+          f"in {time.time() - started:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Regression Checks
+Correctness checks of the analysis engines on synthetic tracks with known answers
+
+Usage:
+    python -m benchmarks.checks [--checks duty_cycle_partial_epoch,...]
+
+Every check raises AssertionError with a description when the engine gives a
+wrong answer; the runner reports each check and exits with 1 if any failed.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+def duty_cycle_track(days, start='2024-01-01'):
+    """
+    Track of a perfect collar fixing every 15 min from 06 to 18h and every 2 h
+    from 18 to 06h (UTC), without failed fixes.
+
+    Args:
+        days: Tracking days
+        start: Time of the first fix
+
+    Returns:
+        DataFrame with the canonical track columns
+    """
+    times = pd.date_range(start, periods=days * 96, freq='15min')
+    day = (times.hour >= 6) & (times.hour < 18)
+    times = times[day | ((times.minute == 0) & (times.hour % 2 == 0))]
+    return pd.DataFrame({
+        'individual_id': 'collar',
+        'timestamp': times,
+        'location_lat': -1.5 + np.arange(len(times)) * 1e-4,
+        'location_long': 35.0,
+    })
+
+
+def check_duty_cycle_partial_epoch():
+    # 30 days end in a 2-day epoch whose night hours have too few intervals
+    from components.quality import quality_report
+    from components.steps import build_step_table
+
+    expected = '15 min 06-18h, 120 min 18-06h'
+    for days in (28, 30):
+        report = quality_report(build_step_table(duty_cycle_track(days)))
+        schedules = set(report['epochs']['schedule'])
+        rate = report['individuals']['fix_success_rate'].iloc[0]
+        assert schedules == {expected}, f"{days} days: inferred schedules {sorted(schedules)}, expected {expected}"
+        assert np.isclose(rate, 100), f"{days} days: fix success rate {rate:.2f}%, expected 100%"
+        assert len(report['gaps']) == 0, f"{days} days: {len(report['gaps'])} gaps in a track without gaps"
+
+
+def check_duplicate_tolerance():
+    # Fixes at the same time are always merged; regularly sampled fixes never are
+    from components.ingest import resolve_duplicates
+
+    times = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.r_[0, 0, np.arange(1, 100)], unit='s')
+    df = pd.DataFrame({'individual_id': 'collar', 'timestamp': times,
+                       'location_lat': -1.5, 'location_long': 35.0})
+    for tolerance_s in (0, 1):
+        clean, report = resolve_duplicates(df, tolerance_s=tolerance_s)
+        assert len(clean) == 100, f"tolerance {tolerance_s} s: {len(clean)} fixes of a 1 Hz track, expected 100"
+        assert report['duplicates'] == 1, f"tolerance {tolerance_s} s: {report['duplicates']} duplicates, expected 1"
+
+
+def check_outlier_settings_isolated():
+    # A filter with other settings keeps the shared mask and the results not derived from it
+    from components.data_store import dataset_version, get_result, store_result
+    from components.outliers import apply_outlier_filter
+    from components.steps import get_step_table
+
+    df = duty_cycle_track(3)
+    movement_data_json = df.to_json(date_format='iso', orient='split')
+    version = dataset_version(movement_data_json)
+    shared = get_step_table(movement_data_json, df)
+    store_result(version, 'home_range', 'home range')
+
+    masked = apply_outlier_filter(movement_data_json, max_speed_kmh=0.01)
+    assert masked['is_outlier'].any(), "a 0.01 km/h limit flags no fix"
+    assert not shared['is_outlier'].any(), "the filter changed the mask of the shared step table"
+    assert get_result(version, 'home_range') == 'home range', "the filter dropped the home range"
+
+
+# Checks: name -> function raising AssertionError on a wrong answer
+CHECKS = {
+    'duty_cycle_partial_epoch': check_duty_cycle_partial_epoch,
+    'duplicate_tolerance': check_duplicate_tolerance,
+    'outlier_settings_isolated': check_outlier_settings_isolated,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the analysis regression checks")
+    parser.add_argument('--checks', default=','.join(CHECKS), help="Comma-separated checks")
+    args = parser.parse_args(argv)
+
+    names = [c for c in args.checks.split(',') if c]
+    unknown = [c for c in names if c not in CHECKS]
+    if unknown:
+        parser.error(f"Unknown checks: {', '.join(unknown)}")
+
+    failed = 0
+    for name in names:
+        try:
+            CHECKS[name]()
+            print(f"ok      {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"FAILED  {name}: {e}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Benchmark Runner
+Times and memory-profiles the analysis estimators and the CSV ingest path on
+synthetic tracks at several scales, and stores the results as JSON
+
+Usage:
+    python -m benchmarks.run [--scales small,medium] [--benchmarks kde,bbmm]
+                             [--repeat 3] [--output results.json] [--compare previous.json]
+
+Every benchmark is timed `repeat` times (the best time is the one to compare) and
+then run once more under tracemalloc for its peak memory, so profiling overhead
+does not distort the times.
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.synthetic import SCHEDULES, correlated_random_walk
+
+# Track sets by scale
+SCALES = {
+    'small': {'individuals': 2, 'fixes_per_individual': 500},
+    'medium': {'individuals': 5, 'fixes_per_individual': 2000},
+    'large': {'individuals': 10, 'fixes_per_individual': 10000},
+}
+
+# Fixes of the single-track estimators at most: BBMM loops over every grid cell of
+# every segment in Python and T-LoCoH holds an n x n distance matrix
+TRACK_LIMITS = {
+    'bbmm': 100,
+    'locoht': 3000,
+}
+
+# Default directory of the result files
+RESULT_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# Best times this much slower than the compared run are reported as regressions
+REGRESSION_RATIO = 1.2
+
+
+def _first_track(df, limit):
+    track = df[df['individual_id'] == df['individual_id'].iloc[0]]
+    return track.iloc[:limit].copy()
+
+
+def _csv_upload(df):
+    encoded = base64.b64encode(df.to_csv(index=False).encode('utf-8')).decode('ascii')
+    return f"data:text/csv;base64,{encoded}"
+
+
+def _setup_distances(df):
+    from components.analysis import calculate_distances
+    return lambda: calculate_distances(df), len(df)
+
+
+def _checked(function, check, message):
+    # Estimators catch their own errors and return empty results; an empty result
+    # must fail the benchmark instead of timing the error path
+    def run():
+        result = function()
+        if not check(result):
+            raise RuntimeError(message)
+        return result
+    return run
+
+
+def _setup_kde(df):
+    from components.analysis import calculate_home_range_kde
+    return _checked(lambda: calculate_home_range_kde(df), lambda result: result['areas'],
+                    "KDE returned no home range"), len(df)
+
+
+def _setup_kde_single(df):
+    from components.home_range import calculate_single_kde
+    track = _first_track(df, len(df))
+    return _checked(lambda: calculate_single_kde(track.copy(), [50, 95], 100, 1.0),
+                    lambda result: 'contour_95' in result, "Single-track KDE returned no contour"), len(track)
+
+
+def _setup_bbmm(df):
+    from components.home_range import calculate_single_bbmm
+    track = _first_track(df, TRACK_LIMITS['bbmm'])
+    return lambda: calculate_single_bbmm(track.copy(), [50, 95], 100), len(track)
+
+
+def _setup_locoht(df):
+    from components.home_range import calculate_single_locoht
+    track = _first_track(df, TRACK_LIMITS['locoht'])
+    return lambda: calculate_single_locoht(track.copy(), [50, 95]), len(track)
+
+
+def _setup_fix_success(df):
+    from components.analysis import calculate_fix_success
+    return lambda: calculate_fix_success(df), len(df)
+
+
+def _setup_csv_upload(df):
+    from app import process_csv_upload
+    contents = _csv_upload(df)
+    return lambda: process_csv_upload(contents, 'benchmark.csv', None, None, None), len(df)
+
+
+# Benchmarks: name -> setup(df) returning the callable to measure and the fixes it processes
+BENCHMARKS = {
+    'distances': _setup_distances,
+    'kde': _setup_kde,
+    'kde_single': _setup_kde_single,
+    'bbmm': _setup_bbmm,
+    'locoht': _setup_locoht,
+    'fix_success': _setup_fix_success,
+    'csv_upload': _setup_csv_upload,
+}
+
+
+def measure(function, repeat=3):
+    """
+    Time a callable and record its peak traced memory.
+
+    Args:
+        function: Callable without arguments
+        repeat: Number of timed runs
+
+    Returns:
+        Dictionary with the wall times of all runs (seconds), the best time and
+        the peak memory of an extra traced run (MB)
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'times_s': [round(t, 6) for t in times],
+        'best_s': round(min(times), 6),
+        'peak_mb': round(peak / 2**20, 3),
+    }
+
+
+def run_benchmarks(scales=None, benchmarks=None, repeat=3, schedule='regular', gap_rate=0.05, seed=0):
+    """
+    Run benchmarks on synthetic tracks.
+
+    Args:
+        scales: Names of SCALES to run (all if None)
+        benchmarks: Names of BENCHMARKS to run (all if None)
+        repeat: Timed runs per benchmark
+        schedule: Sampling schedule of the synthetic tracks
+        gap_rate: Fraction of failed fixes of the synthetic tracks
+        seed: Random seed of the synthetic tracks
+
+    Returns:
+        Result document (see `main`)
+    """
+    results = []
+    for scale in scales or SCALES:
+        df = correlated_random_walk(schedule=schedule, gap_rate=gap_rate, seed=seed, **SCALES[scale])
+        for name in benchmarks or BENCHMARKS:
+            function, fixes = BENCHMARKS[name](df)
+            try:
+                entry = measure(function, repeat)
+            except Exception as e:
+                print(f"Error running benchmark {name} ({scale}): {e}")
+                entry = {'error': str(e)}
+            entry.update({'benchmark': name, 'scale': scale, 'fixes': fixes})
+            results.append(entry)
+            if 'best_s' in entry:
+                print(f"{name:<12} {scale:<8} {fixes:>8} fixes  {entry['best_s']:>9.4f}s  "
+                      f"{entry['peak_mb']:>9.1f} MB", flush=True)
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'parameters': {'repeat': repeat, 'schedule': schedule, 'gap_rate': gap_rate, 'seed': seed},
+        'results': results,
+    }
+
+
+def compare(current, previous, ratio=REGRESSION_RATIO):
+    """
+    Compare the best times of two result documents.
+
+    Args:
+        current: Result document of this run
+        previous: Result document to compare against
+        ratio: Slowdown reported as a regression
+
+    Returns:
+        List of (benchmark, scale, previous best, current best, ratio) of the
+        benchmarks run in both, and the regressions among them
+    """
+    before = {(r['benchmark'], r['scale']): r['best_s'] for r in previous['results'] if 'best_s' in r}
+    rows = []
+    for result in current['results']:
+        key = (result['benchmark'], result['scale'])
+        if key in before and 'best_s' in result and before[key] > 0:
+            rows.append((*key, before[key], result['best_s'], result['best_s'] / before[key]))
+    return rows, [row for row in rows if row[4] > ratio]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis and ingest hot paths")
+    parser.add_argument('--scales', default=','.join(SCALES), help="Comma-separated scales")
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS), help="Comma-separated benchmarks")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--schedule', choices=SCHEDULES, default='regular')
+    parser.add_argument('--gap-rate', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Result file (a timestamped file in benchmarks/results by default)")
+    parser.add_argument('--compare', help="Result file of a previous run")
+    args = parser.parse_args(argv)
+
+    scales = [s for s in args.scales.split(',') if s]
+    names = [b for b in args.benchmarks.split(',') if b]
+    unknown = [s for s in scales if s not in SCALES] + [b for b in names if b not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown scales or benchmarks: {', '.join(unknown)}")
+
+    document = run_benchmarks(scales, names, args.repeat, args.schedule, args.gap_rate, args.seed)
+
+    output = args.output or os.path.join(RESULT_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows, regressions = compare(document, json.load(f))
+        for name, scale, before, after, ratio in rows:
+            print(f"{name:<12} {scale:<8} {before:>9.4f}s -> {after:>9.4f}s  x{ratio:.2f}")
+        if regressions:
+            print(f"{len(regressions)} regression(s) slower than x{REGRESSION_RATIO:.2f}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Activity Component
+Circadian activity engine: counts active and resting steps per individual and
+hour of day in a single bincount pass over the shared step table
+"""
+
+import numpy as np
+import pandas as pd
+
+from components.steps import usable_steps
+
+# Default day period (hours, end exclusive)
+DAY_HOURS = (6, 18)
+
+
+def classify_active(steps, threshold_m, window_min=None):
+    """
+    Classify steps as active from the step length threshold.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        threshold_m: Minimum step length (meters) for an active step
+        window_min: Steps longer than this (minutes) are never counted as active
+
+    Returns:
+        Boolean numpy array, one value per step
+    """
+    step_m = steps['step_m'].to_numpy()
+    active = step_m > threshold_m
+    if window_min:
+        active &= steps['dt_s'].to_numpy() <= window_min * 60
+    return active
+
+
+def activity_tensor(steps, threshold_m=50, window_min=60, active=None):
+    """
+    Build the (individual x hour-of-day x rest/active) count tensor.
+
+    Only the classification is recomputed when the threshold changes; the
+    step table itself is reused.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        threshold_m: Minimum step length (meters) for an active step
+        window_min: Maximum step duration (minutes) for an active step
+        active: Precomputed boolean activity per step (e.g. decoded behavioral
+            states); overrides the threshold classification when given
+
+    Returns:
+        Tuple (counts, speed_sum): counts has shape (n_individuals, 24, 2) with
+        resting counts at [..., 0] and active counts at [..., 1]; speed_sum has
+        shape (n_individuals, 24) with summed step speeds in km/h
+    """
+    n_individuals = len(steps.attrs.get('individuals', [])) or int(steps['ind_code'].max()) + 1
+    valid = usable_steps(steps)
+
+    if active is None:
+        active = classify_active(steps, threshold_m, window_min)
+
+    cell = steps['ind_code'].to_numpy().astype(np.int64) * 24 + steps['hour'].to_numpy()
+    cell = cell[valid]
+
+    counts = np.bincount(cell * 2 + active[valid], minlength=n_individuals * 48)
+    speeds = np.nan_to_num(steps['speed_kmh'].to_numpy()[valid], nan=0.0, posinf=0.0)
+    speed_sum = np.bincount(cell, weights=speeds, minlength=n_individuals * 24)
+
+    return counts.reshape(n_individuals, 24, 2), speed_sum.reshape(n_individuals, 24)
+
+
+def activity_frame(counts, speed_sum, individuals, day_hours=DAY_HOURS):
+    """
+    Convert the activity tensor into the hourly activity table used by the charts.
+
+    Args:
+        counts: Count tensor from `activity_tensor`
+        speed_sum: Summed speeds from `activity_tensor`
+        individuals: Individual labels, in tensor order
+        day_hours: (start, end) hours of the day period
+
+    Returns:
+        DataFrame with individual_id, hour_of_day, activity_count, total_count,
+        avg_speed, activity_ratio, activity and is_daytime columns
+        (hours without steps are omitted)
+    """
+    n_individuals = counts.shape[0]
+    active_count = counts[..., 1].ravel()
+    total_count = counts.sum(axis=2).ravel()
+    hours = np.tile(np.arange(24), n_individuals)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = active_count / total_count
+        avg_speed = speed_sum.ravel() / total_count
+
+    frame = pd.DataFrame({
+        'individual_id': np.repeat(np.asarray(individuals, dtype=object), 24),
+        'hour_of_day': hours,
+        'activity_count': active_count,
+        'total_count': total_count,
+        'avg_speed': avg_speed,
+        'activity_ratio': ratio,
+        'activity': ratio * 100,
+        'is_daytime': (hours >= day_hours[0]) & (hours < day_hours[1])
+    })
+    return frame[frame['total_count'] > 0].reset_index(drop=True)
+
+
+def activity_summary(counts, individuals, day_hours=DAY_HOURS):
+    """
+    Summarize overall, day and night activity per individual from the tensor.
+
+    Args:
+        counts: Count tensor from `activity_tensor`
+        individuals: Individual labels, in tensor order
+        day_hours: (start, end) hours of the day period
+
+    Returns:
+        Dictionary keyed by individual with activity_by_hour, day/night and
+        active/resting percentages
+    """
+    hours = np.arange(24)
+    is_day = (hours >= day_hours[0]) & (hours < day_hours[1])
+
+    def percent(active, total):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total > 0, active / total * 100, 0.0)
+
+    active = counts[..., 1]
+    total = counts.sum(axis=2)
+    by_hour = percent(active, total)
+    day = percent(active[:, is_day].sum(axis=1), total[:, is_day].sum(axis=1))
+    night = percent(active[:, ~is_day].sum(axis=1), total[:, ~is_day].sum(axis=1))
+    overall = percent(active.sum(axis=1), total.sum(axis=1))
+
+    summary = {}
+    for i, individual in enumerate(individuals):
+        observed = total[i] > 0
+        summary[individual] = {
+            'activity_by_hour': [
+                {'hour': int(h), 'activity_status': float(v)}
+                for h, v in zip(hours[observed], by_hour[i][observed])
+            ],
+            'day_activity_percentage': float(day[i]),
+            'night_activity_percentage': float(night[i]),
+            'active_percentage': float(overall[i]),
+            'resting_percentage': float(100 - overall[i])
+        }
+    return summary
@@ -5,16 +5,15 @@ Provides functionality for calculating carnivore movement and behavioral metrics
 
 import pandas as pd
 import numpy as np
-import geopandas as gpd
-from shapely.geometry import Point, LineString, Polygon
-from scipy.spatial import ConvexHull
-from sklearn.neighbors import KernelDensity
-from scipy.stats import gaussian_kde
-from scipy.spatial.distance import pdist, squareform
-import matplotlib.path as mpath
 import math
-from datetime import datetime, timedelta
-import pytz
+
+# geopandas, shapely and scipy are imported by the estimators that use them, so
+# importing this module (and starting the app) does not load them
+
+from components.activity import activity_summary
+from components.quality import quality_report
+from components.schema import INDIVIDUAL, LAT, LON, TIMESTAMP
+from components.steps import build_step_table, usable_steps
 
 # Earth radius in meters
 EARTH_RADIUS = 6371000
@@ -47,36 +46,35 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     return distance
 
 
+def _previous_step(steps, column, fill=np.nan):
+    """Value of the step from the previous fix of the same individual (fill at first fixes)."""
+    values = steps[column].to_numpy()
+    result = np.full(len(values), fill, dtype=np.float64)
+    result[1:] = values[:-1]
+    result[steps.attrs['offsets'][:-1]] = fill
+    return result
+
+
 def calculate_distances(df):
     """
-    Calculate distances between consecutive points in a GPS dataframe.
+    Calculate distances between consecutive GPS points of every individual.
     
     Args:
-        df: DataFrame containing GPS points with 'location-lat', 'location-long', and 'timestamp' columns
+        df: DataFrame with the canonical track columns (see `components.schema`),
+            or a step table from `components.steps.build_step_table`
         
     Returns:
-        DataFrame with added 'distance_to_prev' column
+        Step table sorted by individual and time with an added 'distance_to_prev'
+        column (meters from the previous fix of the same individual, 0 for first fixes)
     """
     if df.empty or len(df) < 2:
         return df
     
-    # Ensure the dataframe is sorted by timestamp
-    df = df.sort_values('timestamp').reset_index(drop=True)
+    # Steps are computed per individual in one sorted pass; a step table is reused without copying its data
+    steps = df.copy(deep=False) if 'step_m' in df.columns else build_step_table(df)
+    steps['distance_to_prev'] = _previous_step(steps, 'step_m', fill=0)
     
-    # Extract coordinates
-    lats = df['location-lat'].values
-    lons = df['location-long'].values
-    
-    # Calculate distances (first point has distance 0)
-    distances = np.zeros(len(df))
-    for i in range(1, len(df)):
-        distances[i] = haversine_distance(lats[i-1], lons[i-1], lats[i], lons[i])
-    
-    # Add distance column
-    df_with_dist = df.copy()
-    df_with_dist['distance_to_prev'] = distances
-    
-    return df_with_dist
+    return steps
 
 
 def calculate_daily_distance(df, by_individual=True):
@@ -84,8 +82,9 @@ def calculate_daily_distance(df, by_individual=True):
     Calculate total distance traveled per day for each individual.
     
     Args:
-        df: DataFrame containing GPS points with 'location-lat', 'location-long', 
-            'timestamp', and 'individual-local-identifier' columns
+        df: DataFrame with the canonical track columns (see `components.schema`),
+            or a step table; steps touching a fix flagged in its is_outlier
+            column are not counted
         by_individual: If True, calculate separately for each individual
         
     Returns:
@@ -98,16 +97,21 @@ def calculate_daily_distance(df, by_individual=True):
     if 'distance_to_prev' not in df.columns:
         df = calculate_distances(df)
     
+    # Distance of every fix from the previous one, zero where that step is not usable
+    distance = df['distance_to_prev'].rename('daily_distance')
+    if 'is_outlier' in df.columns:
+        arrived = np.zeros(len(df), dtype=bool)
+        arrived[1:] = usable_steps(df)[:-1]
+        distance = distance.where(arrived, 0)
+    
     # Convert timestamp to date
-    df['date'] = pd.to_datetime(df['timestamp']).dt.date
+    date = pd.to_datetime(df[TIMESTAMP]).dt.date.rename('date')
     
     # Group by date (and individual if specified) and sum distances
-    if by_individual and 'individual-local-identifier' in df.columns:
-        daily_distance = df.groupby(['individual-local-identifier', 'date'])['distance_to_prev'].sum().reset_index()
-        daily_distance.rename(columns={'distance_to_prev': 'daily_distance'}, inplace=True)
+    if by_individual and INDIVIDUAL in df.columns:
+        daily_distance = distance.groupby([df[INDIVIDUAL], date]).sum().reset_index()
     else:
-        daily_distance = df.groupby('date')['distance_to_prev'].sum().reset_index()
-        daily_distance.rename(columns={'distance_to_prev': 'daily_distance'}, inplace=True)
+        daily_distance = distance.groupby(date).sum().reset_index()
     
     return daily_distance
 
@@ -117,8 +121,7 @@ def calculate_net_displacement(df):
     Calculate net squared displacement (NSD) from the first point for each individual.
     
     Args:
-        df: DataFrame containing GPS points with 'location-lat', 'location-long', 
-            'timestamp', and 'individual-local-identifier' columns
+        df: DataFrame with the canonical track columns (see `components.schema`)
             
     Returns:
         DataFrame with NSD values
@@ -126,58 +129,33 @@ def calculate_net_displacement(df):
     if df.empty:
         return pd.DataFrame()
     
-    result_dfs = []
+    # Sort once, then measure every fix against the first fix of its individual
+    if INDIVIDUAL in df.columns:
+        df_sorted = df.sort_values([INDIVIDUAL, TIMESTAMP], kind='stable')
+        
+        # Individuals with a single fix have no displacement
+        group_size = df_sorted.groupby(INDIVIDUAL)[TIMESTAMP].transform('size')
+        df_sorted = df_sorted[group_size >= 2]
+        grouped = df_sorted.groupby(INDIVIDUAL)
+        first_lat = grouped[LAT].transform('first')
+        first_lon = grouped[LON].transform('first')
+    else:
+        # If no individual column, treat all points as one track
+        df_sorted = df.sort_values(TIMESTAMP, kind='stable').reset_index(drop=True)
+        first_lat = df_sorted[LAT].iloc[0] if len(df_sorted) else np.nan
+        first_lon = df_sorted[LON].iloc[0] if len(df_sorted) else np.nan
     
-    # Process each individual separately if individual ID column exists
-    if 'individual-local-identifier' in df.columns:
-        for individual, group in df.groupby('individual-local-identifier'):
-            if len(group) < 2:
-                continue
-                
-            # Sort by timestamp
-            group = group.sort_values('timestamp').reset_index(drop=True)
-            
-            # Get first point coordinates
-            first_lat = group.iloc[0]['location-lat']
-            first_lon = group.iloc[0]['location-long']
-            
-            # Calculate NSD for each point
-            nsd_values = []
-            for _, row in group.iterrows():
-                distance = haversine_distance(first_lat, first_lon, 
-                                             row['location-lat'], row['location-long'])
-                nsd_values.append(distance**2)  # Square the displacement
-                
-            # Create result dataframe
-            result_df = group.copy()
-            result_df['nsd'] = nsd_values
-            result_dfs.append(result_df)
-            
-        if result_dfs:
-            return pd.concat(result_dfs)
+    if len(df_sorted) < 2:
         return pd.DataFrame()
     
-    else:
-        # If no individual column, treat all points as one track
-        df_sorted = df.sort_values('timestamp').reset_index(drop=True)
-        
-        if len(df_sorted) < 2:
-            return pd.DataFrame()
-            
-        # Get first point coordinates
-        first_lat = df_sorted.iloc[0]['location-lat']
-        first_lon = df_sorted.iloc[0]['location-long']
-        
-        # Calculate NSD for each point
-        nsd_values = []
-        for _, row in df_sorted.iterrows():
-            distance = haversine_distance(first_lat, first_lon, 
-                                         row['location-lat'], row['location-long'])
-            nsd_values.append(distance**2)  # Square the displacement
-            
-        # Create result dataframe
-        df_sorted['nsd'] = nsd_values
-        return df_sorted
+    distance = haversine_distance(
+        np.asarray(first_lat, dtype=float), np.asarray(first_lon, dtype=float),
+        df_sorted[LAT].to_numpy(dtype=float), df_sorted[LON].to_numpy(dtype=float)
+    )
+    
+    result_df = df_sorted.copy()
+    result_df['nsd'] = distance ** 2  # Square the displacement
+    return result_df
 
 
 def calculate_nsd(df, time_windows=None):
@@ -204,11 +182,11 @@ def calculate_nsd(df, time_windows=None):
         for window in time_windows:
             try:
                 # Group by individual and time window
-                if 'individual-local-identifier' in df.columns:
-                    window_df = nsd_df.set_index('timestamp')
-                    window_df = window_df.groupby(['individual-local-identifier', pd.Grouper(freq=window)])['nsd'].mean().reset_index()
+                if INDIVIDUAL in df.columns:
+                    window_df = nsd_df.set_index(TIMESTAMP)
+                    window_df = window_df.groupby([INDIVIDUAL, pd.Grouper(freq=window)])['nsd'].mean().reset_index()
                 else:
-                    window_df = nsd_df.set_index('timestamp')
+                    window_df = nsd_df.set_index(TIMESTAMP)
                     window_df = window_df.groupby(pd.Grouper(freq=window))['nsd'].mean().reset_index()
                 
                 result[window] = window_df
@@ -223,7 +201,7 @@ def calculate_home_range_mcp(df, percentage=95):
     Calculate Minimum Convex Polygon (MCP) home range.
     
     Args:
-        df: DataFrame containing GPS points with 'location-lat', 'location-long' columns
+        df: DataFrame with the canonical location columns (see `components.schema`)
         percentage: Percentage of points to include (e.g., 95% MCP)
         
     Returns:
@@ -232,17 +210,21 @@ def calculate_home_range_mcp(df, percentage=95):
     if df.empty or len(df) < 3:
         return {'polygons': [], 'areas': {}}
     
+    import geopandas as gpd
+    from scipy.spatial import ConvexHull
+    from shapely.geometry import Polygon
+    
     result = {'polygons': [], 'areas': {}}
     
     # Process each individual separately if individual ID column exists
-    groups = df.groupby('individual-local-identifier') if 'individual-local-identifier' in df.columns else [(None, df)]
+    groups = df.groupby(INDIVIDUAL) if INDIVIDUAL in df.columns else [(None, df)]
     
     for individual, group in groups:
         if len(group) < 3:
             continue
             
         # Extract coordinates
-        coords = np.column_stack((group['location-long'].values, group['location-lat'].values))
+        coords = np.column_stack((group[LON].values, group[LAT].values))
         
         try:
             # Calculate convex hull with specified percentage of points
@@ -293,7 +275,7 @@ def calculate_home_range_kde(df, percentage=95, bandwidth=None):
     Calculate Kernel Density Estimation (KDE) home range.
     
     Args:
-        df: DataFrame containing GPS points with 'location-lat', 'location-long' columns
+        df: DataFrame with the canonical location columns (see `components.schema`)
         percentage: Percentage contour to calculate (e.g., 95% KDE)
         bandwidth: Smoothing parameter for KDE, if None it's estimated automatically
         
@@ -303,17 +285,21 @@ def calculate_home_range_kde(df, percentage=95, bandwidth=None):
     if df.empty or len(df) < 10:  # KDE needs more points for stability
         return {'polygons': [], 'areas': {}}
     
+    import geopandas as gpd
+    from scipy.stats import gaussian_kde
+    from shapely.geometry import Polygon
+    
     result = {'polygons': [], 'areas': {}}
     
     # Process each individual separately if individual ID column exists
-    groups = df.groupby('individual-local-identifier') if 'individual-local-identifier' in df.columns else [(None, df)]
+    groups = df.groupby(INDIVIDUAL) if INDIVIDUAL in df.columns else [(None, df)]
     
     for individual, group in groups:
         if len(group) < 10:
             continue
             
         # Extract coordinates
-        coords = np.column_stack((group['location-long'].values, group['location-lat'].values))
+        coords = np.column_stack((group[LON].values, group[LAT].values))
         
         try:
             # Estimate bandwidth if not provided
@@ -345,18 +331,16 @@ def calculate_home_range_kde(df, percentage=95, bandwidth=None):
             threshold_idx = np.searchsorted(cumsum, percentage / 100.0)
             threshold = z_sorted[threshold_idx]
             
-            # Extract contour polygons
-            import matplotlib.pyplot as plt
-            from matplotlib.contour import QuadContourSet
+            # Extract contour polygons (allsegs works on every matplotlib version;
+            # ContourSet.collections is gone since 3.10)
+            from matplotlib.figure import Figure
             
-            fig, ax = plt.figure(), plt.Axes(plt.figure(), [0, 0, 1, 1])
+            ax = Figure().add_axes([0, 0, 1, 1])
             contour_set = ax.contour(grid_x, grid_y, z, levels=[threshold])
-            plt.close(fig)
             
             # Convert matplotlib contours to Shapely polygons
             polygons = []
-            for path in contour_set.collections[0].get_paths():
-                vertices = path.vertices
+            for vertices in contour_set.allsegs[0]:
                 if len(vertices) >= 3:
                     poly = Polygon(vertices)
                     if poly.is_valid:
@@ -411,7 +395,8 @@ def calculate_speed_metrics(df):
     Calculate speed metrics from GPS points.
     
     Args:
-        df: DataFrame containing GPS points with location and timestamp
+        df: DataFrame with the canonical track columns (see `components.schema`),
+            or the output of `calculate_distances`
         
     Returns:
         DataFrame with added speed columns and summary statistics
@@ -419,15 +404,12 @@ def calculate_speed_metrics(df):
     if df.empty or len(df) < 2:
         return df, {}
     
-    # Ensure the dataframe has distance columns
-    if 'distance_to_prev' not in df.columns:
+    # Ensure the dataframe has per-individual distance and duration columns
+    if 'distance_to_prev' not in df.columns or 'dt_s' not in df.columns:
         df = calculate_distances(df)
     
-    # Ensure timestamps are datetime
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    
-    # Calculate time differences in seconds
-    df['time_diff'] = df['timestamp'].diff().dt.total_seconds()
+    # Time differences in seconds from the previous fix of the same individual
+    df['time_diff'] = _previous_step(df, 'dt_s')
     
     # Calculate speed (m/s) - avoid division by zero
     df['speed_mps'] = np.where(df['time_diff'] > 0, 
@@ -441,7 +423,7 @@ def calculate_speed_metrics(df):
     summary_stats = {}
     
     # Process each individual separately if individual ID column exists
-    groups = df.groupby('individual-local-identifier') if 'individual-local-identifier' in df.columns else [(None, df)]
+    groups = df.groupby(INDIVIDUAL) if INDIVIDUAL in df.columns else [(None, df)]
     
     for individual, group in groups:
         # Filter out potential outliers for summary statistics (e.g., speeds > 100 km/h for many carnivores)
@@ -481,42 +463,26 @@ def calculate_activity_patterns(df, active_speed_threshold=0.1):
         df, _ = calculate_speed_metrics(df)
     
     # Classify activity
-    df['activity_status'] = np.where(df['speed_mps'] >= active_speed_threshold, 'active', 'resting')
+    active = (df['speed_mps'] >= active_speed_threshold).to_numpy()
+    df['activity_status'] = np.where(active, 'active', 'resting')
     
     # Add hour of day for temporal patterns
-    df['hour'] = pd.to_datetime(df['timestamp']).dt.hour
+    df['hour'] = pd.to_datetime(df[TIMESTAMP]).dt.hour
     
-    # Summarize activity by time of day
-    summary_stats = {}
+    # Count active and resting fixes per individual and hour in a single pass
+    if INDIVIDUAL in df.columns:
+        codes, individuals = pd.factorize(df[INDIVIDUAL], sort=True)
+    else:
+        codes, individuals = np.zeros(len(df), dtype=np.int64), [None]
     
-    # Process each individual separately if individual ID column exists
-    groups = df.groupby('individual-local-identifier') if 'individual-local-identifier' in df.columns else [(None, df)]
+    cells = (codes * 24 + df['hour'].to_numpy()) * 2 + active
+    counts = np.bincount(cells, minlength=len(individuals) * 48).reshape(len(individuals), 24, 2)
     
-    for individual, group in groups:
-        # Activity by hour
-        activity_by_hour = group.groupby('hour')['activity_status'].apply(
-            lambda x: (x == 'active').mean() * 100  # Percentage of active points
-        ).reset_index()
-        
-        # Day vs. night activity
-        day_hours = range(6, 18)  # 6 AM to 6 PM
-        night_hours = list(range(0, 6)) + list(range(18, 24))
-        
-        day_activity = group[group['hour'].isin(day_hours)]['activity_status'].value_counts(normalize=True).get('active', 0) * 100
-        night_activity = group[group['hour'].isin(night_hours)]['activity_status'].value_counts(normalize=True).get('active', 0) * 100
-        
-        # Active vs. resting overall
-        active_percentage = (group['activity_status'] == 'active').mean() * 100
-        
-        stats = {
-            'activity_by_hour': activity_by_hour.to_dict('records'),
-            'day_activity_percentage': day_activity,
-            'night_activity_percentage': night_activity,
-            'active_percentage': active_percentage,
-            'resting_percentage': 100 - active_percentage
-        }
-        
-        summary_stats[individual if individual else 'all'] = stats
+    # Summarize activity by time of day (day is 6 AM to 6 PM)
+    summary_stats = {
+        (individual if individual else 'all'): stats
+        for individual, stats in activity_summary(counts, individuals).items()
+    }
     
     return df, summary_stats
 
@@ -528,80 +494,45 @@ def calculate_fix_success(df, expected_frequency=None):
     Args:
         df: DataFrame containing GPS points with timestamps
         expected_frequency: Expected frequency of fixes in minutes
+            (the duty-cycle schedule of every individual is inferred if not provided)
         
     Returns:
-        Dictionary with fix success metrics and data gaps
+        Dictionary with fix success metrics and data gaps per individual; gaps
+        are columnar (start_time, end_time and duration_hours arrays)
     """
     if df.empty:
         return {}
     
-    results = {}
+    try:
+        steps = build_step_table(df)
+    except ValueError as e:
+        print(f"Error calculating fix success: {e}")
+        return {}
     
-    # Process each individual separately if individual ID column exists
-    groups = df.groupby('individual-local-identifier') if 'individual-local-identifier' in df.columns else [(None, df)]
+    report = quality_report(steps, expected_frequency)
+    individuals = report['individuals']
+    gaps = report['gaps']
     
-    for individual, group in groups:
-        # Sort by timestamp
-        group = group.sort_values('timestamp')
-        
-        if len(group) < 2:
-            continue
-        
-        # Calculate time differences between consecutive points
-        group['timestamp'] = pd.to_datetime(group['timestamp'])
-        group['time_diff_minutes'] = group['timestamp'].diff().dt.total_seconds() / 60
-        
-        # Remove first row with NaN time_diff
-        group = group.dropna(subset=['time_diff_minutes'])
-        
-        if group.empty:
-            continue
-        
-        # Determine expected frequency if not provided
-        if expected_frequency is None:
-            # Try to infer from most common time difference
-            time_diffs = group['time_diff_minutes'].value_counts()
-            if not time_diffs.empty:
-                expected_frequency = time_diffs.idxmax()
-                
-                # If most common difference is very large, it might be unreliable
-                if expected_frequency > 1440:  # More than 1 day
-                    expected_frequency = 60  # Default to hourly
-            else:
-                expected_frequency = 60  # Default to hourly
-        
-        # Calculate expected total number of fixes
-        start_time = group['timestamp'].min()
-        end_time = group['timestamp'].max()
-        total_minutes = (end_time - start_time).total_seconds() / 60
-        expected_fixes = total_minutes / expected_frequency
-        
-        # Calculate fix success rate
-        actual_fixes = len(group)
-        fix_success_rate = min(actual_fixes / expected_fixes * 100, 100) if expected_fixes > 0 else 0
-        
-        # Identify significant gaps (more than 3x expected frequency)
-        gap_threshold_minutes = expected_frequency * 3
-        gaps = group[group['time_diff_minutes'] > gap_threshold_minutes].copy()
-        gaps['gap_duration_hours'] = gaps['time_diff_minutes'] / 60
-        
-        # Summarize gaps
-        gap_summary = []
-        for _, row in gaps.iterrows():
-            gap_summary.append({
-                'start_time': row['timestamp'] - pd.Timedelta(minutes=row['time_diff_minutes']),
-                'end_time': row['timestamp'],
-                'duration_hours': row['gap_duration_hours']
-            })
-        
-        # Prepare results
-        results[individual if individual else 'all'] = {
-            'fix_success_rate': fix_success_rate,
-            'expected_fixes': expected_fixes,
-            'actual_fixes': actual_fixes,
-            'missing_fixes': expected_fixes - actual_fixes if expected_fixes > actual_fixes else 0,
-            'gaps': gap_summary,
-            'total_gap_hours': sum(gap['duration_hours'] for gap in gap_summary)
+    # Individuals with a single fix have no intervals to assess
+    individuals = individuals[individuals['actual_fixes'] >= 2]
+    gap_rows = gaps.groupby('individual_id').indices
+    
+    results = {}
+    for row in individuals.itertuples(index=False):
+        rows = gap_rows.get(row.individual_id, np.array([], dtype=np.int64))
+        results[row.individual_id] = {
+            'fix_success_rate': row.fix_success_rate,
+            'expected_frequency': row.expected_interval_min,
+            'schedule': row.schedule,
+            'expected_fixes': row.expected_fixes,
+            'actual_fixes': row.actual_fixes,
+            'missing_fixes': row.missing_fixes,
+            'gaps': {
+                'start_time': gaps['start_time'].to_numpy()[rows],
+                'end_time': gaps['end_time'].to_numpy()[rows],
+                'duration_hours': gaps['duration_min'].to_numpy()[rows] / 60
+            },
+            'total_gap_hours': row.total_gap_hours
         }
     
     return results
@@ -622,21 +553,23 @@ def calculate_core_peripheral_zones(df, core_threshold=50, peripheral_threshold=
     if df.empty:
         return {}
     
+    from shapely.geometry import Point
+    
     results = {}
     
     # Process each individual separately if individual ID column exists
-    groups = df.groupby('individual-local-identifier') if 'individual-local-identifier' in df.columns else [(None, df)]
+    groups = df.groupby(INDIVIDUAL) if INDIVIDUAL in df.columns else [(None, df)]
     
     for individual, group in groups:
         if len(group) < 10:  # Need sufficient points for KDE
             continue
         
         # Calculate core zone (e.g., 50% KDE)
-        core_range = calculate_home_range_kde(group[['location-lat', 'location-long']], 
+        core_range = calculate_home_range_kde(group[[LAT, LON]], 
                                             percentage=core_threshold)
         
         # Calculate peripheral zone (e.g., 95% KDE)
-        peripheral_range = calculate_home_range_kde(group[['location-lat', 'location-long']], 
+        peripheral_range = calculate_home_range_kde(group[[LAT, LON]], 
                                                  percentage=peripheral_threshold)
         
         # Get areas
@@ -650,7 +583,7 @@ def calculate_core_peripheral_zones(df, core_threshold=50, peripheral_threshold=
                                   if p.get('individual') == individual), None)
         
         # Calculate time spent in each zone
-        points = [Point(lon, lat) for lon, lat in zip(group['location-long'], group['location-lat'])]
+        points = [Point(lon, lat) for lon, lat in zip(group[LON], group[LAT])]
         
         # Initialize count for core, peripheral, and outside
         count_core = 0
@@ -705,22 +638,22 @@ def calculate_movement_map_data(df):
     map_data = {}
     
     # Process each individual separately if individual ID column exists
-    groups = df.groupby('individual-local-identifier') if 'individual-local-identifier' in df.columns else [(None, df)]
+    groups = df.groupby(INDIVIDUAL) if INDIVIDUAL in df.columns else [(None, df)]
     
     for individual, group in groups:
         # Sort by timestamp
-        group = group.sort_values('timestamp')
+        group = group.sort_values(TIMESTAMP)
         
-        # Extract coordinates and timestamps
-        coords = []
-        times = []
-        for _, row in group.iterrows():
-            coords.append([row['location-long'], row['location-lat']])
-            times.append(row['timestamp'])
-        
-        if not coords:
+        if group.empty:
             continue
         
+        # Extract coordinates and timestamps as arrays
+        lons = group[LON].to_numpy(dtype=float)
+        lats = group[LAT].to_numpy(dtype=float)
+        coords = np.column_stack((lons, lats)).tolist()
+        times = pd.to_datetime(group[TIMESTAMP]).dt.strftime('%Y-%m-%dT%H:%M:%S').tolist()
+        individual_label = individual if individual else 'unknown'
+        
         # Create LineString for track
         track = {
             'type': 'LineString',
@@ -728,25 +661,17 @@ def calculate_movement_map_data(df):
         }
         
         # Create GeoJSON for points
-        points = []
-        for i, (coord, time) in enumerate(zip(coords, times)):
-            points.append({
+        points = [
+            {
                 'type': 'Feature',
-                'geometry': {
-                    'type': 'Point',
-                    'coordinates': coord
-                },
-                'properties': {
-                    'index': i,
-                    'timestamp': time.isoformat() if isinstance(time, pd.Timestamp) else str(time),
-                    'individual': individual if individual else 'unknown'
-                }
-            })
+                'geometry': {'type': 'Point', 'coordinates': coord},
+                'properties': {'index': i, 'timestamp': time, 'individual': individual_label}
+            }
+            for i, (coord, time) in enumerate(zip(coords, times))
+        ]
         
         # Calculate bounding box
-        lon_coords = [c[0] for c in coords]
-        lat_coords = [c[1] for c in coords]
-        bounds = [min(lon_coords), min(lat_coords), max(lon_coords), max(lat_coords)]
+        bounds = [float(lons.min()), float(lats.min()), float(lons.max()), float(lats.max())]
         
         # Add data to results
         map_data[individual if individual else 'all'] = {
@@ -0,0 +1,587 @@
+"""
+Append Component
+Incremental, append-only ingest for live collar feeds: new fixes are merged into a
+registered dataset's step table by individual and time, step metrics and outlier
+flags are recomputed only around the seams, and the daily distance, activity and
+quality rollups are updated from the rows that changed
+
+Merging writes every step table column once (the cost of a copy, with no sort
+and no metric recomputation). Everything computed per fix only touches the new
+fixes and a few neighbours on each side, so the analysis cost of an append is
+O(new fixes) however large the study is; the rollups are kept as dense
+(individual x day) grids that are updated in place.
+"""
+
+import hashlib
+import io
+import threading
+
+import numpy as np
+import pandas as pd
+
+from components.data_store import get_dataset, get_result, list_results, register_dataset, store_result
+from components.outliers import DEFAULT_MEDIAN_WINDOW, detect_outliers
+from components.quality import completeness_from_rollup, fix_success_table, rollup_frame
+from components.schema import HDOP, INDIVIDUAL, LAT, LON, REQUIRED_COLUMNS, SATELLITES, TIMESTAMP, to_canonical
+from components.steps import build_step_table, step_metrics
+
+NS_PER_SECOND = 1_000_000_000
+SECONDS_PER_DAY = 86400
+
+# Step table columns carried into merged tables, in order; columns other engines
+# add to a cached table are dropped as they would be stale
+STEP_TABLE_COLUMNS = ('individual_id', 'ind_code', 'timestamp', 'location_lat', 'location_long', 'hour',
+                      'step_m', 'dt_s', 'speed_mps', 'speed_kmh', 'heading', 'turn_angle',
+                      HDOP, SATELLITES, 'outlier_flags', 'is_outlier')
+
+# Step metrics recomputed next to every new fix
+STEP_METRICS = ('step_m', 'dt_s', 'speed_mps', 'heading', 'turn_angle')
+
+# Classification of the cached activity tensor (the `activity_tensor` defaults)
+ACTIVITY_THRESHOLD_M = 50
+ACTIVITY_WINDOW_MIN = 60
+
+# Days added at once when the day grids have to grow
+GROW_DAYS = 64
+
+# Day grids kept for every individual
+DAY_MEASURES = ('fixes', 'distance', 'outliers', 'duplicates', 'hdop_fixes', 'hdop_sum', 'hdop_max')
+
+_append_lock = threading.Lock()
+
+
+def _around(rows, before, after, n):
+    """Sorted unique rows within a margin of the given rows, clipped to the table."""
+    near = (np.asarray(rows)[:, None] + np.arange(-before, after + 1)[None, :]).ravel()
+    return np.unique(near[(near >= 0) & (near < n)])
+
+
+def _runs(rows, codes):
+    """Codes that split gathered rows into runs of consecutive rows of one individual."""
+    breaks = np.ones(len(rows), dtype=bool)
+    breaks[1:] = (np.diff(rows) != 1) | (codes[rows[1:]] != codes[rows[:-1]])
+    return np.cumsum(breaks) - 1
+
+
+def _reach(settings):
+    """Rows on each side of a new fix whose outlier flags can change."""
+    return max(int(settings.get('median_window') or DEFAULT_MEDIAN_WINDOW) // 2, 1) + 2
+
+
+def _days(steps, rows):
+    return steps['timestamp'].to_numpy()[rows].astype('datetime64[D]').astype(np.int64)
+
+
+def merge_steps(steps, fixes, outlier_settings=None):
+    """
+    Merge new fixes into a step table by individual and time.
+
+    New fixes are inserted after the existing fixes of their individual at the
+    same or earlier times (so the result equals a rebuild from all fixes). Step
+    metrics are recomputed for the steps leading into and out of every new fix,
+    and outlier flags within the outlier filter's reach of them.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table` (not modified)
+        fixes: DataFrame of new fixes with the canonical track columns
+        outlier_settings: Keyword arguments of `detect_outliers` used for the table
+
+    Returns:
+        Tuple (merged step table, merged rows of the new fixes, merged code of
+        every individual of the old table)
+    """
+    settings = outlier_settings or {}
+    new = build_step_table(fixes)
+    old_individuals = pd.Index(steps.attrs['individuals'])
+    individuals = old_individuals.union(pd.Index(new.attrs['individuals']))
+    old_map = individuals.get_indexer(old_individuals)
+    new_map = individuals.get_indexer(new.attrs['individuals'])
+
+    old_offsets = steps.attrs['offsets']
+    new_offsets = new.attrs['offsets']
+    old_time = steps['timestamp'].to_numpy().view(np.int64)
+    new_time = new['timestamp'].to_numpy().view(np.int64)
+
+    # Insertion point of every new fix in the old table; old individuals keep
+    # their order, so the individuals before a code tell where its slice starts
+    preceding = np.searchsorted(old_map, np.arange(len(individuals)))
+    positions = np.empty(len(new), dtype=np.int64)
+    for j, code in enumerate(new_map):
+        rows = slice(new_offsets[j], new_offsets[j + 1])
+        i = preceding[code]
+        start = old_offsets[i]
+        if i < len(old_map) and old_map[i] == code:
+            positions[rows] = start + np.searchsorted(old_time[start:old_offsets[i + 1]], new_time[rows], side='right')
+        else:
+            positions[rows] = start
+
+    n_new = len(new)
+    new_values = {
+        'individual_id': new['individual_id'].to_numpy(dtype=object),
+        'ind_code': new_map[new['ind_code'].to_numpy()].astype(np.int32),
+        'outlier_flags': np.zeros(n_new, dtype=np.uint8),
+        'is_outlier': np.zeros(n_new, dtype=bool),
+    }
+    old_values = {'ind_code': old_map[steps['ind_code'].to_numpy()].astype(np.int32)}
+
+    columns = {}
+    for name in STEP_TABLE_COLUMNS:
+        if name not in steps.columns and name not in new.columns:
+            continue
+        if name in steps.columns:
+            old = old_values.get(name, steps[name].to_numpy())
+        else:
+            old = np.full(len(steps), np.nan)
+        if name in new_values:
+            values = new_values[name]
+        elif name in new.columns and name not in STEP_METRICS + ('speed_kmh',):
+            values = new[name].to_numpy()
+        else:
+            values = np.full(n_new, np.nan)
+        columns[name] = np.insert(old, positions, values)
+
+    inserted = positions + np.arange(n_new)
+    codes = columns['ind_code']
+    n = len(codes)
+
+    # Steps into and out of the new fixes, and the turns at both ends of them
+    changed = _around(inserted, 1, 1, n)
+    gathered = _around(changed, 1, 1, n)
+    metrics = step_metrics(_runs(gathered, codes), columns['timestamp'].view(np.int64)[gathered],
+                           columns['location_lat'][gathered], columns['location_long'][gathered])
+    at = np.searchsorted(gathered, changed)
+    for name in STEP_METRICS:
+        columns[name][changed] = metrics[name][at]
+    columns['speed_kmh'][changed] = columns['speed_mps'][changed] * 3.6
+
+    # Outlier rules look at the neighbouring steps and the rolling median window
+    if 'outlier_flags' in columns:
+        reach = _reach(settings)
+        flagged = _around(inserted, reach, reach, n)
+        window = _around(flagged, reach, reach, n)
+        local = pd.DataFrame({'ind_code': _runs(window, codes)})
+        for name in ('location_lat', 'location_long', 'step_m', 'speed_kmh', 'turn_angle', HDOP, SATELLITES):
+            if name in columns:
+                local[name] = columns[name][window]
+        flags = detect_outliers(local, **settings)[np.searchsorted(window, flagged)]
+        columns['outlier_flags'][flagged] = flags
+        columns['is_outlier'][flagged] = flags > 0
+
+    merged = pd.DataFrame(columns, copy=False)
+    counts = np.zeros(len(individuals), dtype=np.int64)
+    counts[old_map] = np.diff(old_offsets)
+    counts[new_map] += np.diff(new_offsets)
+    merged.attrs['individuals'] = list(individuals)
+    merged.attrs['offsets'] = np.concatenate([[0], np.cumsum(counts)])
+    return merged, inserted, old_map
+
+
+class Rollups:
+    """
+    Derived per-individual tables of a dataset as accumulators that appends update in place.
+
+    Every measure is a sum of per-row contributions, so an append subtracts the
+    contributions of the rows around the seams before the merge and adds them
+    back after it.
+
+    Attributes:
+        individuals: Individual labels, in code order
+        first_day: First day of the day grids (days since the epoch)
+        days: Dictionary of (n_individuals, n_days) grids of DAY_MEASURES
+        activity: (n_individuals, 24, 2) resting and active step counts
+        speed_sum: (n_individuals, 24) summed step speeds (km/h)
+        quality: Dictionary keyed by quality report kind with the schedule,
+            gap_factor, 'days' grids (expected_fixes, gap_count, gap_hours)
+            and the gaps table of every cached report
+    """
+
+    def __init__(self, individuals, first_day):
+        self.individuals = list(individuals)
+        self.first_day = int(first_day)
+        n_individuals = len(self.individuals)
+        self.days = {name: np.zeros((n_individuals, 0)) for name in DAY_MEASURES}
+        self.activity = np.zeros((n_individuals, 24, 2))
+        self.speed_sum = np.zeros((n_individuals, 24))
+        self.quality = {}
+
+    @classmethod
+    def from_steps(cls, steps):
+        """
+        Build the rollups of a step table (one pass over all its rows).
+
+        Args:
+            steps: Step table with the outlier columns
+
+        Returns:
+            Rollups
+        """
+        rollups = cls(steps.attrs['individuals'], _days(steps, [0])[0] if len(steps) else 0)
+        rollups.add_rows(steps, np.arange(len(steps)))
+        return rollups
+
+    def _grids(self):
+        yield from self.days.values()
+        for report in self.quality.values():
+            yield from report['days'].values()
+
+    def _cover(self, days):
+        """Grow the day grids to cover the given days."""
+        if len(days) == 0:
+            return
+        n_days = self.days['fixes'].shape[1]
+        before = max(self.first_day - int(days.min()), 0)
+        after = max(int(days.max()) - (self.first_day + n_days - 1), 0)
+        if not before and not after:
+            return
+        before = before and before + GROW_DAYS
+        after = after and after + GROW_DAYS
+        self.first_day -= before
+        self.days = {name: self._pad(grid, name, before, after) for name, grid in self.days.items()}
+        for report in self.quality.values():
+            report['days'] = {name: self._pad(grid, name, before, after) for name, grid in report['days'].items()}
+
+    @staticmethod
+    def _pad(grid, name, before, after):
+        fill = np.nan if name == 'hdop_max' else 0
+        return np.pad(grid, ((0, 0), (before, after)), constant_values=fill)
+
+    def _cells(self, codes, days):
+        return codes, days - self.first_day
+
+    def add_individuals(self, individuals, old_map):
+        """
+        Insert grid rows for new individuals; quality rollups are dropped as
+        their schedules do not cover the new individuals.
+
+        Args:
+            individuals: All individual labels, in code order
+            old_map: New code of every current individual
+        """
+        def expand(grid, fill=0):
+            expanded = np.full((len(individuals),) + grid.shape[1:], fill, dtype=grid.dtype)
+            expanded[old_map] = grid
+            return expanded
+
+        self.individuals = list(individuals)
+        self.days = {name: expand(grid, np.nan if name == 'hdop_max' else 0) for name, grid in self.days.items()}
+        self.activity = expand(self.activity)
+        self.speed_sum = expand(self.speed_sum)
+        self.quality = {}
+
+    def add_report(self, kind, report, steps):
+        """
+        Track a cached quality report (its gaps and expected fixes) from now on.
+
+        Args:
+            kind: Result name of the report
+            report: Report from `components.quality.quality_report` of the steps
+            steps: Step table the report was built from
+        """
+        schedule = report['schedule']
+        slot_codes, slot_start, expected = schedule.expected_slots(steps)
+        gaps = report['gaps']
+        self._cover(slot_start // SECONDS_PER_DAY)
+        shape = self.days['fixes'].shape
+        days = {name: np.zeros(shape) for name in ('expected_fixes', 'gap_count', 'gap_hours')}
+        np.add.at(days['expected_fixes'], self._cells(slot_codes, slot_start // SECONDS_PER_DAY), expected)
+        gap_cells = self._cells(gaps['ind_code'].to_numpy(),
+                                gaps['start_time'].to_numpy(dtype='datetime64[D]').astype(np.int64))
+        np.add.at(days['gap_count'], gap_cells, 1)
+        np.add.at(days['gap_hours'], gap_cells, gaps['duration_min'].to_numpy() / 60)
+        self.quality[kind] = {'schedule': schedule, 'gap_factor': report['gap_factor'], 'days': days, 'gaps': gaps}
+
+    def add_rows(self, steps, rows, sign=1, code_map=None):
+        """
+        Add (or with sign -1 remove) the contributions of step table rows.
+
+        A row contributes its fix to the day grids, the step leading away from
+        it to the activity tensor and, by the day of the step's end, to the
+        daily distance, and the interval leading away from it to the gaps.
+
+        Args:
+            steps: Step table with the outlier columns
+            rows: Sorted rows of the table
+            sign: 1 to add, -1 to remove
+            code_map: Code in these rollups of every individual code of the table
+        """
+        n = len(steps)
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        codes = steps['ind_code'].to_numpy()[rows].astype(np.int64)
+        if code_map is not None:
+            codes = code_map[codes]
+        day = _days(steps, rows)
+        following = np.minimum(rows + 1, n - 1)
+
+        step_m = steps['step_m'].to_numpy()[rows]
+        dt_s = steps['dt_s'].to_numpy()[rows]
+        outlier = steps['is_outlier'].to_numpy() if 'is_outlier' in steps.columns else np.zeros(n, dtype=bool)
+        has_step = ~np.isnan(step_m)
+        arrival_day = _days(steps, following[has_step])
+        self._cover(np.r_[day, arrival_day])
+
+        cells = self._cells(codes, day)
+        np.add.at(self.days['fixes'], cells, sign)
+        np.add.at(self.days['outliers'], cells, sign * outlier[rows])
+        previous_dt = np.where(rows > 0, steps['dt_s'].to_numpy()[np.maximum(rows - 1, 0)], np.nan)
+        np.add.at(self.days['duplicates'], cells, sign * (previous_dt == 0))
+        if HDOP in steps.columns:
+            hdop = steps[HDOP].to_numpy()[rows]
+            measured = ~np.isnan(hdop)
+            np.add.at(self.days['hdop_fixes'], cells, sign * measured)
+            np.add.at(self.days['hdop_sum'], cells, sign * np.where(measured, hdop, 0))
+            if sign > 0:
+                np.fmax.at(self.days['hdop_max'], (codes[measured], cells[1][measured]), hdop[measured])
+
+        # Distance of usable steps counts towards the day the step arrives
+        usable = has_step & ~outlier[rows] & ~(outlier[following] & (rows + 1 < n))
+        np.add.at(self.days['distance'], self._cells(codes[usable], arrival_day[usable[has_step]]),
+                  sign * step_m[usable])
+
+        active = (step_m > ACTIVITY_THRESHOLD_M) & (dt_s <= ACTIVITY_WINDOW_MIN * 60)
+        hour = steps['hour'].to_numpy()[rows]
+        speed = np.nan_to_num(steps['speed_kmh'].to_numpy()[rows], nan=0.0, posinf=0.0)
+        np.add.at(self.activity, (codes[usable], hour[usable], active[usable].astype(np.int64)), sign)
+        np.add.at(self.speed_sum, (codes[usable], hour[usable]), sign * speed[usable])
+
+        time_s = steps['timestamp'].to_numpy()[rows].view(np.int64) // NS_PER_SECOND
+        for report in self.quality.values():
+            threshold_s = report['schedule'].lookup(codes, time_s) * 60 * report['gap_factor']
+            gap = dt_s > threshold_s
+            gap_cells = (codes[gap], cells[1][gap])
+            np.add.at(report['days']['gap_count'], gap_cells, sign)
+            np.add.at(report['days']['gap_hours'], gap_cells, sign * dt_s[gap] / 3600)
+            report['gaps'] = self._update_gaps(report['gaps'], steps, rows[gap], codes[gap], sign)
+
+    def _update_gaps(self, gaps, steps, rows, codes, sign):
+        if len(rows) == 0:
+            return gaps
+        start = steps['timestamp'].to_numpy()[rows]
+        if sign < 0:
+            drop = pd.MultiIndex.from_arrays([codes, start])
+            keep = ~pd.MultiIndex.from_arrays([gaps['ind_code'].to_numpy(), gaps['start_time'].to_numpy()]).isin(drop)
+            return gaps[keep].reset_index(drop=True)
+
+        duration_s = steps['dt_s'].to_numpy()[rows]
+        added = pd.DataFrame({
+            'individual_id': np.asarray(self.individuals, dtype=object)[codes],
+            'ind_code': codes.astype(gaps['ind_code'].dtype),
+            'start_time': start,
+            'end_time': start + (duration_s * NS_PER_SECOND).astype('timedelta64[ns]'),
+            'duration_min': duration_s / 60
+        })
+        return pd.concat([gaps, added], ignore_index=True).sort_values(
+            ['ind_code', 'start_time'], kind='stable', ignore_index=True)
+
+    def extend_schedules(self, old_steps, steps, codes, code_map):
+        """
+        Add the expected fixes of the hours by which individuals' tracking periods grew.
+
+        Args:
+            old_steps: Step table before the append
+            steps: Step table after the append
+            codes: Codes (in these rollups) of the individuals that got new fixes
+            code_map: Code in these rollups of every individual code of old_steps
+        """
+        if not self.quality or len(codes) == 0:
+            return
+        old_codes = np.searchsorted(code_map, codes)
+        old_offsets = old_steps.attrs['offsets']
+        offsets = steps.attrs['offsets']
+        old_time = old_steps['timestamp'].to_numpy().view(np.int64)
+        time_ns = steps['timestamp'].to_numpy().view(np.int64)
+        old_first = old_time[old_offsets[old_codes]] // NS_PER_SECOND
+        old_last = old_time[old_offsets[old_codes + 1] - 1] // NS_PER_SECOND
+        first = time_ns[offsets[codes]] // NS_PER_SECOND
+        last = time_ns[offsets[codes + 1] - 1] // NS_PER_SECOND
+
+        earlier = first < old_first
+        later = last > old_last
+        self._cover(np.r_[first, last] // SECONDS_PER_DAY)
+        for report in self.quality.values():
+            expected = report['days']['expected_fixes']
+            schedule = report['schedule']
+            for grow, start, end in ((earlier, first, old_first), (later, old_last, last)):
+                if grow.any():
+                    slot_codes, slot_start, slots = schedule.slots_between(codes[grow], start[grow], end[grow])
+                    np.add.at(expected, self._cells(slot_codes, slot_start // SECONDS_PER_DAY), slots)
+            # The fix at the start of the tracking period moved
+            np.add.at(expected, self._cells(codes[earlier], old_first[earlier] // SECONDS_PER_DAY), -1)
+            np.add.at(expected, self._cells(codes[earlier], first[earlier] // SECONDS_PER_DAY), 1)
+
+    def update(self, old_steps, steps, inserted, old_map, reach):
+        """
+        Update the rollups for new fixes merged by `merge_steps`.
+
+        Args:
+            old_steps: Step table before the append
+            steps: Merged step table
+            inserted: Merged rows of the new fixes
+            old_map: Merged code of every individual of old_steps
+            reach: Rows on each side of a new fix whose derived values may have changed
+        """
+        if len(steps.attrs['individuals']) != len(self.individuals):
+            self.add_individuals(steps.attrs['individuals'], old_map)
+
+        rows = _around(inserted, reach + 1, reach + 1, len(steps))
+        kept = rows[~np.isin(rows, inserted, assume_unique=True)]
+        self.add_rows(old_steps, kept - np.searchsorted(inserted, kept), -1, old_map)
+        self.add_rows(steps, rows)
+
+        touched = np.unique(steps['ind_code'].to_numpy()[inserted])
+        self.extend_schedules(old_steps, steps, touched[np.isin(touched, old_map)], old_map)
+
+    def daily_distance(self):
+        """
+        Daily distance table (see `components.analysis.calculate_daily_distance`).
+
+        Returns:
+            DataFrame with individual_id, date and daily_distance (meters) columns
+        """
+        fixes = self.days['fixes']
+        cells = np.flatnonzero(fixes.ravel() > 0)
+        ind, day = np.divmod(cells, fixes.shape[1])
+        return pd.DataFrame({
+            'individual_id': np.asarray(self.individuals, dtype=object)[ind],
+            'date': (self.first_day + day).astype('datetime64[D]').astype(object),
+            'daily_distance': self.days['distance'].ravel()[cells]
+        })
+
+    def activity_tensor(self):
+        """Activity tensor with the default classification (see `components.activity.activity_tensor`)."""
+        return np.rint(self.activity).astype(np.int64), self.speed_sum.copy()
+
+    def quality_report(self, kind, steps):
+        """
+        Quality report of a tracked kind (see `components.quality.quality_report`).
+
+        Args:
+            kind: Result name of the report
+            steps: Current step table
+
+        Returns:
+            Report dictionary
+        """
+        report = self.quality[kind]
+        schedule = report['schedule']
+        n_days = self.days['fixes'].shape[1]
+        measures = {name: np.rint(self.days[name]).ravel() for name in ('fixes', 'outliers', 'duplicates', 'hdop_fixes')}
+        measures.update({name: grid.ravel() for name, grid in report['days'].items()})
+        measures['gap_count'] = np.rint(measures['gap_count'])
+        measures['hdop_sum'] = self.days['hdop_sum'].ravel()
+        measures['hdop_max'] = self.days['hdop_max'].ravel()
+        rollup = rollup_frame(self.individuals, self.first_day, n_days, measures)
+        expected = report['days']['expected_fixes'].sum(axis=1)
+        return {
+            'schedule': schedule,
+            'gap_factor': report['gap_factor'],
+            'epochs': schedule.epochs(),
+            'individuals': fix_success_table(steps, schedule, report['gap_factor'], report['gaps'], expected),
+            'gaps': report['gaps'],
+            'rollup': rollup,
+            'daily': completeness_from_rollup(rollup)
+        }
+
+
+def _fixes_digest(fixes):
+    return hashlib.md5(pd.util.hash_pandas_object(fixes[list(REQUIRED_COLUMNS)], index=False).to_numpy()).hexdigest()
+
+
+def append_fixes(version, fixes, new_version=None):
+    """
+    Append new fixes to a registered dataset and register the merged dataset.
+
+    The merged dataset gets its own version with the merged step table, the
+    updated rollups and the daily distance, activity and quality results
+    derived from them, so nothing is recomputed from all fixes.
+
+    Args:
+        version: Version key of a registered dataset
+        fixes: DataFrame of new fixes (canonical or alias column names; modified
+            in place when columns are renamed)
+        new_version: Version key of the merged dataset (derived from the version
+            and the new fixes if None)
+
+    Returns:
+        Dictionary with the new version, the number of appended fixes, the new
+        individuals and the total number of fixes
+    """
+    missing = to_canonical(fixes)
+    if missing:
+        raise ValueError(f"New fixes are missing columns: {', '.join(missing)}")
+    fixes[TIMESTAMP] = pd.to_datetime(fixes[TIMESTAMP])
+    fixes = fixes.dropna(subset=[INDIVIDUAL, TIMESTAMP, LAT, LON])
+
+    with _append_lock:
+        steps = get_result(version, 'steps')
+        settings = get_result(version, 'outlier_settings') or {}
+        if steps is None:
+            df = get_dataset(version)
+            if df is None:
+                raise KeyError(f"Unknown dataset version: {version}")
+            steps = build_step_table(df)
+            detect_outliers(steps)
+            settings = {}
+        if fixes.empty:
+            return {'version': version, 'appended': 0, 'new_individuals': [], 'fixes': int(len(steps))}
+
+        reports = {kind: get_result(version, kind) for kind in list_results(version) if kind.startswith('quality_')}
+        rollups = get_result(version, 'rollups')
+        if rollups is None:
+            rollups = Rollups.from_steps(steps)
+        for kind, report in reports.items():
+            if kind not in rollups.quality and report.get('schedule') is not None:
+                rollups.add_report(kind, report, steps)
+
+        merged, inserted, old_map = merge_steps(steps, fixes, settings)
+        rollups.update(steps, merged, inserted, old_map, _reach(settings))
+
+        # The rollups now describe the merged data only
+        store_result(version, 'rollups', None)
+
+        new_version = new_version or hashlib.md5(f"{version}:{_fixes_digest(fixes)}".encode()).hexdigest()
+        register_dataset(merged, version=new_version)
+        store_result(new_version, 'steps', merged)
+        store_result(new_version, 'outlier_settings', settings)
+        store_result(new_version, 'rollups', rollups)
+        store_result(new_version, 'daily_distance', rollups.daily_distance())
+        store_result(new_version, 'activity', rollups.activity_tensor())
+        for kind in rollups.quality:
+            store_result(new_version, kind, rollups.quality_report(kind, merged))
+
+    old_individuals = set(steps.attrs['individuals'])
+    return {
+        'version': new_version,
+        'appended': int(len(inserted)),
+        'new_individuals': [str(i) for i in merged.attrs['individuals'] if i not in old_individuals],
+        'fixes': int(len(merged))
+    }
+
+
+def register_append_routes(server):
+    """
+    Register the append endpoint on the Flask server.
+
+    Endpoints:
+        POST /datasets/<version>/append   Append fixes sent as CSV, or as JSON
+                                          records or columns; responds with the
+                                          merged dataset's version
+
+    Args:
+        server: Flask application
+    """
+    from flask import abort, jsonify, request
+
+    @server.route('/datasets/<version>/append', methods=['POST'])
+    def append_dataset(version):
+        try:
+            if request.is_json:
+                fixes = pd.DataFrame(request.get_json())
+            else:
+                fixes = pd.read_csv(io.BytesIO(request.get_data()))
+            return jsonify(append_fixes(version, fixes))
+        except KeyError:
+            abort(404)
+        except (ValueError, pd.errors.ParserError) as e:
+            return jsonify({'error': str(e)}), 400
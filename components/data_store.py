@@ -0,0 +1,175 @@
+"""
+Data Store Component
+Keeps server-side copies of uploaded tracking datasets and their derived results,
+keyed by a content-based dataset version, so Flask endpoints can reach them
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Maximum number of dataset versions kept in memory (least recently used are dropped)
+MAX_DATASETS = 8
+
+_lock = threading.RLock()
+_datasets = OrderedDict()
+_results = {}
+
+
+def dataset_version(movement_data_json):
+    """
+    Compute the version key of a serialized movement dataset.
+
+    Args:
+        movement_data_json (str): Movement data as stored in `store-movement-data`
+
+    Returns:
+        str: Hex digest identifying the dataset contents
+    """
+    if not movement_data_json:
+        return None
+    if isinstance(movement_data_json, str):
+        movement_data_json = movement_data_json.encode('utf-8')
+    return hashlib.md5(movement_data_json).hexdigest()
+
+
+def register_dataset(df, movement_data_json=None, version=None):
+    """
+    Register a movement DataFrame under its dataset version.
+
+    Args:
+        df (pandas.DataFrame): Movement data with individual_id, timestamp,
+            location_lat and location_long columns
+        movement_data_json (str, optional): Serialized form used to derive the version
+        version (str, optional): Explicit version key, overrides the derived one
+
+    Returns:
+        str: Dataset version key
+    """
+    if version is None:
+        if movement_data_json is None:
+            movement_data_json = df.to_json(date_format='iso', orient='split')
+        version = dataset_version(movement_data_json)
+
+    with _lock:
+        _datasets[version] = df
+        _datasets.move_to_end(version)
+        _results.setdefault(version, {})
+
+        # Evict least recently used datasets together with their results
+        while len(_datasets) > MAX_DATASETS:
+            old_version, _ = _datasets.popitem(last=False)
+            _results.pop(old_version, None)
+
+    return version
+
+
+def get_dataset(version):
+    """
+    Get a registered movement DataFrame.
+
+    Args:
+        version (str): Dataset version key
+
+    Returns:
+        pandas.DataFrame or None: The registered data, None if unknown
+    """
+    with _lock:
+        df = _datasets.get(version)
+        if df is not None:
+            _datasets.move_to_end(version)
+        return df
+
+
+def remove_dataset(version):
+    """
+    Drop a registered dataset and its derived results.
+
+    Args:
+        version (str): Dataset version key
+    """
+    with _lock:
+        _datasets.pop(version, None)
+        _results.pop(version, None)
+
+
+def list_datasets():
+    """
+    List registered dataset versions, most recently used last.
+
+    Returns:
+        list: Dictionaries with version, record and individual counts
+    """
+    with _lock:
+        items = list(_datasets.items())
+
+    datasets = []
+    for version, df in items:
+        datasets.append({
+            'version': version,
+            'records': int(len(df)),
+            'individuals': int(df['individual_id'].nunique()) if 'individual_id' in df.columns else 1
+        })
+    return datasets
+
+
+def store_result(version, kind, result):
+    """
+    Attach a derived result (home range, step table, ...) to a dataset version.
+
+    Results of versions that are not registered (e.g. of a background job that
+    finished after its dataset was evicted) are dropped, as nothing would free them.
+
+    Args:
+        version (str): Dataset version key
+        kind (str): Name of the derived result
+        result: Any Python object
+    """
+    with _lock:
+        if version in _datasets:
+            _results[version][kind] = result
+
+
+def get_result(version, kind, default=None):
+    """
+    Get a derived result attached to a dataset version.
+
+    Args:
+        version (str): Dataset version key
+        kind (str): Name of the derived result
+        default: Value returned when the result is missing
+
+    Returns:
+        The stored result or `default`
+    """
+    with _lock:
+        return _results.get(version, {}).get(kind, default)
+
+
+def list_results(version):
+    """
+    List the names of the derived results attached to a dataset version.
+
+    Args:
+        version (str): Dataset version key
+
+    Returns:
+        list: Result names
+    """
+    with _lock:
+        return list(_results.get(version, {}))
+
+
+def clear_results(version, keep=()):
+    """
+    Drop the derived results of a dataset version, e.g. after its data changed.
+
+    Args:
+        version (str): Dataset version key
+        keep (tuple): Names of results to keep
+    """
+    with _lock:
+        results = _results.get(version)
+        if results:
+            for kind in [kind for kind in results if kind not in keep]:
+                del results[kind]
@@ -0,0 +1,369 @@
+"""
+Elevation Component
+Terrain elevation at every fix from local DEM tiles (SRTM .hgt and GeoTIFF),
+with bilinear interpolation and cumulative ascent and descent along each track
+
+Fixes are grouped by the tile that contains them and every tile is sampled in
+one vectorized pass. Decoded tiles are kept in a bounded least-recently-used
+cache, so repeated profiles and neighboring datasets do not decode tiles again.
+Elevation samples are cached per dataset version and set of tiles.
+
+Tiles are read from DEM_DIR. SRTM tiles are named after their south-west corner
+(N09E021.hgt) and decoded directly; GeoTIFF tiles need the optional rasterio package.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from components.data_store import dataset_version, get_result, store_result
+from components.raster import LAYER_DIR
+from components.steps import get_step_table
+
+# Directory of the DEM tiles
+DEM_DIR = os.environ.get('DEM_DIR', os.path.join(LAYER_DIR, 'dem'))
+
+DEM_EXTENSIONS = ('.hgt', '.tif', '.tiff')
+
+# SRTM void value
+HGT_NODATA = -32768
+
+# Decoded tiles kept in memory (a 1 arc-second SRTM tile takes about 26 MB)
+MAX_TILES = 12
+
+# Points per individual and bucket pair kept in a displayed profile
+MAX_PROFILE_POINTS = 4000
+
+_HGT_NAME = re.compile(r'^([NS])(\d{1,2})([EW])(\d{1,3})$', re.IGNORECASE)
+
+_tiles = OrderedDict()
+_tile_lock = threading.RLock()
+
+
+class DemTile:
+    """
+    Decoded elevation grid of one tile.
+
+    Attributes:
+        data: 2D array of elevations (rows north to south)
+        x0, y0: Coordinates of the center of the first pixel
+        dx, dy: Pixel size (dy is negative for north-up grids)
+        nodata: Void value, or None
+        crs: Tile CRS, or None for geographic coordinates
+    """
+
+    def __init__(self, data, x0, y0, dx, dy, nodata=None, crs=None):
+        self.data = data
+        self.x0 = x0
+        self.y0 = y0
+        self.dx = dx
+        self.dy = dy
+        self.nodata = nodata
+        self.crs = crs
+
+    def sample(self, x, y):
+        """
+        Bilinear interpolation of the grid at points inside the tile.
+
+        Args:
+            x, y: Point coordinates in the tile CRS
+
+        Returns:
+            numpy array of elevations (NaN where a surrounding pixel is void)
+        """
+        height, width = self.data.shape
+        col = (np.asarray(x) - self.x0) / self.dx
+        row = (np.asarray(y) - self.y0) / self.dy
+
+        # Points in the half pixel along the edges use the edge pixels
+        col = np.clip(col, 0, width - 1)
+        row = np.clip(row, 0, height - 1)
+        c0 = np.minimum(col.astype(np.int64), max(width - 2, 0))
+        r0 = np.minimum(row.astype(np.int64), max(height - 2, 0))
+        c1 = np.minimum(c0 + 1, width - 1)
+        r1 = np.minimum(r0 + 1, height - 1)
+        fc = col - c0
+        fr = row - r0
+
+        corners = [self.data[r0, c0], self.data[r0, c1], self.data[r1, c0], self.data[r1, c1]]
+        corners = [corner.astype(np.float64) for corner in corners]
+        if self.nodata is not None:
+            for corner in corners:
+                corner[corner == self.nodata] = np.nan
+
+        top = corners[0] * (1 - fc) + corners[1] * fc
+        bottom = corners[2] * (1 - fc) + corners[3] * fc
+        return top * (1 - fr) + bottom * fr
+
+
+def hgt_bounds(path):
+    """
+    Bounds of an SRTM tile from its file name.
+
+    Args:
+        path: Path of a .hgt file (e.g. N09E021.hgt)
+
+    Returns:
+        Tuple (west, south, east, north), or None if the name is not an SRTM tile name
+    """
+    match = _HGT_NAME.match(os.path.splitext(os.path.basename(path))[0])
+    if not match:
+        return None
+    south = int(match.group(2)) * (1 if match.group(1).upper() == 'N' else -1)
+    west = int(match.group(4)) * (1 if match.group(3).upper() == 'E' else -1)
+    return west, south, west + 1, south + 1
+
+
+def read_tile(path):
+    """
+    Decode a DEM tile.
+
+    Args:
+        path: .hgt or GeoTIFF file
+
+    Returns:
+        DemTile
+    """
+    if path.lower().endswith('.hgt'):
+        west, south, east, north = hgt_bounds(path)
+        data = np.fromfile(path, dtype='>i2')
+        size = int(round(np.sqrt(len(data))))
+        if size * size != len(data):
+            raise ValueError(f"{path} is not a square SRTM tile")
+        # SRTM samples lie on the tile edges (pixel-is-point)
+        spacing = 1 / (size - 1)
+        return DemTile(data.reshape(size, size).astype(np.int16), west, north, spacing, -spacing, HGT_NODATA)
+
+    import rasterio
+
+    with rasterio.open(path) as dataset:
+        transform = dataset.transform
+        crs = None
+        if dataset.crs is not None and not dataset.crs.is_geographic:
+            crs = dataset.crs.to_string()
+        return DemTile(
+            dataset.read(1),
+            transform.c + transform.a / 2,
+            transform.f + transform.e / 2,
+            transform.a,
+            transform.e,
+            dataset.nodata,
+            crs
+        )
+
+
+def get_tile(path):
+    """
+    Get a decoded tile from the least-recently-used tile cache.
+
+    Args:
+        path: Tile file
+
+    Returns:
+        DemTile
+    """
+    key = (path, os.path.getmtime(path))
+    with _tile_lock:
+        tile = _tiles.get(key)
+        if tile is not None:
+            _tiles.move_to_end(key)
+            return tile
+
+    tile = read_tile(path)
+    with _tile_lock:
+        _tiles[key] = tile
+        _tiles.move_to_end(key)
+        while len(_tiles) > MAX_TILES:
+            _tiles.popitem(last=False)
+    return tile
+
+
+def tile_index(dem_dir=None):
+    """
+    List the DEM tiles of a directory with their geographic bounds.
+
+    Args:
+        dem_dir: Directory of the tiles (DEM_DIR if None)
+
+    Returns:
+        List of (path, (west, south, east, north)) tuples
+    """
+    dem_dir = dem_dir or DEM_DIR
+    if not os.path.isdir(dem_dir):
+        return []
+
+    index = []
+    for name in sorted(os.listdir(dem_dir)):
+        path = os.path.join(dem_dir, name)
+        extension = os.path.splitext(name)[1].lower()
+        if extension not in DEM_EXTENSIONS:
+            continue
+        if extension == '.hgt':
+            bounds = hgt_bounds(path)
+        else:
+            try:
+                import rasterio
+                from rasterio.warp import transform_bounds
+
+                with rasterio.open(path) as dataset:
+                    bounds = tuple(dataset.bounds)
+                    if dataset.crs is not None and not dataset.crs.is_geographic:
+                        bounds = transform_bounds(dataset.crs, 'EPSG:4326', *bounds)
+            except Exception as e:
+                print(f"Error reading DEM tile {path}: {e}")
+                bounds = None
+        if bounds is not None:
+            index.append((path, bounds))
+    return index
+
+
+def sample_elevation(lon, lat, index=None):
+    """
+    Elevation at many points from the tiles that contain them.
+
+    Args:
+        lon, lat: Arrays of point coordinates (WGS84 degrees)
+        index: Tile list from `tile_index` (DEM_DIR tiles if None)
+
+    Returns:
+        numpy float array of elevations in meters (NaN outside the tiles or at voids)
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    index = tile_index() if index is None else index
+    elevation = np.full(len(lon), np.nan)
+    pending = np.isfinite(lon) & np.isfinite(lat)
+
+    for path, (west, south, east, north) in index:
+        if not pending.any():
+            break
+        points = np.flatnonzero(pending & (lon >= west) & (lon <= east) & (lat >= south) & (lat <= north))
+        if len(points) == 0:
+            continue
+
+        tile = get_tile(path)
+        x, y = lon[points], lat[points]
+        if tile.crs is not None:
+            from rasterio.warp import transform as warp_transform
+            x, y = (np.asarray(v) for v in warp_transform('EPSG:4326', tile.crs, x, y))
+        elevation[points] = tile.sample(x, y)
+        # Points at tile edges and over voids can still be filled by a neighboring tile
+        pending[points[~np.isnan(elevation[points])]] = False
+
+    return elevation
+
+
+def get_elevation(movement_data_json):
+    """
+    Get the elevation at every fix of a serialized dataset, cached per set of tiles.
+
+    Args:
+        movement_data_json: Movement data as stored in `store-movement-data`
+
+    Returns:
+        float32 array aligned with the step table rows (NaN where not covered),
+        or None if there are no DEM tiles
+    """
+    index = tile_index()
+    if not index:
+        return None
+
+    # Tile paths and modification times are part of the key, so changed tiles are re-read
+    signature = hashlib.md5(repr([(path, os.path.getmtime(path)) for path, _ in index]).encode()).hexdigest()
+    version = dataset_version(movement_data_json)
+    kind = f"elevation_{signature}"
+    elevation = get_result(version, kind)
+    if elevation is None:
+        steps = get_step_table(movement_data_json)
+        elevation = sample_elevation(steps['location_long'].to_numpy(), steps['location_lat'].to_numpy(),
+                                     index).astype(np.float32)
+        store_result(version, kind, elevation)
+    return elevation
+
+
+def elevation_summary(steps, elevation):
+    """
+    Elevation range and cumulative ascent and descent of every individual.
+
+    Changes are summed between consecutive fixes that have an elevation and are
+    not flagged as outliers.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        elevation: Elevation per step table row (from `get_elevation`)
+
+    Returns:
+        DataFrame with individual_id, fixes (with elevation), min_m, max_m,
+        mean_m, ascent_m and descent_m columns
+    """
+    n_individuals = len(steps.attrs['individuals'])
+    valid = ~np.isnan(elevation)
+    if 'is_outlier' in steps.columns:
+        valid &= ~steps['is_outlier'].to_numpy()
+    rows = np.flatnonzero(valid)
+    codes = steps['ind_code'].to_numpy()[rows]
+    values = elevation[rows].astype(np.float64)
+
+    change = np.diff(values)
+    same = codes[1:] == codes[:-1]
+    ascent = np.bincount(codes[1:][same], weights=np.maximum(change[same], 0), minlength=n_individuals)
+    descent = np.bincount(codes[1:][same], weights=np.maximum(-change[same], 0), minlength=n_individuals)
+
+    grouped = pd.Series(values).groupby(codes)
+    present = np.unique(codes)
+    return pd.DataFrame({
+        'individual_id': np.asarray(steps.attrs['individuals'], dtype=object)[present],
+        'fixes': np.bincount(codes, minlength=n_individuals)[present],
+        'min_m': grouped.min().to_numpy(),
+        'max_m': grouped.max().to_numpy(),
+        'mean_m': grouped.mean().to_numpy(),
+        'ascent_m': ascent[present],
+        'descent_m': descent[present]
+    })
+
+
+def profile_points(steps, elevation, max_points=MAX_PROFILE_POINTS):
+    """
+    Thin an elevation profile for display, keeping the low and high point of each stretch.
+
+    Every individual's fixes are split into at most max_points / 2 equal stretches
+    and the lowest and highest fix of each stretch are kept, so peaks and valleys
+    survive on multi-year tracks.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        elevation: Elevation per step table row
+        max_points: Points kept per individual
+
+    Returns:
+        DataFrame with individual_id, timestamp and elevation columns, in time order
+    """
+    rows = np.flatnonzero(~np.isnan(elevation))
+    if 'is_outlier' in steps.columns:
+        rows = rows[~steps['is_outlier'].to_numpy()[rows]]
+    codes = steps['ind_code'].to_numpy()[rows]
+    values = elevation[rows]
+
+    # Stretch number of every fix within its individual
+    starts = np.searchsorted(codes, codes, side='left')
+    counts = np.bincount(codes, minlength=len(steps.attrs['individuals']))[codes]
+    buckets = max(int(max_points) // 2, 1)
+    stretch = (np.arange(len(rows)) - starts) * buckets // np.maximum(counts, 1)
+    key = codes.astype(np.int64) * buckets + stretch
+
+    # Lowest and highest fix of every stretch (rows are sorted by key)
+    order = np.lexsort((values, key))
+    first = np.r_[True, key[order][1:] != key[order][:-1]]
+    last = np.r_[key[order][1:] != key[order][:-1], True]
+    kept = np.unique(np.concatenate([order[first], order[last]]))
+
+    return pd.DataFrame({
+        'individual_id': steps['individual_id'].to_numpy()[rows[kept]],
+        'timestamp': steps['timestamp'].to_numpy()[rows[kept]],
+        'elevation': values[kept]
+    })
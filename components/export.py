@@ -0,0 +1,580 @@
+"""
+Export Component
+Streams tracks, fixes and home-range polygons as newline-delimited GeoJSON or
+Mapbox Vector Tiles, built directly from coordinate arrays
+"""
+
+import hashlib
+import json
+import math
+import struct
+
+import numpy as np
+import pandas as pd
+
+from components.data_store import get_dataset, get_result, store_result, list_datasets
+
+# Tile geometry settings
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+# Number of fixes serialized per NDJSON chunk
+NDJSON_CHUNK_SIZE = 50000
+
+# Mercator latitude limit
+MAX_MERCATOR_LAT = 85.0511287798
+
+# Vector tile geometry types
+GEOM_POINT = 1
+GEOM_LINESTRING = 2
+GEOM_POLYGON = 3
+
+
+def track_arrays(df):
+    """
+    Build sorted, contiguous coordinate arrays for all individuals.
+
+    Args:
+        df: DataFrame with individual_id, timestamp, location_lat and location_long columns
+
+    Returns:
+        Dictionary with 'individuals', 'offsets', 'lon', 'lat', 'timestamps' (ISO strings),
+        'merc_x' and 'merc_y' (Web Mercator in unit square) arrays
+    """
+    if 'individual_id' in df.columns:
+        df = df.sort_values(['individual_id', 'timestamp'], kind='mergesort')
+        codes, individuals = pd.factorize(df['individual_id'], sort=False)
+    else:
+        df = df.sort_values('timestamp', kind='mergesort')
+        codes = np.zeros(len(df), dtype=np.int64)
+        individuals = np.array(['all'], dtype=object)
+
+    counts = np.bincount(codes, minlength=len(individuals))
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    lon = df['location_long'].to_numpy(dtype=np.float64)
+    lat = df['location_lat'].to_numpy(dtype=np.float64)
+    timestamps = np.datetime_as_string(
+        pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[s]'), unit='s'
+    )
+
+    # Project once to the unit Web Mercator square used for tiling
+    clipped_lat = np.radians(np.clip(lat, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    merc_x = (lon + 180.0) / 360.0
+    merc_y = (1.0 - np.log(np.tan(clipped_lat) + 1.0 / np.cos(clipped_lat)) / math.pi) / 2.0
+
+    return {
+        'individuals': np.asarray(individuals, dtype=object),
+        'offsets': offsets,
+        'lon': lon,
+        'lat': lat,
+        'timestamps': timestamps,
+        'merc_x': merc_x,
+        'merc_y': merc_y
+    }
+
+
+def get_track_arrays(version):
+    """
+    Get (and cache) the coordinate arrays of a registered dataset.
+
+    Args:
+        version: Dataset version key
+
+    Returns:
+        Dictionary from `track_arrays`, or None if the dataset is unknown
+    """
+    arrays = get_result(version, 'track_arrays')
+    if arrays is None:
+        df = get_dataset(version)
+        if df is None or df.empty:
+            return None
+        arrays = track_arrays(df)
+        store_result(version, 'track_arrays', arrays)
+    return arrays
+
+
+def home_range_digest(version):
+    """
+    Digest of the home range result of a dataset, cached until the result is replaced.
+
+    Args:
+        version: Dataset version key
+
+    Returns:
+        str: Hex digest, '' if the dataset has no home range result
+    """
+    home_ranges = get_result(version, 'home_range')
+    if not home_ranges:
+        return ''
+    cached = get_result(version, 'home_range_digest')
+    if cached is not None and cached[0] is home_ranges:
+        return cached[1]
+    digest = hashlib.md5(json.dumps(home_ranges, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    store_result(version, 'home_range_digest', (home_ranges, digest))
+    return digest
+
+
+def _coordinate_strings(lon, lat):
+    """Format coordinate pairs as JSON arrays without building Python lists."""
+    pairs = np.char.add(np.char.add('[', np.char.mod('%.6f', lon)), ',')
+    return np.char.add(np.char.add(pairs, np.char.mod('%.6f', lat)), ']')
+
+
+def iter_geojson_lines(arrays, layers=('tracks', 'points'), home_ranges=None):
+    """
+    Generate newline-delimited GeoJSON features.
+
+    Args:
+        arrays: Coordinate arrays from `track_arrays`
+        layers: Layers to include ('tracks', 'points', 'home_ranges')
+        home_ranges: Home range results as produced by the home range callback
+
+    Yields:
+        Chunks of NDJSON text
+    """
+    individuals = arrays['individuals']
+    offsets = arrays['offsets']
+
+    for i, individual in enumerate(individuals):
+        start, end = offsets[i], offsets[i + 1]
+        if end <= start:
+            continue
+
+        individual_json = json.dumps(str(individual))
+        lon = arrays['lon'][start:end]
+        lat = arrays['lat'][start:end]
+
+        if 'tracks' in layers and end - start >= 2:
+            coords = ','.join(_coordinate_strings(lon, lat).tolist())
+            properties = json.dumps({
+                'layer': 'tracks',
+                'individual': str(individual),
+                'start_time': str(arrays['timestamps'][start]),
+                'end_time': str(arrays['timestamps'][end - 1]),
+                'point_count': int(end - start)
+            })
+            yield ('{"type":"Feature","geometry":{"type":"LineString","coordinates":[' + coords +
+                   ']},"properties":' + properties + '}\n')
+
+        if 'points' in layers:
+            for chunk_start in range(start, end, NDJSON_CHUNK_SIZE):
+                chunk_end = min(chunk_start + NDJSON_CHUNK_SIZE, end)
+                coords = _coordinate_strings(arrays['lon'][chunk_start:chunk_end],
+                                             arrays['lat'][chunk_start:chunk_end])
+                lines = np.char.add('{"type":"Feature","geometry":{"type":"Point","coordinates":', coords)
+                lines = np.char.add(lines, '},"properties":{"layer":"points","individual":' + individual_json + ',"index":')
+                lines = np.char.add(lines, np.arange(chunk_start - start, chunk_end - start).astype(str))
+                lines = np.char.add(lines, ',"timestamp":"')
+                lines = np.char.add(lines, arrays['timestamps'][chunk_start:chunk_end].astype(str))
+                lines = np.char.add(lines, '"}}')
+                yield '\n'.join(lines.tolist()) + '\n'
+
+    if 'home_ranges' in layers and home_ranges:
+        for method, individual, percent, geometry, area in iter_home_range_geometries(home_ranges):
+            yield json.dumps({
+                'type': 'Feature',
+                'geometry': geometry,
+                'properties': {
+                    'layer': 'home_ranges',
+                    'individual': str(individual),
+                    'method': method,
+                    'percent': percent,
+                    'area_km2': area
+                }
+            }) + '\n'
+
+
+def iter_home_range_geometries(home_ranges):
+    """
+    Iterate over home range polygons stored by the home range callbacks.
+
+    Args:
+        home_ranges: Dictionary {method: {individual: {'contour_95': geojson, 'area_95': ...}}}
+
+    Yields:
+        Tuples (method, individual, percent, geojson geometry, area in km²)
+    """
+    for method, by_individual in home_ranges.items():
+        if not isinstance(by_individual, dict):
+            continue
+        # Single dataset results are not keyed by individual
+        if any(key.startswith(('contour_', 'hull_')) for key in by_individual):
+            by_individual = {'all': by_individual}
+
+        for individual, result in by_individual.items():
+            if not isinstance(result, dict):
+                continue
+            for key, geometry in result.items():
+                if not key.startswith(('contour_', 'hull_')) or not geometry:
+                    continue
+                percent = key.split('_', 1)[1]
+                yield method, individual, percent, geometry, result.get(f"area_{percent}")
+
+
+def tile_bounds(z, x, y):
+    """
+    Get the bounds of a tile in unit Web Mercator coordinates.
+
+    Args:
+        z, x, y: Tile address
+
+    Returns:
+        Tuple (scale, x0, y0) so that tile coordinates are (merc - origin) * scale
+    """
+    n = 2 ** z
+    return n, x / n, y / n
+
+
+def _zigzag(values):
+    """Zigzag-encode signed integers for vector tile geometries."""
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def _encode_varints(values):
+    """Encode an array of unsigned integers as concatenated protobuf varints."""
+    values = np.asarray(values, dtype=np.uint64)
+    if values.size == 0:
+        return b''
+
+    n_bytes = np.ones(values.shape, dtype=np.int64)
+    for shift in (7, 14, 21, 28, 35, 42, 49, 56, 63):
+        n_bytes += values >= (np.uint64(1) << np.uint64(shift))
+
+    positions = np.cumsum(n_bytes) - n_bytes
+    out = np.zeros(int(n_bytes.sum()), dtype=np.uint8)
+    for byte_index in range(int(n_bytes.max())):
+        mask = n_bytes > byte_index
+        chunk = (values[mask] >> np.uint64(7 * byte_index)) & np.uint64(0x7F)
+        chunk |= np.where(n_bytes[mask] > byte_index + 1, np.uint64(0x80), np.uint64(0))
+        out[positions[mask] + byte_index] = chunk.astype(np.uint8)
+
+    return out.tobytes()
+
+
+def _varint(value):
+    return _encode_varints(np.array([value], dtype=np.uint64))
+
+
+def _field(number, wire_type):
+    return _varint((number << 3) | wire_type)
+
+
+def _length_delimited(number, payload):
+    return _field(number, 2) + _varint(len(payload)) + payload
+
+
+def _command(command_id, count):
+    return (command_id & 0x7) | (count << 3)
+
+
+def _encode_value(value):
+    """Encode a vector tile Value message."""
+    if isinstance(value, (bool, np.bool_)):
+        return _field(7, 0) + _varint(int(value))
+    if isinstance(value, (int, np.integer)) and value >= 0:
+        return _field(5, 0) + _varint(int(value))
+    if isinstance(value, (float, np.floating)):
+        return _field(3, 1) + struct.pack('<d', float(value))
+    return _length_delimited(1, str(value).encode('utf-8'))
+
+
+def _line_geometry(px, py, runs):
+    """
+    Encode one or more linestring parts as a geometry command array.
+
+    Args:
+        px, py: Integer tile coordinates of all kept points, parts concatenated
+        runs: Length of each part (all >= 2)
+
+    Returns:
+        numpy array of geometry integers
+    """
+    dx = np.diff(px, prepend=0)
+    dy = np.diff(py, prepend=0)
+    zx, zy = _zigzag(dx), _zigzag(dy)
+
+    sizes = 2 + 2 * runs
+    run_offsets = np.cumsum(sizes) - sizes
+    out = np.zeros(int(sizes.sum()), dtype=np.uint64)
+
+    run_starts = np.cumsum(runs) - runs
+    out[run_offsets] = _command(1, 1)
+    out[run_offsets + 1] = zx[run_starts]
+    out[run_offsets + 2] = zy[run_starts]
+    out[run_offsets + 3] = (np.uint64(2) | ((runs - 1).astype(np.uint64) << np.uint64(3)))
+
+    # Remaining vertices of every part follow its LineTo command
+    local = np.arange(len(px)) - np.repeat(run_starts, runs)
+    follow = local > 0
+    positions = np.repeat(run_offsets, runs)[follow] + 4 + 2 * (local[follow] - 1)
+    out[positions] = zx[follow]
+    out[positions + 1] = zy[follow]
+    return out
+
+
+def _ring_geometry(px, py, cursor):
+    """Encode a single polygon ring (without closing vertex) as geometry integers."""
+    dx = np.diff(px, prepend=cursor[0])
+    dy = np.diff(py, prepend=cursor[1])
+    out = np.empty(2 * len(px) + 3, dtype=np.uint64)
+    out[0] = _command(1, 1)
+    out[1:3] = [_zigzag(dx[:1])[0], _zigzag(dy[:1])[0]]
+    out[3] = _command(2, len(px) - 1)
+    out[4:-1:2] = _zigzag(dx[1:])
+    out[5:-1:2] = _zigzag(dy[1:])
+    out[-1] = _command(7, 1)
+    return out
+
+
+class _LayerBuilder:
+    """Accumulates features of a single vector tile layer."""
+
+    __slots__ = ('name', 'features', 'keys', 'values', 'key_index', 'value_index')
+
+    def __init__(self, name):
+        self.name = name
+        self.features = []
+        self.keys = []
+        self.values = []
+        self.key_index = {}
+        self.value_index = {}
+
+    def _tags(self, properties):
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if key not in self.key_index:
+                self.key_index[key] = len(self.keys)
+                self.keys.append(key)
+            value_key = (type(value).__name__, value)
+            if value_key not in self.value_index:
+                self.value_index[value_key] = len(self.values)
+                self.values.append(value)
+            tags.extend([self.key_index[key], self.value_index[value_key]])
+        return tags
+
+    def add(self, geom_type, geometry, properties):
+        feature_id = len(self.features) + 1
+        payload = _field(1, 0) + _varint(feature_id)
+        tags = self._tags(properties)
+        if tags:
+            payload += _length_delimited(2, _encode_varints(np.array(tags, dtype=np.uint64)))
+        payload += _field(3, 0) + _varint(geom_type)
+        payload += _length_delimited(4, _encode_varints(geometry))
+        self.features.append(payload)
+
+    def encode(self, extent):
+        payload = _field(15, 0) + _varint(2)
+        payload += _length_delimited(1, self.name.encode('utf-8'))
+        payload += b''.join(_length_delimited(2, feature) for feature in self.features)
+        payload += b''.join(_length_delimited(3, key.encode('utf-8')) for key in self.keys)
+        payload += b''.join(_length_delimited(4, _encode_value(value)) for value in self.values)
+        payload += _field(5, 0) + _varint(extent)
+        return _length_delimited(3, payload)
+
+
+def encode_vector_tile(arrays, z, x, y, layers=('tracks', 'points'), home_ranges=None,
+                       extent=TILE_EXTENT, buffer=TILE_BUFFER):
+    """
+    Encode a Mapbox Vector Tile for one tile address.
+
+    Tracks are encoded as one (multi)linestring per individual, fixes as one
+    multipoint per individual, so the feature count grows with the number of
+    animals rather than the number of fixes.
+
+    Args:
+        arrays: Coordinate arrays from `track_arrays`
+        z, x, y: Tile address
+        layers: Layers to include ('tracks', 'points', 'home_ranges')
+        home_ranges: Home range results as produced by the home range callback
+        extent: Tile extent in integer units
+        buffer: Extra margin around the tile in tile units
+
+    Returns:
+        bytes: Protobuf-encoded tile
+    """
+    scale, x0, y0 = tile_bounds(z, x, y)
+    tile_x = (arrays['merc_x'] - x0) * scale * extent
+    tile_y = (arrays['merc_y'] - y0) * scale * extent
+
+    low, high = -buffer, extent + buffer
+    inside = (tile_x >= low) & (tile_x <= high) & (tile_y >= low) & (tile_y <= high)
+
+    # Keep far-away neighbours bounded so deltas stay small
+    px = np.round(np.clip(tile_x, -8 * extent, 9 * extent)).astype(np.int64)
+    py = np.round(np.clip(tile_y, -8 * extent, 9 * extent)).astype(np.int64)
+
+    offsets = arrays['offsets']
+    individuals = arrays['individuals']
+    builders = {}
+
+    if 'tracks' in layers or 'points' in layers:
+        for i, individual in enumerate(individuals):
+            start, end = offsets[i], offsets[i + 1]
+            ind_inside = inside[start:end]
+            if not ind_inside.any():
+                continue
+
+            ind_px, ind_py = px[start:end], py[start:end]
+            properties = {'individual': str(individual)}
+
+            if 'points' in layers:
+                pts_x, pts_y = ind_px[ind_inside], ind_py[ind_inside]
+                geometry = np.empty(2 * len(pts_x) + 1, dtype=np.uint64)
+                geometry[0] = _command(1, len(pts_x))
+                geometry[1::2] = _zigzag(np.diff(pts_x, prepend=0))
+                geometry[2::2] = _zigzag(np.diff(pts_y, prepend=0))
+                builders.setdefault('points', _LayerBuilder('points')).add(
+                    GEOM_POINT, geometry, dict(properties, point_count=int(len(pts_x)))
+                )
+
+            if 'tracks' in layers and end - start >= 2:
+                # Keep vertices inside the tile plus their neighbours so segments cross the edge
+                keep = ind_inside.copy()
+                keep[1:] |= ind_inside[:-1]
+                keep[:-1] |= ind_inside[1:]
+                part_start = keep & ~np.concatenate([[False], keep[:-1]])
+                part_id = np.cumsum(part_start) - 1
+
+                # Drop repeated vertices, which vector tiles do not allow within a part
+                repeated = np.zeros_like(keep)
+                repeated[1:] = (keep[1:] & keep[:-1] &
+                                (ind_px[1:] == ind_px[:-1]) & (ind_py[1:] == ind_py[:-1]))
+
+                kept = np.flatnonzero(keep & ~repeated)
+                if len(kept) < 2:
+                    continue
+                _, runs = np.unique(part_id[kept], return_counts=True)
+                kept = kept[np.repeat(runs >= 2, runs)]
+                runs = runs[runs >= 2]
+                if len(runs) == 0:
+                    continue
+
+                geometry = _line_geometry(ind_px[kept], ind_py[kept], runs)
+                builders.setdefault('tracks', _LayerBuilder('tracks')).add(
+                    GEOM_LINESTRING, geometry, properties
+                )
+
+    if 'home_ranges' in layers and home_ranges:
+        for method, individual, percent, geometry, area in iter_home_range_geometries(home_ranges):
+            polygons = geometry['coordinates']
+            if geometry.get('type') == 'Polygon':
+                polygons = [polygons]
+
+            parts = []
+            for polygon in polygons:
+                for ring_index, ring in enumerate(polygon):
+                    ring = np.asarray(ring, dtype=np.float64)
+                    if len(ring) < 4:
+                        continue
+                    lat = np.radians(np.clip(ring[:, 1], -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+                    ring_x = ((ring[:, 0] + 180.0) / 360.0 - x0) * scale * extent
+                    ring_y = ((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 - y0) * scale * extent
+                    rx = np.round(ring_x[:-1]).astype(np.int64)
+                    ry = np.round(ring_y[:-1]).astype(np.int64)
+
+                    # Exterior rings must have positive area in tile coordinates, holes negative
+                    area2 = np.sum(rx * np.roll(ry, -1) - np.roll(rx, -1) * ry)
+                    if area2 == 0:
+                        continue
+                    if (area2 < 0) == (ring_index == 0):
+                        rx, ry = rx[::-1], ry[::-1]
+                    parts.append((rx, ry))
+
+            if not parts:
+                continue
+
+            all_x = np.concatenate([p[0] for p in parts])
+            all_y = np.concatenate([p[1] for p in parts])
+            if all_x.max() < low or all_x.min() > high or all_y.max() < low or all_y.min() > high:
+                continue
+
+            # Ring cursors continue from the previous ring's last vertex
+            encoded = []
+            cursor = (0, 0)
+            for rx, ry in parts:
+                encoded.append(_ring_geometry(rx, ry, cursor))
+                cursor = (rx[-1], ry[-1])
+
+            builders.setdefault('home_ranges', _LayerBuilder('home_ranges')).add(
+                GEOM_POLYGON, np.concatenate(encoded),
+                {'individual': str(individual), 'method': method, 'percent': str(percent),
+                 'area_km2': float(area) if area is not None else None}
+            )
+
+    return b''.join(builder.encode(extent) for builder in builders.values())
+
+
+def tile_url_template(version, host_url=''):
+    """
+    Get the vector tile URL template of a dataset for map clients.
+
+    Args:
+        version: Dataset version key
+        host_url: Absolute server prefix (e.g. flask.request.host_url)
+
+    Returns:
+        str: URL template with {z}/{x}/{y} placeholders
+    """
+    return f"{host_url.rstrip('/')}/export/{version}/tiles/{{z}}/{{x}}/{{y}}.mvt"
+
+
+def register_export_routes(server):
+    """
+    Register the export endpoints on the Flask server.
+
+    Endpoints:
+        /export/datasets                          List registered dataset versions
+        /export/<version>/features.ndjson         Stream newline-delimited GeoJSON
+        /export/<version>/tiles/<z>/<x>/<y>.mvt   Mapbox Vector Tile
+
+    Both data endpoints accept a `layers` query parameter
+    (comma-separated subset of tracks, points, home_ranges). Tiles are tagged
+    with the dataset version and its home range result, and clients revalidate
+    them on every use, so a finished home range job replaces cached polygons.
+
+    Args:
+        server: Flask application
+    """
+    from flask import Response, abort, jsonify, request
+
+    def _layers():
+        requested = request.args.get('layers', 'tracks,points,home_ranges')
+        return tuple(layer.strip() for layer in requested.split(',') if layer.strip())
+
+    @server.route('/export/datasets')
+    def export_datasets():
+        return jsonify(list_datasets())
+
+    @server.route('/export/<version>/features.ndjson')
+    def export_ndjson(version):
+        arrays = get_track_arrays(version)
+        if arrays is None:
+            abort(404)
+        home_ranges = get_result(version, 'home_range')
+        return Response(
+            iter_geojson_lines(arrays, _layers(), home_ranges),
+            mimetype='application/x-ndjson',
+            headers={'Content-Disposition': f'attachment; filename="{version}.ndjson"'}
+        )
+
+    @server.route('/export/<version>/tiles/<int:z>/<int:x>/<int:y>.mvt')
+    def export_tile(version, z, x, y):
+        if z < 0 or z > 24 or not (0 <= x < 2 ** z) or not (0 <= y < 2 ** z):
+            abort(404)
+        arrays = get_track_arrays(version)
+        if arrays is None:
+            abort(404)
+        layers = _layers()
+        etag = f"{version}-{home_range_digest(version) if 'home_ranges' in layers else ''}"
+        headers = {'Cache-Control': 'public, no-cache'}
+        if request.if_none_match.contains(etag):
+            response = Response(status=304, headers=headers)
+        else:
+            tile = encode_vector_tile(arrays, z, x, y, layers, get_result(version, 'home_range'))
+            response = Response(tile, mimetype='application/vnd.mapbox-vector-tile', headers=headers)
+        response.set_etag(etag)
+        return response
@@ -0,0 +1,206 @@
+"""
+Figure Cache Component
+Server-side cache of rendered Plotly figures, keyed by the callback, a hash of its
+inputs and the version of the dataset it draws, so unchanged charts are neither
+rebuilt nor re-serialized
+
+Every browser keeps the tag of the figure each cached callback last sent in
+`store-figure-etags`. A callback triggered by an input whose figure has the same
+tag returns `no_update`; a callback fired because its graph was mounted again
+(e.g. on navigation back to a page) is answered from the cache.
+
+The cache is bounded by the serialized size of its figures. Figures of calls
+that hit their error path (see `skip_cache`) are not cached.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from components.data_store import dataset_version
+
+# Serialized size (bytes of JSON) of the figures kept in memory (least recently used are dropped)
+MAX_FIGURE_BYTES = int(float(os.environ.get('FIGURE_CACHE_MB', 256)) * 2**20)
+
+# Cached figures by key: (serialized size, figure)
+_figures = OrderedDict()
+_lock = threading.RLock()
+_size = {'bytes': 0}
+_stats = {'hits': 0, 'misses': 0, 'unchanged': 0, 'skipped': 0}
+_call = threading.local()
+
+
+def figure_key(name, args, data_arg=0):
+    """
+    Cache key of a figure callback call.
+
+    Args:
+        name: Callback name
+        args: Callback arguments (JSON-serializable)
+        data_arg: Position of the serialized dataset among the arguments
+
+    Returns:
+        Tuple (name, input hash, dataset version)
+    """
+    data = args[data_arg] if data_arg is not None and data_arg < len(args) else None
+    others = [arg for i, arg in enumerate(args) if i != data_arg]
+    if data is not None and not isinstance(data, (str, bytes)):
+        data = json.dumps(data, sort_keys=True, default=str)
+    inputs = json.dumps(others, sort_keys=True, default=str).encode('utf-8')
+    return name, hashlib.md5(inputs).hexdigest(), dataset_version(data)
+
+
+def get_figure(key):
+    """
+    Get a cached figure.
+
+    Args:
+        key: Output of `figure_key`
+
+    Returns:
+        dict or None: The serialized figure, None if it is not cached
+    """
+    with _lock:
+        entry = _figures.get(key)
+        if entry is None:
+            return None
+        _figures.move_to_end(key)
+        return entry[1]
+
+
+def store_figure(key, figure):
+    """
+    Serialize a figure and cache it.
+
+    Args:
+        key: Output of `figure_key`
+        figure: plotly Figure or figure dictionary
+
+    Returns:
+        dict: The serialized figure (plain JSON types)
+    """
+    import plotly.io as pio
+
+    serialized = pio.to_json(figure, validate=False)
+    figure = json.loads(serialized)
+    size = len(serialized)
+    if size > MAX_FIGURE_BYTES:
+        return figure
+
+    with _lock:
+        previous = _figures.pop(key, None)
+        if previous is not None:
+            _size['bytes'] -= previous[0]
+        _figures[key] = (size, figure)
+        _size['bytes'] += size
+        while _size['bytes'] > MAX_FIGURE_BYTES:
+            _, (dropped, _) = _figures.popitem(last=False)
+            _size['bytes'] -= dropped
+    return figure
+
+
+def clear_figures(name=None):
+    """
+    Drop cached figures.
+
+    Args:
+        name: Callback name whose figures are dropped (all if None)
+    """
+    with _lock:
+        for key in [key for key in _figures if name is None or key[0] == name]:
+            _size['bytes'] -= _figures.pop(key)[0]
+
+
+def cache_stats():
+    """
+    Counts of the cache.
+
+    Returns:
+        dict: Cached figures and their serialized bytes, hits, misses, unchanged
+            (`no_update`) answers and figures not cached because of an error
+    """
+    with _lock:
+        return {'figures': len(_figures), 'bytes': _size['bytes'], **_stats}
+
+
+def _count(outcome):
+    with _lock:
+        _stats[outcome] += 1
+
+
+def skip_cache():
+    """
+    Keep the figure of the current cached callback call out of the cache.
+
+    Call it from a callback's error path, so a transient failure is not served
+    again for the same inputs.
+    """
+    _call.skip = True
+
+
+def _triggered():
+    from dash import ctx
+
+    try:
+        return ctx.triggered_id is not None
+    except Exception:
+        return False
+
+
+def cached_figure(name=None, data_arg=0):
+    """
+    Cache the figure of a callback.
+
+    The decorated callback takes `State("store-figure-etags", "data")` as its last
+    argument and gets `Output("store-figure-etags", "data", allow_duplicate=True)`
+    as its last output; the wrapped function keeps its own arguments and returns
+    the figure only.
+
+    Args:
+        name: Cache name of the callback (function name if None)
+        data_arg: Position of the serialized dataset among the function arguments
+
+    Returns:
+        Decorator
+    """
+    def decorate(function):
+        cache_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args):
+            from dash import Patch, no_update
+
+            *args, etags = args
+            key = figure_key(cache_name, args, data_arg)
+            etag = f"{key[1]}:{key[2]}"
+
+            # The browser already shows this figure
+            if _triggered() and (etags or {}).get(cache_name) == etag:
+                _count('unchanged')
+                return no_update, no_update
+
+            figure = get_figure(key)
+            if figure is None:
+                _count('misses')
+                _call.skip = False
+                figure = function(*args)
+                if _call.skip:
+                    # The browser shows an uncached figure: its tag must not match again
+                    _count('skipped')
+                    update = Patch()
+                    update[cache_name] = None
+                    return figure, update
+                figure = store_figure(key, figure)
+            else:
+                _count('hits')
+
+            update = Patch()
+            update[cache_name] = etag
+            return figure, update
+
+        return wrapper
+
+    return decorate
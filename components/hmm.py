@@ -0,0 +1,445 @@
+"""
+Hidden Markov Model Component
+Behavioral state segmentation (resting / foraging / travelling) with gamma step lengths
+and von Mises turning angles, fitted by EM on the shared step table
+
+Forward-backward and Viterbi are evaluated as blocked prefix scans over the
+per-step transition matrices: products inside blocks of about sqrt(T) steps are
+built for all blocks at once and then chained across blocks, so each pass is
+about 2 * sqrt(T) batched numpy operations instead of a Python loop over steps.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from components.data_store import dataset_version, get_result, store_result
+from components.outliers import outlier_suffix
+from components.steps import get_step_table, usable_steps
+
+# State labels, ordered by increasing mean step length
+STATE_NAMES = {
+    2: ['resting', 'travelling'],
+    3: ['resting', 'foraging', 'travelling'],
+    4: ['resting', 'foraging', 'searching', 'travelling'],
+}
+
+# Step lengths below this (meters) are treated as this value (GPS jitter)
+MIN_STEP_M = 1.0
+
+# Tracks shorter than this are fitted serially even when parallel fitting is requested
+MIN_STEPS_FOR_PROCESS = 5000
+
+_LOG_2PI = np.log(2 * np.pi)
+
+
+def _log_gamma_pdf(x, shape, scale):
+    """Log density of gamma distributions, x (T,), parameters (N,) -> (T, N)."""
+    from scipy.special import gammaln
+
+    log_x = np.log(x)[:, None]
+    return (shape - 1) * log_x - x[:, None] / scale - gammaln(shape) - shape * np.log(scale)
+
+
+def _log_vonmises_pdf(angle, mu, kappa):
+    """Log density of von Mises distributions; missing angles contribute 0."""
+    from scipy.special import i0e
+
+    log_pdf = kappa * np.cos(angle[:, None] - mu) - _LOG_2PI - (np.log(i0e(kappa)) + kappa)
+    return np.where(np.isnan(angle)[:, None], 0.0, log_pdf)
+
+
+def emission_log_likelihood(step, angle, params):
+    """
+    Log emission probabilities of every observation under every state.
+
+    Args:
+        step: Step lengths in meters (T,)
+        angle: Turning angles in radians, NaN where undefined (T,)
+        params: Parameter dictionary from `fit_hmm`
+
+    Returns:
+        numpy array (T, N)
+    """
+    return (_log_gamma_pdf(step, params['shape'], params['scale']) +
+            _log_vonmises_pdf(angle, params['mu'], params['kappa']))
+
+
+def _transition_stack(log_b, log_A, log_pi, starts):
+    """Per-step log transition-emission matrices; rows reset at sequence starts."""
+    log_M = log_A[None, :, :] + log_b[:, None, :]
+    log_M[starts] = (log_pi[None, :] + log_b[starts])[:, None, :]
+    return log_M
+
+
+def _block_shape(T):
+    """Block length and number of blocks for a scan over T elements."""
+    block = max(int(np.sqrt(T)), 1)
+    return block, -(-T // block)
+
+
+def _scaled_prefix_products(M, log_scale, reverse=False):
+    """
+    Inclusive prefix (or suffix) matrix products with per-matrix rescaling.
+
+    Args:
+        M: Stack of non-negative matrices (T, N, N)
+        log_scale: Log scale factor of every matrix (T,)
+        reverse: Compute suffix products M_t @ ... @ M_{T-1} instead
+
+    Returns:
+        Tuple (products, log_scales) such that the true product is products * exp(log_scales)
+    """
+    if reverse:
+        # (M_t ... M_{T-1})^T is the prefix product of the reversed transposes
+        products, scales = _scaled_prefix_products(M[::-1].transpose(0, 2, 1), log_scale[::-1])
+        return products[::-1].transpose(0, 2, 1), scales[::-1]
+
+    T, N, _ = M.shape
+    block, n_blocks = _block_shape(T)
+    pad = n_blocks * block - T
+
+    local = np.concatenate([M, np.broadcast_to(np.eye(N), (pad, N, N))]).reshape(n_blocks, block, N, N)
+    scale = np.concatenate([log_scale, np.zeros(pad)]).reshape(n_blocks, block)
+
+    def rescale(products):
+        peak = products.max(axis=(-2, -1))
+        peak[peak <= 0] = 1.0
+        products /= peak[..., None, None]
+        return np.log(peak)
+
+    # Prefix products inside every block, all blocks at once
+    for j in range(1, block):
+        local[:, j] = local[:, j - 1] @ local[:, j]
+        scale[:, j] += scale[:, j - 1] + rescale(local[:, j])
+
+    # Exclusive prefix of the block totals
+    carry = np.empty((n_blocks, N, N))
+    carry_scale = np.zeros(n_blocks)
+    carry[0] = np.eye(N)
+    for b in range(1, n_blocks):
+        carry[b] = carry[b - 1] @ local[b - 1, -1]
+        carry_scale[b] = carry_scale[b - 1] + scale[b - 1, -1] + rescale(carry[b:b + 1])[0]
+
+    products = carry[:, None] @ local
+    scale += carry_scale[:, None] + rescale(products)
+    return products.reshape(-1, N, N)[:T], scale.ravel()[:T]
+
+
+def forward_backward(log_b, log_A, log_pi, starts):
+    """
+    Log-space forward-backward pass evaluated with prefix scans.
+
+    Args:
+        log_b: Log emission probabilities (T, N)
+        log_A: Log transition matrix (N, N)
+        log_pi: Log initial distribution (N,)
+        starts: Boolean array marking the first observation of every sequence
+
+    Returns:
+        Tuple (log_alpha, log_beta, log_likelihood)
+    """
+    T, N = log_b.shape
+    log_M = _transition_stack(log_b, log_A, log_pi, starts)
+
+    # Scale every matrix so its largest entry is one
+    peak = log_M.max(axis=(1, 2))
+    M = np.exp(log_M - peak[:, None, None])
+
+    log_alpha0 = log_pi + log_b[0]
+    log_alpha = np.empty((T, N))
+    log_alpha[0] = log_alpha0
+    if T > 1:
+        prefix, prefix_scale = _scaled_prefix_products(M[1:].copy(), peak[1:].copy())
+        shift = log_alpha0.max()
+        alpha = np.einsum('j,tjk->tk', np.exp(log_alpha0 - shift), prefix)
+        with np.errstate(divide='ignore'):
+            log_alpha[1:] = np.log(alpha) + (prefix_scale + shift)[:, None]
+
+    log_beta = np.zeros((T, N))
+    if T > 1:
+        suffix, suffix_scale = _scaled_prefix_products(M[1:].copy(), peak[1:].copy(), reverse=True)
+        with np.errstate(divide='ignore'):
+            log_beta[:-1] = np.log(suffix.sum(axis=2)) + suffix_scale[:, None]
+
+    from scipy.special import logsumexp
+
+    log_likelihood = logsumexp(log_alpha[-1])
+    return log_alpha, log_beta, log_likelihood
+
+
+def viterbi(log_b, log_A, log_pi, starts):
+    """
+    Most likely state sequence, using a blocked max-plus prefix scan.
+
+    Args:
+        log_b: Log emission probabilities (T, N)
+        log_A: Log transition matrix (N, N)
+        log_pi: Log initial distribution (N,)
+        starts: Boolean array marking the first observation of every sequence
+
+    Returns:
+        Integer numpy array of decoded states (T,)
+    """
+    T, N = log_b.shape
+    log_M = _transition_stack(log_b, log_A, log_pi, starts)
+
+    # delta_t = delta_0 (max-plus) M_1 ... M_t, scanned in blocks
+    delta = np.empty((T, N))
+    delta[0] = log_pi + log_b[0]
+    if T > 1:
+        block, n_blocks = _block_shape(T - 1)
+        pad = n_blocks * block - (T - 1)
+        identity = np.where(np.eye(N, dtype=bool), 0.0, -np.inf)
+        local = np.concatenate([log_M[1:], np.broadcast_to(identity, (pad, N, N))]).reshape(n_blocks, block, N, N)
+        for j in range(1, block):
+            local[:, j] = np.max(local[:, j - 1, :, :, None] + local[:, j, None, :, :], axis=2)
+
+        carry = np.empty((n_blocks, N))
+        carry[0] = delta[0]
+        for b in range(1, n_blocks):
+            carry[b] = np.max(carry[b - 1][:, None] + local[b - 1, -1], axis=0)
+
+        delta[1:] = np.max(carry[:, None, :, None] + local, axis=2).reshape(-1, N)[:T - 1]
+
+    # Back-pointers: best previous state for every state at t
+    back = np.argmax(delta[:-1, :, None] + log_A[None, :, :], axis=1)
+
+    ends = np.zeros(T, dtype=bool)
+    ends[-1] = True
+    ends[:-1] = starts[1:]
+    best_end = np.argmax(delta, axis=1)
+
+    states = np.empty(T, dtype=np.int64)
+    back_list = back.tolist()
+    best_list = best_end.tolist()
+    ends_list = ends.tolist()
+    starts_list = starts.tolist()
+    state = best_list[-1]
+    for t in range(T - 1, -1, -1):
+        if ends_list[t]:
+            state = best_list[t]
+        states[t] = state
+        if t > 0 and not starts_list[t]:
+            state = back_list[t - 1][state]
+    return states
+
+
+def _fit_gamma(x, log_x, weights):
+    """Weighted maximum likelihood gamma shape and scale for every state."""
+    from scipy.special import digamma, polygamma
+
+    total = weights.sum(axis=0)
+    mean = (weights * x[:, None]).sum(axis=0) / total
+    mean_log = (weights * log_x[:, None]).sum(axis=0) / total
+    s = np.maximum(np.log(mean) - mean_log, 1e-8)
+
+    shape = (3 - s + np.sqrt((s - 3) ** 2 + 24 * s)) / (12 * s)
+    for _ in range(5):
+        shape -= (np.log(shape) - digamma(shape) - s) / (1 / shape - polygamma(1, shape))
+        shape = np.maximum(shape, 1e-3)
+    return shape, mean / shape
+
+
+def _fit_vonmises(angle, weights):
+    """Weighted maximum likelihood von Mises mean and concentration for every state."""
+    observed = ~np.isnan(angle)
+    w = weights[observed]
+    cos_sum = (w * np.cos(angle[observed])[:, None]).sum(axis=0)
+    sin_sum = (w * np.sin(angle[observed])[:, None]).sum(axis=0)
+    total = np.maximum(w.sum(axis=0), 1e-12)
+
+    mu = np.arctan2(sin_sum, cos_sum)
+    r = np.clip(np.hypot(cos_sum, sin_sum) / total, 0, 0.999)
+
+    # Best & Fisher approximation of the inverse of A1(kappa)
+    kappa = np.where(
+        r < 0.53, 2 * r + r ** 3 + 5 * r ** 5 / 6,
+        np.where(r < 0.85, -0.4 + 1.39 * r + 0.43 / (1 - r), 1 / (r ** 3 - 4 * r ** 2 + 3 * r))
+    )
+    return mu, np.maximum(kappa, 1e-3)
+
+
+def _initial_params(step, angle, n_states):
+    """Quantile-based starting values, states ordered by step length."""
+    edges = np.quantile(step, np.linspace(0, 1, n_states + 1))
+    group = np.clip(np.searchsorted(edges[1:-1], step, side='right'), 0, n_states - 1)
+    weights = np.eye(n_states)[group] + 1e-3
+    shape, scale = _fit_gamma(step, np.log(step), weights)
+    return {
+        'shape': shape,
+        'scale': scale,
+        'mu': np.zeros(n_states),
+        'kappa': np.linspace(0.2, 2.0, n_states),
+        'A': np.full((n_states, n_states), 0.1 / max(n_states - 1, 1)) + np.eye(n_states) * (0.9 - 0.1 / max(n_states - 1, 1)),
+        'pi': np.full(n_states, 1.0 / n_states)
+    }
+
+
+def _fit_sequences(step, angle, starts, n_states, max_iter, tol):
+    """Baum-Welch on concatenated sequences."""
+    from scipy.special import logsumexp
+
+    step = np.maximum(step, MIN_STEP_M)
+    log_step = np.log(step)
+    params = _initial_params(step, angle, n_states)
+    transitions = ~starts
+    transitions[0] = False
+
+    previous = -np.inf
+    log_likelihood = previous
+    for iteration in range(max_iter):
+        log_A = np.log(params['A'])
+        log_pi = np.log(params['pi'])
+        log_b = emission_log_likelihood(step, angle, params)
+
+        log_alpha, log_beta, log_likelihood = forward_backward(log_b, log_A, log_pi, starts)
+
+        # State posteriors
+        log_gamma = log_alpha + log_beta
+        log_gamma -= logsumexp(log_gamma, axis=1, keepdims=True)
+        gamma = np.exp(log_gamma)
+
+        # Transition posteriors over all within-sequence steps
+        t = np.flatnonzero(transitions)
+        log_xi = (log_alpha[t - 1][:, :, None] + log_A[None, :, :] +
+                  (log_b[t] + log_beta[t])[:, None, :])
+        log_xi -= logsumexp(log_xi, axis=(1, 2), keepdims=True)
+        xi = np.exp(log_xi).sum(axis=0) + 1e-10
+
+        params['A'] = xi / xi.sum(axis=1, keepdims=True)
+        params['pi'] = gamma[starts].mean(axis=0) + 1e-10
+        params['pi'] /= params['pi'].sum()
+        params['shape'], params['scale'] = _fit_gamma(step, log_step, gamma + 1e-10)
+        params['mu'], params['kappa'] = _fit_vonmises(angle, gamma + 1e-10)
+
+        if abs(log_likelihood - previous) < tol * max(abs(log_likelihood), 1.0):
+            break
+        previous = log_likelihood
+
+    # Keep states ordered by mean step length
+    order = np.argsort(params['shape'] * params['scale'])
+    params = {
+        'shape': params['shape'][order],
+        'scale': params['scale'][order],
+        'mu': params['mu'][order],
+        'kappa': params['kappa'][order],
+        'A': params['A'][np.ix_(order, order)],
+        'pi': params['pi'][order]
+    }
+
+    log_b = emission_log_likelihood(step, angle, params)
+    states = viterbi(log_b, np.log(params['A']), np.log(params['pi']), starts)
+
+    n_params = n_states * 4 + n_states * (n_states - 1) + (n_states - 1)
+    return {
+        'params': params,
+        'states': states,
+        'log_likelihood': float(log_likelihood),
+        'aic': float(-2 * log_likelihood + 2 * n_params),
+        'iterations': iteration + 1
+    }
+
+
+def _fit_one(args):
+    step, angle, n_states, max_iter, tol = args
+    starts = np.zeros(len(step), dtype=bool)
+    starts[0] = True
+    return _fit_sequences(step, angle, starts, n_states, max_iter, tol)
+
+
+def fit_hmm(steps, n_states=3, pooled=False, n_jobs=None, max_iter=50, tol=1e-6):
+    """
+    Fit the behavioral HMM and decode states for every step.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        n_states: Number of behavioral states (2-4)
+        pooled: Fit one model to all individuals instead of one per individual
+        n_jobs: Worker processes for per-individual fits (None uses all cores, 1 is serial)
+        max_iter: Maximum number of EM iterations
+        tol: Relative log-likelihood convergence tolerance
+
+    Returns:
+        Dictionary with 'states' (state index per step table row, -1 where the
+        row has no valid step), 'state_names', 'models' (per individual, or
+        'pooled', with params, log_likelihood and aic)
+    """
+    if n_states not in STATE_NAMES:
+        raise ValueError(f"Number of states must be between 2 and 4, got {n_states}")
+
+    step = steps['step_m'].to_numpy()
+    angle = steps['turn_angle'].to_numpy()
+    codes = steps['ind_code'].to_numpy()
+    valid = usable_steps(steps) & (steps['dt_s'].to_numpy() > 0)
+
+    rows = np.flatnonzero(valid)
+    states = np.full(len(steps), -1, dtype=np.int64)
+    models = {}
+    individuals = steps.attrs.get('individuals', [])
+
+    if len(rows) < n_states * 10:
+        return {'states': states, 'state_names': STATE_NAMES[n_states], 'models': models}
+
+    if pooled:
+        valid_codes = codes[rows]
+        starts = np.ones(len(rows), dtype=bool)
+        starts[1:] = valid_codes[1:] != valid_codes[:-1]
+        fit = _fit_sequences(step[rows], angle[rows], starts, n_states, max_iter, tol)
+        states[rows] = fit.pop('states')
+        models['pooled'] = fit
+    else:
+        groups = np.split(rows, np.flatnonzero(np.diff(codes[rows])) + 1)
+        groups = [g for g in groups if len(g) >= n_states * 10]
+        tasks = [(step[g], angle[g], n_states, max_iter, tol) for g in groups]
+
+        parallel = n_jobs != 1 and len(tasks) > 1 and max(len(g) for g in groups) >= MIN_STEPS_FOR_PROCESS
+        if parallel:
+            with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()) as executor:
+                fits = list(executor.map(_fit_one, tasks))
+        else:
+            fits = [_fit_one(task) for task in tasks]
+
+        for g, fit in zip(groups, fits):
+            states[g] = fit.pop('states')
+            individual = individuals[codes[g[0]]] if individuals else codes[g[0]]
+            models[individual] = fit
+
+    return {'states': states, 'state_names': STATE_NAMES[n_states], 'models': models}
+
+
+def get_hmm_states(movement_data_json, n_states=3, pooled=False, outlier_settings=None):
+    """
+    Get decoded behavioral states of a serialized dataset, fitting and caching on first use.
+
+    Args:
+        movement_data_json: Movement data as stored in `store-movement-data`
+        n_states: Number of behavioral states (2-4)
+        pooled: Fit one model to all individuals
+        outlier_settings: Settings of the outlier mask (default mask if None)
+
+    Returns:
+        Result dictionary from `fit_hmm`, aligned with the cached step table
+    """
+    version = dataset_version(movement_data_json)
+    kind = f"hmm_{n_states}_{'pooled' if pooled else 'individual'}{outlier_suffix(outlier_settings)}"
+    result = get_result(version, kind)
+    if result is None:
+        steps = get_step_table(movement_data_json, outlier_settings=outlier_settings)
+        result = fit_hmm(steps, n_states=n_states, pooled=pooled)
+        store_result(version, kind, result)
+    return result
+
+
+def active_from_states(states):
+    """
+    Map decoded states to the active/resting split used by the activity charts.
+
+    Args:
+        states: State index per step table row from `fit_hmm`
+
+    Returns:
+        Boolean numpy array, True for every state except resting
+    """
+    return states > 0
@@ -0,0 +1,506 @@
+"""
+Home Range Component
+Home range estimators (MCP, KDE, simplified BBMM and T-LoCoH) per individual,
+with progress reporting so they can run as background jobs
+
+Estimators take an optional `progress(fraction, message, partial)` callable that is
+called after every individual (and periodically within slow estimators) with the
+results finished so far. Contour extraction needs the optional scikit-image package.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import spatial, stats
+from scipy.spatial import ConvexHull
+from shapely.geometry import MultiPoint, MultiPolygon, Point, Polygon
+from shapely.ops import unary_union
+
+from components.tracks import split_individuals
+
+# Home range methods and their estimators' display names
+HOME_RANGE_METHODS = {
+    'mcp': 'Minimum Convex Polygon',
+    'kde': 'Kernel Density Estimation',
+    'bbmm': 'Brownian Bridge Movement Model',
+    'locoht': 'T-LoCoH',
+}
+
+# Steps of the slow estimators between progress reports
+PROGRESS_EVERY = 50
+
+
+def find_contours(grid, level):
+    """Iso-lines of a density grid in grid index coordinates (needs scikit-image)."""
+    from skimage import measure
+    return measure.find_contours(grid, level)
+
+
+def per_individual(df, estimate, progress=None):
+    """
+    Run a single-track estimator for every individual.
+
+    Args:
+        df: Fixes with an optional individual_id column
+        estimate: Callable (df, progress) returning the result of one track;
+            progress is None or a callable taking the fraction of the track done
+        progress: Optional callable (fraction, message, partial)
+
+    Returns:
+        Dictionary of individual to result, or the result of the whole data
+        when there is no individual_id column
+    """
+    if 'individual_id' not in df.columns:
+        return estimate(df, None)
+
+    result = {}
+    individuals = df['individual_id'].nunique()
+    for i, (individual, track) in enumerate(split_individuals(df)):
+        track_progress = None
+        if progress is not None:
+            message = f"Individual {i + 1} of {individuals}"
+            track_progress = lambda fraction, i=i, message=message: progress(
+                (i + fraction) / individuals, message)
+        result[str(individual)] = estimate(track, track_progress)
+        if progress is not None:
+            progress((i + 1) / individuals, f"{i + 1} of {individuals} individuals done", result)
+    return result
+
+
+def home_range_job(df, method='mcp', percent_levels=(50, 95), grid_size=100, smoothing_factor=1.0,
+                   individuals=None, progress=None):
+    """
+    Estimate home ranges with one method, e.g. as a background job.
+
+    Args:
+        df: Fixes with individual_id, timestamp, location_lat and location_long columns
+        method: One of HOME_RANGE_METHODS
+        percent_levels: Isopleth levels (%)
+        grid_size: Grid cells per axis of the density estimators
+        smoothing_factor: KDE bandwidth factor
+        individuals: Individuals to include (all if None or empty)
+        progress: Optional callable (fraction, message, partial); partial results
+            are keyed by method like the final result
+
+    Returns:
+        Dictionary {method: per-individual results}
+    """
+    if 'location_lat' not in df.columns or 'location_long' not in df.columns:
+        return {}
+    if individuals and 'individual_id' in df.columns:
+        df = df[df['individual_id'].isin(individuals)]
+
+    method_progress = None
+    if progress is not None:
+        def method_progress(fraction, message, partial=None):
+            progress(fraction, message, None if partial is None else {method: partial})
+
+    if method == "mcp":
+        return {"mcp": calculate_mcp_home_range(df, percent_levels, method_progress)}
+    elif method == "kde":
+        return {"kde": calculate_kde_home_range(df, percent_levels, grid_size, smoothing_factor, method_progress)}
+    elif method == "bbmm":
+        return {"bbmm": calculate_bbmm_home_range(df, percent_levels, grid_size, method_progress)}
+    elif method == "locoht":
+        return {"locoht": calculate_locoht_home_range(df, percent_levels, method_progress)}
+    return {}
+
+
+# MCP Home Range Calculation
+def calculate_mcp_home_range(df, percent_levels, progress=None):
+    return per_individual(df, lambda ind_df, _: calculate_single_mcp(ind_df, percent_levels), progress)
+
+def calculate_single_mcp(df, percent_levels):
+    result = {}
+    
+    # Create a list of points for shapely
+    points = [Point(lon, lat) for lon, lat in zip(df['location_long'], df['location_lat'])]
+    
+    # Calculate MultiPoint and convex hull
+    multi_point = MultiPoint(points)
+    
+    # Calculate full MCP (100%)
+    hull = multi_point.convex_hull
+    
+    # Calculate area in square kilometers (approximate)
+    # This is an approximation assuming a flat surface
+    area_100 = calculate_area_km2(hull, df['location_lat'].mean())
+    result["area_100"] = area_100
+    result["hull_100"] = hull_to_geojson(hull)
+    
+    # Calculate MCPs for specified percent levels
+    for percent in percent_levels:
+        if percent == 100:
+            continue  # Already calculated
+            
+        # Randomly sample points
+        n_points = len(points)
+        sample_size = int(n_points * (percent / 100))
+        
+        if sample_size >= 3:  # Need at least 3 points for a polygon
+            # Sample points
+            random_indices = np.random.choice(range(n_points), sample_size, replace=False)
+            sampled_points = [points[i] for i in random_indices]
+            sampled_multi_point = MultiPoint(sampled_points)
+            sampled_hull = sampled_multi_point.convex_hull
+            
+            # Calculate area
+            area = calculate_area_km2(sampled_hull, df['location_lat'].mean())
+            result[f"area_{percent}"] = area
+            result[f"hull_{percent}"] = hull_to_geojson(sampled_hull)
+    
+    return result
+
+# KDE Home Range Calculation
+def calculate_kde_home_range(df, percent_levels, grid_size, smoothing_factor, progress=None):
+    return per_individual(
+        df, lambda ind_df, _: calculate_single_kde(ind_df, percent_levels, grid_size, smoothing_factor), progress)
+
+def calculate_single_kde(df, percent_levels, grid_size, smoothing_factor):
+    result = {}
+    
+    try:
+        # Extract coordinates
+        x = df['location_long'].to_numpy()
+        y = df['location_lat'].to_numpy()
+        
+        # Create grid for KDE calculation
+        x_min, x_max = x.min(), x.max()
+        y_min, y_max = y.min(), y.max()
+        
+        # Add buffer around min/max
+        buffer_x = (x_max - x_min) * 0.1
+        buffer_y = (y_max - y_min) * 0.1
+        
+        x_min -= buffer_x
+        x_max += buffer_x
+        y_min -= buffer_y
+        y_max += buffer_y
+        
+        # Create grid
+        x_grid = np.linspace(x_min, x_max, grid_size)
+        y_grid = np.linspace(y_min, y_max, grid_size)
+        xx, yy = np.meshgrid(x_grid, y_grid)
+        
+        # Stack coordinates for KDE input
+        positions = np.vstack([xx.ravel(), yy.ravel()])
+        values = np.vstack([x, y])
+        
+        # Calculate KDE
+        kernel = stats.gaussian_kde(values, bw_method=smoothing_factor)
+        kde = np.reshape(kernel(positions).T, xx.shape)
+        
+        # Find contour levels
+        kde_sorted = np.sort(kde.flatten())[::-1]  # Sort in descending order
+        cumsum = np.cumsum(kde_sorted)
+        cumsum = cumsum / cumsum[-1]  # Normalize
+        
+        # Store raw KDE data
+        result["kde_grid"] = kde.tolist()
+        result["x_grid"] = x_grid.tolist()
+        result["y_grid"] = y_grid.tolist()
+        
+        # Calculate contours for each percent level
+        for percent in percent_levels:
+            # Find the kde value that gives the specified percent level
+            idx = np.argmin(np.abs(cumsum - (percent / 100)))
+            contour_level = kde_sorted[idx]
+            
+            # Generate contour
+            contours = find_contours(kde, contour_level)
+            
+            # Convert contours to geographic coordinates
+            geo_contours = []
+            for contour in contours:
+                # Map from grid indices to geographic coordinates
+                contour_y = np.interp(contour[:, 0], np.arange(grid_size), y_grid)
+                contour_x = np.interp(contour[:, 1], np.arange(grid_size), x_grid)
+                geo_contours.append(list(zip(contour_x, contour_y)))
+            
+            # Convert to polygons and calculate area
+            polygons = [Polygon(contour) for contour in geo_contours if len(contour) >= 3]
+            if polygons:
+                multi_polygon = MultiPolygon(polygons)
+                area = calculate_area_km2(multi_polygon, df['location_lat'].mean())
+                result[f"area_{percent}"] = area
+                result[f"contour_{percent}"] = contour_to_geojson(multi_polygon)
+                
+    except Exception as e:
+        result["error"] = str(e)
+    
+    return result
+
+# Brownian Bridge Movement Model (BBMM) - Simplified implementation
+def calculate_bbmm_home_range(df, percent_levels, grid_size, progress=None):
+    # In a real implementation, this would use a proper BBMM package
+    # For this demo, we'll use a simplified approach similar to KDE but with time weighting
+    if 'timestamp' not in df.columns:
+        return {}
+    return per_individual(
+        df, lambda ind_df, track_progress: calculate_single_bbmm(ind_df, percent_levels, grid_size, track_progress),
+        progress)
+
+def calculate_single_bbmm(df, percent_levels, grid_size, progress=None):
+    # This is a simplified implementation
+    result = {}
+    
+    try:
+        # Sort by timestamp
+        if 'timestamp' in df.columns:
+            df = df.sort_values('timestamp')
+            
+            # Calculate time differences
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            df['time_diff'] = df['timestamp'].diff().dt.total_seconds() / 3600  # In hours
+            
+            # Replace NaN in first row and cap large gaps
+            df['time_diff'] = df['time_diff'].fillna(0).clip(upper=24)  # Cap at 24 hours
+            
+            # Use time differences as weights
+            weights = 1.0 / (df['time_diff'] + 0.1)  # Add small constant to avoid division by zero
+            weights = (weights / weights.sum()).to_numpy()  # Normalize, positional like x and y
+            
+            # Extract coordinates
+            x = df['location_long'].to_numpy()
+            y = df['location_lat'].to_numpy()
+            
+            # Create grid
+            x_min, x_max = x.min(), x.max()
+            y_min, y_max = y.min(), y.max()
+            
+            # Add buffer
+            buffer_x = (x_max - x_min) * 0.1
+            buffer_y = (y_max - y_min) * 0.1
+            
+            x_min -= buffer_x
+            x_max += buffer_x
+            y_min -= buffer_y
+            y_max += buffer_y
+            
+            x_grid = np.linspace(x_min, x_max, grid_size)
+            y_grid = np.linspace(y_min, y_max, grid_size)
+            xx, yy = np.meshgrid(x_grid, y_grid)
+            
+            # Calculate weighted KDE as a simplified BBMM
+            grid_values = np.zeros_like(xx)
+            
+            for i in range(len(x) - 1):
+                if progress is not None and i % PROGRESS_EVERY == 0:
+                    progress(i / len(x))
+                
+                # Calculate segment contribution based on time
+                weight = weights[i+1]
+                
+                # Create a density between consecutive points
+                segment_density = np.zeros_like(xx)
+                
+                for j in range(grid_size):
+                    for k in range(grid_size):
+                        # Distance from grid point to line segment
+                        dist = point_to_segment_distance(
+                            xx[j, k], yy[j, k],
+                            x[i], y[i],
+                            x[i+1], y[i+1]
+                        )
+                        # Apply Gaussian kernel
+                        segment_density[j, k] = np.exp(-dist * dist / 0.001) * weight
+                
+                grid_values += segment_density
+            
+            # Normalize grid values
+            grid_values = grid_values / grid_values.sum()
+            
+            # Store grid data
+            result["bbmm_grid"] = grid_values.tolist()
+            result["x_grid"] = x_grid.tolist()
+            result["y_grid"] = y_grid.tolist()
+            
+            # Calculate contours for each percent level
+            grid_sorted = np.sort(grid_values.flatten())[::-1]
+            cumsum = np.cumsum(grid_sorted)
+            cumsum = cumsum / cumsum[-1]  # Normalize
+            
+            for percent in percent_levels:
+                # Find contour level
+                idx = np.argmin(np.abs(cumsum - (percent / 100)))
+                contour_level = grid_sorted[idx]
+                
+                # Generate contour
+                contours = find_contours(grid_values, contour_level)
+                
+                # Convert to geographic coordinates
+                geo_contours = []
+                for contour in contours:
+                    contour_y = np.interp(contour[:, 0], np.arange(grid_size), y_grid)
+                    contour_x = np.interp(contour[:, 1], np.arange(grid_size), x_grid)
+                    geo_contours.append(list(zip(contour_x, contour_y)))
+                
+                # Convert to polygons and calculate area
+                polygons = [Polygon(contour) for contour in geo_contours if len(contour) >= 3]
+                if polygons:
+                    multi_polygon = MultiPolygon(polygons)
+                    area = calculate_area_km2(multi_polygon, df['location_lat'].mean())
+                    result[f"area_{percent}"] = area
+                    result[f"contour_{percent}"] = contour_to_geojson(multi_polygon)
+            
+    except Exception as e:
+        result["error"] = str(e)
+    
+    return result
+
+# Calculate T-LoCoH Home Range (simplified implementation)
+def calculate_locoht_home_range(df, percent_levels, progress=None):
+    return per_individual(
+        df, lambda ind_df, track_progress: calculate_single_locoht(ind_df, percent_levels, track_progress), progress)
+
+def calculate_single_locoht(df, percent_levels, progress=None):
+    # This is a simplified implementation of T-LoCoH
+    result = {}
+    
+    try:
+        # Extract coordinates
+        coords = np.column_stack((df['location_long'].values, df['location_lat'].values))
+        n_points = len(coords)
+        
+        if n_points < 5:
+            result["error"] = "Not enough points for T-LoCoH analysis"
+            return result
+        
+        # Calculate pairwise distances
+        dist_matrix = spatial.distance.cdist(coords, coords, 'euclidean')
+        
+        # Incorporate time if available
+        if 'timestamp' in df.columns:
+            times = pd.to_datetime(df['timestamp']).values.astype(np.int64) // 10**9  # Convert to Unix time
+            time_matrix = spatial.distance.cdist(times.reshape(-1, 1), times.reshape(-1, 1), 'euclidean')
+            # Normalize time matrix
+            time_matrix = time_matrix / time_matrix.max() if time_matrix.max() > 0 else time_matrix
+            
+            # Combine space and time with s parameter = 0.5 (equal weight)
+            combined_matrix = dist_matrix + 0.5 * time_matrix
+        else:
+            combined_matrix = dist_matrix
+        
+        # Set diagonal to infinity to avoid self-neighbors
+        np.fill_diagonal(combined_matrix, np.inf)
+        
+        # Create local hulls
+        k = min(15, n_points - 1)  # Number of nearest neighbors
+        hulls = []
+        hull_areas = []
+        
+        for i in range(n_points):
+            if progress is not None and i % PROGRESS_EVERY == 0:
+                progress(i / n_points)
+            
+            # Find k nearest neighbors
+            neighbors_idx = np.argsort(combined_matrix[i])[:k+1]  # +1 to include self
+            neighbor_coords = coords[neighbors_idx]
+            
+            # Create convex hull
+            if len(neighbor_coords) >= 3:
+                hull = ConvexHull(neighbor_coords)
+                hull_points = neighbor_coords[hull.vertices]
+                
+                # Calculate hull area (simplified, should be geodesic in full implementation)
+                hull_poly = Polygon(hull_points)
+                area = calculate_area_km2(hull_poly, df['location_lat'].mean())
+                
+                hulls.append(hull_poly)
+                hull_areas.append(area)
+        
+        # Sort hulls by area
+        sorted_indices = np.argsort(hull_areas)
+        sorted_hulls = [hulls[i] for i in sorted_indices]
+        
+        # Calculate isopleth hulls for different percent levels
+        total_area = sum(hull_areas)
+        
+        for percent in percent_levels:
+            # Calculate how many hulls to include
+            target_area = total_area * (percent / 100)
+            current_area = 0
+            included_hulls = []
+            
+            for i, hull in enumerate(sorted_hulls):
+                current_area += hull_areas[sorted_indices[i]]
+                included_hulls.append(hull)
+                
+                if current_area >= target_area:
+                    break
+            
+            # Union of included hulls
+            if included_hulls:
+                union_poly = unary_union(included_hulls)
+                area = calculate_area_km2(union_poly, df['location_lat'].mean())
+                result[f"area_{percent}"] = area
+                result[f"contour_{percent}"] = contour_to_geojson(union_poly)
+    
+    except Exception as e:
+        result["error"] = str(e)
+    
+    return result
+
+# Helper function to calculate area in km²
+def calculate_area_km2(polygon, mean_latitude):
+    # Convert area in degrees to km² (approximate)
+    # At the equator, 1° longitude = 111.32 km
+    # At latitude L, 1° longitude = 111.32 * cos(L) km
+    lat_correction = np.cos(np.radians(mean_latitude))
+    area_degrees = polygon.area
+    area_km2 = area_degrees * (111.32**2) * lat_correction
+    return area_km2
+
+# Helper function to convert shapely polygon to GeoJSON format
+def hull_to_geojson(hull):
+    if hull.geom_type == 'Polygon':
+        exterior_coords = np.asarray(hull.exterior.coords).tolist()
+        return {
+            "type": "Polygon",
+            "coordinates": [exterior_coords]
+        }
+    return None
+
+# Helper function to convert contour to GeoJSON
+def contour_to_geojson(contour):
+    if contour.geom_type == 'Polygon':
+        exterior_coords = np.asarray(contour.exterior.coords).tolist()
+        interior_coords = [np.asarray(interior.coords).tolist() for interior in contour.interiors]
+        return {
+            "type": "Polygon",
+            "coordinates": [exterior_coords] + interior_coords
+        }
+    elif contour.geom_type == 'MultiPolygon':
+        multi_coords = []
+        for polygon in contour.geoms:
+            exterior_coords = np.asarray(polygon.exterior.coords).tolist()
+            interior_coords = [np.asarray(interior.coords).tolist() for interior in polygon.interiors]
+            multi_coords.append([exterior_coords] + interior_coords)
+        return {
+            "type": "MultiPolygon",
+            "coordinates": multi_coords
+        }
+    return None
+
+# Helper function for BBMM calculation
+def point_to_segment_distance(px, py, x1, y1, x2, y2):
+    # Calculate the distance from point (px, py) to line segment (x1,y1)-(x2,y2)
+    line_length_sq = (x2 - x1)**2 + (y2 - y1)**2
+    
+    if line_length_sq == 0:
+        # Points are the same
+        return np.sqrt((px - x1)**2 + (py - y1)**2)
+    
+    # Calculate projection
+    t = ((px - x1) * (x2 - x1) + (py - y1) * (y2 - y1)) / line_length_sq
+    
+    if t < 0:
+        # Beyond point 1
+        return np.sqrt((px - x1)**2 + (py - y1)**2)
+    elif t > 1:
+        # Beyond point 2
+        return np.sqrt((px - x2)**2 + (py - y2)**2)
+    else:
+        # On the segment
+        proj_x = x1 + t * (x2 - x1)
+        proj_y = y1 + t * (y2 - y1)
+        return np.sqrt((px - proj_x)**2 + (py - proj_y)**2)
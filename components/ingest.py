@@ -0,0 +1,187 @@
+"""
+Ingest Component
+Ingest-time normalization of uploaded fixes: drops unusable rows, sorts every
+individual's fixes and resolves duplicate and near-duplicate timestamps
+
+Resolution runs on the sorted table in vectorized form, so every downstream
+engine gets strictly increasing timestamps per individual. The resolution
+report says what was changed.
+"""
+
+import numpy as np
+import pandas as pd
+
+from components.schema import HDOP, INDIVIDUAL, LAT, LON, find_column
+
+# Duplicate resolution policies
+DUPLICATE_POLICIES = {
+    'best_dop': 'Keep the fix with the lowest HDOP',
+    'first': 'Keep the first fix in the file',
+    'mean': 'Average the positions',
+}
+DEFAULT_POLICY = 'best_dop'
+
+# Fixes of one individual closer than this (seconds) are treated as the same fix
+DEFAULT_TOLERANCE_S = 1
+
+
+def resolve_duplicates(df, policy=DEFAULT_POLICY, tolerance_s=DEFAULT_TOLERANCE_S):
+    """
+    Sort fixes by individual and time and resolve duplicate fixes.
+
+    Fixes of the same individual less than `tolerance_s` after the first fix of
+    their group, or at the same time, form a duplicate group (a tolerance of 0
+    merges identical timestamps only), which is reduced to one fix:
+    'best_dop' keeps the fix with the lowest HDOP (the first fix if the data has
+    no HDOP), 'first' keeps the first fix in file order and 'mean' keeps the
+    first fix with the group's mean position.
+
+    Args:
+        df: DataFrame with individual, timestamp and location columns
+        policy: One of DUPLICATE_POLICIES
+        tolerance_s: Time difference (seconds) from the first fix of a group
+            below which fixes are duplicates
+
+    Returns:
+        Tuple (clean DataFrame sorted by individual and time with a fresh index,
+        resolution report dictionary from `resolution_report`)
+    """
+    if policy not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicate policy: {policy}")
+    if tolerance_s < 0:
+        raise ValueError(f"Duplicate tolerance must not be negative: {tolerance_s}")
+
+    id_col = find_column(df, INDIVIDUAL)
+    lat_col = find_column(df, LAT)
+    lon_col = find_column(df, LON)
+    hdop_col = find_column(df, HDOP)
+    if lat_col is None or lon_col is None or 'timestamp' not in df.columns:
+        raise ValueError("Ingest needs timestamp and location columns")
+
+    n_rows = len(df)
+    timestamps = pd.to_datetime(df['timestamp'], errors='coerce')
+    lat = pd.to_numeric(df[lat_col], errors='coerce').to_numpy(dtype=np.float64)
+    lon = pd.to_numeric(df[lon_col], errors='coerce').to_numpy(dtype=np.float64)
+
+    # Rows without an individual, a time or a position cannot be used
+    usable = timestamps.notna().to_numpy() & np.isfinite(lat) & np.isfinite(lon)
+    if id_col is not None:
+        ids = df[id_col]
+        usable &= (ids.notna() & (ids.astype(str).str.strip() != '')).to_numpy()
+    rows = np.flatnonzero(usable)
+    if id_col is not None:
+        codes, individuals = pd.factorize(df[id_col].to_numpy()[rows], sort=True)
+    else:
+        codes = np.zeros(len(rows), dtype=np.int64)
+        individuals = pd.Index(['all'])
+    time_ns = timestamps.to_numpy(dtype='datetime64[ns]').astype(np.int64)[rows]
+
+    # Fixes earlier than the fix before them in the file (same individual)
+    file_order = np.lexsort((rows, codes))
+    earlier = np.zeros(len(rows), dtype=bool)
+    same = codes[file_order][1:] == codes[file_order][:-1]
+    earlier[file_order[1:]] = same & (time_ns[file_order][1:] < time_ns[file_order][:-1])
+
+    # Stable sort: fixes with equal times keep their file order
+    order = np.lexsort((rows, time_ns, codes))
+    rows, codes, time_ns, earlier = rows[order], codes[order], time_ns[order], earlier[order]
+
+    # Duplicate groups hold the fixes closer than the tolerance to the group's first
+    # fix, and always the fixes at the same time; gaps between neighbors give the
+    # first split, then the first fix of a group at or beyond the tolerance opens
+    # a new group until none is left
+    tolerance_ns = tolerance_s * 1e9
+    opens = np.ones(len(rows), dtype=bool)
+    gap = np.diff(time_ns)
+    opens[1:] = (codes[1:] != codes[:-1]) | ((gap > 0) & (gap >= tolerance_ns))
+    while True:
+        group = np.cumsum(opens) - 1
+        starts = np.flatnonzero(opens)
+        offset = time_ns - time_ns[starts][group]
+        late = np.flatnonzero(~opens & (offset > 0) & (offset >= tolerance_ns))
+        if not len(late):
+            break
+        opens[late[np.r_[True, group[late][1:] != group[late][:-1]]]] = True
+
+    if policy == 'best_dop' and hdop_col is not None:
+        hdop = pd.to_numeric(df[hdop_col], errors='coerce').to_numpy(dtype=np.float64)[rows]
+        best = np.lexsort((np.arange(len(rows)), np.nan_to_num(hdop, nan=np.inf), group))
+        keep = best[np.r_[True, group[best][1:] != group[best][:-1]]]
+    else:
+        keep = starts
+
+    clean = df.iloc[rows[keep]].reset_index(drop=True)
+    if policy == 'mean' and len(starts):
+        clean[lat_col] = np.add.reduceat(lat[rows], starts) / np.diff(np.r_[starts, len(rows)])
+        clean[lon_col] = np.add.reduceat(lon[rows], starts) / np.diff(np.r_[starts, len(rows)])
+    clean['timestamp'] = timestamps.iloc[rows[keep]].to_numpy()
+
+    report = resolution_report(individuals, codes, opens, earlier, n_rows, n_rows - len(rows),
+                               policy, tolerance_s)
+    return clean, report
+
+
+def resolution_report(individuals, codes, opens, earlier, rows_in, invalid, policy, tolerance_s):
+    """
+    Summarize a duplicate resolution.
+
+    Args:
+        individuals: Individual labels
+        codes: Individual code of every usable fix, sorted
+        opens: True where a fix starts a new duplicate group
+        earlier: True where a fix was out of order in the file
+        rows_in: Number of input rows
+        invalid: Number of rows dropped for a missing individual, time or position
+        policy: Resolution policy used
+        tolerance_s: Duplicate tolerance used
+
+    Returns:
+        Dictionary with rows_in, rows_out, invalid, duplicates (fixes removed),
+        duplicate_groups, out_of_order, policy, tolerance_s and 'individuals'
+        (records with individual_id, fixes, duplicates and out_of_order)
+    """
+    n_individuals = len(individuals)
+    duplicate = ~opens
+    group_size = np.diff(np.r_[np.flatnonzero(opens), len(opens)])
+
+    per_individual = pd.DataFrame({
+        'individual_id': np.asarray(individuals).astype(str),
+        'fixes': np.bincount(codes[opens], minlength=n_individuals),
+        'duplicates': np.bincount(codes[duplicate], minlength=n_individuals),
+        'out_of_order': np.bincount(codes[earlier], minlength=n_individuals)
+    })
+    changed = per_individual[(per_individual['duplicates'] > 0) | (per_individual['out_of_order'] > 0)]
+
+    return {
+        'rows_in': int(rows_in),
+        'rows_out': int(opens.sum()),
+        'invalid': int(invalid),
+        'duplicates': int(duplicate.sum()),
+        'duplicate_groups': int((group_size > 1).sum()),
+        'out_of_order': int(earlier.sum()),
+        'policy': policy,
+        'tolerance_s': tolerance_s,
+        'individuals': changed.to_dict('records')
+    }
+
+
+def describe_resolution(report):
+    """
+    One-line description of a resolution report for status messages.
+
+    Args:
+        report: Dictionary from `resolve_duplicates`
+
+    Returns:
+        Description string
+    """
+    parts = []
+    if report['duplicates']:
+        policy = DUPLICATE_POLICIES[report['policy']]
+        parts.append(f"{report['duplicates']:,} duplicate fixes resolved in {report['duplicate_groups']:,} groups "
+                     f"({policy[0].lower() + policy[1:]})")
+    if report['out_of_order']:
+        parts.append(f"{report['out_of_order']:,} out-of-order fixes sorted")
+    if report['invalid']:
+        parts.append(f"{report['invalid']:,} rows without individual, time or position dropped")
+    return "; ".join(parts) if parts else "No duplicate or out-of-order fixes found"
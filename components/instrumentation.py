@@ -0,0 +1,432 @@
+"""
+Instrumentation Component
+Wall time, CPU time, peak memory and payload sizes of Dash callbacks and analysis
+functions, exposed as Prometheus text on the Flask server, with on-demand profiling
+
+Callbacks are wrapped when they are registered (see `instrument_callbacks`) and
+module functions by `instrument_module`. For callbacks, input and output payloads
+are the actual request and response bodies, and the whole request time is recorded
+next to the callback time, so JSON decoding and figure serialization show up as the
+difference. For functions, payloads are estimated from a sample of the items of lists
+and dicts, so measuring stays cheap next to the call. Peak memory is traced only when METRICS_TRACE_MEMORY is set (tracemalloc
+slows allocation-heavy code considerably).
+
+A profile of the next call of one function is armed with /metrics/profile?name=...;
+the report is then listed at /metrics/profiles. pyinstrument is optional.
+"""
+
+import cProfile
+import functools
+import importlib.util
+import inspect
+import io
+import itertools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+# Set INSTRUMENTATION=0 to register functions and callbacks unwrapped
+INSTRUMENTATION = os.environ.get('INSTRUMENTATION', '1') != '0'
+
+# Trace peak memory of every call with tracemalloc
+TRACE_MEMORY = bool(os.environ.get('METRICS_TRACE_MEMORY'))
+
+# Upper bounds (seconds) of the wall time histogram buckets
+WALL_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Profile reports kept
+MAX_PROFILES = 20
+
+# Items of a list or dict measured by payload_size; the size of the others is
+# extrapolated from them, so a result with 200k features costs as much as one with 8
+PAYLOAD_SAMPLE_ITEMS = 8
+
+# Nesting depth payload_size descends into (deeper values count as 8 bytes)
+PAYLOAD_MAX_DEPTH = 4
+
+# Profilers for on-demand capture
+PROFILERS = ('cprofile', 'pyinstrument')
+
+_DASH_UPDATE_PATH = '/_dash-update-component'
+
+_lock = threading.Lock()
+_metrics = OrderedDict()
+_armed = {}
+_profiles = deque(maxlen=MAX_PROFILES)
+_profile_count = 0
+
+
+class CallMetrics:
+    """Aggregated measurements of one instrumented function."""
+
+    __slots__ = ('kind', 'calls', 'errors', 'wall_s', 'cpu_s', 'max_wall_s', 'peak_memory_bytes',
+                 'input_bytes', 'output_bytes', 'request_s', 'buckets')
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.calls = 0
+        self.errors = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.max_wall_s = 0.0
+        self.peak_memory_bytes = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.request_s = 0.0
+        self.buckets = [0] * len(WALL_BUCKETS)
+
+
+def _entry(name, kind):
+    entry = _metrics.get(name)
+    if entry is None:
+        entry = _metrics[name] = CallMetrics(kind)
+    return entry
+
+
+def payload_size(value, depth=0):
+    """
+    Approximate in-memory size of a function argument or result in bytes.
+
+    Args:
+        value: Any value; strings, arrays and pandas objects are measured, containers
+            estimated from a sample of their items and other objects counted as 8 bytes
+        depth: Nesting depth of the value
+
+    Returns:
+        Size in bytes
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=False, deep=False)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (dict, list, tuple)):
+        if not value:
+            return 0
+        if depth >= PAYLOAD_MAX_DEPTH:
+            return 8 * len(value)
+        if isinstance(value, dict):
+            items = itertools.islice(value.items(), PAYLOAD_SAMPLE_ITEMS)
+            sampled = sum(payload_size(k, depth + 1) + payload_size(v, depth + 1) for k, v in items)
+        else:
+            step = max(len(value) // PAYLOAD_SAMPLE_ITEMS, 1)
+            sampled = sum(payload_size(item, depth + 1) for item in value[::step][:PAYLOAD_SAMPLE_ITEMS])
+        return sampled * len(value) // min(len(value), PAYLOAD_SAMPLE_ITEMS)
+    return 8
+
+
+def record_call(name, kind, wall_s, cpu_s, peak_memory_bytes=0, input_bytes=0, output_bytes=0, failed=False):
+    """
+    Add one call to the metrics of a function.
+
+    Args:
+        name: Metric name of the function
+        kind: 'callback' or 'function'
+        wall_s, cpu_s: Wall and CPU time of the call
+        peak_memory_bytes: Peak traced memory of the call
+        input_bytes, output_bytes: Payload sizes
+        failed: Whether the call raised
+    """
+    with _lock:
+        entry = _entry(name, kind)
+        entry.calls += 1
+        entry.errors += failed
+        entry.wall_s += wall_s
+        entry.cpu_s += cpu_s
+        entry.max_wall_s = max(entry.max_wall_s, wall_s)
+        entry.peak_memory_bytes = max(entry.peak_memory_bytes, peak_memory_bytes)
+        entry.input_bytes += input_bytes
+        entry.output_bytes += output_bytes
+        for i, bound in enumerate(WALL_BUCKETS):
+            if wall_s <= bound:
+                entry.buckets[i] += 1
+                break
+
+
+def _record_request(name, request_s, input_bytes, output_bytes):
+    with _lock:
+        entry = _entry(name, 'callback')
+        entry.request_s += request_s
+        entry.input_bytes += input_bytes
+        entry.output_bytes += output_bytes
+
+
+def arm_profile(name, profiler='cprofile'):
+    """
+    Profile the next call of an instrumented function.
+
+    Args:
+        name: Metric name of the function ('*' for the next instrumented call)
+        profiler: One of PROFILERS
+    """
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler: {profiler}")
+    if profiler == 'pyinstrument' and importlib.util.find_spec('pyinstrument') is None:
+        raise ValueError("pyinstrument is not installed")
+    with _lock:
+        _armed[name] = profiler
+
+
+def _take_armed(name):
+    if not _armed:
+        return None
+    with _lock:
+        return _armed.pop(name, None) or _armed.pop('*', None)
+
+
+def _profiled_call(function, args, kwargs, name, profiler):
+    if profiler == 'pyinstrument':
+        from pyinstrument import Profiler
+        session = Profiler()
+        session.start()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            session.stop()
+            _keep_profile(name, profiler, session.output_text(unicode=False, color=False))
+
+    session = cProfile.Profile()
+    try:
+        return session.runcall(function, *args, **kwargs)
+    finally:
+        stream = io.StringIO()
+        pstats.Stats(session, stream=stream).sort_stats('cumulative').print_stats(40)
+        _keep_profile(name, profiler, stream.getvalue())
+
+
+def _keep_profile(name, profiler, report):
+    global _profile_count
+    with _lock:
+        _profile_count += 1
+        _profiles.append({'id': _profile_count, 'name': name, 'profiler': profiler,
+                          'created': time.time(), 'report': report})
+
+
+def instrument(function, name=None, kind='function'):
+    """
+    Wrap a function to record its metrics.
+
+    Args:
+        function: Function to wrap
+        name: Metric name (module-qualified function name if None)
+        kind: 'callback' (payloads are taken from the HTTP request) or 'function'
+            (payloads are estimated with `payload_size`)
+
+    Returns:
+        The wrapper, or the function itself if instrumentation is disabled
+    """
+    if not INSTRUMENTATION or getattr(function, '__instrumented__', False):
+        return function
+    name = name or f"{function.__module__.rsplit('.', 1)[-1]}.{function.__qualname__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if kind == 'callback':
+            _mark_request(name)
+        profiler = _take_armed(name)
+        trace = TRACE_MEMORY and not tracemalloc.is_tracing()
+        if trace:
+            tracemalloc.start()
+        started, cpu_started = time.perf_counter(), time.thread_time()
+        failed = False
+        result = None
+        try:
+            if profiler:
+                result = _profiled_call(function, args, kwargs, name, profiler)
+            else:
+                result = function(*args, **kwargs)
+            return result
+        except Exception:
+            failed = True
+            raise
+        finally:
+            wall_s, cpu_s = time.perf_counter() - started, time.thread_time() - cpu_started
+            peak = 0
+            if trace:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            if kind == 'callback':
+                record_call(name, kind, wall_s, cpu_s, peak, failed=failed)
+            else:
+                record_call(name, kind, wall_s, cpu_s, peak,
+                            payload_size(args) + payload_size(kwargs), payload_size(result), failed)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def instrument_module(module, names=None):
+    """
+    Instrument the public functions of a module and the public methods of its classes, in place.
+
+    Call this before other modules import names from the module, or they keep the
+    unwrapped functions.
+
+    Args:
+        module: Module object
+        names: Names to instrument (all public functions and classes defined in the module if None)
+    """
+    for attribute, value in list(vars(module).items()):
+        if attribute.startswith('_') or (names is not None and attribute not in names):
+            continue
+        if getattr(value, '__module__', None) != module.__name__:
+            continue
+        if inspect.isfunction(value):
+            setattr(module, attribute, instrument(value))
+        elif inspect.isclass(value):
+            for method_name, method in list(vars(value).items()):
+                if not method_name.startswith('_') and inspect.isfunction(method):
+                    setattr(value, method_name, instrument(method))
+
+
+def instrument_callbacks(register):
+    """
+    Wrap a callback decorator (`dash.callback` or `app.callback`) so callbacks are instrumented.
+
+    Args:
+        register: Callback decorator factory
+
+    Returns:
+        Decorator factory with the same arguments
+    """
+    if not INSTRUMENTATION:
+        return register
+
+    @functools.wraps(register)
+    def instrumented_register(*args, **kwargs):
+        decorator = register(*args, **kwargs)
+        return lambda function: decorator(instrument(function, name=function.__name__, kind='callback'))
+
+    return instrumented_register
+
+
+def _mark_request(name):
+    from flask import g, has_request_context
+    if has_request_context():
+        g.instrumented_callback = name
+
+
+def _labels(name, kind):
+    escaped = name.replace('\\', '\\\\').replace('"', '\\"')
+    return f'name="{escaped}",kind="{kind}"'
+
+
+def metrics_text():
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Returns:
+        Text of the metrics
+    """
+    with _lock:
+        snapshot = [(name, entry.kind, dict((slot, getattr(entry, slot)) for slot in CallMetrics.__slots__))
+                    for name, entry in _metrics.items()]
+
+    series = (
+        ('app_calls_total', 'counter', 'Calls of the instrumented function', 'calls'),
+        ('app_call_errors_total', 'counter', 'Calls that raised', 'errors'),
+        ('app_call_wall_seconds_total', 'counter', 'Wall time spent in the function', 'wall_s'),
+        ('app_call_cpu_seconds_total', 'counter', 'CPU time of the calling thread', 'cpu_s'),
+        ('app_call_wall_seconds_max', 'gauge', 'Longest call', 'max_wall_s'),
+        ('app_call_peak_memory_bytes', 'gauge', 'Largest traced peak memory of a call', 'peak_memory_bytes'),
+        ('app_call_input_bytes_total', 'counter', 'Input payload (callback request bodies)', 'input_bytes'),
+        ('app_call_output_bytes_total', 'counter', 'Output payload (callback response bodies)', 'output_bytes'),
+        ('app_callback_request_seconds_total', 'counter',
+         'Whole callback request time, including JSON decoding and serialization', 'request_s'),
+    )
+    lines = []
+    for metric, metric_type, help_text, slot in series:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for name, kind, values in snapshot:
+            if slot == 'request_s' and kind != 'callback':
+                continue
+            lines.append(f"{metric}{{{_labels(name, kind)}}} {values[slot]:.6g}")
+
+    lines.append("# HELP app_call_wall_seconds Wall time of calls")
+    lines.append("# TYPE app_call_wall_seconds histogram")
+    for name, kind, values in snapshot:
+        labels = _labels(name, kind)
+        cumulative = 0
+        for bound, count in zip(WALL_BUCKETS, values['buckets']):
+            cumulative += count
+            lines.append(f'app_call_wall_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'app_call_wall_seconds_bucket{{{labels},le="+Inf"}} {values["calls"]}')
+        lines.append(f"app_call_wall_seconds_sum{{{labels}}} {values['wall_s']:.6g}")
+        lines.append(f"app_call_wall_seconds_count{{{labels}}} {values['calls']}")
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    """Clear all recorded metrics and profiles."""
+    with _lock:
+        _metrics.clear()
+        _armed.clear()
+        _profiles.clear()
+
+
+def register_metrics_routes(server):
+    """
+    Register the metrics and profiling endpoints on the Flask server.
+
+    Endpoints:
+        /metrics                      Prometheus text metrics
+        /metrics/profile?name=...     Profile the next call of a function
+                                      (`profiler` cprofile or pyinstrument)
+        /metrics/profiles             List captured profiles
+        /metrics/profiles/<id>        Text report of a profile
+
+    Args:
+        server: Flask application
+    """
+    from flask import Response, abort, g, jsonify, request
+
+    @server.before_request
+    def _start_request_timer():
+        if request.path == _DASH_UPDATE_PATH:
+            g.request_started = time.perf_counter()
+
+    @server.after_request
+    def _record_callback_request(response):
+        name = g.get('instrumented_callback')
+        if name is not None and 'request_started' in g:
+            _record_request(name, time.perf_counter() - g.request_started,
+                            request.content_length or 0, response.calculate_content_length() or 0)
+        return response
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(metrics_text(), mimetype='text/plain; version=0.0.4')
+
+    @server.route('/metrics/profile')
+    def profile_next_call():
+        name = request.args.get('name', '*')
+        profiler = request.args.get('profiler', 'cprofile')
+        try:
+            arm_profile(name, profiler)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'armed': name, 'profiler': profiler})
+
+    @server.route('/metrics/profiles')
+    def list_profiles():
+        with _lock:
+            return jsonify([{k: v for k, v in profile.items() if k != 'report'} for profile in _profiles])
+
+    @server.route('/metrics/profiles/<int:profile_id>')
+    def profile_report(profile_id):
+        with _lock:
+            profile = next((p for p in _profiles if p['id'] == profile_id), None)
+        if profile is None:
+            abort(404)
+        return Response(profile['report'], mimetype='text/plain')
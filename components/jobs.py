@@ -0,0 +1,419 @@
+"""
+Jobs Component
+Local background job queue for long-running analyses: jobs are recorded in a
+SQLite database and run in a pool of worker processes, without an external broker
+
+Identical jobs (same kind, dataset version and parameters) share one job id, so
+repeated requests reuse the running or finished job. A group (e.g. one browser
+session's analysis of a dataset) holds one job at a time: submitting a job to it
+cancels the group's previous job unless another group still holds that job.
+Workers write progress and partial results to the database, where callbacks poll
+them; cancellation is picked up the next time a job reports progress.
+
+Dataset copies handed to workers are deleted once no active job reads them, and
+finished jobs are deleted after JOB_RETENTION_S.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib import import_module
+from io import StringIO
+
+import pandas as pd
+
+from components.data_store import dataset_version
+
+# Directory of the job database and the datasets handed to workers
+JOB_DIR = os.environ.get('JOB_DIR', './data/jobs')
+
+# Worker processes
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+
+# Job functions by kind, as 'module:function' so worker processes can import them
+JOB_KINDS = {
+    'home_range': 'components.home_range:home_range_job',
+}
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Finished jobs and idle groups are kept this long (seconds); active jobs whose
+# owner process is gone are considered stale after the same time
+JOB_RETENTION_S = int(os.environ.get('JOB_RETENTION_S', 24 * 3600))
+
+# Least time (seconds) between cleanups
+CLEANUP_INTERVAL_S = 600
+
+# Least time (seconds) between progress writes without a partial result
+PROGRESS_INTERVAL_S = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    group_key TEXT,
+    version TEXT,
+    params TEXT,
+    status TEXT NOT NULL,
+    progress REAL DEFAULT 0,
+    message TEXT,
+    partial TEXT,
+    result TEXT,
+    error TEXT,
+    owner INTEGER,
+    created REAL,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS job_groups (
+    group_key TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_version ON jobs (version, status)
+"""
+
+_executor = None
+_executor_lock = threading.Lock()
+_last_cleanup = 0.0
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled."""
+
+
+def _connect(job_dir=None):
+    job_dir = job_dir or JOB_DIR
+    os.makedirs(job_dir, exist_ok=True)
+    connection = sqlite3.connect(os.path.join(job_dir, 'jobs.sqlite'), timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, TypeError):
+        return pid is not None
+    return True
+
+
+def job_key(kind, version, params):
+    """
+    Id of a job: identical analyses of the same dataset get the same id.
+
+    Args:
+        kind: Job kind, one of JOB_KINDS
+        version: Dataset version key
+        params: JSON-serializable parameters
+
+    Returns:
+        Hex digest string
+    """
+    payload = json.dumps([kind, version, params], sort_keys=True, default=str)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+def dataset_path(version, job_dir=None):
+    """Path of the copy of a dataset read by the workers."""
+    return os.path.join(job_dir or JOB_DIR, 'datasets', f"{version}.json")
+
+
+def _spool_dataset(movement_data_json, version, job_dir=None):
+    # Written after the job is queued, so a release of the previous copy cannot remove it
+    path = dataset_path(version, job_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(partial, 'w') as f:
+        f.write(movement_data_json)
+    os.replace(partial, path)
+    return path
+
+
+def _release_dataset(connection, version, job_dir=None):
+    # Delete the dataset copy once no queued or running job needs it; the write
+    # lock keeps a job of the same dataset from being queued in between
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        active = connection.execute(
+            "SELECT 1 FROM jobs WHERE version = ? AND status IN ('queued', 'running') LIMIT 1", (version,)
+        ).fetchone()
+        if active is None:
+            try:
+                os.remove(dataset_path(version, job_dir))
+            except FileNotFoundError:
+                pass
+    finally:
+        connection.execute("COMMIT")
+
+
+def cleanup_jobs(job_dir=None, retention_s=None):
+    """
+    Delete old jobs and groups and the dataset copies no active job reads.
+
+    Finished jobs and groups not updated within the retention time are deleted;
+    active jobs not updated within it whose owner process is gone are marked failed.
+
+    Args:
+        job_dir: Directory of the job database (JOB_DIR if None)
+        retention_s: Retention time in seconds (JOB_RETENTION_S if None)
+
+    Returns:
+        Number of deleted jobs
+    """
+    cutoff = time.time() - (JOB_RETENTION_S if retention_s is None else retention_s)
+    connection = _connect(job_dir)
+    try:
+        stale = connection.execute(
+            "SELECT id, owner FROM jobs WHERE status IN ('queued', 'running') AND updated < ?", (cutoff,)
+        ).fetchall()
+        for row in stale:
+            if not _process_alive(row['owner']):
+                connection.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Job went stale', updated = ? "
+                    "WHERE id = ? AND status IN ('queued', 'running')", (time.time(), row['id'])
+                )
+
+        connection.execute("DELETE FROM job_groups WHERE updated < ?", (cutoff,))
+        deleted = connection.execute(
+            "DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND updated < ? "
+            "AND id NOT IN (SELECT job_id FROM job_groups)", (cutoff,)
+        ).rowcount
+
+        directory = os.path.dirname(dataset_path('', job_dir))
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith('.json'):
+                    _release_dataset(connection, name[:-len('.json')], job_dir)
+        return deleted
+    finally:
+        connection.close()
+
+
+def _maybe_cleanup(job_dir=None):
+    global _last_cleanup
+    now = time.time()
+    if now - _last_cleanup < CLEANUP_INTERVAL_S:
+        return
+    _last_cleanup = now
+    try:
+        cleanup_jobs(job_dir)
+    except Exception as e:
+        print(f"Error cleaning up jobs: {e}")
+
+
+def get_executor():
+    """
+    Get the worker pool of this process, starting it on first use.
+
+    Returns:
+        ProcessPoolExecutor
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=JOB_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _dispatch(job_id, path, job_dir):
+    global _executor
+    try:
+        get_executor().submit(run_job, job_id, path, job_dir)
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); start a fresh pool
+        with _executor_lock:
+            _executor = None
+        get_executor().submit(run_job, job_id, path, job_dir)
+
+
+def submit_job(kind, movement_data_json, params, group=None, job_dir=None):
+    """
+    Queue an analysis of a serialized dataset, reusing an identical job.
+
+    Args:
+        kind: Job kind, one of JOB_KINDS
+        movement_data_json: Movement data as stored in `store-movement-data`
+        params: JSON-serializable keyword arguments of the job function
+        group: Group whose job this becomes; its previous job is cancelled unless
+            another group holds it (kind and dataset if None, which shares the
+            group with every client; pass a per-session key from the app)
+        job_dir: Directory of the job database (JOB_DIR if None)
+
+    Returns:
+        Job id
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    version = dataset_version(movement_data_json)
+    job_id = job_key(kind, version, params)
+    group = group or f"{kind}:{version}"
+    now = time.time()
+
+    connection = _connect(job_dir)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        row = connection.execute("SELECT status, owner FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        reuse = row is not None and (
+            row['status'] == 'done' or
+            (row['status'] in ACTIVE_STATUSES and _process_alive(row['owner']))
+        )
+        previous = connection.execute("SELECT job_id FROM job_groups WHERE group_key = ?", (group,)).fetchone()
+        connection.execute("INSERT OR REPLACE INTO job_groups (group_key, job_id, updated) VALUES (?, ?, ?)",
+                            (group, job_id, now))
+        if previous is not None and previous['job_id'] != job_id:
+            connection.execute(
+                "UPDATE jobs SET status = 'cancelled', updated = ? WHERE id = ? AND status IN ('queued', 'running') "
+                "AND id NOT IN (SELECT job_id FROM job_groups)",
+                (now, previous['job_id'])
+            )
+        if not reuse:
+            connection.execute(
+                "INSERT OR REPLACE INTO jobs (id, kind, group_key, version, params, status, progress, "
+                "owner, created, updated) VALUES (?, ?, ?, ?, ?, 'queued', 0, ?, ?, ?)",
+                (job_id, kind, group, version, json.dumps(params, default=str), os.getpid(), now, now)
+            )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+
+    if not reuse:
+        _dispatch(job_id, _spool_dataset(movement_data_json, version, job_dir), job_dir)
+    _maybe_cleanup(job_dir)
+    return job_id
+
+
+def job_status(job_id, job_dir=None):
+    """
+    Get the state of a job.
+
+    Args:
+        job_id: Id from `submit_job`
+        job_dir: Directory of the job database (JOB_DIR if None)
+
+    Returns:
+        Dictionary with id, kind, version, status ('queued', 'running', 'done',
+        'failed' or 'cancelled'), progress (0-1), message, partial, result and
+        error, or None if the job is unknown
+    """
+    connection = _connect(job_dir)
+    try:
+        row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        connection.close()
+    if row is None:
+        return None
+
+    status = dict(row)
+    for key in ('params', 'partial', 'result'):
+        status[key] = json.loads(status[key]) if status[key] else None
+    return status
+
+
+def cancel_job(job_id, job_dir=None):
+    """
+    Cancel a queued or running job.
+
+    Args:
+        job_id: Id from `submit_job`
+        job_dir: Directory of the job database (JOB_DIR if None)
+    """
+    connection = _connect(job_dir)
+    try:
+        connection.execute(
+            "UPDATE jobs SET status = 'cancelled', updated = ? WHERE id = ? AND status IN ('queued', 'running')",
+            (time.time(), job_id)
+        )
+    finally:
+        connection.close()
+
+
+class JobProgress:
+    """
+    Progress callable handed to job functions: progress(fraction, message='', partial=None).
+
+    Writes progress to the job database (throttled unless there is a partial
+    result) and raises JobCancelled once the job has been cancelled.
+    """
+
+    def __init__(self, connection, job_id):
+        self.connection = connection
+        self.job_id = job_id
+        self.last_write = 0.0
+
+    def __call__(self, fraction, message='', partial=None):
+        now = time.time()
+        if partial is None and now - self.last_write < PROGRESS_INTERVAL_S:
+            return
+        self.last_write = now
+
+        cursor = self.connection.execute(
+            "UPDATE jobs SET progress = ?, message = ?, partial = COALESCE(?, partial), updated = ? "
+            "WHERE id = ? AND status = 'running'",
+            (float(fraction), message, json.dumps(partial, default=str) if partial is not None else None,
+             now, self.job_id)
+        )
+        if cursor.rowcount == 0:
+            raise JobCancelled(self.job_id)
+
+
+def run_job(job_id, path, job_dir=None):
+    """
+    Run a queued job in a worker process.
+
+    Args:
+        job_id: Id from `submit_job`
+        path: Dataset file from `dataset_path`
+        job_dir: Directory of the job database (JOB_DIR if None)
+    """
+    connection = _connect(job_dir)
+    try:
+        cursor = connection.execute(
+            "UPDATE jobs SET status = 'running', owner = ?, updated = ? WHERE id = ? AND status = 'queued'",
+            (os.getpid(), time.time(), job_id)
+        )
+        if cursor.rowcount == 0:
+            return  # Cancelled or taken over before it started
+
+        row = connection.execute("SELECT kind, params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        module_name, function_name = JOB_KINDS[row['kind']].split(':')
+        function = getattr(import_module(module_name), function_name)
+
+        with open(path) as f:
+            df = pd.read_json(StringIO(f.read()), orient='split')
+
+        result = function(df, progress=JobProgress(connection, job_id), **json.loads(row['params']))
+        connection.execute(
+            "UPDATE jobs SET status = 'done', progress = 1, result = ?, partial = NULL, updated = ? "
+            "WHERE id = ? AND status = 'running'",
+            (json.dumps(result, default=str), time.time(), job_id)
+        )
+    except JobCancelled:
+        pass
+    except Exception as e:
+        print(f"Error running job {job_id}: {e}")
+        connection.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ? AND status = 'running'",
+            (str(e), time.time(), job_id)
+        )
+    finally:
+        try:
+            row = connection.execute("SELECT version FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None:
+                _release_dataset(connection, row['version'], job_dir)
+        finally:
+            connection.close()
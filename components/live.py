@@ -0,0 +1,329 @@
+"""
+Live Component
+Live-tracking pipeline: polls Movebank, or a local feed directory standing in for
+it, for fixes newer than each individual's last fix, appends them to the dataset
+incrementally and describes every poll as a small delta for the map and KPIs
+
+The live state is a JSON-serializable dictionary kept in the browser
+(`store-live`); the merged datasets stay in the server-side data store.
+"""
+
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from components.append import append_fixes
+from components.data_store import get_dataset, get_result, remove_dataset
+from components.quality import DEFAULT_GAP_FACTOR
+from components.schema import INDIVIDUAL, LAT, LON, TIMESTAMP, to_canonical
+
+# Default directory polled by the local feed (collar uploads dropped as CSV files)
+LIVE_FEED_DIR = os.environ.get('LIVE_FEED_DIR', './data/live')
+
+# Default time between polls (minutes)
+DEFAULT_POLL_MIN = 5
+
+# Parsed feed files by path: (modification time, DataFrame)
+_feed_files = {}
+_feed_lock = threading.Lock()
+
+
+class LocalFeed:
+    """
+    Stand-in for the Movebank client that reads fixes from CSV files in a directory.
+
+    Files may use Movebank or canonical column names; files are re-read only
+    when they change.
+    """
+
+    def __init__(self, directory=LIVE_FEED_DIR):
+        self.directory = directory
+
+    def _read(self, path):
+        mtime = os.path.getmtime(path)
+        with _feed_lock:
+            cached = _feed_files.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        df = pd.read_csv(path)
+        to_canonical(df)
+        if TIMESTAMP in df.columns:
+            df[TIMESTAMP] = pd.to_datetime(df[TIMESTAMP])
+        with _feed_lock:
+            _feed_files[path] = (mtime, df)
+        return df
+
+    def get_tracking_data(self, study_id=None, individuals=None, start_date=None, end_date=None,
+                          attributes="all", use_cache=False):
+        """
+        Fixes of the feed, with the arguments of `MoveBank.get_tracking_data`.
+
+        Args:
+            study_id: Ignored (the directory is the study)
+            individuals: Individual ids to include (None for all)
+            start_date, end_date: Time range to include (strings or timestamps)
+
+        Returns:
+            pandas.DataFrame with the canonical track columns, empty if the feed has no fixes
+        """
+        paths = sorted(glob.glob(os.path.join(self.directory, '*.csv')))
+        frames = []
+        for path in paths:
+            try:
+                frames.append(self._read(path))
+            except Exception as e:
+                print(f"Error reading live feed file {path}: {e}")
+        frames = [df for df in frames if TIMESTAMP in df.columns]
+        if not frames:
+            return pd.DataFrame()
+
+        df = pd.concat(frames, ignore_index=True)
+        if individuals is not None and INDIVIDUAL in df.columns:
+            df = df[df[INDIVIDUAL].isin(individuals if isinstance(individuals, list) else [individuals])]
+        if start_date is not None:
+            df = df[df[TIMESTAMP] >= pd.Timestamp(start_date)]
+        if end_date is not None:
+            df = df[df[TIMESTAMP] <= pd.Timestamp(end_date)]
+        return df.reset_index(drop=True)
+
+
+def live_client(source, username=None, password=None):
+    """
+    Client to poll: the Movebank API or a local feed directory.
+
+    Args:
+        source: 'movebank' or 'feed'
+        username, password: Movebank credentials (default: the MOVEBANK_USERNAME
+            and MOVEBANK_PASSWORD environment variables)
+
+    Returns:
+        Object with a `get_tracking_data` method
+    """
+    if source == 'feed':
+        return LocalFeed()
+
+    from components.movebank_api import MoveBank
+
+    movebank = MoveBank()
+    username = username or os.environ.get('MOVEBANK_USERNAME')
+    if username:
+        movebank.authenticate(username, password or os.environ.get('MOVEBANK_PASSWORD'))
+    return movebank
+
+
+def last_fixes(steps):
+    """
+    Time and position of the last fix of every individual.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+
+    Returns:
+        Dictionary keyed by individual (as str) of {'time' (ISO string), 'lat', 'lon'}
+    """
+    offsets = steps.attrs['offsets']
+    timestamps = steps['timestamp'].to_numpy()
+    lat = steps['location_lat'].to_numpy()
+    lon = steps['location_long'].to_numpy()
+    last = {}
+    for i, individual in enumerate(steps.attrs['individuals']):
+        if offsets[i + 1] > offsets[i]:
+            row = offsets[i + 1] - 1
+            last[str(individual)] = {
+                'time': pd.Timestamp(timestamps[row]).isoformat(),
+                'lat': float(lat[row]),
+                'lon': float(lon[row])
+            }
+    return last
+
+
+def new_fixes(fixes, last):
+    """
+    Fixes newer than the last fix of their individual (all fixes of unknown individuals).
+
+    Args:
+        fixes: DataFrame with the canonical track columns
+        last: Output of `last_fixes`
+
+    Returns:
+        DataFrame sorted by individual and time
+    """
+    if fixes.empty or TIMESTAMP not in fixes.columns or INDIVIDUAL not in fixes.columns:
+        return fixes.iloc[:0]
+    fixes = fixes.dropna(subset=[INDIVIDUAL, TIMESTAMP, LAT, LON])
+    since = fixes[INDIVIDUAL].astype(str).map({ind: pd.Timestamp(item['time']) for ind, item in last.items()})
+    newer = since.isna().to_numpy() | (pd.to_datetime(fixes[TIMESTAMP]) > since).to_numpy()
+    return fixes[newer].sort_values([INDIVIDUAL, TIMESTAMP], kind='stable').reset_index(drop=True)
+
+
+def poll_live(state, client=None):
+    """
+    Poll the live source once and append the new fixes to the current dataset.
+
+    Args:
+        state: Live state (see `start_live`); not modified
+        client: Client to poll (default: `live_client(state['source'])`)
+
+    Returns:
+        Tuple (changes, delta): changes is a dictionary of the state keys to
+        update (version, last, appended, seq, polled, error), delta describes the
+        new fixes for the map (None when there are none)
+    """
+    changes = {'polled': time.time(), 'error': None}
+    client = client or live_client(state['source'])
+    last = state['last']
+
+    # One request from the earliest last fix; newer fixes are picked per individual
+    since = min((item['time'] for item in last.values()), default=None)
+    start = pd.Timestamp(since).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3] if since else None
+    try:
+        fixes = client.get_tracking_data(state.get('study_id'), start_date=start, use_cache=False)
+    except Exception as e:
+        changes['error'] = str(e)
+        return changes, None
+
+    fixes = new_fixes(fixes, last)
+    if fixes.empty:
+        return changes, None
+
+    try:
+        result = append_fixes(state['version'], fixes)
+    except (KeyError, ValueError) as e:
+        changes['error'] = f"Could not append live fixes: {e}"
+        return changes, None
+
+    # Intermediate live versions are superseded; the dataset loaded in the app stays
+    if state['version'] != state['base']:
+        remove_dataset(state['version'])
+
+    last = dict(last)
+    delta = {'individual_id': [], 'lat': [], 'lon': [], 'time': []}
+    for individual, group in fixes.groupby(INDIVIDUAL, sort=True):
+        individual = str(individual)
+        lat = group[LAT].to_numpy(dtype=float)
+        lon = group[LON].to_numpy(dtype=float)
+        times = list(pd.to_datetime(group[TIMESTAMP]))
+
+        # Segments start at the individual's previous last fix and are separated by gaps
+        anchor = last.get(individual)
+        if anchor:
+            lat = np.r_[anchor['lat'], lat]
+            lon = np.r_[anchor['lon'], lon]
+            times = [pd.Timestamp(anchor['time'])] + times
+        delta['individual_id'] += [individual] * len(lat) + [None]
+        delta['lat'] += lat.tolist() + [None]
+        delta['lon'] += lon.tolist() + [None]
+        delta['time'] += [pd.Timestamp(t).isoformat() for t in times] + [None]
+        last[individual] = {'time': pd.Timestamp(times[-1]).isoformat(), 'lat': float(lat[-1]), 'lon': float(lon[-1])}
+
+    changes.update({
+        'version': result['version'],
+        'last': last,
+        'appended': state.get('appended', 0) + result['appended'],
+        'seq': state.get('seq', 0) + 1,
+    })
+    return changes, delta
+
+
+def start_live(version, steps, source, study_id=None, poll_min=DEFAULT_POLL_MIN):
+    """
+    Initial live state of a dataset.
+
+    Args:
+        version: Version key of the registered dataset shown in the app
+        steps: Its step table
+        source: 'movebank' or 'feed'
+        study_id: Movebank study id (for the 'movebank' source)
+        poll_min: Minutes between polls
+
+    Returns:
+        Live state dictionary
+    """
+    return {
+        'enabled': True,
+        'source': source,
+        'study_id': study_id,
+        'poll_s': max(float(poll_min or DEFAULT_POLL_MIN), 0.1) * 60,
+        'base': version,
+        'version': version,
+        'last': last_fixes(steps),
+        'appended': 0,
+        'seq': 0,
+        'polled': 0,
+        'error': None,
+        'delta': None,
+    }
+
+
+def live_dataset(live, version):
+    """
+    Dataset with the live fixes appended, for full renders of the maps and KPIs.
+
+    Args:
+        live: Live state (see `start_live`), or None
+        version: Version key of the dataset loaded in the app
+
+    Returns:
+        Tuple (version key, DataFrame) of the appended dataset, or None when live
+        mode is off, belongs to another dataset or has not appended fixes yet
+    """
+    if not live or not live.get('enabled') or live.get('base') != version or live.get('version') == version:
+        return None
+    df = get_dataset(live['version'])
+    if df is None:
+        return None
+    # Shared with the data store: callers may add or replace columns of the copy only
+    return live['version'], df.copy(deep=False)
+
+
+def stop_live(live):
+    """
+    Drop the appended dataset of a live state from the data store.
+
+    Args:
+        live: Live state (see `start_live`), or None
+    """
+    if live and live.get('version') and live.get('version') != live.get('base'):
+        remove_dataset(live['version'])
+
+
+def live_kpis(version):
+    """
+    Dashboard KPIs of an appended dataset from its incrementally updated results.
+
+    Args:
+        version: Version key returned by `append_fixes`
+
+    Returns:
+        Dictionary with total_distance, avg_daily, avg_speed, time_active,
+        fix_rate and fixes values (None when a result is not available)
+    """
+    from components.activity import activity_frame
+
+    kpis = dict.fromkeys(('total_distance', 'avg_daily', 'avg_speed', 'time_active', 'fix_rate', 'fixes'))
+    rollups = get_result(version, 'rollups')
+    if rollups is None:
+        return kpis
+
+    daily = rollups.daily_distance()
+    if not daily.empty:
+        kpis['total_distance'] = float(daily['daily_distance'].sum() / 1000)
+        kpis['avg_daily'] = float(daily['daily_distance'].mean() / 1000)
+    kpis['fixes'] = int(rollups.days['fixes'].sum())
+
+    counts, speed_sum = rollups.activity_tensor()
+    activity = activity_frame(counts, speed_sum, rollups.individuals)
+    if not activity.empty:
+        kpis['time_active'] = float(activity['activity_ratio'].mean() * 100)
+    steps = counts.sum(axis=(1, 2))
+    if steps.any():
+        kpis['avg_speed'] = float(np.mean(speed_sum.sum(axis=1)[steps > 0] / steps[steps > 0]))
+
+    report = get_result(version, f"quality_None_{DEFAULT_GAP_FACTOR}")
+    if report is not None and not report['individuals'].empty:
+        kpis['fix_rate'] = float(report['individuals']['fix_success_rate'].mean())
+    return kpis
@@ -15,6 +15,8 @@ import time
 from io import StringIO
 import csv
 
+from components.schema import to_canonical
+
 
 class MoveBank:
     """
@@ -315,7 +317,8 @@ class MoveBank:
             print(f"Error parsing individuals data: {e}")
             return pd.DataFrame()
     
-    def get_tracking_data(self, study_id, individuals=None, start_date=None, end_date=None, attributes="all"):
+    def get_tracking_data(self, study_id, individuals=None, start_date=None, end_date=None, attributes="all",
+                          use_cache=True):
         """
         Get tracking data for specific individuals within a date range.
         
@@ -325,6 +328,8 @@ class MoveBank:
             start_date (str): Start date in format 'YYYY-MM-DD'
             end_date (str): End date in format 'YYYY-MM-DD'
             attributes (str): Comma-separated list of attributes to retrieve or 'all'
+            use_cache (bool): Read and write the response cache (off for live polling,
+                where a cached empty response would hide new fixes)
             
         Returns:
             pandas.DataFrame: DataFrame with tracking data or empty DataFrame if retrieval fails
@@ -335,9 +340,11 @@ class MoveBank:
         cache_file = os.path.join(self.cache_dir, f"tracking_{cache_key}.csv")
         
         # Check cache first
-        if os.path.exists(cache_file) and (time.time() - os.path.getmtime(cache_file)) < 86400:
+        if use_cache and os.path.exists(cache_file) and (time.time() - os.path.getmtime(cache_file)) < 86400:
             try:
-                return pd.read_csv(cache_file)
+                df = pd.read_csv(cache_file)
+                to_canonical(df)
+                return df
             except Exception as e:
                 print(f"Error reading cached tracking data: {e}")
                 # Continue to fetch fresh data
@@ -383,6 +390,9 @@ class MoveBank:
             # Parse CSV response directly using pandas
             df = pd.read_csv(StringIO(result['res_cont']))
             
+            # Movebank column names (location-lat, individual-local-identifier, ...) to the canonical schema
+            to_canonical(df)
+            
             # Convert timestamp to datetime
             if 'timestamp' in df.columns:
                 df['timestamp'] = pd.to_datetime(df['timestamp'])
@@ -392,7 +402,8 @@ class MoveBank:
                 df = df[df['visible'] != 'false']
                 
             # Save to cache
-            df.to_csv(cache_file, index=False)
+            if use_cache:
+                df.to_csv(cache_file, index=False)
             return df
         except Exception as e:
             print(f"Error parsing tracking data: {e}")
@@ -541,9 +552,8 @@ class MoveBank:
             # Read the CSV file
             df = pd.read_csv(file_path)
             
-            # Basic validation to check if this looks like Movebank data
-            required_columns = ['individual_id', 'timestamp', 'location_lat', 'location_long']
-            missing_columns = [col for col in required_columns if col not in df.columns]
+            # Movebank column names to the canonical schema, and check this looks like Movebank data
+            missing_columns = to_canonical(df)
             
             if missing_columns:
                 print(f"Warning: CSV file is missing expected Movebank columns: {', '.join(missing_columns)}")
@@ -679,6 +689,7 @@ class MoveBank:
         if response:
             try:
                 events = pd.read_csv(pd.StringIO(response))
+                to_canonical(events)
                 
                 # Convert timestamp to datetime
                 if 'timestamp' in events.columns:
@@ -0,0 +1,263 @@
+"""
+NSD Component
+Net squared displacement engine and batch fitting of the standard NSD movement models
+(sedentary, nomadic, dispersal, migration) for all individuals at once
+
+Every model is linear in its displacement parameter once the timing parameters
+are fixed, so the timing parameters are searched on a shared grid (in time
+relative to each individual's tracking period) and the displacement parameter
+is solved in closed form for every individual and grid point together.
+"""
+
+import numpy as np
+import pandas as pd
+
+from components.data_store import dataset_version, get_result, store_result
+from components.outliers import outlier_suffix
+from components.steps import displacement_from_start, get_step_table
+
+SECONDS_PER_DAY = 86400
+
+# Minimum number of daily NSD values needed to fit the models
+MIN_FIT_DAYS = 10
+
+# Grid of timing parameters, in fractions of each individual's tracking period
+SEDENTARY_RATES = np.logspace(0, 3, 40)
+TRANSITION_TIMES = np.linspace(0.05, 0.95, 19)
+TRANSITION_WIDTHS = np.logspace(-3, -0.7, 8)
+
+# Number of fitted parameters per model (including the residual variance)
+MODEL_PARAMETERS = {
+    'sedentary': 3,
+    'nomadic': 2,
+    'dispersal': 4,
+    'migration': 5,
+}
+
+# Grid columns evaluated at once
+GRID_CHUNK = 256
+
+
+def daily_nsd(steps):
+    """
+    Mean NSD per individual and tracking day, leaving out flagged outlier fixes.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+
+    Returns:
+        DataFrame with individual_id, ind_code, day (days since the individual's
+        first fix, mean time of the fixes that day), date and nsd_km2 columns,
+        sorted by individual and day
+    """
+    codes = steps['ind_code'].to_numpy().astype(np.int64)
+    offsets = steps.attrs['offsets']
+    time_s = steps['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+    nsd_km2 = (displacement_from_start(steps) / 1000) ** 2
+
+    start = time_s[offsets[:-1][codes]]
+
+    # Flagged outlier fixes do not count towards the daily means
+    if 'is_outlier' in steps.columns:
+        keep = ~steps['is_outlier'].to_numpy()
+        codes, time_s, nsd_km2, start = codes[keep], time_s[keep], nsd_km2[keep], start[keep]
+    day = ((time_s - start) // SECONDS_PER_DAY).astype(np.int64)
+
+    # One bincount over (individual, day) cells
+    n_days = int(day.max()) + 1 if len(day) else 0
+    cells = codes * n_days + day
+    unique_cells, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+
+    return pd.DataFrame({
+        'individual_id': np.asarray(steps.attrs['individuals'], dtype=object)[unique_cells // n_days],
+        'ind_code': unique_cells // n_days,
+        'day': np.bincount(inverse, weights=(time_s - start) / SECONDS_PER_DAY) / counts,
+        'date': pd.to_datetime(np.bincount(inverse, weights=time_s) / counts, unit='s').normalize(),
+        'nsd_km2': np.bincount(inverse, weights=nsd_km2) / counts
+    })
+
+
+def _logistic(u, theta, phi):
+    return 1.0 / (1.0 + np.exp(np.clip((theta - u) / phi, -500, 500)))
+
+
+def model_basis(model, u, timing):
+    """
+    Model shape with unit displacement.
+
+    Args:
+        model: One of MODEL_PARAMETERS
+        u: Time as a fraction of the tracking period, shape (n, 1)
+        timing: Timing parameters, each an array of shape (G,)
+
+    Returns:
+        numpy array (n, G)
+    """
+    if model == 'sedentary':
+        (rate,) = timing
+        return 1.0 - np.exp(-rate * u)
+    if model == 'nomadic':
+        return np.broadcast_to(u, (u.shape[0], 1))
+    if model == 'dispersal':
+        theta, phi = timing
+        return _logistic(u, theta, phi)
+    theta1, theta2, phi = timing
+    return _logistic(u, theta1, phi) - _logistic(u, theta2, phi)
+
+
+def _timing_grid(model):
+    if model == 'sedentary':
+        return (SEDENTARY_RATES,)
+    if model == 'nomadic':
+        return ()
+    if model == 'dispersal':
+        theta, phi = np.meshgrid(TRANSITION_TIMES, TRANSITION_WIDTHS, indexing='ij')
+        return theta.ravel(), phi.ravel()
+    theta1, theta2, phi = np.meshgrid(TRANSITION_TIMES, TRANSITION_TIMES, TRANSITION_WIDTHS, indexing='ij')
+    outbound = theta1 < theta2
+    return theta1[outbound], theta2[outbound], phi[outbound]
+
+
+def _grid_least_squares(y, u, starts, model):
+    """
+    Best grid point and closed-form displacement of a model for every individual.
+
+    Returns:
+        Tuple (rss, delta, best_index), each of shape (n_individuals,)
+    """
+    grid = _timing_grid(model)
+    n_grid = len(grid[0]) if grid else 1
+    syy = np.add.reduceat(y ** 2, starts)
+
+    best_rss = np.full(len(starts), np.inf)
+    best_delta = np.zeros(len(starts))
+    best_index = np.zeros(len(starts), dtype=np.int64)
+
+    for lo in range(0, n_grid, GRID_CHUNK):
+        timing = tuple(g[lo:lo + GRID_CHUNK] for g in grid)
+        basis = model_basis(model, u[:, None], timing)
+        syg = np.add.reduceat(y[:, None] * basis, starts, axis=0)
+        sgg = np.add.reduceat(basis ** 2, starts, axis=0)
+
+        # Displacement is constrained to be non-negative
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = np.where(sgg > 0, np.maximum(syg / sgg, 0), 0)
+        rss = syy[:, None] - 2 * delta * syg + delta ** 2 * sgg
+
+        column = np.argmin(rss, axis=1)
+        rows = np.arange(len(starts))
+        better = rss[rows, column] < best_rss
+        best_rss[better] = rss[rows, column][better]
+        best_delta[better] = delta[rows, column][better]
+        best_index[better] = lo + column[better]
+
+    return np.maximum(best_rss, 0), best_delta, best_index
+
+
+def fit_nsd_models(daily):
+    """
+    Fit all NSD models to every individual and rank them by AIC.
+
+    Args:
+        daily: Daily NSD table from `daily_nsd`
+
+    Returns:
+        DataFrame with one row per individual and model: individual_id, model,
+        aic, delta_aic, rss, delta_km2 (asymptotic displacement, or km^2 per day
+        for the nomadic model), period_days, timing parameters in days
+        (rate_per_day, theta1_day, theta2_day, phi_day) and is_best
+    """
+    counts = daily.groupby('ind_code', sort=True).size()
+    fit_codes = counts.index[counts >= MIN_FIT_DAYS].to_numpy()
+    daily = daily[daily['ind_code'].isin(fit_codes)]
+    if daily.empty:
+        return pd.DataFrame()
+
+    codes = daily['ind_code'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    n_obs = np.diff(np.r_[starts, len(codes)])
+
+    # Time relative to each individual's tracking period
+    day = daily['day'].to_numpy()
+    period = np.maximum(np.maximum.reduceat(day, starts), 1.0)
+    u = day / np.repeat(period, n_obs)
+    y = daily['nsd_km2'].to_numpy()
+    individuals = daily['individual_id'].to_numpy()[starts]
+
+    frames = []
+    for model, k in MODEL_PARAMETERS.items():
+        rss, delta, index = _grid_least_squares(y, u, starts, model)
+        grid = _timing_grid(model)
+
+        frame = pd.DataFrame({
+            'individual_id': individuals,
+            'model': model,
+            'aic': n_obs * np.log(np.maximum(rss, 1e-12) / n_obs) + 2 * k,
+            'rss': rss,
+            'delta_km2': delta,
+            'period_days': period,
+            'rate_per_day': np.nan,
+            'theta1_day': np.nan,
+            'theta2_day': np.nan,
+            'phi_day': np.nan
+        })
+        if model == 'sedentary':
+            frame['rate_per_day'] = grid[0][index] / period
+        elif model == 'nomadic':
+            frame['delta_km2'] = delta / period
+        elif model == 'dispersal':
+            frame['theta1_day'] = grid[0][index] * period
+            frame['phi_day'] = grid[1][index] * period
+        else:
+            frame['theta1_day'] = grid[0][index] * period
+            frame['theta2_day'] = grid[1][index] * period
+            frame['phi_day'] = grid[2][index] * period
+        frames.append(frame)
+
+    fits = pd.concat(frames, ignore_index=True)
+    fits['delta_aic'] = fits['aic'] - fits.groupby('individual_id')['aic'].transform('min')
+    fits['is_best'] = fits['delta_aic'] == 0
+    return fits.sort_values(['individual_id', 'aic']).reset_index(drop=True)
+
+
+def model_curve(fit, day):
+    """
+    Evaluate a fitted model.
+
+    Args:
+        fit: One row of `fit_nsd_models`
+        day: Days since the individual's first fix
+
+    Returns:
+        numpy array of NSD values (km^2)
+    """
+    day = np.asarray(day, dtype=float)
+    if fit['model'] == 'nomadic':
+        return fit['delta_km2'] * day
+    if fit['model'] == 'sedentary':
+        return fit['delta_km2'] * (1.0 - np.exp(-fit['rate_per_day'] * day))
+    if fit['model'] == 'dispersal':
+        return fit['delta_km2'] * _logistic(day, fit['theta1_day'], fit['phi_day'])
+    return fit['delta_km2'] * (_logistic(day, fit['theta1_day'], fit['phi_day']) -
+                               _logistic(day, fit['theta2_day'], fit['phi_day']))
+
+
+def get_nsd_models(movement_data_json, outlier_settings=None):
+    """
+    Get the daily NSD table and model fits of a serialized dataset, cached per dataset.
+
+    Args:
+        movement_data_json: Movement data as stored in `store-movement-data`
+        outlier_settings: Settings of the outlier mask (default mask if None)
+
+    Returns:
+        Tuple (daily, fits) from `daily_nsd` and `fit_nsd_models`
+    """
+    version = dataset_version(movement_data_json)
+    kind = f"nsd_models{outlier_suffix(outlier_settings)}"
+    result = get_result(version, kind)
+    if result is None:
+        daily = daily_nsd(get_step_table(movement_data_json, outlier_settings=outlier_settings))
+        result = (daily, fit_nsd_models(daily))
+        store_result(version, kind, result)
+    return result
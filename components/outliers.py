@@ -0,0 +1,236 @@
+"""
+Outliers Component
+Batch outlier and spike detection for GPS fixes: speed and turning-angle spike
+filters, DOP and satellite-count filters (when the data has those columns) and a
+rolling median-deviation filter, run in one pass over the step table
+
+Results are written into the step table as an `outlier_flags` bit mask and an
+`is_outlier` boolean column; the table is not copied. Downstream engines skip
+steps touching a flagged fix through `components.steps.usable_steps`.
+
+The shared step table of a dataset carries the mask of the default settings.
+Other settings get their own step table (sharing all other columns), and the
+results derived from it are cached under names ending in `outlier_suffix`.
+"""
+
+import hashlib
+import inspect
+import json
+
+import numpy as np
+import pandas as pd
+
+from components.steps import get_step_table, haversine_steps
+
+# Outlier rule bits of the outlier_flags column
+FLAG_SPEED = 1
+FLAG_SPIKE = 2
+FLAG_DOP = 4
+FLAG_SATELLITES = 8
+FLAG_MEDIAN = 16
+
+FLAG_NAMES = {
+    FLAG_SPEED: 'Speed',
+    FLAG_SPIKE: 'Spike',
+    FLAG_DOP: 'DOP',
+    FLAG_SATELLITES: 'Satellites',
+    FLAG_MEDIAN: 'Median deviation',
+}
+
+# Fixes reached and left faster than this are implausible (km/h)
+DEFAULT_MAX_SPEED_KMH = 20
+
+# Spikes: fast out-and-back movement with a near reversal of heading
+DEFAULT_SPIKE_SPEED_KMH = 5
+DEFAULT_SPIKE_ANGLE_DEG = 160
+
+# Fix quality limits
+DEFAULT_MAX_HDOP = 10
+DEFAULT_MIN_SATELLITES = 3
+
+# Rolling median filter: window (fixes, odd) and allowed deviation from the
+# median position, in multiples of the local median step length (with a floor)
+DEFAULT_MEDIAN_WINDOW = 5
+DEFAULT_MEDIAN_FACTOR = 5
+MIN_MEDIAN_DEVIATION_M = 500
+
+
+def _neighbour(values, codes, shift):
+    """Value of the previous (shift=-1) or next (shift=1) row of the same individual."""
+    result = np.full(len(values), np.nan)
+    if len(values) > 1:
+        if shift < 0:
+            result[1:] = np.where(codes[1:] == codes[:-1], values[:-1], np.nan)
+        else:
+            result[:-1] = np.where(codes[:-1] == codes[1:], values[1:], np.nan)
+    return result
+
+
+def _window_median(values, windows, present):
+    """Median over each window row, ignoring positions outside the individual."""
+    stacked = np.where(present, values[windows], np.nan)
+    stacked = np.sort(stacked, axis=1)
+    count = present.sum(axis=1)
+    rows = np.arange(len(stacked))
+    lower = stacked[rows, np.maximum(count - 1, 0) // 2]
+    upper = stacked[rows, count // 2]
+    return (lower + upper) / 2
+
+
+def median_deviation(steps, window=DEFAULT_MEDIAN_WINDOW):
+    """
+    Distance of every fix from the rolling median position of its individual.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        window: Number of fixes in the centered window (odd)
+
+    Returns:
+        Tuple (deviation_m, local_step_m): distance to the median position and
+        median step length within the window, one value per fix
+    """
+    n = len(steps)
+    half = max(int(window) // 2, 1)
+    codes = steps['ind_code'].to_numpy()
+
+    # Window indices of every fix, clipped to the table and masked to the individual
+    windows = np.arange(n)[:, None] + np.arange(-half, half + 1)[None, :]
+    inside = (windows >= 0) & (windows < n)
+    windows = np.clip(windows, 0, max(n - 1, 0))
+    present = inside & (codes[windows] == codes[:, None])
+
+    lat = steps['location_lat'].to_numpy()
+    lon = steps['location_long'].to_numpy()
+    step_m = steps['step_m'].to_numpy()
+
+    median_lat = _window_median(lat, windows, present)
+    median_lon = _window_median(lon, windows, present)
+    step_present = present & ~np.isnan(step_m[windows])
+    local_step = _window_median(np.nan_to_num(step_m), windows, step_present)
+
+    return haversine_steps(lat, lon, median_lat, median_lon), local_step
+
+
+def detect_outliers(steps, max_speed_kmh=DEFAULT_MAX_SPEED_KMH, spike_speed_kmh=DEFAULT_SPIKE_SPEED_KMH,
+                    spike_angle_deg=DEFAULT_SPIKE_ANGLE_DEG, max_hdop=DEFAULT_MAX_HDOP,
+                    min_satellites=DEFAULT_MIN_SATELLITES, median_window=DEFAULT_MEDIAN_WINDOW,
+                    median_factor=DEFAULT_MEDIAN_FACTOR):
+    """
+    Flag outlier fixes of all individuals and write the mask into the step table.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table` (modified in place)
+        max_speed_kmh: Fixes reached and left faster than this are flagged
+        spike_speed_kmh: Minimum speed in and out of a spike
+        spike_angle_deg: Minimum turning angle of a spike
+        max_hdop: Maximum horizontal dilution of precision (if the data has HDOP)
+        min_satellites: Minimum satellite count (if the data has satellite counts)
+        median_window: Window of the rolling median filter (fixes, 0 disables it)
+        median_factor: Allowed deviation from the median position, in local step lengths
+
+    Returns:
+        numpy array of outlier flags (FLAG_* bits), one value per fix
+    """
+    codes = steps['ind_code'].to_numpy()
+    speed_out = steps['speed_kmh'].to_numpy()
+    speed_in = _neighbour(speed_out, codes, -1)
+    turn = np.abs(steps['turn_angle'].to_numpy())
+    flags = np.zeros(len(steps), dtype=np.uint8)
+
+    with np.errstate(invalid='ignore'):
+        # Both steps touching the fix are implausibly fast
+        flags[(speed_in > max_speed_kmh) & (speed_out > max_speed_kmh)] |= FLAG_SPEED
+
+        # Fast out-and-back movement
+        spike = ((speed_in > spike_speed_kmh) & (speed_out > spike_speed_kmh) &
+                 (turn > np.radians(spike_angle_deg)))
+        flags[spike] |= FLAG_SPIKE
+
+        if 'hdop' in steps.columns and max_hdop:
+            flags[steps['hdop'].to_numpy() > max_hdop] |= FLAG_DOP
+        if 'satellites' in steps.columns and min_satellites:
+            flags[steps['satellites'].to_numpy() < min_satellites] |= FLAG_SATELLITES
+
+        if median_window and len(steps):
+            deviation, local_step = median_deviation(steps, median_window)
+            limit = np.maximum(median_factor * np.nan_to_num(local_step), MIN_MEDIAN_DEVIATION_M)
+            flags[deviation > limit] |= FLAG_MEDIAN
+
+    steps['outlier_flags'] = flags
+    steps['is_outlier'] = flags > 0
+    return flags
+
+
+def outlier_summary(steps):
+    """
+    Number of flagged fixes per individual and rule.
+
+    Args:
+        steps: Step table with the columns written by `detect_outliers`
+
+    Returns:
+        DataFrame with individual_id, fixes, outliers and one count column per rule
+    """
+    n_individuals = len(steps.attrs['individuals'])
+    codes = steps['ind_code'].to_numpy()
+    flags = steps['outlier_flags'].to_numpy()
+
+    summary = pd.DataFrame({
+        'individual_id': steps.attrs['individuals'],
+        'fixes': np.bincount(codes, minlength=n_individuals),
+        'outliers': np.bincount(codes, weights=flags > 0, minlength=n_individuals).astype(np.int64)
+    })
+    for flag, name in FLAG_NAMES.items():
+        summary[name] = np.bincount(codes, weights=(flags & flag) > 0, minlength=n_individuals).astype(np.int64)
+    return summary
+
+
+def outlier_suffix(settings):
+    """
+    Suffix of the names of results derived from the outlier mask of some settings.
+
+    Args:
+        settings: Keyword arguments of `detect_outliers` (None values and
+            defaults are ignored)
+
+    Returns:
+        str: '' for the default mask, else a suffix identifying the settings
+    """
+    settings = normalize_outlier_settings(settings)
+    if not settings:
+        return ''
+    digest = hashlib.md5(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"_outliers_{digest[:12]}"
+
+
+def normalize_outlier_settings(settings):
+    """
+    Outlier settings without None values and values equal to the defaults.
+
+    Args:
+        settings: Keyword arguments of `detect_outliers` or None
+
+    Returns:
+        dict: The settings that differ from the defaults
+    """
+    defaults = {name: parameter.default
+                for name, parameter in inspect.signature(detect_outliers).parameters.items()}
+    return {key: value for key, value in (settings or {}).items()
+            if value is not None and value != defaults.get(key)}
+
+
+def apply_outlier_filter(movement_data_json, **settings):
+    """
+    Flag the outliers of a serialized dataset with the given settings.
+
+    The shared step table and the results derived from other settings are kept;
+    engines called with the same settings pick up the new mask.
+
+    Args:
+        movement_data_json: Movement data as stored in `store-movement-data`
+        **settings: Keyword arguments of `detect_outliers`
+
+    Returns:
+        Step table with the outlier columns of the settings
+    """
+    return get_step_table(movement_data_json, outlier_settings=normalize_outlier_settings(settings))
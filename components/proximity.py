@@ -0,0 +1,258 @@
+"""
+Proximity Component
+Nearest-feature distances from every fix to local vector layers (rivers and water
+bodies, roads, settlements, protected-area boundaries) through an STRtree index
+
+Fixes and features are projected to the UTM zone of the dataset, so distances are
+in meters. Each layer's index is built once and kept; distances for all fixes are
+computed in batches with nearest-neighbor queries instead of pairwise distances.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from components.data_store import dataset_version, get_result, store_result
+from components.raster import LAYER_DIR
+from components.steps import get_step_table
+
+# Feature layers and their labels
+FEATURE_LAYERS = {
+    'water': 'Water Sources',
+    'roads': 'Roads',
+    'settlements': 'Settlements',
+    'protected': 'Protected Areas',
+}
+
+# Layers measured to their polygon boundaries rather than their interiors
+BOUNDARY_LAYERS = ('protected',)
+
+# Layers counted in the human influence index
+HUMAN_LAYERS = ('roads', 'settlements')
+
+VECTOR_EXTENSIONS = ('.gpkg', '.geojson', '.json', '.shp')
+
+# Fixes per nearest-neighbor query batch
+QUERY_CHUNK = 500_000
+
+# Spatial indexes of recently used layers
+MAX_INDEXES = 16
+_indexes = OrderedDict()
+_lock = threading.RLock()
+
+
+def feature_path(feature, layer_dir=None):
+    """
+    Find the vector file of a feature layer (e.g. data/layers/roads.gpkg).
+
+    Args:
+        feature: Layer name, one of FEATURE_LAYERS
+        layer_dir: Directory of the layers (LAYER_DIR if None)
+
+    Returns:
+        Path of the layer file, or None if there is none
+    """
+    layer_dir = layer_dir or LAYER_DIR
+    for extension in VECTOR_EXTENSIONS:
+        path = os.path.join(layer_dir, feature + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def utm_crs(lon, lat):
+    """
+    UTM coordinate reference system of the zone containing the median position.
+
+    Args:
+        lon, lat: Arrays of WGS84 coordinates
+
+    Returns:
+        EPSG code string, e.g. 'EPSG:32643'
+    """
+    lon0 = float(np.nanmedian(lon))
+    lat0 = float(np.nanmedian(lat))
+    zone = int((lon0 + 180) // 6) % 60 + 1
+    return f"EPSG:{32600 + zone if lat0 >= 0 else 32700 + zone}"
+
+
+def feature_index(path, crs, boundary=False):
+    """
+    STRtree of a vector layer in the given projection, built once per file version.
+
+    Args:
+        path: Vector file
+        crs: Target projected CRS
+        boundary: Index polygon boundaries instead of the polygons
+
+    Returns:
+        shapely STRtree (None if the layer has no geometries)
+    """
+    key = (path, os.path.getmtime(path), crs, boundary)
+    with _lock:
+        tree = _indexes.get(key)
+        if tree is not None:
+            _indexes.move_to_end(key)
+            return tree
+
+    import geopandas as gpd
+    import shapely
+
+    features = gpd.read_file(path)
+    features = features[features.geometry.notna() & ~features.geometry.is_empty]
+    if features.crs is None:
+        features = features.set_crs('EPSG:4326')
+    geometries = features.to_crs(crs).geometry.to_numpy()
+    if boundary:
+        geometries = shapely.boundary(geometries)
+    tree = shapely.STRtree(geometries) if len(geometries) else None
+
+    with _lock:
+        _indexes[key] = tree
+        _indexes.move_to_end(key)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return tree
+
+
+def nearest_distances(tree, x, y):
+    """
+    Distance from every point to its nearest indexed feature.
+
+    Args:
+        tree: STRtree from `feature_index`
+        x, y: Projected point coordinates (meters)
+
+    Returns:
+        numpy array of distances in meters (NaN for points without coordinates)
+    """
+    import shapely
+
+    distances = np.full(len(x), np.nan)
+    valid = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    for lo in range(0, len(valid), QUERY_CHUNK):
+        rows = valid[lo:lo + QUERY_CHUNK]
+        points = shapely.points(x[rows], y[rows])
+        (point_index, _), distance = tree.query_nearest(points, return_distance=True, all_matches=False)
+        distances[rows[point_index]] = distance
+    return distances
+
+
+def fix_distances(steps, feature, crs=None):
+    """
+    Distance from every fix of the step table to the nearest feature of a layer.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        feature: Layer name, one of FEATURE_LAYERS
+        crs: Projected CRS (UTM zone of the data if None)
+
+    Returns:
+        numpy array of distances in meters, or None if the layer has no file
+    """
+    path = feature_path(feature)
+    if path is None:
+        return None
+
+    lon = steps['location_long'].to_numpy()
+    lat = steps['location_lat'].to_numpy()
+    crs = crs or utm_crs(lon, lat)
+    tree = feature_index(path, crs, boundary=feature in BOUNDARY_LAYERS)
+    if tree is None:
+        return np.full(len(steps), np.nan)
+
+    from pyproj import Transformer
+
+    x, y = Transformer.from_crs('EPSG:4326', crs, always_xy=True).transform(lon, lat)
+    return nearest_distances(tree, np.asarray(x), np.asarray(y))
+
+
+def get_feature_distances(movement_data_json, features):
+    """
+    Get nearest-feature distances of a serialized dataset, cached per layer file.
+
+    Args:
+        movement_data_json: Movement data as stored in `store-movement-data`
+        features: Layer names
+
+    Returns:
+        Dictionary of layer name to float32 distance array (meters) aligned with
+        the step table rows; layers without a file are left out
+    """
+    version = dataset_version(movement_data_json)
+    distances = {}
+    for feature in features:
+        path = feature_path(feature)
+        if path is None:
+            continue
+        kind = f"proximity_{feature}_{os.path.getmtime(path)}"
+        values = get_result(version, kind)
+        if values is None:
+            values = fix_distances(get_step_table(movement_data_json), feature).astype(np.float32)
+            store_result(version, kind, values)
+        distances[feature] = values
+    return distances
+
+
+def proximity_summary(steps, distances, threshold_m):
+    """
+    Per-individual distance statistics and share of fixes within a threshold.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        distances: Dictionary from `get_feature_distances`
+        threshold_m: Distance threshold in meters
+
+    Returns:
+        DataFrame with individual_id, feature, mean_km, median_km, within
+        (fixes within the threshold), fixes and percent_within columns
+    """
+    frames = []
+    codes = steps['ind_code'].to_numpy()
+    n_individuals = len(steps.attrs['individuals'])
+    for feature, values in distances.items():
+        measured = ~np.isnan(values)
+        frame = pd.DataFrame({'ind_code': codes[measured], 'km': values[measured] / 1000})
+        grouped = frame.groupby('ind_code')['km']
+        count = np.bincount(codes[measured], minlength=n_individuals)
+        within = np.bincount(codes[measured], weights=values[measured] <= threshold_m, minlength=n_individuals)
+        present = count > 0
+
+        frames.append(pd.DataFrame({
+            'individual_id': np.asarray(steps.attrs['individuals'], dtype=object)[present],
+            'feature': feature,
+            'mean_km': grouped.mean().reindex(np.flatnonzero(present)).to_numpy(),
+            'median_km': grouped.median().reindex(np.flatnonzero(present)).to_numpy(),
+            'within': within[present].astype(np.int64),
+            'fixes': count[present],
+            'percent_within': within[present] / count[present] * 100
+        }))
+
+    if not frames:
+        return pd.DataFrame(columns=['individual_id', 'feature', 'mean_km', 'median_km',
+                                     'within', 'fixes', 'percent_within'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def human_influence_index(distances, threshold_m):
+    """
+    Human influence index (0-100): share of fixes within the threshold of a road or settlement.
+
+    Args:
+        distances: Dictionary from `get_feature_distances`
+        threshold_m: Distance threshold in meters
+
+    Returns:
+        Index value, or None if no human feature layer is available
+    """
+    layers = [distances[feature] for feature in HUMAN_LAYERS if feature in distances]
+    if not layers:
+        return None
+    nearest = np.fmin.reduce(layers)
+    measured = ~np.isnan(nearest)
+    if not measured.any():
+        return None
+    return float(np.mean(nearest[measured] <= threshold_m) * 100)
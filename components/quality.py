@@ -0,0 +1,442 @@
+"""
+Quality Component
+Data-quality engine: inter-fix intervals, fix schedule inference, gap runs,
+per-day quality rollups and scores for all individuals at once from the sorted step table
+
+Gaps are returned as columnar tables (one array per field) rather than lists
+of dictionaries, so reports for large collar fleets stay fast to build and to
+serialize. Expected fix counts follow the inferred duty-cycle schedule
+(see `components.schedule`) unless a fixed interval is given.
+"""
+
+import numpy as np
+import pandas as pd
+
+from components.data_store import dataset_version, get_result, store_result
+from components.outliers import outlier_suffix
+from components.schedule import DutyCycleSchedule, infer_duty_cycle
+from components.steps import get_step_table
+
+NS_PER_SECOND = 1_000_000_000
+
+# Gaps are intervals longer than this multiple of the schedule
+DEFAULT_GAP_FACTOR = 3
+
+# Weights of the composite quality score; precision only counts when HDOP is known
+QUALITY_WEIGHTS = {
+    'completeness': 0.6,
+    'outliers': 0.2,
+    'duplicates': 0.1,
+    'precision': 0.1,
+}
+
+# HDOP at which precision scores zero (HDOP 1 scores one)
+POOR_HDOP = 10
+
+
+def resolve_schedule(steps, schedule=None):
+    """
+    Schedule object for a fixed interval, or the inferred duty cycle.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        schedule: DutyCycleSchedule, interval in minutes (scalar or one per
+            individual), or None to infer the duty cycle
+
+    Returns:
+        DutyCycleSchedule
+    """
+    if isinstance(schedule, DutyCycleSchedule):
+        return schedule
+    if schedule is None:
+        return infer_duty_cycle(steps)
+    return DutyCycleSchedule.constant(steps, schedule)
+
+
+def find_gaps(steps, schedule=None, gap_factor=DEFAULT_GAP_FACTOR):
+    """
+    Intervals longer than gap_factor times the scheduled interval at their start.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        schedule: See `resolve_schedule`
+        gap_factor: Multiple of the schedule above which an interval is a gap
+
+    Returns:
+        DataFrame with individual_id, ind_code, start_time, end_time and
+        duration_min columns, ordered by individual and time
+    """
+    schedule = resolve_schedule(steps, schedule)
+    codes = steps['ind_code'].to_numpy()
+    dt_s = steps['dt_s'].to_numpy()
+    threshold_s = schedule.row_intervals(steps) * 60 * gap_factor
+
+    rows = np.flatnonzero(dt_s > threshold_s)
+    start = steps['timestamp'].to_numpy()[rows]
+    duration_s = dt_s[rows]
+
+    return pd.DataFrame({
+        'individual_id': steps['individual_id'].to_numpy()[rows],
+        'ind_code': codes[rows],
+        'start_time': start,
+        'end_time': start + (duration_s * NS_PER_SECOND).astype('timedelta64[ns]'),
+        'duration_min': duration_s / 60
+    })
+
+
+def merge_intervals(start, end, groups=None, min_gap=0):
+    """
+    Merge overlapping intervals, and intervals closer than min_gap, within each group.
+
+    Args:
+        start: Interval starts (datetime64 or numeric)
+        end: Interval ends, same type as start
+        groups: Group label of every interval (optional, all in one group if None)
+        min_gap: Intervals separated by at most this much are merged (same unit as
+            end - start, e.g. a numpy timedelta64 for datetimes)
+
+    Returns:
+        DataFrame with group, start, end, count (number of merged intervals) and
+        covered (summed duration of the merged intervals) columns, ordered by
+        group and start
+    """
+    start = np.asarray(start)
+    end = np.asarray(end)
+    if groups is None:
+        groups = np.zeros(len(start), dtype=np.int64)
+    codes, labels = pd.factorize(np.asarray(groups), sort=True)
+    if len(start) == 0:
+        return pd.DataFrame({'group': labels[:0], 'start': start, 'end': end,
+                             'count': np.zeros(0, dtype=np.int64), 'covered': end - start})
+
+    order = np.lexsort((start, codes))
+    start, end, codes = start[order], end[order], codes[order]
+
+    # An interval opens a new run unless it starts within min_gap of the
+    # furthest end reached so far in its group
+    reach = pd.Series(end).groupby(codes).cummax().to_numpy()
+    opens = np.r_[True, (codes[1:] != codes[:-1]) | (start[1:] > reach[:-1] + min_gap)]
+    first = np.flatnonzero(opens)
+
+    return pd.DataFrame({
+        'group': labels[codes[first]],
+        'start': start[first],
+        'end': reach[np.r_[first[1:], len(start)] - 1],
+        'count': np.diff(np.r_[first, len(start)]),
+        'covered': np.add.reduceat(end - start, first)
+    })
+
+
+def fix_success_table(steps, schedule=None, gap_factor=DEFAULT_GAP_FACTOR, gaps=None, expected=None):
+    """
+    Fix success and gap totals per individual against the schedule.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        schedule: See `resolve_schedule`
+        gap_factor: Multiple of the schedule above which an interval is a gap
+        gaps: Output of `find_gaps` for the same schedule (optional)
+        expected: Expected fixes of every individual (optional, from the schedule if None)
+
+    Returns:
+        DataFrame with individual_id, start_time, end_time, schedule (description
+        of the latest schedule), expected_interval_min (mean scheduled interval),
+        expected_fixes, actual_fixes, missing_fixes, fix_success_rate, gap_count
+        and total_gap_hours columns
+    """
+    schedule = resolve_schedule(steps, schedule)
+    n_individuals = len(schedule.individuals)
+    if gaps is None:
+        gaps = find_gaps(steps, schedule, gap_factor)
+
+    offsets = steps.attrs['offsets']
+    timestamps = steps['timestamp'].to_numpy()
+    actual = np.diff(offsets)
+    present = actual > 0
+    first = timestamps[offsets[:-1][present]]
+    last = timestamps[offsets[1:][present] - 1]
+    span_min = (last - first) / np.timedelta64(1, 'm')
+
+    if expected is None:
+        expected = schedule.expected_fixes(steps)
+    expected = np.asarray(expected)[present]
+    gap_codes = gaps['ind_code'].to_numpy()
+    gap_count = np.bincount(gap_codes, minlength=n_individuals)[present]
+    gap_minutes = np.bincount(gap_codes, weights=gaps['duration_min'].to_numpy(), minlength=n_individuals)[present]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_interval = np.where(expected > 1, span_min / (expected - 1), np.nan)
+
+    return pd.DataFrame({
+        'individual_id': np.asarray(schedule.individuals, dtype=object)[present],
+        'start_time': first,
+        'end_time': last,
+        'schedule': np.asarray(schedule.current(), dtype=object)[present],
+        'expected_interval_min': mean_interval,
+        'expected_fixes': expected,
+        'actual_fixes': actual[present],
+        'missing_fixes': np.maximum(expected - actual[present], 0),
+        'fix_success_rate': np.minimum(actual[present] / expected * 100, 100),
+        'gap_count': gap_count,
+        'total_gap_hours': gap_minutes / 60
+    })
+
+
+def daily_rollup(steps, schedule=None, gaps=None, gap_factor=DEFAULT_GAP_FACTOR):
+    """
+    Per-individual, per-day quality rollup: the compact table the quality views render from.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`, optionally
+            with the outlier columns from `components.outliers.detect_outliers`
+        schedule: See `resolve_schedule`
+        gaps: Output of `find_gaps` for the same schedule (optional)
+        gap_factor: Multiple of the schedule above which an interval is a gap
+
+    Returns:
+        DataFrame with one row per individual and tracked day: individual_id,
+        ind_code, date, fixes, expected_fixes, completeness (percent, capped at
+        100), gap_count and gap_hours (by gap start), outliers, duplicates
+        (fixes repeating the previous timestamp), hdop_fixes, hdop_mean and hdop_max
+    """
+    schedule = resolve_schedule(steps, schedule)
+    n_individuals = len(schedule.individuals)
+    columns = ['individual_id', 'ind_code', 'date', 'fixes', 'expected_fixes', 'completeness',
+               'gap_count', 'gap_hours', 'outliers', 'duplicates', 'hdop_fixes', 'hdop_mean', 'hdop_max']
+    if len(steps) == 0:
+        return pd.DataFrame(columns=columns)
+    if gaps is None:
+        gaps = find_gaps(steps, schedule, gap_factor)
+
+    codes = steps['ind_code'].to_numpy().astype(np.int64)
+    day = steps['timestamp'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    first_day = day.min()
+    n_days = int(day.max() - first_day) + 1
+    size = n_individuals * n_days
+
+    # Every measure is one bincount into the same (individual, day) cells
+    cells = codes * n_days + (day - first_day)
+    fixes = np.bincount(cells, minlength=size)
+
+    slot_codes, slot_start, slot_expected = schedule.expected_slots(steps)
+    slot_cells = slot_codes * n_days + (slot_start // 86400 - first_day)
+    expected = np.bincount(slot_cells, weights=slot_expected, minlength=size)
+
+    gap_day = gaps['start_time'].to_numpy(dtype='datetime64[D]').astype(np.int64) - first_day
+    gap_cells = gaps['ind_code'].to_numpy().astype(np.int64) * n_days + gap_day
+    gap_count = np.bincount(gap_cells, minlength=size)
+    gap_hours = np.bincount(gap_cells, weights=gaps['duration_min'].to_numpy() / 60, minlength=size)
+
+    if 'is_outlier' in steps.columns:
+        outliers = np.bincount(cells, weights=steps['is_outlier'].to_numpy(), minlength=size)
+    else:
+        outliers = np.zeros(size)
+
+    # A fix duplicates its predecessor when the step leading to it has zero duration
+    duplicate = np.zeros(len(steps), dtype=bool)
+    duplicate[1:] = steps['dt_s'].to_numpy()[:-1] == 0
+    duplicates = np.bincount(cells, weights=duplicate, minlength=size)
+
+    hdop_fixes = np.zeros(size)
+    hdop_sum = np.zeros(size)
+    hdop_max = np.full(size, np.nan)
+    if 'hdop' in steps.columns:
+        hdop = steps['hdop'].to_numpy()
+        measured = ~np.isnan(hdop)
+        hdop_fixes = np.bincount(cells[measured], minlength=size)
+        hdop_sum = np.bincount(cells[measured], weights=hdop[measured], minlength=size)
+        np.fmax.at(hdop_max, cells[measured], hdop[measured])
+
+    return rollup_frame(schedule.individuals, first_day, n_days, {
+        'fixes': fixes, 'expected_fixes': expected, 'gap_count': gap_count, 'gap_hours': gap_hours,
+        'outliers': outliers, 'duplicates': duplicates, 'hdop_fixes': hdop_fixes,
+        'hdop_sum': hdop_sum, 'hdop_max': hdop_max
+    })
+
+
+def rollup_frame(individuals, first_day, n_days, measures):
+    """
+    Daily rollup table from per-(individual, day) measures (see `daily_rollup`).
+
+    Args:
+        individuals: Individual labels, in code order
+        first_day: First day of the cells (days since the epoch)
+        n_days: Number of days per individual
+        measures: Flat arrays of n_individuals * n_days cells: fixes,
+            expected_fixes, gap_count, gap_hours, outliers, duplicates,
+            hdop_fixes, hdop_sum and hdop_max
+
+    Returns:
+        DataFrame with the `daily_rollup` columns
+    """
+    fixes = measures['fixes']
+    expected = measures['expected_fixes']
+    hdop_fixes = measures['hdop_fixes']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hdop_mean = np.where(hdop_fixes > 0, measures['hdop_sum'] / hdop_fixes, np.nan)
+
+    # Keep days with fixes or expected fixes
+    tracked = np.flatnonzero((fixes > 0) | (expected > 0))
+    ind = tracked // n_days
+    rollup = pd.DataFrame({
+        'individual_id': pd.Categorical.from_codes(ind, pd.Index(individuals).astype(str)),
+        'ind_code': ind.astype(np.int32),
+        'date': (first_day + tracked % n_days).astype('datetime64[D]').astype('datetime64[ns]'),
+        'fixes': fixes[tracked].astype(np.int32),
+        'expected_fixes': expected[tracked].astype(np.float32),
+        'gap_count': measures['gap_count'][tracked].astype(np.int32),
+        'gap_hours': measures['gap_hours'][tracked].astype(np.float32),
+        'outliers': measures['outliers'][tracked].astype(np.int32),
+        'duplicates': measures['duplicates'][tracked].astype(np.int32),
+        'hdop_fixes': hdop_fixes[tracked].astype(np.int32),
+        'hdop_mean': hdop_mean[tracked].astype(np.float32),
+        'hdop_max': measures['hdop_max'][tracked].astype(np.float32)
+    })
+    with np.errstate(divide='ignore', invalid='ignore'):
+        completeness = np.where(rollup['expected_fixes'] > 0,
+                                np.minimum(rollup['fixes'] / rollup['expected_fixes'] * 100, 100), np.nan)
+    rollup.insert(5, 'completeness', completeness.astype(np.float32))
+    return rollup
+
+
+def rollup_by(rollup, keys):
+    """
+    Aggregate daily rollup rows, e.g. per individual or per week.
+
+    Args:
+        rollup: Table from `daily_rollup` (or an aggregate of it)
+        keys: Column name(s) or grouping keys accepted by `DataFrame.groupby`
+
+    Returns:
+        DataFrame indexed by the keys with the summed counts, recomputed
+        completeness, outlier_share and duplicate_share, and HDOP mean and max
+    """
+    rollup = rollup.assign(hdop_sum=rollup['hdop_mean'].astype(float).fillna(0) * rollup['hdop_fixes'])
+    grouped = rollup.groupby(keys, observed=True)
+    totals = grouped[['fixes', 'expected_fixes', 'gap_count', 'gap_hours', 'outliers',
+                      'duplicates', 'hdop_fixes', 'hdop_sum']].sum()
+    totals['hdop_max'] = grouped['hdop_max'].max()
+    totals['days'] = grouped.size()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fixes = totals['fixes'].clip(lower=1)
+        totals['completeness'] = np.minimum(totals['fixes'] / totals['expected_fixes'] * 100, 100)
+        totals['outlier_share'] = totals['outliers'] / fixes
+        totals['duplicate_share'] = totals['duplicates'] / fixes
+        totals['hdop_mean'] = totals['hdop_sum'] / totals['hdop_fixes'].where(totals['hdop_fixes'] > 0)
+    return totals.drop(columns='hdop_sum')
+
+
+def quality_scores(rollup):
+    """
+    Composite quality score (0-100) per individual from the daily rollup.
+
+    The score is a weighted mean of completeness, the share of fixes that are
+    not outliers and the share that are not duplicates, plus HDOP precision
+    when the data has HDOP values (see QUALITY_WEIGHTS).
+
+    Args:
+        rollup: Table from `daily_rollup`
+
+    Returns:
+        DataFrame with one row per individual: the `rollup_by` totals and score
+    """
+    totals = rollup_by(rollup, 'individual_id')
+    parts = {
+        'completeness': totals['completeness'].fillna(0) / 100,
+        'outliers': 1 - totals['outlier_share'],
+        'duplicates': 1 - totals['duplicate_share'],
+        'precision': np.clip((POOR_HDOP - totals['hdop_mean']) / (POOR_HDOP - 1), 0, 1)
+    }
+
+    weighted = sum(QUALITY_WEIGHTS[name] * part.fillna(0) for name, part in parts.items())
+    weights = sum(QUALITY_WEIGHTS[name] * part.notna() for name, part in parts.items())
+    totals['score'] = weighted / weights * 100
+    return totals.reset_index()
+
+
+def daily_completeness(steps, schedule=None, individual_level=False):
+    """
+    Fixes per calendar day relative to the number expected from the schedule.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        schedule: See `resolve_schedule`
+        individual_level: Return one row per individual and day instead of per day
+
+    Returns:
+        DataFrame with date, (individual_id,) fixes, expected_fixes and
+        completeness (percent, capped at 100) columns
+    """
+    return completeness_from_rollup(daily_rollup(steps, schedule), individual_level)
+
+
+def completeness_from_rollup(rollup, individual_level=False):
+    """
+    Daily completeness table from the daily rollup (see `daily_completeness`).
+
+    Days only count against the individuals expected to report on them.
+    """
+    if individual_level:
+        frame = rollup.loc[rollup['expected_fixes'] > 0, ['date', 'individual_id', 'fixes', 'expected_fixes']]
+        frame = frame.assign(individual_id=frame['individual_id'].astype(object)).reset_index(drop=True)
+    else:
+        frame = rollup.groupby('date')[['fixes', 'expected_fixes']].sum().reset_index()
+        frame = frame[frame['expected_fixes'] > 0].reset_index(drop=True)
+
+    frame['completeness'] = np.minimum(frame['fixes'] / frame['expected_fixes'] * 100, 100)
+    return frame
+
+
+def quality_report(steps, expected_frequency=None, gap_factor=DEFAULT_GAP_FACTOR):
+    """
+    Full data-quality report for all individuals.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        expected_frequency: Fix interval in minutes; the duty-cycle schedule of
+            every individual is inferred if None
+        gap_factor: Multiple of the schedule above which an interval is a gap
+
+    Returns:
+        Dictionary with 'schedule' (DutyCycleSchedule), 'gap_factor', 'epochs'
+        (piecewise schedule table), 'individuals' (from `fix_success_table`),
+        'gaps' (from `find_gaps`), 'rollup' (from `daily_rollup`) and 'daily'
+        (from `daily_completeness`) tables
+    """
+    schedule = resolve_schedule(steps, expected_frequency)
+    gaps = find_gaps(steps, schedule, gap_factor)
+    rollup = daily_rollup(steps, schedule, gaps=gaps)
+    return {
+        'schedule': schedule,
+        'gap_factor': gap_factor,
+        'epochs': schedule.epochs(),
+        'individuals': fix_success_table(steps, schedule, gap_factor, gaps=gaps),
+        'gaps': gaps,
+        'rollup': rollup,
+        'daily': completeness_from_rollup(rollup)
+    }
+
+
+def get_quality_report(movement_data_json, expected_frequency=None, gap_factor=DEFAULT_GAP_FACTOR,
+                       outlier_settings=None):
+    """
+    Get the quality report of a serialized dataset, computing and caching on first use.
+
+    Args:
+        movement_data_json: Movement data as stored in `store-movement-data`
+        expected_frequency: Fix interval in minutes; inferred duty cycle if None
+        gap_factor: Multiple of the schedule above which an interval is a gap
+        outlier_settings: Settings of the outlier mask (default mask if None)
+
+    Returns:
+        Report dictionary from `quality_report`
+    """
+    version = dataset_version(movement_data_json)
+    kind = f"quality_{expected_frequency}_{gap_factor}{outlier_suffix(outlier_settings)}"
+    report = get_result(version, kind)
+    if report is None:
+        steps = get_step_table(movement_data_json, outlier_settings=outlier_settings)
+        report = quality_report(steps, expected_frequency, gap_factor)
+        store_result(version, kind, report)
+    return report
@@ -0,0 +1,259 @@
+"""
+Raster Component
+Habitat overlay engine: samples local GeoTIFF land-cover and vegetation layers at
+every fix with windowed reads
+
+Fixes are binned into raster tiles and only the tiles that contain fixes are
+read, so each individual's bounding box is covered without loading whole layers.
+Class values for all fixes are then looked up in vectorized form per tile, and
+the samples are cached per layer and dataset version.
+
+Layers are GeoTIFF files in LAYER_DIR named after the layer (e.g. landcover.tif),
+optionally per resolution (landcover_high.tif). A JSON file next to a layer
+(landcover.json, {"value": "label"}) names its classes. Reading rasters needs
+the optional rasterio package.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from components.data_store import dataset_version, get_result, store_result
+from components.steps import get_step_table
+
+# Directory of the raster layers
+LAYER_DIR = os.environ.get('RASTER_LAYER_DIR', './data/layers')
+
+# Target pixel size (meters) of the resolution settings
+RESOLUTION_METERS = {
+    'high': 30,
+    'medium': 100,
+    'low': 300,
+}
+
+# Tile edge (pixels, after decimation) of the windows read from a layer
+TILE_PIXELS = 1024
+
+# Approximate meters per degree, to compare geographic pixel sizes with RESOLUTION_METERS
+METERS_PER_DEGREE = 111320
+
+# MODIS MCD12Q1 land cover (IGBP, LC_Type1) classes
+IGBP_CLASSES = {
+    1: 'Evergreen Needleleaf Forest',
+    2: 'Evergreen Broadleaf Forest',
+    3: 'Deciduous Needleleaf Forest',
+    4: 'Deciduous Broadleaf Forest',
+    5: 'Mixed Forest',
+    6: 'Closed Shrubland',
+    7: 'Open Shrubland',
+    8: 'Woody Savanna',
+    9: 'Savanna',
+    10: 'Grassland',
+    11: 'Permanent Wetland',
+    12: 'Cropland',
+    13: 'Urban and Built-up',
+    14: 'Cropland/Natural Vegetation Mosaic',
+    15: 'Permanent Snow and Ice',
+    16: 'Barren',
+    17: 'Water Bodies',
+}
+
+DEFAULT_LEGENDS = {
+    'landcover': IGBP_CLASSES,
+}
+
+
+def layer_path(layer, resolution=None, layer_dir=None):
+    """
+    Find the GeoTIFF of a layer.
+
+    Args:
+        layer: Layer name (e.g. 'landcover')
+        resolution: Resolution setting; a resolution-specific file is preferred
+        layer_dir: Directory of the layers (LAYER_DIR if None)
+
+    Returns:
+        Path of the layer file, or None if there is none
+    """
+    layer_dir = layer_dir or LAYER_DIR
+    names = [f"{layer}_{resolution}", layer] if resolution else [layer]
+    for name in names:
+        for extension in ('.tif', '.tiff'):
+            path = os.path.join(layer_dir, name + extension)
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def layer_legend(layer, path=None):
+    """
+    Class labels of a layer.
+
+    Args:
+        layer: Layer name
+        path: Layer file; a JSON file with the same name overrides the default legend
+
+    Returns:
+        Dictionary of class value to label (empty if unknown)
+    """
+    if path:
+        legend_path = os.path.splitext(path)[0] + '.json'
+        if os.path.exists(legend_path):
+            try:
+                with open(legend_path) as f:
+                    return {int(value): label for value, label in json.load(f).items()}
+            except (OSError, ValueError) as e:
+                print(f"Error reading legend {legend_path}: {e}")
+    return dict(DEFAULT_LEGENDS.get(layer, {}))
+
+
+def _decimation(dataset, resolution):
+    """Integer read decimation that brings the layer close to the requested resolution."""
+    target_m = RESOLUTION_METERS.get(resolution)
+    if not target_m:
+        return 1
+    pixel = abs(dataset.res[0])
+    if dataset.crs is None or dataset.crs.is_geographic:
+        pixel *= METERS_PER_DEGREE
+    return max(1, int(target_m // pixel)) if pixel > 0 else 1
+
+
+def sample_raster(path, lon, lat, resolution=None):
+    """
+    Sample band 1 of a raster at many points, reading only the tiles that contain points.
+
+    Args:
+        path: GeoTIFF path
+        lon, lat: Arrays of point coordinates (WGS84 degrees)
+        resolution: Resolution setting (see RESOLUTION_METERS); coarser settings
+            read decimated windows (overviews when the file has them, class mode)
+
+    Returns:
+        numpy float array of values (NaN outside the raster or at nodata)
+    """
+    import rasterio
+    from rasterio.enums import Resampling
+    from rasterio.warp import transform as warp_transform
+    from rasterio.windows import Window
+
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    values = np.full(len(lon), np.nan)
+
+    with rasterio.open(path) as dataset:
+        x, y = lon, lat
+        if dataset.crs is not None and not dataset.crs.is_geographic:
+            finite = np.isfinite(lon) & np.isfinite(lat)
+            x, y = np.full(len(lon), np.nan), np.full(len(lat), np.nan)
+            x[finite], y[finite] = warp_transform('EPSG:4326', dataset.crs, lon[finite], lat[finite])
+            x, y = np.asarray(x), np.asarray(y)
+
+        cols, rows = ~dataset.transform * (x, y)
+        with np.errstate(invalid='ignore'):
+            inside = (rows >= 0) & (rows < dataset.height) & (cols >= 0) & (cols < dataset.width)
+        points = np.flatnonzero(inside)
+        if len(points) == 0:
+            return values
+
+        # Pixel of every point on the decimated grid, and its tile
+        factor = _decimation(dataset, resolution)
+        grid_rows = rows[points].astype(np.int64) // factor
+        grid_cols = cols[points].astype(np.int64) // factor
+        tile_span = TILE_PIXELS * factor
+        n_tile_cols = -(-dataset.width // tile_span)
+        tiles = (grid_rows // TILE_PIXELS) * n_tile_cols + grid_cols // TILE_PIXELS
+
+        order = np.argsort(tiles, kind='stable')
+        bounds = np.flatnonzero(np.r_[True, tiles[order][1:] != tiles[order][:-1], True])
+        resampling = Resampling.mode if factor > 1 else Resampling.nearest
+        nodata = dataset.nodata
+
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            members = order[lo:hi]
+            tile_row, tile_col = divmod(int(tiles[members[0]]), n_tile_cols)
+            row_off, col_off = tile_row * tile_span, tile_col * tile_span
+            height = min(tile_span, dataset.height - row_off)
+            width = min(tile_span, dataset.width - col_off)
+
+            block = dataset.read(
+                1,
+                window=Window(col_off, row_off, width, height),
+                out_shape=(-(-height // factor), -(-width // factor)),
+                resampling=resampling
+            )
+            local_rows = np.minimum(grid_rows[members] - tile_row * TILE_PIXELS, block.shape[0] - 1)
+            local_cols = np.minimum(grid_cols[members] - tile_col * TILE_PIXELS, block.shape[1] - 1)
+            sampled = block[local_rows, local_cols].astype(np.float64)
+            if nodata is not None:
+                sampled[sampled == nodata] = np.nan
+            values[points[members]] = sampled
+
+    return values
+
+
+def get_layer_values(movement_data_json, layer, resolution=None):
+    """
+    Get the layer value at every fix of a serialized dataset, cached per layer file.
+
+    Args:
+        movement_data_json: Movement data as stored in `store-movement-data`
+        layer: Layer name
+        resolution: Resolution setting
+
+    Returns:
+        Tuple (values, legend, path): float32 array aligned with the step table
+        rows (NaN where not covered), class labels and layer file; values is
+        None if the layer has no file
+    """
+    path = layer_path(layer, resolution)
+    if path is None:
+        return None, {}, None
+
+    # The file's modification time is part of the key, so replaced layers are re-read
+    version = dataset_version(movement_data_json)
+    kind = f"raster_{layer}_{resolution}_{os.path.getmtime(path)}"
+    values = get_result(version, kind)
+    if values is None:
+        steps = get_step_table(movement_data_json)
+        values = sample_raster(path, steps['location_long'].to_numpy(), steps['location_lat'].to_numpy(),
+                               resolution).astype(np.float32)
+        store_result(version, kind, values)
+    return values, layer_legend(layer, path), path
+
+
+def habitat_usage(steps, values, legend=None):
+    """
+    Share of every individual's fixes in each habitat class.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        values: Layer value per step table row (from `get_layer_values`)
+        legend: Class labels (classes without a label are named 'Class <value>')
+
+    Returns:
+        DataFrame with individual_id, value, habitat, fixes and percent columns
+        (fixes outside the layer are left out; percent of the covered fixes)
+    """
+    legend = legend or {}
+    covered = np.flatnonzero(~np.isnan(values))
+    if len(covered) == 0:
+        return pd.DataFrame(columns=['individual_id', 'value', 'habitat', 'fixes', 'percent'])
+
+    n_individuals = len(steps.attrs['individuals'])
+    classes, class_index = np.unique(values[covered], return_inverse=True)
+    codes = steps['ind_code'].to_numpy()[covered].astype(np.int64)
+    counts = np.bincount(codes * len(classes) + class_index,
+                         minlength=n_individuals * len(classes)).reshape(n_individuals, len(classes))
+
+    ind, cls = np.nonzero(counts)
+    totals = counts.sum(axis=1)
+    labels = [legend.get(int(value), f"Class {value:g}") for value in classes]
+    return pd.DataFrame({
+        'individual_id': np.asarray(steps.attrs['individuals'], dtype=object)[ind],
+        'value': classes[cls],
+        'habitat': np.asarray(labels, dtype=object)[cls],
+        'fixes': counts[ind, cls],
+        'percent': counts[ind, cls] / totals[ind] * 100
+    })
@@ -0,0 +1,321 @@
+"""
+Schedule Component
+Fix-schedule inference for duty-cycled collars: per individual, per epoch and per
+hour of day modal fix intervals from interval histograms, and expected-vs-actual
+fix counts against the inferred schedule
+
+A schedule is a grid of intervals (individual x epoch x hour of day). Epochs are
+fixed windows counted from each individual's first fix, so schedules that are
+reprogrammed mid-deployment show up as piecewise changes between epochs.
+"""
+
+import numpy as np
+import pandas as pd
+
+NS_PER_SECOND = 1_000_000_000
+SECONDS_PER_HOUR = 3600
+
+# Epoch length (days) over which an hourly schedule is assumed constant
+DEFAULT_EPOCH_DAYS = 7
+
+# Minimum number of intervals in an (individual, epoch, hour) cell to infer its schedule
+MIN_CELL_INTERVALS = 3
+
+# Schedule used when none can be inferred, and the longest interval treated as a schedule
+DEFAULT_INTERVAL_MIN = 60
+MAX_SCHEDULE_MIN = 1440
+
+
+def _time_seconds(steps):
+    return steps['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64) // NS_PER_SECOND
+
+
+def _cell_mode(cells, values, n_cells):
+    """Most frequent value per cell (NaN for empty cells) and the cell sample counts."""
+    mode = np.full(n_cells, np.nan)
+    support = np.bincount(cells, minlength=n_cells)
+    if len(cells) == 0:
+        return mode, support
+
+    width = int(values.max()) + 1
+    unique_keys, counts = np.unique(cells.astype(np.int64) * width + values, return_counts=True)
+    key_cells = unique_keys // width
+
+    # Highest count first within every cell
+    order = np.lexsort((-counts, key_cells))
+    first = np.r_[True, key_cells[order][1:] != key_cells[order][:-1]]
+    best = order[first]
+    mode[key_cells[best]] = unique_keys[best] % width
+    return mode, support
+
+
+def _fill_hours(grid):
+    """Fill empty hours with the previous hour's interval (circular over the day)."""
+    doubled = np.concatenate([grid, grid], axis=-1)
+    index = np.where(np.isnan(doubled), -1, np.arange(doubled.shape[-1]))
+    index = np.maximum.accumulate(index, axis=-1)
+    filled = np.take_along_axis(doubled, np.maximum(index, 0), axis=-1)
+    filled[index < 0] = np.nan
+    return filled[..., 24:]
+
+
+def _fill_spanned(grid):
+    """
+    Fill empty hours with the previous hour's interval where that interval spans
+    them (circular over the day); hours it does not span stay empty.
+    """
+    doubled = np.concatenate([grid, grid], axis=-1)
+    position = np.arange(doubled.shape[-1])
+    index = np.maximum.accumulate(np.where(np.isnan(doubled), -1, position), axis=-1)
+    filled = np.take_along_axis(doubled, np.maximum(index, 0), axis=-1)
+    filled[(index < 0) | ((position - index) * 60 >= filled)] = np.nan
+    return filled[..., 24:]
+
+
+def _interval_minutes(steps):
+    """Rounded intervals of steps that can belong to a schedule, with their rows."""
+    dt_s = steps['dt_s'].to_numpy()
+    rows = np.flatnonzero((dt_s > 0) & (dt_s <= MAX_SCHEDULE_MIN * 60))
+    return rows, np.maximum(np.rint(dt_s[rows] / 60), 1).astype(np.int64)
+
+
+def infer_schedules(steps):
+    """
+    Single modal fix interval of every individual.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+
+    Returns:
+        numpy array of intervals in minutes, one per individual (DEFAULT_INTERVAL_MIN
+        where no schedule can be inferred)
+    """
+    n_individuals = len(steps.attrs['individuals'])
+    rows, minutes = _interval_minutes(steps)
+    mode, _ = _cell_mode(steps['ind_code'].to_numpy()[rows], minutes, n_individuals)
+    return np.where(np.isnan(mode), DEFAULT_INTERVAL_MIN, mode)
+
+
+class DutyCycleSchedule:
+    """
+    Fix schedule of every individual by epoch and hour of day (UTC).
+
+    Attributes:
+        intervals: Interval grid in minutes, shape (n_individuals, n_epochs, 24)
+        origin_s: First fix of every individual (seconds since epoch)
+        epoch_s: Epoch length in seconds
+        individuals: Individual labels, in grid order
+        last_epoch: Last tracked epoch of every individual
+    """
+
+    def __init__(self, intervals, origin_s, epoch_s, individuals, last_epoch=None):
+        self.intervals = intervals
+        self.origin_s = origin_s
+        self.epoch_s = epoch_s
+        self.individuals = list(individuals)
+        if last_epoch is None:
+            last_epoch = np.full(len(self.individuals), intervals.shape[1] - 1)
+        self.last_epoch = last_epoch
+
+    @classmethod
+    def constant(cls, steps, interval_min):
+        """Schedule with a fixed interval (scalar or one per individual)."""
+        n_individuals = len(steps.attrs['individuals'])
+        values = np.broadcast_to(np.asarray(interval_min, dtype=float), (n_individuals,))
+        intervals = np.repeat(values[:, None, None], 24, axis=2)
+        origin = _time_seconds(steps)[steps.attrs['offsets'][:-1]]
+        return cls(intervals, origin, np.iinfo(np.int64).max, steps.attrs['individuals'])
+
+    def lookup(self, codes, time_s):
+        """
+        Scheduled interval at given times.
+
+        Args:
+            codes: Individual codes
+            time_s: Times in seconds since epoch
+
+        Returns:
+            numpy array of intervals in minutes
+        """
+        epoch = np.clip((time_s - self.origin_s[codes]) // self.epoch_s, 0, self.intervals.shape[1] - 1)
+        hour = (time_s // SECONDS_PER_HOUR) % 24
+        return self.intervals[codes, epoch, hour]
+
+    def row_intervals(self, steps):
+        """Scheduled interval at the start of every step of the step table."""
+        return self.lookup(steps['ind_code'].to_numpy(), _time_seconds(steps))
+
+    def expected_slots(self, steps):
+        """
+        Expected fixes in every tracked hour of every individual.
+
+        Args:
+            steps: Step table from `components.steps.build_step_table`
+
+        Returns:
+            Tuple (codes, slot_start_s, expected) with one entry per tracked hour
+        """
+        offsets = steps.attrs['offsets']
+        counts = np.diff(offsets)
+        present = np.flatnonzero(counts > 0)
+        time_s = _time_seconds(steps)
+        first = time_s[offsets[:-1][present]]
+        last = time_s[offsets[1:][present] - 1]
+
+        codes, slot_start, expected = self.slots_between(present, first, last)
+
+        # The first fix of every individual
+        expected[np.r_[0, np.cumsum(last // SECONDS_PER_HOUR - first // SECONDS_PER_HOUR + 1)[:-1]]] += 1
+        return codes, slot_start, expected
+
+    def slots_between(self, codes, start_s, end_s):
+        """
+        Expected fixes in every hour of given periods, without the fix at their start.
+
+        Expected counts are additive: the slots of two adjoining periods sum to
+        the slots of the whole period.
+
+        Args:
+            codes: Individual code of every period
+            start_s, end_s: Period starts and ends (seconds since epoch)
+
+        Returns:
+            Tuple (codes, slot_start_s, expected) with one entry per hour touched
+        """
+        start_slot = start_s // SECONDS_PER_HOUR
+        n_slots = end_s // SECONDS_PER_HOUR - start_slot + 1
+        slot_offsets = np.r_[0, np.cumsum(n_slots)[:-1]]
+
+        slot_owner = np.repeat(np.arange(len(codes)), n_slots)
+        slot = np.arange(n_slots.sum()) - slot_offsets[slot_owner] + start_slot[slot_owner]
+        slot_start = slot * SECONDS_PER_HOUR
+
+        # Only the covered part of the first and last hour counts
+        covered = (np.minimum(slot_start + SECONDS_PER_HOUR, end_s[slot_owner]) -
+                   np.maximum(slot_start, start_s[slot_owner]))
+        codes = np.asarray(codes)[slot_owner]
+        return codes, slot_start, covered / 60 / self.lookup(codes, slot_start)
+
+    def expected_fixes(self, steps):
+        """Expected number of fixes of every individual over its tracking period."""
+        codes, _, expected = self.expected_slots(steps)
+        return np.bincount(codes, weights=expected, minlength=len(self.individuals))
+
+    def epochs(self):
+        """
+        Piecewise schedule table, merging consecutive epochs with the same hourly schedule.
+
+        Returns:
+            DataFrame with individual_id, epoch_start, epoch_end (timestamps, end
+            exclusive; NaT for open-ended), schedule (description) and hourly
+            (list of 24 intervals) columns
+        """
+        n_individuals, n_epochs, _ = self.intervals.shape
+        grid = np.nan_to_num(self.intervals, nan=-1)
+        changed = np.ones((n_individuals, n_epochs), dtype=bool)
+        changed[:, 1:] = np.any(grid[:, 1:] != grid[:, :-1], axis=2)
+        changed &= np.arange(n_epochs)[None, :] <= self.last_epoch[:, None]
+        ind, epoch = np.nonzero(changed)
+
+        # Each piece runs until the next change; the last one stays open
+        next_start = np.r_[epoch[1:], n_epochs]
+        last_piece = np.r_[ind[1:] != ind[:-1], True]
+
+        # Float arithmetic: constant schedules use an unbounded epoch length
+        origin = self.origin_s[ind].astype(float)
+        ends = np.where(last_piece, np.nan, origin + next_start * float(self.epoch_s))
+        return pd.DataFrame({
+            'individual_id': np.asarray(self.individuals, dtype=object)[ind],
+            'epoch_start': pd.to_datetime(origin + epoch * float(self.epoch_s), unit='s'),
+            'epoch_end': pd.to_datetime(ends, unit='s'),
+            'schedule': [describe_schedule(self.intervals[i, e]) for i, e in zip(ind, epoch)],
+            'hourly': [self.intervals[i, e].tolist() for i, e in zip(ind, epoch)]
+        })
+
+    def current(self):
+        """Description of the last schedule of every individual."""
+        return [describe_schedule(self.intervals[i, self.last_epoch[i]]) for i in range(len(self.individuals))]
+
+
+def describe_schedule(hourly):
+    """
+    Readable description of an hourly schedule, e.g. '15 min 18-06h, 120 min 06-18h'.
+
+    Args:
+        hourly: 24 intervals in minutes (UTC hours)
+
+    Returns:
+        Description string
+    """
+    hourly = np.asarray(hourly, dtype=float)
+    if np.all(hourly == hourly[0]):
+        return f"{hourly[0]:g} min"
+
+    # Start at a change so runs do not wrap around midnight
+    shift = int(np.flatnonzero(hourly != np.roll(hourly, 1))[0])
+    rolled = np.roll(hourly, -shift)
+    bounds = np.r_[0, np.flatnonzero(rolled[1:] != rolled[:-1]) + 1, 24]
+    parts = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        parts.append(f"{rolled[lo]:g} min {(lo + shift) % 24:02d}-{(hi + shift) % 24:02d}h")
+    return ", ".join(parts)
+
+
+def infer_duty_cycle(steps, epoch_days=DEFAULT_EPOCH_DAYS, min_intervals=MIN_CELL_INTERVALS):
+    """
+    Infer per-individual, per-epoch, per-hour fix schedules from interval histograms.
+
+    Each (individual, epoch, hour) cell takes its modal interval. Cells with too
+    few intervals take the individual's hourly schedule over all epochs (which
+    falls back to its overall modal interval); hours without fixes starting in
+    them inherit the previous hour's interval when it spans them (long
+    intervals span several hours) and the hourly schedule otherwise (e.g. hours
+    a short final epoch does not reach).
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        epoch_days: Epoch length in days
+        min_intervals: Minimum number of intervals per cell
+
+    Returns:
+        DutyCycleSchedule
+    """
+    individuals = steps.attrs['individuals']
+    n_individuals = len(individuals)
+    epoch_s = int(epoch_days * 86400)
+
+    time_s = _time_seconds(steps)
+    codes = steps['ind_code'].to_numpy().astype(np.int64)
+    origin = time_s[steps.attrs['offsets'][:-1]]
+    epoch = (time_s - origin[codes]) // epoch_s
+    n_epochs = int(epoch.max()) + 1 if len(epoch) else 1
+    hour = steps['hour'].to_numpy().astype(np.int64)
+
+    rows, minutes = _interval_minutes(steps)
+
+    # Fallbacks: individual x hour over all epochs, then the individual's overall mode
+    hourly_mode, hourly_support = _cell_mode(codes[rows] * 24 + hour[rows], minutes, n_individuals * 24)
+    hourly_mode[hourly_support < min_intervals] = np.nan
+    hourly = _fill_hours(hourly_mode.reshape(n_individuals, 24))
+
+    overall, _ = _cell_mode(codes[rows], minutes, n_individuals)
+    overall = np.where(np.isnan(overall), DEFAULT_INTERVAL_MIN, overall)
+    hourly = np.where(np.isnan(hourly), overall[:, None], hourly)
+
+    # Individual x epoch x hour modal intervals; cells with some but too few
+    # intervals take the hourly schedule
+    cells = (codes[rows] * n_epochs + epoch[rows]) * 24 + hour[rows]
+    mode, support = _cell_mode(cells, minutes, n_individuals * n_epochs * 24)
+    mode = mode.reshape(n_individuals, n_epochs, 24)
+    support = support.reshape(n_individuals, n_epochs, 24)
+    grid = np.where(support >= min_intervals, mode, np.nan)
+    grid = np.where((support > 0) & (support < min_intervals), hourly[:, None, :], grid)
+
+    # Hours where no interval starts: spanned by the previous hour's interval, or
+    # not covered by the epoch's data
+    grid = np.where(np.isnan(grid), _fill_spanned(grid), grid)
+    grid = np.where(np.isnan(grid), hourly[:, None, :], grid)
+
+    last_epoch = np.zeros(n_individuals, dtype=np.int64)
+    np.maximum.at(last_epoch, codes, epoch)
+    return DutyCycleSchedule(grid, origin, epoch_s, individuals, last_epoch)
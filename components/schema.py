@@ -0,0 +1,83 @@
+"""
+Schema Component
+Canonical column names of tracking data and the aliases they are resolved from
+
+Uploaded and Movebank data name the same fields differently (location-lat,
+individual-local-identifier, latitude, ...). Aliases are resolved once at ingest
+by renaming the columns in place, so every engine works on the canonical names
+without translation copies.
+"""
+
+# Canonical columns
+INDIVIDUAL = 'individual_id'
+TIMESTAMP = 'timestamp'
+LAT = 'location_lat'
+LON = 'location_long'
+HDOP = 'hdop'
+SATELLITES = 'satellites'
+
+REQUIRED_COLUMNS = (INDIVIDUAL, TIMESTAMP, LAT, LON)
+
+# Accepted names of every canonical column, in order of preference
+COLUMN_ALIASES = {
+    INDIVIDUAL: ('individual_id', 'individual-local-identifier', 'individual_local_identifier', 'individual-id',
+                 'id', 'animal_id', 'animal-id', 'tag_id', 'tag-id'),
+    TIMESTAMP: ('timestamp', 'time', 'date', 'datetime', 'date_time', 'date-time'),
+    LAT: ('location_lat', 'location-lat', 'latitude', 'lat', 'y'),
+    LON: ('location_long', 'location-long', 'longitude', 'long', 'lon', 'x'),
+    HDOP: ('hdop', 'gps_hdop', 'gps-hdop', 'gps:hdop'),
+    SATELLITES: ('satellites', 'gps_satellite_count', 'gps-satellite-count', 'gps:satellite-count'),
+}
+
+
+def find_column(df, name):
+    """
+    Find the column holding a canonical field.
+
+    Args:
+        df: DataFrame
+        name: Canonical column name (a key of COLUMN_ALIASES)
+
+    Returns:
+        The first matching column name, or None
+    """
+    return next((column for column in COLUMN_ALIASES[name] if column in df.columns), None)
+
+
+def resolve_columns(df):
+    """
+    Map the columns of a DataFrame to canonical names.
+
+    Args:
+        df: DataFrame with canonical or alias column names
+
+    Returns:
+        Tuple (mapping of existing column to canonical name for the columns to
+        rename, list of required canonical columns that were not found)
+    """
+    mapping = {}
+    missing = []
+    for name in COLUMN_ALIASES:
+        column = find_column(df, name)
+        if column is None:
+            if name in REQUIRED_COLUMNS:
+                missing.append(name)
+        elif column != name:
+            mapping[column] = name
+    return mapping, missing
+
+
+def to_canonical(df):
+    """
+    Rename alias columns of a DataFrame to the canonical names, in place.
+
+    Args:
+        df: DataFrame (only the column labels change; the data is not copied)
+
+    Returns:
+        List of required canonical columns that are missing
+    """
+    mapping, missing = resolve_columns(df)
+    if mapping:
+        df.rename(columns=mapping, inplace=True)
+    return missing
@@ -0,0 +1,384 @@
+"""
+Segmentation Component
+Streaming behavioral change-point detection (Bayesian online change-point detection)
+on step length, rate of change of displacement from the first fix (NSD) and heading persistence
+
+Every individual is processed in a single pass with a bounded number of run-length
+hypotheses, all individuals in lockstep. Steps touching a fix flagged as an outlier
+are left out. Detector state is kept between uploads (per outlier mask), so when
+new fixes arrive only the new steps are processed.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from components.data_store import dataset_version, get_result, store_result
+from components.outliers import outlier_suffix
+from components.steps import displacement_from_start, get_step_table, usable_steps
+
+# Expected segment length (steps) of the constant hazard function
+DEFAULT_HAZARD_LAMBDA = 500
+
+# Maximum number of run-length hypotheses kept per detector
+MAX_RUN_HYPOTHESES = 100
+
+# Shortest run (steps) accepted as a new segment
+MIN_SEGMENT_STEPS = 20
+
+# Normal-Gamma prior per feature (log step, displacement rate, heading persistence)
+PRIOR_MEAN = np.array([4.0, 0.0, 0.0])
+PRIOR_KAPPA = 0.01
+PRIOR_ALPHA = 1.0
+PRIOR_BETA = np.array([1.0, 0.25, 0.25])
+
+FEATURE_NAMES = ['log_step', 'displacement_rate', 'persistence']
+
+# Detectors of recently segmented individuals
+MAX_DETECTORS = 64
+_detectors = OrderedDict()
+_lock = threading.RLock()
+
+
+def step_features(steps, displacement=None):
+    """
+    Segmentation features for every step of the step table.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        displacement: Output of `displacement_from_start` (optional)
+
+    Returns:
+        numpy array (n_steps, 3) with log step length (m), change in displacement
+        from the first fix per meter moved (-1 to 1; near 1 while dispersing, near 0
+        while resident) and cosine of the turning angle
+    """
+    if displacement is None:
+        displacement = displacement_from_start(steps)
+    step_m = steps['step_m'].to_numpy()
+
+    rate = np.zeros(len(steps))
+    if len(steps) > 1:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate[:-1] = (displacement[1:] - displacement[:-1]) / step_m[:-1]
+
+    return np.column_stack([
+        np.log(np.maximum(step_m, 1.0)),
+        np.clip(np.nan_to_num(rate, nan=0.0, posinf=0.0, neginf=0.0), -1, 1),
+        np.nan_to_num(np.cos(steps['turn_angle'].to_numpy()), nan=0.0)
+    ])
+
+
+# Per run length (rows): constant of the Student-t log density, nu * scale^2 per
+# unit beta, (nu + 1) / 2 and the weights of the posterior mean and beta updates;
+# kappa and alpha only depend on the run length
+_run_tables = np.zeros((0, 5))
+
+
+def _tables_for(max_run_length):
+    global _run_tables
+    if max_run_length >= len(_run_tables):
+        from scipy.special import gammaln
+
+        run_length = np.arange(max(2 * max_run_length, 1024))
+        kappa = PRIOR_KAPPA + run_length
+        alpha = PRIOR_ALPHA + run_length / 2
+        nu = 2 * alpha
+        scale = (kappa + 1) / (alpha * kappa)
+        _run_tables = np.column_stack([
+            len(PRIOR_MEAN) * (gammaln(alpha + 0.5) - gammaln(alpha) - 0.5 * np.log(nu * np.pi)
+                               - 0.5 * np.log(scale)),
+            nu * scale,
+            (nu + 1) / 2,
+            1.0 / (kappa + 1),
+            kappa / (2 * (kappa + 1)),
+        ])
+    return _run_tables
+
+
+class ChangePointDetector:
+    """
+    Bayesian online change-point detector with independent Normal-Gamma features.
+
+    Run-length hypotheses beyond `max_runs` are pruned by posterior mass, so
+    memory stays constant however long the deployment gets. Hypotheses live in
+    `max_runs` fixed slots (unused slots have zero mass) so detectors can be
+    stacked and run in lockstep by `stream_detectors`.
+    """
+
+    def __init__(self, hazard_lambda=DEFAULT_HAZARD_LAMBDA, max_runs=MAX_RUN_HYPOTHESES,
+                 min_segment=MIN_SEGMENT_STEPS):
+        self.log_hazard = np.log(1.0 / hazard_lambda)
+        self.log_survival = np.log(1.0 - 1.0 / hazard_lambda)
+        self.max_runs = max_runs
+        self.min_segment = min_segment
+
+        self.log_run = np.full(max_runs, -np.inf)
+        self.log_run[0] = 0.0
+        self.run_length = np.zeros(max_runs, dtype=np.int64)
+        self.mean = np.tile(PRIOR_MEAN, (max_runs, 1))
+        self.beta = np.tile(PRIOR_BETA, (max_runs, 1))
+
+        self.n_seen = 0
+        self.segment_start = 0
+        self.change_points = []
+        self.last_timestamp = None
+        self.digest = hashlib.md5()
+
+    def update(self, x):
+        """
+        Process one observation.
+
+        Args:
+            x: Feature vector of one step
+
+        Returns:
+            Index of the first step of a newly confirmed segment, or None
+        """
+        new_points = self.process(np.asarray(x, dtype=np.float64)[None, :])
+        return new_points[0] if new_points else None
+
+    def process(self, features, timestamps=None):
+        """
+        Stream a block of observations through the detector.
+
+        Args:
+            features: Array (n, n_features) of consecutive steps
+            timestamps: Start time of every step (optional, last one is remembered)
+
+        Returns:
+            List of newly confirmed change points (step indices)
+        """
+        return stream_detectors([self], [features], [timestamps])[0]
+
+
+def stream_detectors(detectors, blocks, timestamps=None):
+    """
+    Stream blocks of observations through several detectors at once.
+
+    The detectors run in lockstep: the run-length update of step t is one set of
+    array operations over every detector that has a step t.
+
+    Args:
+        detectors: ChangePointDetector objects (distinct)
+        blocks: Array (n_i, n_features) of consecutive steps per detector
+        timestamps: Start times of the steps per detector (optional, last one is remembered)
+
+    Returns:
+        List with the newly confirmed change points of every detector
+    """
+    blocks = [np.ascontiguousarray(block, dtype=np.float64).reshape(-1, len(PRIOR_MEAN))
+              for block in blocks]
+    timestamps = timestamps or [None] * len(detectors)
+    new_points = [[] for _ in detectors]
+
+    # Detectors with the same number of slots are stacked, longest block first,
+    # so the detectors still running at step t are the first rows
+    by_slots = {}
+    for i, detector in enumerate(detectors):
+        if len(blocks[i]):
+            by_slots.setdefault(detector.max_runs, []).append(i)
+    for members in by_slots.values():
+        members.sort(key=lambda i: -len(blocks[i]))
+        _stream_stacked([detectors[i] for i in members], [blocks[i] for i in members],
+                        [new_points[i] for i in members])
+
+    for detector, block, times in zip(detectors, blocks, timestamps):
+        detector.digest.update(block.tobytes())
+        if times is not None and len(times):
+            detector.last_timestamp = times[-1]
+    return new_points
+
+
+def _stream_stacked(detectors, blocks, new_points):
+    lengths = np.array([len(block) for block in blocks])
+    n_features = len(PRIOR_MEAN)
+    features = np.zeros((len(detectors), lengths[0], n_features))
+    for i, block in enumerate(blocks):
+        features[i, :len(block)] = block
+
+    log_run = np.stack([d.log_run for d in detectors])
+    run_length = np.stack([d.run_length for d in detectors])
+    mean = np.stack([d.mean for d in detectors])
+    beta = np.stack([d.beta for d in detectors])
+    n_seen = np.array([d.n_seen for d in detectors])
+    segment_start = np.array([d.segment_start for d in detectors])
+    min_segment = np.array([d.min_segment for d in detectors])
+    log_hazard = np.array([d.log_hazard for d in detectors])
+    log_survival = np.array([d.log_survival for d in detectors])[:, None]
+    table = _tables_for(int(run_length.max()) + lengths[0])
+
+    # Number of detectors with a step t
+    running = np.searchsorted(-lengths, -np.arange(lengths[0]), side='right')
+    rows = np.arange(len(detectors))
+    for t in range(lengths[0]):
+        k = running[t]
+        r = rows[:k]
+        x = features[:k, t, None, :]
+        coefficients = table[run_length[:k]]
+        lr, rl, mu, b = log_run[:k], run_length[:k], mean[:k], beta[:k]
+
+        # Student-t posterior predictive of every run, summed over independent features
+        delta = x - mu
+        delta2 = delta * delta
+        log_pred = (coefficients[..., 0] + lr
+                    - 0.5 * np.log(b.prod(axis=2))
+                    - coefficients[..., 2] * np.log((1 + delta2 / (b * coefficients[..., 1:2])).prod(axis=2)))
+        peak = log_pred.max(axis=1)
+        log_total = peak + np.log(np.exp(log_pred - peak[:, None]).sum(axis=1))
+        log_change = log_total + log_hazard[:k]
+
+        # Posterior update of every run in place
+        b += coefficients[..., 4:5] * delta2
+        mu += delta * coefficients[..., 3:4]
+        rl += 1
+        lr[:] = log_pred + log_survival[:k]
+
+        # The fresh run takes the slot of the least probable hypothesis (an unused
+        # slot while there is one) unless it is less probable itself; the dropped
+        # mass is taken off the total the posterior is normalized by
+        slot = lr.argmin(axis=1)
+        weakest = lr[r, slot]
+        log_total += np.log1p(-np.exp(np.minimum(weakest, log_change) - log_total))
+        fresh = log_change > weakest
+        r_fresh, slot_fresh = r[fresh], slot[fresh]
+        lr[r_fresh, slot_fresh] = log_change[fresh]
+        rl[r_fresh, slot_fresh] = 0
+        mu[r_fresh, slot_fresh] = PRIOR_MEAN
+        b[r_fresh, slot_fresh] = PRIOR_BETA
+        lr -= log_total[:, None]
+        n_seen[:k] += 1
+
+        # A change is confirmed once the most probable run has lasted min_segment steps
+        run = rl[r, lr.argmax(axis=1)]
+        start = n_seen[:k] - 1 - run
+        confirmed = (run >= min_segment[:k]) & (start >= segment_start[:k] + min_segment[:k])
+        for i in np.flatnonzero(confirmed):
+            segment_start[i] = start[i]
+            detectors[i].change_points.append(int(start[i]))
+            new_points[i].append(int(start[i]))
+
+    for i, detector in enumerate(detectors):
+        detector.log_run, detector.run_length = log_run[i], run_length[i]
+        detector.mean, detector.beta = mean[i], beta[i]
+        detector.n_seen, detector.segment_start = int(n_seen[i]), int(segment_start[i])
+
+
+def _detector_for(key, features, timestamps, hazard_lambda):
+    """Cached detector for an individual, or a new one if its history changed. Call with _lock held."""
+    detector = _detectors.get(key)
+    if detector is None:
+        return ChangePointDetector(hazard_lambda=hazard_lambda)
+    _detectors.move_to_end(key)
+
+    # Valid only if the new data extends the steps already processed: same
+    # features (positions of another dataset with the same times differ) and times
+    n = detector.n_seen
+    if (n > len(timestamps) or n == 0 or timestamps[n - 1] != detector.last_timestamp or
+            np.log(1.0 / hazard_lambda) != detector.log_hazard):
+        return ChangePointDetector(hazard_lambda=hazard_lambda)
+    prefix = np.ascontiguousarray(features[:n], dtype=np.float64)
+    if hashlib.md5(prefix.tobytes()).digest() != detector.digest.digest():
+        return ChangePointDetector(hazard_lambda=hazard_lambda)
+    return detector
+
+
+def _keep_detector(key, detector):
+    with _lock:
+        _detectors[key] = detector
+        _detectors.move_to_end(key)
+        while len(_detectors) > MAX_DETECTORS:
+            _detectors.popitem(last=False)
+
+
+def segment_tracks(steps, hazard_lambda=DEFAULT_HAZARD_LAMBDA, outlier_settings=None):
+    """
+    Segment every individual's track, resuming cached detectors where possible.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`; steps touching
+            a fix flagged in its is_outlier column are skipped
+        hazard_lambda: Expected segment length in steps
+        outlier_settings: Settings of the outlier mask of `steps` (default mask if
+            None); cached detectors are only resumed with the same settings
+
+    Returns:
+        DataFrame with one row per segment: individual_id, segment, start, end,
+        n_steps, mean_step_m, mean_displacement_km and persistence
+    """
+    displacement_km = displacement_from_start(steps) / 1000
+    features = step_features(steps, displacement_km * 1000)
+    offsets = steps.attrs['offsets']
+    individuals = steps.attrs['individuals']
+    timestamps = steps['timestamp'].to_numpy()
+    step_m = steps['step_m'].to_numpy()
+    suffix = outlier_suffix(outlier_settings)
+
+    # Usable steps of every individual (all fixes but the last have a step)
+    usable = np.flatnonzero(usable_steps(steps))
+    codes = steps['ind_code'].to_numpy()[usable]
+    bounds = np.searchsorted(codes, np.arange(len(individuals) + 1))
+    tracks = [(individual, offsets[code], usable[bounds[code]:bounds[code + 1]])
+              for code, individual in enumerate(individuals) if bounds[code + 1] > bounds[code]]
+
+    # Cached detectors are shared between requests: resume them under the lock,
+    # every individual's new steps in one lockstep stream
+    with _lock:
+        keys, detectors = [], []
+        for individual, first, rows in tracks:
+            keys.append((individual, timestamps[first], suffix))
+            detectors.append(_detector_for(keys[-1], features[rows], timestamps[rows], hazard_lambda))
+        stream_detectors(detectors,
+                         [features[rows[detector.n_seen:]] for detector, (_, _, rows) in zip(detectors, tracks)],
+                         [timestamps[rows] for _, _, rows in tracks])
+        for key, detector in zip(keys, detectors):
+            _keep_detector(key, detector)
+        change_points = [list(detector.change_points) for detector in detectors]
+
+    frames = []
+    for (individual, _, rows), points in zip(tracks, change_points):
+        bounds = np.array([0] + points + [len(rows)])
+        labels = np.repeat(np.arange(len(bounds) - 1), np.diff(bounds))
+        counts = np.diff(bounds)
+
+        # A segment ends at the fix its last step arrives at
+        frames.append(pd.DataFrame({
+            'individual_id': individual,
+            'segment': np.arange(len(counts)),
+            'start': timestamps[rows[bounds[:-1]]],
+            'end': timestamps[rows[bounds[1:] - 1] + 1],
+            'n_steps': counts,
+            'mean_step_m': np.bincount(labels, weights=step_m[rows]) / counts,
+            'mean_displacement_km': np.bincount(labels, weights=displacement_km[rows]) / counts,
+            'persistence': np.bincount(labels, weights=features[rows, 2]) / counts
+        }))
+
+    if not frames:
+        return pd.DataFrame(columns=['individual_id', 'segment', 'start', 'end', 'n_steps',
+                                     'mean_step_m', 'mean_displacement_km', 'persistence'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def get_segments(movement_data_json, hazard_lambda=DEFAULT_HAZARD_LAMBDA, outlier_settings=None):
+    """
+    Get the behavioral segments of a serialized dataset, computing and caching on first use.
+
+    Args:
+        movement_data_json: Movement data as stored in `store-movement-data`
+        hazard_lambda: Expected segment length in steps
+        outlier_settings: Settings of the outlier mask (default mask if None)
+
+    Returns:
+        Segment DataFrame from `segment_tracks`
+    """
+    version = dataset_version(movement_data_json)
+    kind = f"segments_{hazard_lambda}{outlier_suffix(outlier_settings)}"
+    segments = get_result(version, kind)
+    if segments is None:
+        steps = get_step_table(movement_data_json, outlier_settings=outlier_settings)
+        segments = segment_tracks(steps, hazard_lambda=hazard_lambda, outlier_settings=outlier_settings)
+        store_result(version, kind, segments)
+    return segments
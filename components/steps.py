@@ -0,0 +1,244 @@
+"""
+Steps Component
+Builds the shared step table (step length, duration, speed, heading and turning angle
+between consecutive fixes of each individual) used by the behavioral engines
+"""
+
+import numpy as np
+import pandas as pd
+
+from components.data_store import (clear_results, dataset_version, get_dataset, get_result, list_results,
+                                   register_dataset, store_result)
+from components.schema import HDOP, INDIVIDUAL, LAT, LON, SATELLITES, find_column
+
+# Earth radius in meters
+EARTH_RADIUS = 6371000
+
+# Outlier masks of non-default settings kept per dataset (least recently made are dropped)
+MAX_OUTLIER_MASKS = 4
+
+def haversine_steps(lat1, lon1, lat2, lon2):
+    """
+    Vectorized great-circle distance in meters.
+
+    Args:
+        lat1, lon1, lat2, lon2: Arrays of coordinates in decimal degrees
+
+    Returns:
+        numpy array of distances in meters
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def step_metrics(codes, time_ns, lat, lon):
+    """
+    Step metrics between consecutive fixes, for fixes sorted by individual and time.
+
+    Args:
+        codes: Individual code of every fix
+        time_ns: int64 fix times in nanoseconds
+        lat, lon: Fix coordinates in decimal degrees
+
+    Returns:
+        Dictionary of step_m, dt_s, speed_mps, heading and turn_angle arrays; the
+        step values of the last fix of every individual and the turning angle of
+        the first are NaN
+    """
+    n = len(codes)
+    same_next = np.zeros(n, dtype=bool)
+    same_next[:-1] = codes[1:] == codes[:-1]
+
+    step_m = np.full(n, np.nan)
+    dt_s = np.full(n, np.nan)
+    heading = np.full(n, np.nan)
+    if n > 1:
+        step_m[:-1] = haversine_steps(lat[:-1], lon[:-1], lat[1:], lon[1:])
+        dt_s[:-1] = (time_ns[1:] - time_ns[:-1]) / 1e9
+
+        # Initial great-circle bearing of every step
+        phi1, phi2 = np.radians(lat[:-1]), np.radians(lat[1:])
+        dlon = np.radians(lon[1:] - lon[:-1])
+        heading[:-1] = np.arctan2(np.sin(dlon) * np.cos(phi2),
+                                  np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dlon))
+
+    step_m[~same_next] = np.nan
+    dt_s[~same_next] = np.nan
+    heading[~same_next | (step_m == 0)] = np.nan
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed_mps = np.where(dt_s > 0, step_m / dt_s, np.nan)
+
+    # Turning angle relative to the previous step of the same individual, wrapped to [-pi, pi)
+    turn_angle = np.full(n, np.nan)
+    if n > 1:
+        turn_angle[1:] = np.mod(heading[1:] - heading[:-1] + np.pi, 2 * np.pi) - np.pi
+        turn_angle[1:][codes[1:] != codes[:-1]] = np.nan
+
+    return {'step_m': step_m, 'dt_s': dt_s, 'speed_mps': speed_mps, 'heading': heading, 'turn_angle': turn_angle}
+
+
+def build_step_table(df):
+    """
+    Build the step table for all individuals in a single vectorized pass.
+
+    Row i describes the step from fix i to the next fix of the same individual;
+    the last fix of every individual has NaN step values.
+
+    Args:
+        df: DataFrame with individual, timestamp and location columns
+
+    Returns:
+        DataFrame with columns individual_id, ind_code, timestamp, location_lat,
+        location_long, hour, step_m, dt_s, speed_mps, speed_kmh, heading and turn_angle,
+        plus hdop and satellites when the input has fix quality columns.
+        The individual labels are stored in `attrs['individuals']` and the
+        per-individual row offsets in `attrs['offsets']`.
+    """
+    # Canonical columns are used as is; aliases are accepted for data not ingested through the app
+    id_col = find_column(df, INDIVIDUAL)
+    lat_col = find_column(df, LAT)
+    lon_col = find_column(df, LON)
+    if lat_col is None or lon_col is None or 'timestamp' not in df.columns:
+        raise ValueError("Step table needs timestamp and location columns")
+
+    timestamps = pd.to_datetime(df['timestamp'])
+    if id_col is not None:
+        codes, individuals = pd.factorize(df[id_col], sort=True)
+    else:
+        codes = np.zeros(len(df), dtype=np.int64)
+        individuals = pd.Index(['all'])
+
+    # Sort once by individual and time
+    time_ns = timestamps.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    order = np.lexsort((time_ns, codes))
+    codes = codes[order].astype(np.int32)
+    time_ns = time_ns[order]
+    lat = df[lat_col].to_numpy(dtype=np.float64)[order]
+    lon = df[lon_col].to_numpy(dtype=np.float64)[order]
+
+    metrics = step_metrics(codes, time_ns, lat, lon)
+
+    timestamp_values = time_ns.view('datetime64[ns]')
+    steps = pd.DataFrame({
+        'individual_id': np.asarray(individuals)[codes],
+        'ind_code': codes,
+        'timestamp': timestamp_values,
+        'location_lat': lat,
+        'location_long': lon,
+        'hour': ((time_ns // 3_600_000_000_000) % 24).astype(np.int8),
+        'step_m': metrics['step_m'],
+        'dt_s': metrics['dt_s'],
+        'speed_mps': metrics['speed_mps'],
+        'speed_kmh': metrics['speed_mps'] * 3.6,
+        'heading': metrics['heading'],
+        'turn_angle': metrics['turn_angle']
+    })
+
+    for name in (HDOP, SATELLITES):
+        column = find_column(df, name)
+        if column is not None:
+            steps[name] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)[order]
+
+    counts = np.bincount(codes, minlength=len(individuals))
+    steps.attrs['individuals'] = list(individuals)
+    steps.attrs['offsets'] = np.concatenate([[0], np.cumsum(counts)])
+    return steps
+
+
+def usable_steps(steps):
+    """
+    Steps that have a next fix and whose two fixes are not flagged as outliers.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`, optionally
+            with the is_outlier column from `components.outliers.detect_outliers`
+
+    Returns:
+        Boolean numpy array, one value per step
+    """
+    usable = ~np.isnan(steps['step_m'].to_numpy())
+    if 'is_outlier' in steps.columns:
+        outlier = steps['is_outlier'].to_numpy()
+        usable &= ~outlier
+        usable[:-1] &= ~outlier[1:]
+    return usable
+
+
+def displacement_from_start(steps):
+    """
+    Distance of every fix from the first fix of its individual (square root of NSD).
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+
+    Returns:
+        numpy array of distances in meters
+    """
+    first = steps.attrs['offsets'][:-1][steps['ind_code'].to_numpy()]
+    lat = steps['location_lat'].to_numpy()
+    lon = steps['location_long'].to_numpy()
+    return haversine_steps(lat[first], lon[first], lat, lon)
+
+
+def get_step_table(movement_data_json, df=None, outlier_settings=None):
+    """
+    Get the step table of a serialized dataset, building and caching it on first use.
+
+    Args:
+        movement_data_json: Movement data as stored in `store-movement-data`
+        df: Already parsed DataFrame of the same data (optional)
+        outlier_settings: Keyword arguments of `components.outliers.detect_outliers`
+            for the outlier mask (default mask if None)
+
+    Returns:
+        Step table DataFrame with the outlier mask of the settings (shared, treat as read-only)
+    """
+    # Imported here as the outlier pipeline builds on this module
+    from components.outliers import detect_outliers, outlier_suffix
+
+    version = dataset_version(movement_data_json)
+    suffix = outlier_suffix(outlier_settings)
+    if suffix:
+        return _masked_step_table(movement_data_json, df, outlier_settings, suffix)
+
+    steps = get_result(version, 'steps')
+    if steps is not None:
+        return steps
+
+    if df is None:
+        df = get_dataset(version)
+    if df is None:
+        df = pd.read_json(movement_data_json, orient='split')
+
+    # Results are only kept for registered datasets
+    register_dataset(df, version=version)
+
+    steps = build_step_table(df)
+    detect_outliers(steps)
+    store_result(version, 'outlier_settings', {})
+    store_result(version, 'steps', steps)
+    return steps
+
+
+def _masked_step_table(movement_data_json, df, outlier_settings, suffix):
+    """Step table sharing the columns of the default table, with its own outlier mask."""
+    from components.outliers import detect_outliers, normalize_outlier_settings
+
+    version = dataset_version(movement_data_json)
+    steps = get_result(version, f"steps{suffix}")
+    if steps is not None:
+        return steps
+
+    # Only the mask columns are replaced, the shared table keeps its own
+    steps = get_step_table(movement_data_json, df).copy(deep=False)
+    detect_outliers(steps, **normalize_outlier_settings(outlier_settings))
+    store_result(version, f"steps{suffix}", steps)
+
+    # Drop the oldest masks of this dataset together with the results derived from them
+    masks = [suffix] + [s for s in get_result(version, 'outlier_masks', []) if s != suffix]
+    for old in masks[MAX_OUTLIER_MASKS:]:
+        clear_results(version, keep=[kind for kind in list_results(version) if not kind.endswith(old)])
+    store_result(version, 'outlier_masks', masks[:MAX_OUTLIER_MASKS])
+    return steps
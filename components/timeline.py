@@ -0,0 +1,109 @@
+"""
+Timeline Component
+Builds the behavioral timeline (period x time-of-day occupancy and activity matrices)
+with a single bincount over the shared step table
+"""
+
+import numpy as np
+import pandas as pd
+
+from components.activity import classify_active
+from components.steps import usable_steps
+
+NS_PER_SECOND = 1_000_000_000
+
+# Resolution -> (cell width in seconds, cells per row, row label)
+RESOLUTIONS = {
+    '15min': (900, 96, 'Date'),
+    'hour': (3600, 24, 'Date'),
+    'day': (86400, 7, 'Week of'),
+}
+
+# Timeline button -> (window length in days, resolution); None means all data
+TIMELINE_WINDOWS = {
+    '1week': (7, '15min'),
+    '1month': (30, 'hour'),
+    '3months': (91, 'hour'),
+    'all': (None, None),
+}
+
+# When showing all data, switch from hourly to daily cells above this span
+ALL_DATA_DAILY_AFTER_DAYS = 120
+
+# 1970-01-01 was a Thursday; weekly rows start on Monday
+_MONDAY_OFFSET_S = 4 * 86400
+
+
+def _column_labels(resolution):
+    if resolution == '15min':
+        return [f"{m // 60:02d}:{m % 60:02d}" for m in range(0, 1440, 15)]
+    if resolution == 'hour':
+        return list(range(24))
+    return ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def build_timeline(steps, window='1month', individual=None, threshold_m=50, window_min=60, active=None):
+    """
+    Build the timeline matrices for the requested window.
+
+    Args:
+        steps: Step table from `components.steps.build_step_table`
+        window: One of the TIMELINE_WINDOWS keys; the window ends at the last fix
+        individual: Individual label to show, None or 'all' for all individuals
+        threshold_m: Minimum step length (meters) for an active step
+        window_min: Maximum step duration (minutes) for an active step
+        active: Precomputed boolean activity per step, overrides the threshold
+
+    Returns:
+        Dictionary with 'resolution', 'rows' (row start labels), 'columns',
+        'occupancy' (fixes per cell) and 'activity' (percent of active steps per
+        cell, NaN where there are no steps); None if no fixes are selected
+    """
+    days, resolution = TIMELINE_WINDOWS.get(window, TIMELINE_WINDOWS['1month'])
+
+    if active is None:
+        active = classify_active(steps, threshold_m, window_min)
+
+    time_s = steps['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64) // NS_PER_SECOND
+    mask = np.ones(len(steps), dtype=bool)
+    if individual is not None and individual != 'all':
+        mask &= (steps['individual_id'] == individual).to_numpy()
+    if not mask.any():
+        return None
+
+    end = time_s[mask].max()
+    if days is not None:
+        mask &= time_s > end - days * 86400
+    start = time_s[mask].min()
+
+    if resolution is None:
+        resolution = 'day' if (end - start) > ALL_DATA_DAILY_AFTER_DAYS * 86400 else 'hour'
+    cell_s, n_cols, row_title = RESOLUTIONS[resolution]
+
+    # Align rows to calendar days (or Monday-based weeks)
+    row_s = cell_s * n_cols
+    shift = _MONDAY_OFFSET_S if resolution == 'day' else 0
+    origin = ((start - shift) // row_s) * row_s + shift
+
+    cells = (time_s[mask] - origin) // cell_s
+    n_rows = int(cells.max() // n_cols) + 1
+    size = n_rows * n_cols
+
+    valid = usable_steps(steps)[mask]
+    occupancy = np.bincount(cells, minlength=size)
+    step_count = np.bincount(cells[valid], minlength=size)
+    active_count = np.bincount(cells[valid], weights=active[mask][valid], minlength=size)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        activity = np.where(step_count > 0, active_count / step_count * 100, np.nan)
+
+    row_starts = pd.to_datetime(origin + np.arange(n_rows) * row_s, unit='s')
+
+    return {
+        'resolution': resolution,
+        'row_title': row_title,
+        'rows': row_starts.strftime('%Y-%m-%d').tolist(),
+        'columns': _column_labels(resolution),
+        'occupancy': occupancy.reshape(n_rows, n_cols),
+        'activity': activity.reshape(n_rows, n_cols)
+    }
@@ -0,0 +1,321 @@
+"""
+Tracks Component
+Compact array-backed track container: all fixes sorted by individual and time in
+contiguous NumPy arrays, with CSR-style offsets marking where each individual's
+fixes start
+
+A Track is a zero-copy view of one individual's slice, so iterating over or
+looking up individuals costs O(1) per individual instead of a boolean mask over
+all fixes. Conversion to pandas shares the arrays where pandas allows it;
+conversion to and from Arrow needs the optional pyarrow package.
+"""
+
+import numpy as np
+import pandas as pd
+
+from components.data_store import dataset_version, get_result, store_result
+from components.schema import INDIVIDUAL, LAT, LON, TIMESTAMP, find_column
+
+
+class Track:
+    """
+    Fixes of one individual, as views into the arrays of a TrackCollection.
+
+    Attributes:
+        individual: Individual label
+        time: int64 nanoseconds since the epoch, sorted
+        lon, lat: float64 coordinates
+        attributes: Dictionary of additional per-fix arrays
+    """
+
+    __slots__ = ('individual', 'time', 'lon', 'lat', 'attributes')
+
+    def __init__(self, individual, time, lon, lat, attributes=None):
+        self.individual = individual
+        self.time = time
+        self.lon = lon
+        self.lat = lat
+        self.attributes = attributes or {}
+
+    def __len__(self):
+        return len(self.time)
+
+    def __repr__(self):
+        return f"Track({self.individual!r}, {len(self)} fixes)"
+
+    @property
+    def timestamps(self):
+        """Fix times as a datetime64[ns] view."""
+        return self.time.view('datetime64[ns]')
+
+    def to_frame(self):
+        """
+        Convert to a DataFrame with the canonical track columns.
+
+        Returns:
+            DataFrame with individual_id, timestamp, location_lat and location_long
+            columns plus the attributes
+        """
+        columns = {
+            INDIVIDUAL: np.full(len(self), self.individual, dtype=object),
+            TIMESTAMP: self.timestamps,
+            LAT: self.lat,
+            LON: self.lon,
+        }
+        columns.update(self.attributes)
+        return pd.DataFrame(columns, copy=False)
+
+
+class TrackCollection:
+    """
+    Fixes of many individuals in contiguous arrays sorted by individual and time.
+
+    Attributes:
+        individuals: Individual labels, in the order of their slices
+        offsets: int64 array of len(individuals) + 1; individual i's fixes are
+            rows offsets[i]:offsets[i + 1]
+        time: int64 nanoseconds since the epoch
+        lon, lat: float64 coordinates
+        attributes: Dictionary of additional per-fix arrays (e.g. hdop)
+    """
+
+    __slots__ = ('individuals', 'offsets', 'time', 'lon', 'lat', 'attributes', '_index')
+
+    def __init__(self, individuals, offsets, time, lon, lat, attributes=None):
+        self.individuals = list(individuals)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.time = time
+        self.lon = lon
+        self.lat = lat
+        self.attributes = attributes or {}
+        self._index = {individual: i for i, individual in enumerate(self.individuals)}
+
+    @classmethod
+    def from_frame(cls, df, attributes=()):
+        """
+        Build a collection from a DataFrame, sorting once by individual and time.
+
+        Args:
+            df: DataFrame with the canonical track columns (aliases are accepted)
+            attributes: Names of additional columns to carry
+
+        Returns:
+            TrackCollection
+        """
+        id_col = find_column(df, INDIVIDUAL)
+        lat_col = find_column(df, LAT)
+        lon_col = find_column(df, LON)
+        if lat_col is None or lon_col is None or TIMESTAMP not in df.columns:
+            raise ValueError("Tracks need timestamp and location columns")
+
+        time = pd.to_datetime(df[TIMESTAMP]).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        if id_col is not None:
+            codes, individuals = pd.factorize(df[id_col], sort=True)
+        else:
+            codes, individuals = np.zeros(len(df), dtype=np.int64), ['all']
+
+        # Rows without an individual (code -1) sort first and are dropped
+        order = np.lexsort((time, codes))
+        order = order[np.count_nonzero(codes < 0):]
+        counts = np.bincount(codes[codes >= 0], minlength=len(individuals))
+        return cls(
+            individuals,
+            np.concatenate([[0], np.cumsum(counts)]),
+            time[order],
+            df[lon_col].to_numpy(dtype=np.float64)[order],
+            df[lat_col].to_numpy(dtype=np.float64)[order],
+            {name: df[name].to_numpy()[order] for name in attributes if name in df.columns}
+        )
+
+    @classmethod
+    def from_step_table(cls, steps, attributes=()):
+        """
+        Wrap a step table without copying (it is already sorted by individual and time).
+
+        Args:
+            steps: Step table from `components.steps.build_step_table`
+            attributes: Names of step table columns to carry (e.g. 'step_m')
+
+        Returns:
+            TrackCollection sharing the step table's arrays
+        """
+        return cls(
+            steps.attrs['individuals'],
+            steps.attrs['offsets'],
+            steps[TIMESTAMP].to_numpy().view(np.int64),
+            steps[LON].to_numpy(),
+            steps[LAT].to_numpy(),
+            {name: steps[name].to_numpy() for name in attributes if name in steps.columns}
+        )
+
+    @classmethod
+    def from_arrow(cls, table, attributes=()):
+        """
+        Build a collection from a pyarrow Table with the canonical track columns.
+
+        Args:
+            table: pyarrow.Table
+            attributes: Names of additional columns to carry
+
+        Returns:
+            TrackCollection
+        """
+        return cls.from_frame(table.to_pandas(), attributes)
+
+    def __len__(self):
+        return len(self.time)
+
+    def __repr__(self):
+        return f"TrackCollection({len(self.individuals)} individuals, {len(self)} fixes)"
+
+    def __iter__(self):
+        for i in range(len(self.individuals)):
+            yield self.track(i)
+
+    def __getitem__(self, individual):
+        return self.track(self._index[individual])
+
+    def __contains__(self, individual):
+        return individual in self._index
+
+    def rows(self, individual):
+        """
+        Rows of an individual's fixes, e.g. to slice aligned per-fix arrays.
+
+        Args:
+            individual: Individual label
+
+        Returns:
+            slice
+        """
+        i = self._index[individual]
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def track(self, i):
+        """
+        View of the i-th individual's fixes.
+
+        Args:
+            i: Position of the individual in `individuals`
+
+        Returns:
+            Track sharing this collection's arrays
+        """
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        return Track(
+            self.individuals[i],
+            self.time[rows],
+            self.lon[rows],
+            self.lat[rows],
+            {name: values[rows] for name, values in self.attributes.items()}
+        )
+
+    def counts(self):
+        """Number of fixes of every individual."""
+        return np.diff(self.offsets)
+
+    def codes(self):
+        """Individual position of every fix."""
+        return np.repeat(np.arange(len(self.individuals), dtype=np.int32), self.counts())
+
+    def select(self, individuals):
+        """
+        Collection of some individuals (their slices are copied into new arrays).
+
+        Args:
+            individuals: Individual labels to keep; unknown labels are ignored
+
+        Returns:
+            TrackCollection
+        """
+        positions = sorted(self._index[individual] for individual in individuals if individual in self._index)
+        rows = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in positions]) \
+            if positions else np.array([], dtype=np.int64)
+        counts = self.counts()[positions]
+        return TrackCollection(
+            [self.individuals[i] for i in positions],
+            np.concatenate([[0], np.cumsum(counts)]),
+            self.time[rows],
+            self.lon[rows],
+            self.lat[rows],
+            {name: values[rows] for name, values in self.attributes.items()}
+        )
+
+    def to_frame(self):
+        """
+        Convert to a DataFrame with the canonical track columns.
+
+        Returns:
+            DataFrame with a categorical individual_id column, sharing the
+            coordinate and attribute arrays
+        """
+        columns = {
+            INDIVIDUAL: pd.Categorical.from_codes(self.codes(), categories=pd.Index(self.individuals)),
+            TIMESTAMP: self.time.view('datetime64[ns]'),
+            LAT: self.lat,
+            LON: self.lon,
+        }
+        columns.update(self.attributes)
+        return pd.DataFrame(columns, copy=False)
+
+    def to_arrow(self):
+        """
+        Convert to a pyarrow Table (numeric columns are not copied).
+
+        Returns:
+            pyarrow.Table with a dictionary-encoded individual_id column
+        """
+        import pyarrow as pa
+
+        columns = {
+            INDIVIDUAL: pa.DictionaryArray.from_arrays(pa.array(self.codes()),
+                                                       pa.array([str(i) for i in self.individuals])),
+            TIMESTAMP: pa.array(self.time.view('datetime64[ns]')),
+            LAT: pa.array(self.lat),
+            LON: pa.array(self.lon),
+        }
+        columns.update({name: pa.array(values) for name, values in self.attributes.items()})
+        return pa.table(columns)
+
+
+def split_individuals(df, by_time=False):
+    """
+    Split a DataFrame into per-individual slices with one sort instead of one mask per individual.
+
+    Args:
+        df: DataFrame with an individual_id column
+        by_time: Also sort every individual's rows by timestamp
+
+    Yields:
+        Tuples (individual, DataFrame slice), in order of first appearance
+    """
+    codes, individuals = pd.factorize(df[INDIVIDUAL])
+    if by_time and TIMESTAMP in df.columns:
+        order = np.lexsort((pd.to_datetime(df[TIMESTAMP]).to_numpy(), codes))
+    else:
+        order = np.argsort(codes, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(codes[codes >= 0], minlength=len(individuals)))])
+    # Rows without an individual (code -1) sort first and are skipped
+    ordered = df.iloc[order[np.count_nonzero(codes < 0):]]
+    for i, individual in enumerate(individuals):
+        yield individual, ordered.iloc[offsets[i]:offsets[i + 1]]
+
+
+def get_tracks(movement_data_json):
+    """
+    Get the track collection of a serialized dataset, built on its cached step table.
+
+    Args:
+        movement_data_json: Movement data as stored in `store-movement-data`
+
+    Returns:
+        TrackCollection sharing the step table's arrays
+    """
+    from components.steps import get_step_table
+
+    version = dataset_version(movement_data_json)
+    tracks = get_result(version, 'tracks')
+    if tracks is None:
+        tracks = TrackCollection.from_step_table(get_step_table(movement_data_json))
+        store_result(version, 'tracks', tracks)
+    return tracks
@@ -194,6 +194,39 @@ layout = html.Div([
         ], width=12)
     ], className="mt-4"),
     
+    # Behavioral segments (change points)
+    dbc.Row([
+        dbc.Col([
+            dbc.Card([
+                dbc.CardHeader([
+                    dbc.Row([
+                        dbc.Col(html.H5("Behavioral Segments"), width="auto"),
+                        dbc.Col([
+                            html.Label("Expected Segment Length (steps):", className="me-2"),
+                            dbc.Input(
+                                id="segment-hazard-lambda",
+                                type="number",
+                                min=50,
+                                max=5000,
+                                step=50,
+                                value=500,
+                                size="sm",
+                                style={"width": "100px", "display": "inline-block"}
+                            )
+                        ], width="auto", className="ms-auto")
+                    ])
+                ]),
+                dbc.CardBody([
+                    dcc.Graph(
+                        id="behavioral-segments-chart",
+                        config={'displayModeBar': True},
+                        style={'height': '300px'}
+                    )
+                ])
+            ])
+        ], width=12)
+    ], className="mt-4"),
+    
     # Analysis settings row
     dbc.Row([
         dbc.Col([
@@ -274,6 +307,39 @@ layout = html.Div([
                         ], width=4)
                     ]),
                     
+                    dbc.Row([
+                        # Active/rest classifier
+                        dbc.Col([
+                            html.Label("Activity Classifier:"),
+                            dbc.RadioItems(
+                                id="behavioral-classifier",
+                                options=[
+                                    {"label": "Distance threshold", "value": "threshold"},
+                                    {"label": "Hidden Markov model", "value": "hmm"}
+                                ],
+                                value="threshold",
+                                inline=True,
+                                className="mb-3"
+                            ),
+                            dbc.FormText("HMM states use step length and turning angle")
+                        ], width=8),
+                        
+                        # Number of HMM states
+                        dbc.Col([
+                            html.Label("Behavioral States:"),
+                            dbc.Input(
+                                id="behavioral-hmm-states",
+                                type="number",
+                                min=2,
+                                max=4,
+                                step=1,
+                                value=3,
+                                className="mb-3"
+                            ),
+                            dbc.FormText("Resting, foraging, travelling")
+                        ], width=4)
+                    ]),
+                    
                     dbc.Row([
                         dbc.Col([
                             dbc.Button(
@@ -292,7 +358,8 @@ layout = html.Div([
     # Hidden components to store state
     dcc.Store(id="behavioral-data-store"),
     dcc.Store(id="activity-settings-store"),
-    dcc.Store(id="seasonal-patterns-store")
+    dcc.Store(id="seasonal-patterns-store"),
+    dcc.Store(id="behavioral-timeline-window", data="1month")
 ])
 
 # Callbacks will be defined in app.py to avoid circular imports
@@ -49,6 +49,31 @@ layout = html.Div([
                         },
                         multiple=False
                     ),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label("Duplicate fixes:", html_for="duplicate-policy"),
+                            dcc.Dropdown(
+                                id="duplicate-policy",
+                                options=[
+                                    {"label": "Keep best DOP", "value": "best_dop"},
+                                    {"label": "Keep first", "value": "first"},
+                                    {"label": "Average positions", "value": "mean"}
+                                ],
+                                value="best_dop",
+                                clearable=False
+                            )
+                        ], width=7),
+                        dbc.Col([
+                            dbc.Label("Tolerance (s):", html_for="duplicate-tolerance"),
+                            dbc.Input(
+                                id="duplicate-tolerance",
+                                type="number",
+                                value=1,
+                                min=0,
+                                step=1
+                            )
+                        ], width=5)
+                    ], className="mb-2"),
                     html.Div(id="upload-status", className="mt-3"),
                     
                     html.Hr(),
@@ -88,6 +113,47 @@ layout = html.Div([
                         ])
                     ], bordered=True, hover=True, size="sm")
                 ])
+            ], className="mb-4"),
+            
+            # Live tracking: new fixes are polled and added to the map and KPIs as they arrive
+            dbc.Card([
+                dbc.CardHeader("Live Tracking"),
+                dbc.CardBody([
+                    html.P("Poll a Movebank study or a local feed directory for new fixes:"),
+                    dbc.Checklist(
+                        id="live-mode-switch",
+                        options=[{"label": "Live mode", "value": "live"}],
+                        value=[],
+                        switch=True,
+                        className="mb-2"
+                    ),
+                    dbc.Row([
+                        dbc.Col([
+                            dbc.Label("Source:", html_for="live-source"),
+                            dcc.Dropdown(
+                                id="live-source",
+                                options=[
+                                    {"label": "Movebank study", "value": "movebank"},
+                                    {"label": "Local feed directory", "value": "feed"}
+                                ],
+                                value="movebank",
+                                clearable=False
+                            )
+                        ], width=7),
+                        dbc.Col([
+                            dbc.Label("Poll every (min):", html_for="live-poll-minutes"),
+                            dbc.Input(
+                                id="live-poll-minutes",
+                                type="number",
+                                value=5,
+                                min=1,
+                                step=1
+                            )
+                        ], width=5)
+                    ], className="mb-2"),
+                    dbc.Input(id="live-study-id", type="text", placeholder="Movebank study ID"),
+                    html.Div(id="live-status", className="mt-3 text-muted")
+                ])
             ], className="mb-4")
         ], width=5),
         
@@ -216,6 +216,13 @@ layout = html.Div([
                                 min=1,
                                 step=1,
                                 className="mb-2"
+                            ),
+                            dbc.Checklist(
+                                id="fix-schedule-auto",
+                                options=[{"label": "Infer duty-cycle schedule from data", "value": "auto"}],
+                                value=["auto"],
+                                switch=True,
+                                className="mb-2"
                             )
                         ], width=6),
                         
@@ -299,7 +306,8 @@ layout = html.Div([
     # Hidden components to store state
     dcc.Store(id="quality-data-store"),
     dcc.Store(id="gaps-data-store"),
-    dcc.Store(id="outliers-data-store")
+    dcc.Store(id="outliers-data-store"),
+    dcc.Store(id="fix-success-period", data="D")
 ])
 
 # Callbacks will be defined in app.py to avoid circular imports
@@ -108,7 +108,10 @@ layout = html.Div([
                         id="calculate-home-range-btn",
                         color="primary",
                         className="mt-2 w-100"
-                    )
+                    ),
+
+                    # Background calculation progress
+                    html.Div(id="home-range-job-status")
                 ])
             ], className="mb-4"),
             